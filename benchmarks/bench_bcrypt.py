@@ -0,0 +1,76 @@
+"""bcrypt cost 校准：测量每个 cost 的单次哈希耗时，推荐不超过目标耗时的最大 cost
+
+bcrypt 的 cost 每加一耗时翻倍。cost 越高越能抵抗离线破解，但每次登录 / 注册都要付出这个耗时，
+并占用一个密码线程（PASSWORD_HASH_WORKERS）。在部署机器上运行本脚本，把推荐值写入 BCRYPT_ROUNDS；
+修改后旧用户的密码哈希会在下次登录时自动按新 cost 重新计算。
+
+同时测量在 --workers 个线程并发时每秒能完成的登录数，用于估算登录高峰的排队时间。
+
+用法：
+    python benchmarks/bench_bcrypt.py --target-ms 250
+    python benchmarks/bench_bcrypt.py --rounds 10,11,12,13 --workers 4 --repeat 5
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.hash import bcrypt
+
+PASSWORD = "benchmark-password-123"
+
+
+def measure(rounds: int, repeat: int) -> float:
+    """单次哈希耗时的中位数（毫秒）"""
+    hasher = bcrypt.using(rounds=rounds)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        hasher.hash(PASSWORD)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def throughput(rounds: int, workers: int, seconds: float) -> float:
+    """workers 个线程并发验证密码时每秒完成的次数"""
+    hashed = bcrypt.using(rounds=rounds).hash(PASSWORD)
+    deadline = time.perf_counter() + seconds
+
+    def worker() -> int:
+        count = 0
+        while time.perf_counter() < deadline:
+            bcrypt.verify(PASSWORD, hashed)
+            count += 1
+        return count
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        total = sum(executor.map(lambda _: worker(), range(workers)))
+    return total / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", default="8,9,10,11,12,13,14", help="逗号分隔的 cost")
+    parser.add_argument("--target-ms", type=float, default=250, help="单次哈希的目标耗时上限（毫秒）")
+    parser.add_argument("--repeat", type=int, default=3, help="每个 cost 的测量次数")
+    parser.add_argument("--workers", type=int, default=4, help="并发吞吐测试的线程数（对应 PASSWORD_HASH_WORKERS）")
+    parser.add_argument("--seconds", type=float, default=3, help="并发吞吐测试的时长")
+    args = parser.parse_args()
+
+    rounds_list = [int(r) for r in args.rounds.split(",")]
+    print(f"{'cost':>6} {'耗时(ms)':>10}")
+    timings = {}
+    for rounds in rounds_list:
+        timings[rounds] = measure(rounds, args.repeat)
+        print(f"{rounds:>6} {timings[rounds]:>10.1f}")
+
+    within = [rounds for rounds in rounds_list if timings[rounds] <= args.target_ms]
+    recommended = max(within) if within else min(rounds_list)
+    rate = throughput(recommended, args.workers, args.seconds)
+    print(f"\n推荐 BCRYPT_ROUNDS={recommended}（单次 {timings[recommended]:.1f} ms，目标 ≤ {args.target_ms:.0f} ms）")
+    print(f"{args.workers} 个密码线程并发：约 {rate:.1f} 次登录/秒")
+
+
+if __name__ == "__main__":
+    main()
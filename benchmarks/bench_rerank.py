@@ -0,0 +1,96 @@
+"""两阶段检索基准：召回候选数 vs 重排序延迟与命中率
+
+合成语料：每个目标文档块带有唯一关键词，查询向量是目标向量加较大噪声，
+因此纯向量 top_k 经常漏掉目标；重排序器利用关键词把目标提上来。
+
+用法：
+    python benchmarks/bench_rerank.py [--reranker lexical|cross-encoder] [--docs 5000]
+        [--queries 200] [--top-k 3] [--candidates 3,10,20,50] [--batch-size 16] [--threads 0]
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from ai_qa.domain.entities import DocumentChunk
+from ai_qa.infrastructure.rerank import CrossEncoderReranker, LexicalReranker
+from ai_qa.infrastructure.vectorstore import FaissVectorStore
+
+DIMENSION = 64
+NOISE = 0.25
+
+
+class NoisyEmbedding:
+    """文档向量随机生成；查询向量 = 目标文档向量 + 噪声"""
+
+    def __init__(self, doc_vectors: dict[str, np.ndarray], rng: np.random.Generator):
+        self._doc_vectors = doc_vectors
+        self._rng = rng
+        self.query_targets: dict[str, str] = {}
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        return [self._doc_vectors[text].tolist() for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        base = self._doc_vectors[self.query_targets[text]]
+        noisy = base + self._rng.normal(0, NOISE, DIMENSION)
+        return (noisy / np.linalg.norm(noisy)).tolist()
+
+
+def run(args) -> None:
+    rng = np.random.default_rng(7)
+    texts = [f"文档{i} 关键词K{i:05d} 说明内容" for i in range(args.docs)]
+    vectors = rng.normal(size=(args.docs, DIMENSION))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    embedding = NoisyEmbedding(dict(zip(texts, vectors)), rng)
+
+    store = FaissVectorStore(embedding=embedding, dimension=DIMENSION)
+    store.add_documents([DocumentChunk(content=text, chunk_id=i) for i, text in enumerate(texts)])
+
+    targets = rng.choice(args.docs, size=args.queries, replace=False)
+    queries = []
+    for target in targets:
+        query = f"K{target:05d} 是什么"
+        embedding.query_targets[query] = texts[target]
+        queries.append((query, int(target), store.search_by_vector(embedding.embed_query(query), top_k=max(args.candidates))))
+
+    if args.reranker == "cross-encoder":
+        reranker = CrossEncoderReranker(batch_size=args.batch_size, num_threads=args.threads)
+    else:
+        reranker = LexicalReranker()
+
+    print(f"reranker={args.reranker} docs={args.docs} queries={args.queries} top_k={args.top_k}")
+    print(f"{'candidates':>10} {'hit@k':>7} {'p50(ms)':>8} {'p95(ms)':>8}")
+    for candidate_count in args.candidates:
+        hits, latencies = 0, []
+        for query, target, ranked in queries:
+            candidates = ranked[:candidate_count]
+            start = time.perf_counter()
+            if candidate_count > args.top_k:
+                result = reranker.rerank(query, candidates, args.top_k)
+            else:
+                result = candidates[:args.top_k]
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += any(chunk.chunk_id == target for chunk in result)
+
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(
+            f"{candidate_count:>10} {hits / len(queries):>7.3f} "
+            f"{statistics.median(latencies):>8.2f} {p95:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reranker", choices=["lexical", "cross-encoder"], default="lexical")
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument(
+        "--candidates", type=lambda value: [int(v) for v in value.split(",")], default=[3, 10, 20, 50]
+    )
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=0)
+    run(parser.parse_args())
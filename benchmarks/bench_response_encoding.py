@@ -0,0 +1,104 @@
+"""消息历史响应的序列化 CPU 与压缩后体积
+
+构造一个 --messages 条消息的会话（每隔几条助手消息带 Agent 推理步骤），比较 GET /messages 响应的
+几种序列化方式，以及 gzip / brotli 压缩后的体积和压缩耗时：
+
+- jsonable_encoder + json：FastAPI 对没有 response_model 的返回值的默认处理
+- FastJSONResponse：Pydantic 模型直接 model_dump_json
+- json_codec：把消息转换为字典后用 orjson（未安装时为标准库 json）编码
+
+用法：
+    python benchmarks/bench_response_encoding.py
+    python benchmarks/bench_response_encoding.py --messages 1000 --repeat 20 --gzip-level 6 --brotli-quality 4
+"""
+import argparse
+import gzip
+import statistics
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from ai_qa.infrastructure.utils.json_codec import dumps_bytes
+from ai_qa.interfaces.api.responses import FastJSONResponse
+from ai_qa.interfaces.api.schemas import MessageItem, MessagesResponse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def build_conversation(count: int) -> MessagesResponse:
+    """交替的用户 / 助手消息，中文内容，每 5 条助手消息带一组推理步骤"""
+    messages = []
+    for i in range(count):
+        if i % 2 == 0:
+            messages.append(MessageItem(role="user", content=f"第 {i} 个问题：请解释向量检索的召回率和重排序的关系？"))
+            continue
+        steps = None
+        if i % 10 == 1:
+            steps = [
+                {"type": "thinking", "content": "需要先检索知识库", "tool": None, "input": None, "output": None},
+                {"type": "tool_start", "content": None, "tool": "search", "input": '{"query": "召回率"}', "output": None},
+                {"type": "tool_result", "content": None, "tool": "search", "input": None, "output": "召回率是……" * 20},
+            ]
+        messages.append(
+            MessageItem(
+                role="assistant",
+                content=f"回答 {i}：召回阶段取更多候选，重排序再按相关性精排。" * 8,
+                reasoning_steps=steps,
+            )
+        )
+    return MessagesResponse(session_id="bench-session", messages=messages)
+
+
+def cpu_ms(func, repeat: int) -> float:
+    """单次调用 CPU 时间的中位数（毫秒）"""
+    samples = []
+    for _ in range(repeat):
+        started = time.process_time()
+        func()
+        samples.append((time.process_time() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1000, help="会话消息数")
+    parser.add_argument("--repeat", type=int, default=20, help="每种方式的测量次数")
+    parser.add_argument("--gzip-level", type=int, default=6, help="gzip 压缩级别（对应 COMPRESSION_GZIP_LEVEL）")
+    parser.add_argument("--brotli-quality", type=int, default=4, help="brotli 质量（对应 COMPRESSION_BROTLI_QUALITY）")
+    args = parser.parse_args()
+
+    response = build_conversation(args.messages)
+    encoders = {
+        "jsonable_encoder + json": lambda: JSONResponse(jsonable_encoder(response)).body,
+        "FastJSONResponse": lambda: FastJSONResponse(response).body,
+        "json_codec(dict)": lambda: dumps_bytes(response.model_dump()),
+    }
+
+    print(f"{args.messages} 条消息\n")
+    print(f"{'序列化方式':<26} {'CPU(ms)':>10} {'大小(KB)':>10}")
+    for name, encode in encoders.items():
+        body = encode()
+        print(f"{name:<26} {cpu_ms(encode, args.repeat):>10.2f} {len(body) / 1024:>10.1f}")
+
+    body = FastJSONResponse(response).body
+    codecs = {"identity": lambda: body, f"gzip-{args.gzip_level}": lambda: gzip.compress(body, args.gzip_level)}
+    if brotli is not None:
+        codecs[f"br-{args.brotli_quality}"] = lambda: brotli.compress(body, quality=args.brotli_quality)
+
+    print(f"\n{'压缩':<26} {'CPU(ms)':>10} {'大小(KB)':>10} {'压缩比':>8}")
+    for name, compress in codecs.items():
+        compressed = compress()
+        print(
+            f"{name:<26} {cpu_ms(compress, args.repeat):>10.2f} "
+            f"{len(compressed) / 1024:>10.1f} {len(body) / len(compressed):>8.1f}"
+        )
+    if brotli is None:
+        print("（未安装 brotli，跳过 br）")
+
+
+if __name__ == "__main__":
+    main()
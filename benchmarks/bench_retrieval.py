@@ -0,0 +1,315 @@
+"""检索基准套件：写入吞吐 / 检索延迟 / 召回率，结果输出为 JSON 便于回归对比
+
+把语料写入 FaissVectorStore 或 PostgresVectorStore（使用确定性的假 Embedding），
+语料逐步增长到 --sizes 指定的每个规模，在每个规模下测量：
+    - ingest：本阶段写入速度（行/秒，含假 Embedding 和落盘/入库）
+    - search：每个 top_k 的检索延迟 p50 / p95 / p99（毫秒）
+    - recall@k：与 numpy 精确 L2 检索结果的重合比例
+
+语料默认是合成数据：每个文档块属于一个主题（topic-<n>），假 Embedding 为主题中心加上由文本哈希决定的噪声，
+查询是同一主题下的新文本，因此近邻结构接近真实 Embedding 的聚类分布。
+也可以用 --corpus 指定 JSONL 语料（每行 {"content": ...}），此时查询从语料中抽样并截取前半段。
+
+PostgreSQL 后端使用 DATABASE_URL 连接，会创建临时用户/知识库并在结束时删除；向量维度固定为 1024。
+
+用法：
+    python benchmarks/bench_retrieval.py --backend faiss --sizes 1000,10000,50000 --top-k 1,5,10 --output faiss.json
+    python benchmarks/bench_retrieval.py --backend faiss --faiss-index hnswsq --baseline faiss.json
+    python benchmarks/bench_retrieval.py --backend postgres --dim 1024 --sizes 1000,10000
+"""
+import argparse
+import hashlib
+import json
+import platform
+import random
+import re
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+from ai_qa.domain.entities import DocumentChunk
+
+# 合成语料的主题数
+TOPICS = 64
+# 同一主题内文本相对主题中心的噪声强度
+NOISE = 0.6
+_TOPIC_PATTERN = re.compile(r"topic-(\d+)")
+
+
+class FakeEmbedding:
+    """确定性的假 Embedding：主题中心 + 文本哈希决定的噪声（同一文本始终得到同一向量）"""
+
+    def __init__(self, dimension: int, seed: int = 0):
+        self.dimension = dimension
+        self.calls = 0
+        self._centers = np.random.default_rng(seed).normal(size=(TOPICS, dimension)).astype(np.float32)
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        self.calls += 1
+        return self.embed_matrix(texts).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        self.calls += 1
+        return self.embed_matrix([text])[0].tolist()
+
+    def embed_matrix(self, texts: list[str]) -> np.ndarray:
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.sha1(text.encode()).digest()[:8], "little")
+            noise = np.random.default_rng(seed).normal(size=self.dimension).astype(np.float32)
+            match = _TOPIC_PATTERN.search(text)
+            if match:
+                vectors[row] = self._centers[int(match.group(1)) % TOPICS] + NOISE * noise
+            else:
+                vectors[row] = noise
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors
+
+
+def synthetic_corpus(size: int, queries: int, rng: random.Random) -> tuple[list[str], list[str]]:
+    corpus = [f"文档 {i} topic-{rng.randrange(TOPICS)} 的内容片段 {rng.random():.6f}" for i in range(size)]
+    query_texts = [f"查询 {i} topic-{rng.randrange(TOPICS)}" for i in range(queries)]
+    return corpus, query_texts
+
+
+def fixture_corpus(path: str, size: int, queries: int, rng: random.Random) -> tuple[list[str], list[str]]:
+    with open(path, encoding="utf-8") as f:
+        corpus = [json.loads(line)["content"] for line in f if line.strip()][:size]
+    if len(corpus) < size:
+        raise SystemExit(f"语料只有 {len(corpus)} 条，小于 --sizes 的最大值 {size}")
+    sampled = rng.sample(corpus, min(queries, len(corpus)))
+    return corpus, [text[:max(1, len(text) // 2)] for text in sampled]
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def exact_neighbors(corpus_vectors: np.ndarray, query_vectors: np.ndarray, top_k: int) -> np.ndarray:
+    """numpy 精确 L2 检索，返回每个查询的 top_k 行号"""
+    distances = (
+        (query_vectors ** 2).sum(axis=1, keepdims=True)
+        - 2 * query_vectors @ corpus_vectors.T
+        + (corpus_vectors ** 2).sum(axis=1)
+    )
+    top = np.argpartition(distances, min(top_k, distances.shape[1] - 1), axis=1)[:, :top_k]
+    order = np.take_along_axis(distances, top, axis=1).argsort(axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+# ============ 后端 ============
+
+
+@contextmanager
+def faiss_backend(args, embedding: FakeEmbedding):
+    from ai_qa.infrastructure.vectorstore.faiss_index import FaissIndexConfig, FaissIndexType
+    from ai_qa.infrastructure.vectorstore.faiss_store import FaissVectorStore
+
+    config = FaissIndexConfig(index_type=FaissIndexType(args.faiss_index))
+    with tempfile.TemporaryDirectory() as directory:
+        yield FaissVectorStore(embedding, args.dim, directory, config), "bench", "bench"
+
+
+@contextmanager
+def postgres_backend(args, embedding: FakeEmbedding):
+    from ai_qa.infrastructure.database import SessionLocal
+    from ai_qa.infrastructure.database.models import (
+        Document,
+        DocumentChunk as DocumentChunkModel,
+        KnowledgeBase,
+        User,
+    )
+    from ai_qa.infrastructure.vectorstore.postgres_store import (
+        EMBEDDING_DIMENSION,
+        PostgresVectorStore,
+        VectorStorage,
+    )
+
+    if args.dim != EMBEDDING_DIMENSION:
+        raise SystemExit(f"PostgreSQL 后端的向量维度固定为 {EMBEDDING_DIMENSION}，请指定 --dim {EMBEDDING_DIMENSION}")
+
+    db = SessionLocal()
+    suffix = f"{int(time.time())}"
+    user = User(username=f"bench_{suffix}", password_hash="-")
+    db.add(user)
+    db.flush()
+    kb = KnowledgeBase(user_id=user.id, name="bench")
+    db.add(kb)
+    db.flush()
+    document = Document(knowledge_base_id=kb.id, title="bench")
+    db.add(document)
+    db.commit()
+
+    store = PostgresVectorStore(db, embedding, storage=VectorStorage(args.pg_storage))
+    try:
+        yield store, kb.id, document.id
+    finally:
+        db.rollback()
+        db.query(DocumentChunkModel).filter(DocumentChunkModel.document_id == document.id).delete()
+        db.query(Document).filter(Document.id == document.id).delete()
+        db.query(KnowledgeBase).filter(KnowledgeBase.id == kb.id).delete()
+        db.query(User).filter(User.id == user.id).delete()
+        db.commit()
+        db.close()
+
+
+BACKENDS = {"faiss": faiss_backend, "postgres": postgres_backend}
+
+
+# ============ 测量 ============
+
+
+def ingest(store, kb_id: str, document_id: str, texts: list[str], offset: int, batch_size: int) -> float:
+    """写入一批语料，返回行/秒"""
+    start = time.perf_counter()
+    for begin in range(0, len(texts), batch_size):
+        batch = texts[begin:begin + batch_size]
+        store.add_documents(
+            [
+                DocumentChunk(content=text, document_id=document_id, chunk_id=offset + begin + i)
+                for i, text in enumerate(batch)
+            ],
+            kb_id,
+        )
+    return len(texts) / (time.perf_counter() - start)
+
+
+def measure_search(
+    store, kb_id: str, queries: list[str], top_k: int, truth: np.ndarray, row_of: dict[str, int]
+) -> dict:
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        found = store.search(query, kb_id, top_k=top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len({row_of[chunk.content] for chunk in found} & set(expected.tolist()))
+    latencies.sort()
+    return {
+        "top_k": top_k,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "qps": round(len(latencies) / (sum(latencies) / 1000), 1),
+        "recall": round(hits / truth.size, 4),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> dict:
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    top_ks = [int(k) for k in args.top_k.split(",")]
+    rng = random.Random(args.seed)
+    if args.corpus:
+        corpus, queries = fixture_corpus(args.corpus, sizes[-1], args.queries, rng)
+    else:
+        corpus, queries = synthetic_corpus(sizes[-1], args.queries, rng)
+
+    embedding = FakeEmbedding(args.dim, args.seed)
+    corpus_vectors = embedding.embed_matrix(corpus)
+    query_vectors = embedding.embed_matrix(queries)
+    row_of = {text: row for row, text in enumerate(corpus)}
+
+    stages = []
+    with BACKENDS[args.backend](args, embedding) as (store, kb_id, document_id):
+        loaded = 0
+        for size in sizes:
+            rows_per_second = ingest(store, kb_id, document_id, corpus[loaded:size], loaded, args.batch_size)
+            loaded = size
+
+            # 预热（加载索引、建立关键词索引等）
+            store.search(queries[0], kb_id, top_k=max(top_ks))
+
+            truth = exact_neighbors(corpus_vectors[:size], query_vectors, max(top_ks))
+            searches = [
+                measure_search(store, kb_id, queries, top_k, truth[:, :top_k], row_of)
+                for top_k in top_ks
+            ]
+            stages.append({"size": size, "ingest_rows_per_s": round(rows_per_second, 1), "search": searches})
+            print_stage(stages[-1])
+
+    return {
+        "benchmark": "retrieval",
+        "backend": args.backend,
+        "index": args.faiss_index if args.backend == "faiss" else args.pg_storage,
+        "dim": args.dim,
+        "queries": len(queries),
+        "corpus": args.corpus or "synthetic",
+        "seed": args.seed,
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "stages": stages,
+    }
+
+
+def print_stage(stage: dict) -> None:
+    print(f"\nsize={stage['size']} ingest={stage['ingest_rows_per_s']:.0f} rows/s")
+    print(f"  {'top_k':>5} {'p50(ms)':>8} {'p95(ms)':>8} {'p99(ms)':>8} {'qps':>8} {'recall':>7}")
+    for search in stage["search"]:
+        print(
+            f"  {search['top_k']:>5} {search['p50_ms']:>8.2f} {search['p95_ms']:>8.2f} "
+            f"{search['p99_ms']:>8.2f} {search['qps']:>8.1f} {search['recall']:>7.3f}"
+        )
+
+
+def compare(result: dict, baseline_path: str) -> None:
+    """与基线结果对比同规模、同 top_k 的 p95 和召回率"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {
+        (stage["size"], search["top_k"]): search
+        for stage in baseline["stages"]
+        for search in stage["search"]
+    }
+    print(f"\n对比基线 {baseline_path}（commit={baseline.get('commit')}）")
+    print(f"  {'size':>7} {'top_k':>5} {'p95 Δ%':>8} {'recall Δ':>9}")
+    for stage in result["stages"]:
+        for search in stage["search"]:
+            old = previous.get((stage["size"], search["top_k"]))
+            if old is None:
+                continue
+            p95_delta = (search["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100 if old["p95_ms"] else 0.0
+            print(
+                f"  {stage['size']:>7} {search['top_k']:>5} {p95_delta:>+8.1f} "
+                f"{search['recall'] - old['recall']:>+9.4f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="faiss")
+    parser.add_argument("--sizes", default="1000,10000", help="逗号分隔的语料规模，按从小到大逐步写入")
+    parser.add_argument("--top-k", default="1,5,10", help="逗号分隔的 top_k")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=500, help="每次 add_documents 的文档块数")
+    parser.add_argument("--faiss-index", default="flat", help="FAISS 索引类型：flat / ivfpq / hnswsq")
+    parser.add_argument("--pg-storage", default="full", help="pgvector 存储格式：full / halfvec / binary")
+    parser.add_argument("--corpus", help="JSONL 语料文件（每行 {\"content\": ...}），默认使用合成语料")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="结果 JSON 输出路径")
+    parser.add_argument("--baseline", help="与之前输出的 JSON 对比")
+    args = parser.parse_args()
+
+    result = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.output}")
+    if args.baseline:
+        compare(result, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
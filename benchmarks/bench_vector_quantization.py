@@ -0,0 +1,115 @@
+"""向量压缩基准：内存 / 磁盘 / 召回率 / 延迟
+
+FAISS：flat、ivfpq、hnswsq 三种索引，磁盘为 serialize_index 的字节数（加载后内存占用基本相同）。
+pgvector：在 numpy 中模拟 vector / halfvec / binary（二值量化召回 + float32 重排）三种存储，
+按 pgvector 的行内格式估算每行向量字节数。
+
+召回率为 recall@k，基准答案是 float32 精确 L2 检索结果。
+
+用法：
+    python benchmarks/bench_vector_quantization.py [--docs 20000] [--dim 1024] [--queries 200] [--top-k 10]
+"""
+import argparse
+import statistics
+import time
+
+import faiss
+import numpy as np
+
+from ai_qa.infrastructure.vectorstore.faiss_index import (
+    FaissIndexConfig,
+    FaissIndexType,
+    build_index,
+)
+
+# 有聚类结构的合成数据更接近真实 Embedding 分布
+CLUSTERS = 64
+
+
+def make_data(docs: int, dim: int, queries: int, rng: np.random.Generator):
+    centers = rng.normal(size=(CLUSTERS, dim)).astype(np.float32)
+    labels = rng.integers(0, CLUSTERS, size=docs + queries)
+    data = centers[labels] + 0.6 * rng.normal(size=(docs + queries, dim)).astype(np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    return data[:docs], data[docs:]
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def percentiles(latencies: list[float]) -> tuple[float, float]:
+    latencies = sorted(latencies)
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+def bench_faiss(base, queries, truth, top_k) -> None:
+    print(f"\n[FAISS] {'index':<8} {'disk(MB)':>9} {'B/vec':>7} {'recall':>7} {'p50(ms)':>8} {'p95(ms)':>8} {'build(s)':>9}")
+    for index_type in FaissIndexType:
+        start = time.perf_counter()
+        index = build_index(FaissIndexConfig(index_type=index_type), base.shape[1], base)
+        build_seconds = time.perf_counter() - start
+        disk = len(faiss.serialize_index(index))
+
+        found, latencies = [], []
+        for query in queries:
+            start = time.perf_counter()
+            _, ids = index.search(query[None, :], top_k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found.append(ids[0])
+
+        p50, p95 = percentiles(latencies)
+        print(
+            f"        {type(index).__name__[5:]:<8} {disk / 2 ** 20:>9.1f} {disk / len(base):>7.0f} "
+            f"{recall(np.array(found), truth):>7.3f} {p50:>8.2f} {p95:>8.2f} {build_seconds:>9.1f}"
+        )
+
+
+def bench_pgvector(base, queries, truth, top_k, rescore_factor) -> None:
+    dim = base.shape[1]
+    print(f"\n[pgvector] {'storage':<8} {'B/row':>7} {'recall':>7}")
+
+    # vector：float32，4 * d + 8 字节
+    print(f"           {'full':<8} {4 * dim + 8:>7} {1.0:>7.3f}")
+
+    # halfvec：float16，2 * d + 8 字节
+    half = base.astype(np.float16).astype(np.float32)
+    found = [np.argsort(((half - q) ** 2).sum(axis=1))[:top_k] for q in queries]
+    print(f"           {'halfvec':<8} {2 * dim + 8:>7} {recall(np.array(found), truth):>7.3f}")
+
+    # binary：bit(d) 索引 d / 8 + 8 字节（float32 仍保存在表中用于重排）
+    bits = np.packbits(base > 0, axis=1)
+    found = []
+    for query in queries:
+        hamming = np.unpackbits(bits ^ np.packbits(query > 0), axis=1).sum(axis=1)
+        candidates = np.argsort(hamming, kind="stable")[:top_k * rescore_factor]
+        exact = ((base[candidates] - query) ** 2).sum(axis=1)
+        found.append(candidates[np.argsort(exact)[:top_k]])
+    print(
+        f"           {'binary':<8} {dim // 8 + 8:>7} {recall(np.array(found), truth):>7.3f}"
+        f"  (索引大小；重排系数 {rescore_factor})"
+    )
+
+
+def run(args) -> None:
+    rng = np.random.default_rng(0)
+    base, queries = make_data(args.docs, args.dim, args.queries, rng)
+
+    exact = faiss.IndexFlatL2(args.dim)
+    exact.add(base)
+    _, truth = exact.search(queries, args.top_k)
+
+    print(f"docs={args.docs} dim={args.dim} queries={args.queries} top_k={args.top_k}")
+    bench_faiss(base, queries, truth, args.top_k)
+    bench_pgvector(base, queries, truth, args.top_k, args.rescore_factor)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    run(parser.parse_args())
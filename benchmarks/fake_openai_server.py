@@ -0,0 +1,213 @@
+"""本地 OpenAI 兼容假模型服务（压测用，不调用真实的通义千问）
+
+提供：
+    POST /v1/chat/completions   普通 / 流式（SSE）回答，支持按脚本返回工具调用
+    POST /v1/embeddings         确定性的假向量（同一文本始终得到同一向量）
+    GET  /v1/models
+
+回答的节奏可以配置：首个 token 前等待 --ttft-ms，之后按 --tokens-per-second 输出 --response-tokens 个 token，
+--jitter 为两者的随机波动比例，--error-rate 按比例返回 500。
+
+工具调用脚本（--tool-script）为 JSON 列表，按顺序匹配最后一条用户消息：
+    [
+        {"match": "算|计算", "tool": "calculator", "arguments": {"expression": "123 * 456"}},
+        {"match": "几号|时间", "tool": "get_current_time", "arguments": {}}
+    ]
+只有请求中带了同名工具、且最后一条消息是用户消息（还没有工具结果）时才返回工具调用，
+收到工具结果后正常回答，因此 Agent 每轮对话是 "工具调用 -> 最终回答" 两次请求。
+
+用法：
+    python benchmarks/fake_openai_server.py --port 9000 --ttft-ms 300 --tokens-per-second 40
+    # 启动应用时指向假服务：
+    LLM_BASE_URL=http://127.0.0.1:9000/v1 LLM_API_KEY=fake uvicorn ai_qa.interfaces.api.app:app
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+import uuid
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# 回答内容循环使用的 token
+ANSWER_TOKENS = ["这是", "一个", "用于", "压测", "的", "模拟", "回答", "，", "内容", "没有", "实际", "意义", "。"]
+
+
+class FakeModel:
+    """假模型的行为配置"""
+
+    def __init__(self, args):
+        self.ttft = args.ttft_ms / 1000
+        self.token_interval = 1 / args.tokens_per_second if args.tokens_per_second > 0 else 0
+        self.response_tokens = args.response_tokens
+        self.jitter = args.jitter
+        self.error_rate = args.error_rate
+        self.embedding_dim = args.embedding_dim
+        self.tool_rules = []
+        if args.tool_script:
+            with open(args.tool_script, encoding="utf-8") as f:
+                self.tool_rules = [dict(rule, pattern=re.compile(rule["match"])) for rule in json.load(f)]
+
+    def _vary(self, seconds: float) -> float:
+        return max(0.0, seconds * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    async def wait_first_token(self) -> None:
+        await asyncio.sleep(self._vary(self.ttft))
+
+    async def wait_next_token(self) -> None:
+        if self.token_interval:
+            await asyncio.sleep(self._vary(self.token_interval))
+
+    def should_fail(self) -> bool:
+        return random.random() < self.error_rate
+
+    def answer_tokens(self) -> list[str]:
+        return [ANSWER_TOKENS[i % len(ANSWER_TOKENS)] for i in range(self.response_tokens)]
+
+    def tool_call_for(self, body: dict) -> dict | None:
+        """按脚本决定是否返回工具调用"""
+        messages = body.get("messages") or []
+        if not self.tool_rules or not messages or messages[-1].get("role") != "user":
+            return None
+        available = {tool.get("function", {}).get("name") for tool in body.get("tools") or []}
+        content = messages[-1].get("content") or ""
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        for rule in self.tool_rules:
+            if rule["tool"] in available and rule["pattern"].search(content):
+                return {
+                    "id": f"call_{uuid.uuid4().hex[:12]}",
+                    "type": "function",
+                    "function": {"name": rule["tool"], "arguments": json.dumps(rule["arguments"], ensure_ascii=False)},
+                }
+        return None
+
+    def embed(self, text: str) -> list[float]:
+        seed = int.from_bytes(hashlib.sha1(text.encode()).digest()[:8], "little")
+        vector = np.random.default_rng(seed).normal(size=self.embedding_dim)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+
+def _usage(body: dict, completion_tokens: int) -> dict:
+    prompt_tokens = sum(len(str(message.get("content") or "")) for message in body.get("messages") or [])
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def create_app(model: FakeModel) -> FastAPI:
+    app = FastAPI(title="Fake OpenAI")
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "fake", "object": "model", "owned_by": "bench"}]}
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        return {
+            "object": "list",
+            "model": body.get("model", "fake"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": model.embed(text)}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": sum(len(text) for text in inputs), "total_tokens": sum(len(text) for text in inputs)},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        if model.should_fail():
+            return JSONResponse(status_code=500, content={"error": {"message": "fake upstream error", "type": "server_error"}})
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:16]}"
+        created = int(time.time())
+        model_name = body.get("model", "fake")
+        tool_call = model.tool_call_for(body)
+
+        if not body.get("stream"):
+            await model.wait_first_token()
+            if tool_call:
+                message = {"role": "assistant", "content": "", "tool_calls": [tool_call]}
+                finish_reason, completion_tokens = "tool_calls", 1
+            else:
+                tokens = model.answer_tokens()
+                # 非流式也按生成速度等待，模拟完整生成时间
+                for _ in tokens[1:]:
+                    await model.wait_next_token()
+                message = {"role": "assistant", "content": "".join(tokens)}
+                finish_reason, completion_tokens = "stop", len(tokens)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model_name,
+                "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+                "usage": _usage(body, completion_tokens),
+            }
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        def chunk(delta: dict, finish_reason: str = None, usage: dict = None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model_name,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if usage is None else [],
+            }
+            if usage is not None:
+                payload["usage"] = usage
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        async def stream():
+            await model.wait_first_token()
+            if tool_call:
+                yield chunk({"role": "assistant", "tool_calls": [dict(tool_call, index=0)]})
+                yield chunk({}, "tool_calls")
+                completion_tokens = 1
+            else:
+                tokens = model.answer_tokens()
+                for i, token in enumerate(tokens):
+                    if i:
+                        await model.wait_next_token()
+                    yield chunk({"role": "assistant", "content": token} if i == 0 else {"content": token})
+                yield chunk({}, "stop")
+                completion_tokens = len(tokens)
+            if include_usage:
+                yield chunk({}, usage=_usage(body, completion_tokens))
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--ttft-ms", type=float, default=300, help="首个 token 前的等待（毫秒）")
+    parser.add_argument("--tokens-per-second", type=float, default=40, help="之后每秒输出的 token 数，0 表示不等待")
+    parser.add_argument("--response-tokens", type=int, default=120, help="每个回答的 token 数")
+    parser.add_argument("--jitter", type=float, default=0.2, help="等待时间的随机波动比例")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 500 的比例")
+    parser.add_argument("--embedding-dim", type=int, default=1024)
+    parser.add_argument("--tool-script", help="工具调用脚本（JSON）")
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(FakeModel(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
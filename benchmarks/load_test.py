@@ -0,0 +1,314 @@
+"""端到端压测：N 个并发用户驱动流式对话、Agent 对话和文档上传接口
+
+先启动假模型服务和应用（应用的 LLM_BASE_URL 指向假服务，不产生真实调用费用）：
+    python benchmarks/fake_openai_server.py --port 9000 --tool-script benchmarks/fake_tool_script.json
+    LLM_BASE_URL=http://127.0.0.1:9000/v1 LLM_API_KEY=fake VECTOR_STORE=postgres SERVER_WORKERS=2 \\
+        python -m ai_qa.interfaces.api.server
+（使用生产入口启动，多进程时 /metrics 汇总所有 worker 的指标）
+
+每个虚拟用户注册登录后各自创建会话和知识库，然后在 --duration 秒内按 --scenarios 的权重循环发起请求：
+    chat    POST /conversations/{id}/messages/stream（--rag 时带知识库检索）
+    agent   POST /conversations/{id}/messages/agent/stream
+    upload  POST /knowledge-bases/{id}/documents/text
+同时每 --pool-interval 秒采样 /health/pool，统计数据库连接池的占用和饱和比例。
+
+报告每个场景的吞吐、错误率、首字延迟（TTFT）、端到端延迟分位数和流式输出速度（chunk/s），
+以及服务端在流末尾 metrics 事件中给出的各阶段耗时中位数，用于按工作进程数做容量规划。
+
+用法：
+    python benchmarks/load_test.py --base-url http://127.0.0.1:8000 --users 20 --duration 60 \\
+        [--scenarios chat=6,agent=3,upload=1] [--rag] [--output result.json]
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+
+API = "/api/v1"
+
+CHAT_QUESTIONS = ["介绍一下这个系统", "压测文档里写了什么？", "总结一下知识库的内容", "你好"]
+AGENT_QUESTIONS = ["帮我算一下 123 * 456", "今天几号？", "在知识库里搜一下压测", "讲个笑话"]
+DOCUMENT_TEXT = "压测文档。" + "这是一段用于检索压测的文本内容，包含若干句子。" * 40
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else 0.0
+
+
+def parse_scenarios(text: str) -> dict[str, int]:
+    weights = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name not in ("chat", "agent", "upload"):
+            raise argparse.ArgumentTypeError(f"未知场景: {name}")
+        weights[name] = int(weight or 1)
+    return weights
+
+
+class Stats:
+    """按场景收集单次请求的结果"""
+
+    def __init__(self):
+        self.results = defaultdict(list)
+
+    def record(
+        self, scenario: str, ok: bool, latency: float, ttft: float = None, chunks: int = 0,
+        error: str = None, stages: dict = None,
+    ):
+        self.results[scenario].append(
+            {"ok": ok, "latency": latency, "ttft": ttft, "chunks": chunks, "error": error, "stages": stages}
+        )
+
+    def summary(self, duration: float) -> dict:
+        report = {}
+        for scenario, results in self.results.items():
+            ok = [r for r in results if r["ok"]]
+            latencies = [r["latency"] * 1000 for r in ok]
+            ttfts = [r["ttft"] * 1000 for r in ok if r["ttft"] is not None]
+            # 输出速度：首字之后的 chunk 数 / 首字之后的耗时
+            rates = [
+                (r["chunks"] - 1) / (r["latency"] - r["ttft"])
+                for r in ok
+                if r["ttft"] is not None and r["chunks"] > 1 and r["latency"] > r["ttft"]
+            ]
+            errors = defaultdict(int)
+            for r in results:
+                if not r["ok"]:
+                    errors[r["error"]] += 1
+            stages = defaultdict(list)
+            for r in ok:
+                for stage, ms in (r["stages"] or {}).items():
+                    stages[stage].append(ms)
+            report[scenario] = {
+                "requests": len(results),
+                "rps": len(results) / duration,
+                "error_rate": 1 - len(ok) / len(results),
+                "errors": dict(errors),
+                "latency_ms": {p: percentile(latencies, q) for p, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))},
+                "ttft_ms": {p: percentile(ttfts, q) for p, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))},
+                "chunks_per_second": statistics.median(rates) if rates else 0.0,
+                "server_stages_p50_ms": {stage: statistics.median(values) for stage, values in stages.items()},
+            }
+        return report
+
+
+class VirtualUser:
+    """一个已登录的用户，持有自己的会话和知识库"""
+
+    def __init__(self, client: httpx.AsyncClient, index: int, run_id: str):
+        self.client = client
+        self.username = f"load_{run_id}_{index}"
+        self.headers = {}
+        self.session_id = None
+        self.knowledge_base_id = None
+
+    async def setup(self, rag: bool) -> None:
+        credentials = {"username": self.username, "password": "load-test-password"}
+        response = await self.client.post(f"{API}/auth/register", json=credentials)
+        response.raise_for_status()
+        response = await self.client.post(f"{API}/auth/login", json=credentials)
+        response.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        response = await self.client.post(f"{API}/conversations", headers=self.headers)
+        response.raise_for_status()
+        self.session_id = response.json()["session_id"]
+
+        response = await self.client.post(
+            f"{API}/knowledge-bases", headers=self.headers, json={"name": f"{self.username} 知识库", "description": "压测"}
+        )
+        response.raise_for_status()
+        self.knowledge_base_id = response.json()["id"]
+        if rag:
+            await self.upload()
+
+    async def upload(self) -> None:
+        response = await self.client.post(
+            f"{API}/knowledge-bases/{self.knowledge_base_id}/documents/text",
+            headers=self.headers,
+            json={"title": f"压测文档 {uuid.uuid4().hex[:8]}", "content": DOCUMENT_TEXT},
+        )
+        response.raise_for_status()
+
+    async def stream(self, path: str, body: dict) -> tuple[float, int, dict]:
+        """发起 SSE 请求，返回 (首个事件耗时, 事件数, 服务端分阶段耗时)"""
+        start = time.perf_counter()
+        ttft, chunks, stages = None, 0, None
+        event = None
+        async with self.client.stream("POST", path, headers=self.headers, json=body) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise httpx.HTTPStatusError(f"HTTP {response.status_code}", request=response.request, response=response)
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                    continue
+                if not line:
+                    # 空行结束一个事件块
+                    event = None
+                    continue
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                if event == "metrics":
+                    stages = json.loads(data)
+                    continue
+                if data.startswith("{"):
+                    payload = json.loads(data)
+                    if payload.get("type") == "metrics":
+                        stages = payload["timings"]
+                        continue
+                    if payload.get("type") == "done":
+                        continue
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                chunks += 1
+        return ttft, chunks, stages
+
+    async def chat(self, rag: bool) -> tuple[float, int, dict]:
+        body = {"content": random.choice(CHAT_QUESTIONS), "use_knowledge": rag}
+        if rag:
+            body["knowledge_base_id"] = self.knowledge_base_id
+        return await self.stream(f"{API}/conversations/{self.session_id}/messages/stream", body)
+
+    async def agent(self) -> tuple[float, int, dict]:
+        body = {"content": random.choice(AGENT_QUESTIONS), "mcp_servers": []}
+        return await self.stream(f"{API}/conversations/{self.session_id}/messages/agent/stream", body)
+
+
+async def run_user(user: VirtualUser, scenarios: dict[str, int], deadline: float, rag: bool, stats: Stats) -> None:
+    names, weights = list(scenarios), list(scenarios.values())
+    while time.perf_counter() < deadline:
+        scenario = random.choices(names, weights)[0]
+        start = time.perf_counter()
+        try:
+            if scenario == "chat":
+                ttft, chunks, stages = await user.chat(rag)
+            elif scenario == "agent":
+                ttft, chunks, stages = await user.agent()
+            else:
+                await user.upload()
+                ttft, chunks, stages = None, 0, None
+            stats.record(scenario, True, time.perf_counter() - start, ttft, chunks, stages=stages)
+        except httpx.HTTPStatusError as e:
+            stats.record(scenario, False, time.perf_counter() - start, error=f"HTTP {e.response.status_code}")
+        except httpx.HTTPError as e:
+            stats.record(scenario, False, time.perf_counter() - start, error=type(e).__name__)
+
+
+async def sample_pool(client: httpx.AsyncClient, interval: float, deadline: float) -> list[dict]:
+    samples = []
+    while time.perf_counter() < deadline:
+        try:
+            response = await client.get("/health/pool")
+            if response.status_code == 200:
+                samples.append(response.json())
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(interval)
+    return samples
+
+
+def pool_summary(samples: list[dict]) -> dict:
+    """连接池占用：checked_out 相对 size + max_overflow 的比例，达到上限即视为饱和"""
+    if not samples:
+        return {}
+    capacity = samples[0]["size"] + samples[0]["max_overflow"]
+    checked_out = [s["checked_out"] for s in samples]
+    return {
+        "samples": len(samples),
+        "capacity": capacity,
+        "checked_out_mean": statistics.mean(checked_out),
+        "checked_out_max": max(checked_out),
+        "overflow_max": max(s["overflow"] for s in samples),
+        "saturated_ratio": sum(1 for c in checked_out if c >= capacity) / len(samples),
+    }
+
+
+async def run(args) -> dict:
+    limits = httpx.Limits(max_connections=args.users + 4, max_keepalive_connections=args.users + 4)
+    timeout = httpx.Timeout(args.timeout)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=timeout) as client:
+        run_id = uuid.uuid4().hex[:8]
+        users = [VirtualUser(client, i, run_id) for i in range(args.users)]
+        await asyncio.gather(*(user.setup(args.rag) for user in users))
+        print(f"已准备 {len(users)} 个用户，开始压测 {args.duration}s ...")
+
+        stats = Stats()
+        start = time.perf_counter()
+        deadline = start + args.duration
+        pool_task = asyncio.create_task(sample_pool(client, args.pool_interval, deadline))
+        await asyncio.gather(*(run_user(user, args.scenarios, deadline, args.rag, stats) for user in users))
+        elapsed = time.perf_counter() - start
+        samples = await pool_task
+
+    return {
+        "config": {
+            "base_url": args.base_url,
+            "users": args.users,
+            "duration": args.duration,
+            "scenarios": args.scenarios,
+            "rag": args.rag,
+        },
+        "elapsed": elapsed,
+        "scenarios": stats.summary(elapsed),
+        "db_pool": pool_summary(samples),
+    }
+
+
+def print_report(report: dict) -> None:
+    print(
+        f"{'scenario':<8} {'reqs':>6} {'rps':>7} {'err%':>6} {'ttft p50':>9} {'ttft p95':>9} "
+        f"{'lat p50':>9} {'lat p95':>9} {'lat p99':>9} {'chunk/s':>8}"
+    )
+    for name, s in report["scenarios"].items():
+        print(
+            f"{name:<8} {s['requests']:>6} {s['rps']:>7.2f} {s['error_rate'] * 100:>6.1f} "
+            f"{s['ttft_ms']['p50']:>9.0f} {s['ttft_ms']['p95']:>9.0f} "
+            f"{s['latency_ms']['p50']:>9.0f} {s['latency_ms']['p95']:>9.0f} {s['latency_ms']['p99']:>9.0f} "
+            f"{s['chunks_per_second']:>8.1f}"
+        )
+        if s["errors"]:
+            print(f"         errors: {s['errors']}")
+        if s["server_stages_p50_ms"]:
+            stages = " ".join(f"{stage}={ms:.0f}" for stage, ms in s["server_stages_p50_ms"].items())
+            print(f"         stages p50(ms): {stages}")
+    pool = report["db_pool"]
+    if pool:
+        print(
+            f"db pool: capacity={pool['capacity']} checked_out mean={pool['checked_out_mean']:.1f} "
+            f"max={pool['checked_out_max']} overflow max={pool['overflow_max']} "
+            f"saturated={pool['saturated_ratio'] * 100:.1f}%"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=10, help="并发用户数")
+    parser.add_argument("--duration", type=float, default=60, help="压测时长（秒）")
+    parser.add_argument("--scenarios", type=parse_scenarios, default=parse_scenarios("chat=6,agent=3,upload=1"))
+    parser.add_argument("--rag", action="store_true", help="对话走知识库检索（准备阶段先上传一篇文档）")
+    parser.add_argument("--timeout", type=float, default=120, help="单次请求超时（秒）")
+    parser.add_argument("--pool-interval", type=float, default=0.5, help="连接池采样间隔（秒）")
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ if __name__ == "__main__":
         "ai_qa.interfaces.api.app:app",
         host="0.0.0.0",
         port=8000,
-        reload=True, # 开发模式，代码修改自动重启
+        reload=True, # 开发模式，代码修改自动重启（生产环境使用 python -m ai_qa.interfaces.api.server）
         access_log=False
     )
 
@@ -0,0 +1,44 @@
+"""回填 document_chunks.content_tsv（执行 migration_add_chunk_fulltext.sql 之后运行）
+
+用法：
+    python scripts/backfill_chunk_tsv.py [batch_size]
+"""
+import sys
+
+from sqlalchemy import func
+
+from ai_qa.infrastructure.database.connection import SessionLocal
+from ai_qa.infrastructure.database.models import DocumentChunk
+from ai_qa.infrastructure.vectorstore.postgres_store import TS_CONFIG, to_search_text
+
+
+def backfill(batch_size: int = 500) -> int:
+    """分批回填尚未生成全文检索词项的文档块，返回处理数量"""
+    total = 0
+    db = SessionLocal()
+    try:
+        while True:
+            rows = (
+                db.query(DocumentChunk.id, DocumentChunk.content)
+                .filter(DocumentChunk.content_tsv.is_(None))
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+
+            for chunk_id, content in rows:
+                db.query(DocumentChunk).filter(DocumentChunk.id == chunk_id).update(
+                    {DocumentChunk.content_tsv: func.to_tsvector(TS_CONFIG, to_search_text(content))},
+                    synchronize_session=False,
+                )
+            db.commit()
+            total += len(rows)
+            print(f"已回填 {total} 条")
+    finally:
+        db.close()
+    return total
+
+
+if __name__ == "__main__":
+    backfill(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
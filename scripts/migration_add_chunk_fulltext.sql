@@ -0,0 +1,14 @@
+-- 为 document_chunks 表添加全文检索字段（混合检索：BM25/全文 + 向量，RRF 融合）
+-- 分词在应用侧完成（英文按词、中文按相邻两字 bigram），数据库使用 simple 配置只按空白切分
+
+ALTER TABLE document_chunks
+ADD COLUMN IF NOT EXISTS content_tsv tsvector;
+
+COMMENT ON COLUMN document_chunks.content_tsv IS '全文检索词项，由应用分词后通过 to_tsvector(''simple'', ...) 写入';
+
+-- GIN 倒排索引
+CREATE INDEX IF NOT EXISTS idx_document_chunks_content_tsv
+ON document_chunks USING GIN (content_tsv);
+
+-- 已有数据需要用应用侧分词回填（中文 bigram 无法在 SQL 中直接生成）：
+--   python scripts/backfill_chunk_tsv.py
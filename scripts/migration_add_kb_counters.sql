@@ -0,0 +1,29 @@
+-- 知识库统计计数：文档数、文档块数、文档总字节数
+-- 添加 / 删除文档时在同一事务中增减，知识库列表和详情不再逐个 COUNT 文档和文档块
+-- 执行本脚本时按现有数据回填（只统计未删除的文档）
+
+ALTER TABLE knowledge_bases ADD COLUMN IF NOT EXISTS document_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE knowledge_bases ADD COLUMN IF NOT EXISTS chunk_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE knowledge_bases ADD COLUMN IF NOT EXISTS total_bytes BIGINT NOT NULL DEFAULT 0;
+
+UPDATE knowledge_bases kb
+SET document_count = stats.document_count,
+    total_bytes    = stats.total_bytes
+FROM (
+    SELECT knowledge_base_id, COUNT(*) AS document_count, COALESCE(SUM(file_size), 0) AS total_bytes
+    FROM documents
+    WHERE status = 1
+    GROUP BY knowledge_base_id
+) stats
+WHERE kb.id = stats.knowledge_base_id;
+
+UPDATE knowledge_bases kb
+SET chunk_count = stats.chunk_count
+FROM (
+    SELECT d.knowledge_base_id, COUNT(*) AS chunk_count
+    FROM document_chunks c
+    JOIN documents d ON d.id = c.document_id
+    WHERE d.status = 1
+    GROUP BY d.knowledge_base_id
+) stats
+WHERE kb.id = stats.knowledge_base_id;
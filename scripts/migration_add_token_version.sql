@@ -0,0 +1,4 @@
+-- 用户 Token 版本号：登出、禁用账号时加一，使该用户已签发的 Token 全部失效
+-- 旧 Token 不带版本号，按 0 处理，执行本脚本后仍然有效
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0;
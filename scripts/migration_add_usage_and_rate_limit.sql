@@ -0,0 +1,37 @@
+-- 模型用量统计和共享限流令牌桶
+-- 对应配置 USAGE_TRACKING_ENABLED、RATE_LIMIT_BACKEND=postgres
+
+-- 1. 用量统计表：按 用户 / 会话 / 天 / 调用类型 / 模型 聚合，应用批量 UPSERT 累加
+CREATE TABLE IF NOT EXISTS usage_stats (
+    id               VARCHAR(36) PRIMARY KEY,
+    user_id          VARCHAR(36) NOT NULL DEFAULT '',
+    conversation_id  VARCHAR(36) NOT NULL DEFAULT '',
+    day              DATE NOT NULL,
+    kind             VARCHAR(20) NOT NULL,
+    model            VARCHAR(100) NOT NULL,
+    request_count    BIGINT DEFAULT 0,
+    input_tokens     BIGINT DEFAULT 0,
+    output_tokens    BIGINT DEFAULT 0,
+    updated_at       TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT uk_usage_stats UNIQUE (user_id, conversation_id, day, kind, model)
+);
+
+CREATE INDEX IF NOT EXISTS idx_usage_stats_user_day ON usage_stats(user_id, day);
+
+COMMENT ON TABLE usage_stats IS '模型用量统计（批量累加写入）';
+COMMENT ON COLUMN usage_stats.user_id IS '空字符串表示非请求上下文中的调用';
+COMMENT ON COLUMN usage_stats.kind IS 'llm / embedding';
+
+-- 2. 限流令牌桶表：多个实例共享同一个桶
+CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+    key         VARCHAR(100) PRIMARY KEY,
+    tokens      DOUBLE PRECISION NOT NULL,
+    updated_at  TIMESTAMPTZ NOT NULL
+);
+
+COMMENT ON TABLE rate_limit_buckets IS '限流令牌桶（RATE_LIMIT_BACKEND=postgres）';
+
+-- 示例：最近 7 天各用户的 token 消耗
+-- SELECT user_id, SUM(input_tokens) AS input_tokens, SUM(output_tokens) AS output_tokens
+-- FROM usage_stats WHERE day >= CURRENT_DATE - 7 GROUP BY user_id ORDER BY 2 DESC;
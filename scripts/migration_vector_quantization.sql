@@ -0,0 +1,26 @@
+-- document_chunks 向量压缩存储（需要 pgvector >= 0.7.0）
+-- 对应配置 VECTOR_STORAGE：full（默认）/ halfvec / binary
+
+-- 1. 新增半精度向量字段（所有模式都需要执行，ORM 映射了该字段）
+ALTER TABLE document_chunks
+ADD COLUMN IF NOT EXISTS embedding_half halfvec(1024);
+
+COMMENT ON COLUMN document_chunks.embedding_half IS '半精度向量，VECTOR_STORAGE=halfvec 时代替 embedding 字段';
+
+-- 2A. 切换到 halfvec（每行约 4 KB -> 2 KB）：迁移已有数据并释放 float32 向量
+-- UPDATE document_chunks
+-- SET embedding_half = embedding::halfvec(1024), embedding = NULL
+-- WHERE embedding IS NOT NULL;
+-- CREATE INDEX IF NOT EXISTS idx_document_chunks_embedding_half
+-- ON document_chunks USING hnsw (embedding_half halfvec_l2_ops);
+-- VACUUM FULL document_chunks;  -- 回收表空间（会锁表，请在低峰期执行）
+
+-- 2B. 切换到 binary：保留 float32 向量用于重排，只新增二值量化表达式索引（每行 128 字节）
+-- CREATE INDEX IF NOT EXISTS idx_document_chunks_embedding_bit
+-- ON document_chunks USING hnsw ((binary_quantize(embedding)::bit(1024)) bit_hamming_ops);
+
+-- 回滚 halfvec -> full：
+-- UPDATE document_chunks
+-- SET embedding = embedding_half::vector(1024), embedding_half = NULL
+-- WHERE embedding_half IS NOT NULL;
+-- DROP INDEX IF EXISTS idx_document_chunks_embedding_half;
@@ -1,9 +1,11 @@
+import asyncio
 import json
 import logging
 from typing import AsyncGenerator
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
-from ai_qa.domain.entities import Conversation, MessageRole
+from ai_qa.domain.entities import AgentEvent, AgentEventType, Conversation, MessageRole, REASONING_EVENT_TYPES
 from ai_qa.domain.ports import ConversationMemoryPort, LLMPort
+from ai_qa.infrastructure.observability import current_timings, span
 
 logger = logging.getLogger(__name__)
 
@@ -81,7 +83,10 @@ class AgentService:
         )
 
         # 1. 获取对话历史
-        conversation = self._memory.get_conversation(session_id, user_id=user_id)
+        with span("history"):
+            conversation = await asyncio.to_thread(
+                self._memory.get_conversation, session_id, user_id=user_id
+            )
 
         # 2. 构建消息列表
         messages = self._build_messages(conversation, user_input)
@@ -92,10 +97,11 @@ class AgentService:
         # 4. 保存历史对话
         conversation.add_message(MessageRole.USER, user_input)
         conversation.add_message(MessageRole.ASSISTANT, final_response)
-        self._memory.save_conversation(conversation)
+        with span("persist"):
+            await asyncio.to_thread(self._memory.save_conversation, conversation)
 
         logger.info(
-            f"Agent 对话处理完成 session_id={session_id} user_id={user_id} ai_response={final_response}"
+            f"Agent 对话处理完成 session_id={session_id} user_id={user_id} response_length={len(final_response)}"
         )
 
         return final_response
@@ -133,11 +139,12 @@ class AgentService:
 
         for _ in range(max_iterations):
             # 调用 LLM
-            response = self._llm.chat_with_tools(
-                messages=messages,
-                tools=all_tools,
-                system_prompt=self._system_prompt
-            )
+            with span("llm"):
+                response = await self._llm.achat_with_tools(
+                    messages=messages,
+                    tools=all_tools,
+                    system_prompt=self._system_prompt
+                )
 
             # 如果没有工具调用，返回最终回答
             if not response.tool_calls:
@@ -155,7 +162,8 @@ class AgentService:
                 # 查找并执行工具
                 if tool_name in tool_map:
                     tool_func = tool_map[tool_name]
-                    result = await tool_func.ainvoke(tool_args)
+                    with span("tool"):
+                        result = await tool_func.ainvoke(tool_args)
                 else:
                     result = f"错误：未知工具{tool_name}"
                 
@@ -171,22 +179,26 @@ class AgentService:
         user_input: str,
         user_id: str = None,
         extra_tools: list = None
-    ) -> AsyncGenerator[str, None]:
-        """流式处理用户输出，返回 SSE 格式的消息流
+    ) -> AsyncGenerator[AgentEvent, None]:
+        """流式处理用户输出，返回 Agent 事件流（由接口层序列化为 SSE）
         
-        消息类型：
+        事件类型：
         - thinking: AI 思考过程
         - tool_start: 开始调用工具
         - tool_result: 工具返回结果  
         - answer: 最终回答（流式）
         - done: 完成
+        - metrics: 分阶段耗时（毫秒），在 done 之后、保存历史完成后发送
         """
         logger.info(
             f"Agent 流式对话开始 session_id={session_id} user_id={user_id}"
         )
 
         # 1. 获取对话历史
-        conversation = self._memory.get_conversation(session_id, user_id=user_id)
+        with span("history"):
+            conversation = await asyncio.to_thread(
+                self._memory.get_conversation, session_id, user_id=user_id
+            )
 
         # 2. 构建消息列表
         messages = self._build_messages(conversation, user_input)
@@ -199,45 +211,35 @@ class AgentService:
             yield event
 
             # 收集推理步骤和最终回答（用于保存历史）
-            try:
-                event_data = event.replace("data: ", "").strip()
-                if event_data:
-                    data = json.loads(event_data)
-
-                    # 收集推理步骤
-                    if data.get("type") in ["thinking", "tool_start", "tool_result"]:
-                        reasoning_steps.append({
-                            "type": data["type"],
-                            "content": data.get("content"),
-                            "tool": data.get("tool"),
-                            "input": data.get("input"),
-                            "output": data.get("output"),
-                            "iteration": data.get("iteration")
-                        })
-                    # 收集最终回答
-                    if data.get("type") == "answer":
-                        full_response += data.get("content","")
-            except Exception as e:
-                logger.warning(f"解析 SSE 事件数据失败: {e}")
-    
+            if event.type in REASONING_EVENT_TYPES:
+                reasoning_steps.append(event.to_reasoning_step())
+            elif event.type == AgentEventType.ANSWER:
+                full_response += event.content or ""
+
 
         # 4. 保存历史对话
         conversation.add_message(MessageRole.USER, user_input)
         if full_response:
             ai_message = conversation.add_message(MessageRole.ASSISTANT, full_response)
             ai_message.reasoning_steps = reasoning_steps if reasoning_steps else None
-        self._memory.save_conversation(conversation)
+        with span("persist"):
+            await asyncio.to_thread(self._memory.save_conversation, conversation)
 
         logger.info(
-            f"Agent 流式对话完成 session_id={session_id} user_id={user_id} ai_response={full_response}"
+            f"Agent 流式对话完成 session_id={session_id} user_id={user_id} response_length={len(full_response)}"
         )
+
+        # 5. 最后发送本次请求的分阶段耗时
+        timings = current_timings()
+        if timings is not None:
+            yield AgentEvent(AgentEventType.METRICS, timings=timings.to_dict())
     
     async def _agent_loop_stream(
         self,
         messages: list,
         extra_tools: list = None,
         max_iterations: int = 10
-    ) -> AsyncGenerator[str, None]:
+    ) -> AsyncGenerator[AgentEvent, None]:
         """Agent 循环编排（流式版本）"""
 
         all_tools, tool_map = self._get_tools_and_map(extra_tools)
@@ -245,20 +247,24 @@ class AgentService:
 
         for iteration in range(max_iterations):
             # 调用 LLM
-            response = self._llm.chat_with_tools(
-                messages=messages,
-                tools=all_tools,
-                system_prompt=self._system_prompt
-            )
+            with span("llm"):
+                response = await self._llm.achat_with_tools(
+                    messages=messages,
+                    tools=all_tools,
+                    system_prompt=self._system_prompt
+                )
             if response.content:
                 thinking_content = self._extract_thinking(response.content)
                 if thinking_content:
-                    yield self._sse_event({
-                        "type": "thinking",
-                        "content": thinking_content,
-                        "iteration": iteration + 1
-                    })
-            logger.info(f"Agent 工具调用响应: {response.content} Tool Calls: {response.tool_calls}")
+                    yield AgentEvent(
+                        AgentEventType.THINKING,
+                        content=thinking_content,
+                        iteration=iteration + 1
+                    )
+            logger.info(
+                f"Agent 工具调用响应 iteration={iteration + 1} "
+                f"tools={[call['name'] for call in response.tool_calls]} content_length={len(response.content or '')}"
+            )
 
             # 添加 AI 响应到消息历史
             messages.append(response)
@@ -269,8 +275,8 @@ class AgentService:
                 final_answer = self._extract_final_answer(response.content)
 
                 if final_answer:
-                    yield self._sse_event({"type": "answer", "content": final_answer})
-                yield self._sse_event({"type": "done"})
+                    yield AgentEvent(AgentEventType.ANSWER, content=final_answer)
+                yield AgentEvent(AgentEventType.DONE)
                 return
         
             # 有工具调用，执行工具调用
@@ -280,35 +286,33 @@ class AgentService:
                 tool_id = tool_call["id"]
             
                 # 发送 tool_start 事件
-                yield self._sse_event({
-                    "type": "tool_start",
-                    "tool": tool_name,
-                    "input": json.dumps(tool_args, ensure_ascii=False)
-                })
+                yield AgentEvent(
+                    AgentEventType.TOOL_START,
+                    tool=tool_name,
+                    input=json.dumps(tool_args, ensure_ascii=False)
+                )
 
                 # 查找并执行工具
                 if tool_name in tool_map:
                     tool_func = tool_map[tool_name]
-                    result = await tool_func.ainvoke(tool_args)
+                    with span("tool"):
+                        result = await tool_func.ainvoke(tool_args)
                 else:
                     result = f"错误：未知工具{tool_name}"
                 
                 # 发送 tool_result 事件
-                yield self._sse_event({
-                    "type": "tool_result",
-                    "tool": tool_name,
-                    "output": str(result)
-                })
+                yield AgentEvent(
+                    AgentEventType.TOOL_RESULT,
+                    tool=tool_name,
+                    output=str(result)
+                )
 
                 # 把工具结果加入到消息历史
                 messages.append(ToolMessage(content=str(result), tool_call_id = tool_id))
             
         # 超过最大迭代次数
-        yield self._sse_event({
-            "type": "answer",
-            "content": "抱歉，处理过程过于复杂，请简化您的问题。"
-        })
-        yield self._sse_event({"type":"done"})
+        yield AgentEvent(AgentEventType.ANSWER, content="抱歉，处理过程过于复杂，请简化您的问题。")
+        yield AgentEvent(AgentEventType.DONE)
     
     def _extract_thinking(self, content: str) -> str:
         """ 从 LLM 响应中提取思考内容"""
@@ -342,10 +346,6 @@ class AgentService:
         return " ".join(answer_lines).strip()
                         
 
-    def _sse_event(self, data: dict) -> str:
-        """格式化为 SSE 事件"""
-        return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
-    
     def _get_tools_and_map(self, extra_tools=None):
         """合并内置工具和额外工具，返回工具列表和映射"""
         all_tools = self._tools + (extra_tools or [])
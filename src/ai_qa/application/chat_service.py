@@ -1,11 +1,22 @@
+import asyncio
 import logging
-from typing import Generator
+from contextlib import aclosing
+from typing import AsyncGenerator
 from ai_qa.domain.entities import MessageRole
 from ai_qa.domain.ports import LLMPort, ConversationMemoryPort
+from ai_qa.infrastructure.observability import atimed_stream, span
 
 logger = logging.getLogger(__name__)
 
 
+async def _run_to_completion(func, *args) -> None:
+    """在线程中执行保存操作并等待完成
+
+    流被取消后在 finally 中调用：等待期间再次被取消时，线程中的保存仍会执行完。
+    """
+    await asyncio.shield(asyncio.to_thread(func, *args))
+
+
 class ChatService:
     """聊天服务（应用层）
 
@@ -38,32 +49,39 @@ class ChatService:
         )
 
         # 1. 获取对话历史
-        conversation = self._memory.get_conversation(session_id, user_id=user_id)
+        with span("history"):
+            conversation = self._memory.get_conversation(session_id, user_id=user_id)
 
         # 2. 添加用户消息
         conversation.add_message(MessageRole.USER, user_input)
 
         # 3. 调用 LLM 获取回复
-        response = self._llm.chat(
-            messages=conversation.messages, system_prompt=self._system_prompt
-        )
+        with span("llm"):
+            response = self._llm.chat(
+                messages=conversation.messages, system_prompt=self._system_prompt
+            )
 
         # 4. 添加 AI 回复到历史中
         conversation.add_message(MessageRole.ASSISTANT, response)
 
         # 5. 保存对话历史
-        self._memory.save_conversation(conversation)
+        with span("persist"):
+            self._memory.save_conversation(conversation)
 
         logger.info(
-            f"消息对话处理完成 session_id={session_id} user_id={user_id} ai_response={response}"
+            f"消息对话处理完成 session_id={session_id} user_id={user_id} response_length={len(response)}"
         )
 
         return response
 
-    def chat_stream(
+    async def achat_stream(
         self, session_id: str, user_input: str, user_id: str = None
-    ) -> Generator:
-        """处理用户输入，流式返回 AI 回复
+    ) -> AsyncGenerator[str, None]:
+        """处理用户输入，异步流式返回 AI 回复
+
+        LLM 流在事件循环上执行，不占用线程池线程；历史读取和保存是同步的数据库操作，
+        放到线程中执行（同一时刻只有一个线程使用数据库会话）。客户端断开时（任务取消或生成器被关闭）
+        上游 LLM 流随之关闭，已生成的部分回复仍会保存。
 
         Args:
             session_id: 会话 ID
@@ -74,23 +92,33 @@ class ChatService:
             AI 回复内容
         """
         logger.info(
-            f"流式对话处理开始 session_id={session_id} user_id={user_id} user_input={user_input}"
+            f"异步流式对话处理开始 session_id={session_id} user_id={user_id} user_input={user_input}"
         )
 
         # 1. 获取对话历史
-        conversation = self._memory.get_conversation(session_id, user_id=user_id)
+        with span("history"):
+            conversation = await asyncio.to_thread(
+                self._memory.get_conversation, session_id, user_id=user_id
+            )
 
         # 2. 添加用户消息
         conversation.add_message(MessageRole.USER, user_input)
 
-        # 3. 调用 LLM 流式接口，获取回复
+        # 3. 调用 LLM 异步流式接口
         full_response = ""
+        chunks = atimed_stream(self._llm.achat_stream(
+            messages=conversation.messages, system_prompt=self._system_prompt
+        ))
         try:
-            for chunk in self._llm.chat_stream(
-                messages=conversation.messages, system_prompt=self._system_prompt
-            ):
-                full_response += chunk
-                yield chunk
+            async with aclosing(chunks):
+                async for chunk in chunks:
+                    full_response += chunk
+                    yield chunk
+        except asyncio.CancelledError:
+            logger.info(
+                f"客户端断开，停止生成 session_id={session_id} response_length={len(full_response)}"
+            )
+            raise
         except Exception as e:
             logger.error(
                 f"流式对话异常 session_id = {session_id} error = {str(e)} response_length = {len(full_response)}"
@@ -98,12 +126,31 @@ class ChatService:
             raise
         finally:
             if full_response:
-                # 4. 添加 AI 完整（或部分）回复到历史中
                 conversation.add_message(MessageRole.ASSISTANT, full_response)
-                # 5. 保存对话历史
-                self._memory.save_conversation(conversation)
+                with span("persist"):
+                    await _run_to_completion(self._memory.save_conversation, conversation)
+
+            logger.info(f"异步流式对话处理完成 session_id={session_id}")
+
+    async def asave_exchange(
+        self, session_id: str, user_input: str, response: str, user_id: str = None
+    ) -> None:
+        """把一轮问答追加到对话历史（知识库流式问答结束或中断后调用）
 
-            logger.info(f"流式对话处理完成 session_id={session_id}")
+        Args:
+            session_id: 会话 ID
+            user_input: 用户输入内容
+            response:   AI 回复内容（中断时为已生成的部分）
+            user_id:    用户 ID
+        """
+        def save():
+            conversation = self._memory.get_conversation(session_id, user_id=user_id)
+            conversation.add_message(MessageRole.USER, user_input)
+            conversation.add_message(MessageRole.ASSISTANT, response)
+            self._memory.save_conversation(conversation)
+
+        with span("persist"):
+            await _run_to_completion(save)
 
     def set_system_prompt(self, prompt: str) -> None:
         """设置系统提示词"""
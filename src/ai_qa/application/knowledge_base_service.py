@@ -2,11 +2,7 @@ import logging
 from datetime import datetime, timezone
 from sqlalchemy.orm import Session
 
-from ai_qa.infrastructure.database.models import (
-    KnowledgeBase as KnowledgeBaseModel,
-    Document as DocumentModel,
-    DocumentChunk as DocumentChunkModel,
-)
+from ai_qa.infrastructure.database.models import KnowledgeBase as KnowledgeBaseModel
 
 logger = logging.getLogger(__name__)
 
@@ -94,36 +90,25 @@ class KnowledgeBaseService:
         )
 
     def get_stats(self, kb_id: str, user_id: str) -> dict | None:
-        """获取知识库统计信息"""
+        """获取知识库统计信息（读取知识库上维护的计数，一次查询）"""
         kb = self.get_by_id(kb_id, user_id)
         if not kb:
             return None
+        return self._stats(kb)
 
-        # 统计文档数
-        doc_count = (
-            self._db.query(DocumentModel)
-            .filter(DocumentModel.knowledge_base_id == kb_id, DocumentModel.status == 1)
-            .count()
-        )
-
-        # 统计文档块数量
-        chunk_count = (
-            self._db.query(DocumentChunkModel)
-            .join(DocumentModel)
-            .filter(
-                DocumentChunkModel.document_id == DocumentModel.id,
-                DocumentModel.knowledge_base_id == kb_id,
-                DocumentModel.status == 1,
-            )
-            .count()
-        )
+    def list_with_stats(self, user_id: str) -> list[dict]:
+        """列出用户的所有知识库及统计信息（一次查询）"""
+        return [self._stats(kb) for kb in self.list_by_user(user_id)]
 
+    @staticmethod
+    def _stats(kb: KnowledgeBaseModel) -> dict:
         return {
             "id": kb.id,
             "name": kb.name,
             "description": kb.description,
-            "document_count": doc_count,
-            "chunk_count": chunk_count,
+            "document_count": kb.document_count or 0,
+            "chunk_count": kb.chunk_count or 0,
+            "total_bytes": kb.total_bytes or 0,
             "created_at": kb.created_at,
             "updated_at": kb.updated_at,
         }
@@ -1,12 +1,84 @@
+import asyncio
+import contextvars
 import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import AsyncGenerator
+
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-from ai_qa.domain.entities import DocumentChunk, KnowledgeBase, MessageRole, Message
-from ai_qa.domain.ports import VectorStorePort, LLMPort, ConversationMemoryPort
-from ai_qa.infrastructure.database.models import Document as DocumentModel
+from ai_qa.domain.entities import CachedAnswer, DocumentChunk, KnowledgeBase, MessageRole, Message, SearchMode
+from ai_qa.domain.ports import AnswerCachePort, EmbeddingPort, RerankerPort, VectorStorePort, LLMPort, ConversationMemoryPort
+from ai_qa.infrastructure.cache import TTLCache
+from ai_qa.infrastructure.database.models import Document as DocumentModel, KnowledgeBase as KnowledgeBaseModel
+from ai_qa.infrastructure.observability import atimed_stream, span
+from ai_qa.infrastructure.observability.metrics import VECTOR_SEARCH_LATENCY, VECTOR_SEARCH_RESULTS
 
 logger = logging.getLogger(__name__)
 
+# 缓存命中时按此长度切片回放，模拟流式输出
+CACHE_REPLAY_CHUNK_SIZE = 16
+
+# 指代词/指示词：问题中出现时才需要结合对话历史改写
+# 中文指代词：单字"这/那/其/该/此"会出现在"应该""因此""其他"等常见词中，只匹配多字的指代用法；
+# 人称代词单独匹配，但排除"其他""其它"
+REFERENCE_PATTERN_ZH = re.compile(
+    r"(?<!其)[它他她]"
+    r"|这(?:个|些|种|样|里|项|篇|份|段|部分)"
+    r"|那(?:个|些|种|样|里|项|篇|份|段|部分)"
+    r"|[该此](?:文档|文件|方法|功能|问题|接口|模块|步骤|配置|参数|章节|产品|方案)"
+    r"|以上(?:内容|所述|提到|几点|步骤)"
+    r"|上述|前面|刚才|前者|后者"
+)
+REFERENCE_PATTERN_EN = re.compile(
+    r"\b(it|its|this|that|these|those|they|them|their|he|she|him|her|former|latter)\b",
+    re.IGNORECASE,
+)
+# 过短的问题（如"为什么？"）通常是追问，也需要改写
+SHORT_QUESTION_LENGTH = 6
+
+# 流式问答检索不到相关内容时的提示
+NO_RELEVANT_CHUNKS_TIPS = (
+    "知识库中没有找到相关内容。\n\n"
+    "你可以试试：\n"
+    "1) 换用更具体/更关键的关键词（减少口语，突出专业名词）。\n"
+    "2) 补充上下文信息（场景、对象、时间范围、模块名称等）。\n"
+    "3) 如果你在问某份文档/规范，请提供文档名称或章节号。\n"
+)
+
+# 推测检索时执行查询改写的后台线程池（进程内共享）
+_REWRITE_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="query-rewrite")
+
+
+def needs_rewrite(question: str) -> bool:
+    """启发式判断问题是否依赖对话上下文（含指代词或过短）
+
+    Args:
+        question: 用户问题
+
+    Returns:
+        需要调用 LLM 改写时返回 True
+    """
+    text = question.strip()
+    if len(text) <= SHORT_QUESTION_LENGTH:
+        return True
+    if REFERENCE_PATTERN_ZH.search(text):
+        return True
+    return REFERENCE_PATTERN_EN.search(text) is not None
+
+
+@dataclass
+class _Retrieval:
+    """一次检索的结果"""
+    search_query: str
+    query_vector: list[float] | None = None
+    cached: CachedAnswer | None = None
+    chunks: list[DocumentChunk] = field(default_factory=list)
+    cache_generation: int | None = None
+
 
 class KnowledgeService:
     """知识库服务"""
@@ -19,11 +91,35 @@ class KnowledgeService:
         db=None,  # 数据库服务
         chunk_size: int = 500,
         chunk_overlap: int = 50,
+        embedding: EmbeddingPort = None,
+        answer_cache: AnswerCachePort = None,
+        rewrite_cache: TTLCache = None,
+        speculative_retrieval: bool = False,
+        search_mode: SearchMode = SearchMode.VECTOR,
+        reranker: RerankerPort = None,
+        rerank_candidates: int = 50,
     ):
+        """
+        Args:
+            embedding: 向量化服务（启用语义缓存时需要，用于复用查询向量）
+            answer_cache: 语义回答缓存（可选）
+            rewrite_cache: 查询改写缓存，键为（会话, 历史长度, 问题）（可选）
+            speculative_retrieval: 改写的同时用原问题推测检索
+            search_mode: 检索模式（向量 / 关键词 / 混合）
+            reranker: 重排序器（可选），启用时先召回 rerank_candidates 个候选再重排取 top_k
+            rerank_candidates: 重排序前召回的候选数量
+        """
         self._vector_store = vector_store
         self._llm = llm
         self._memory = memory
         self._db = db
+        self._embedding = embedding
+        self._answer_cache = answer_cache
+        self._rewrite_cache = rewrite_cache
+        self._speculative_retrieval = speculative_retrieval
+        self._search_mode = search_mode
+        self._reranker = reranker
+        self._rerank_candidates = rerank_candidates
 
         # 文本切分器
         self._splitter = RecursiveCharacterTextSplitter(
@@ -61,6 +157,8 @@ class KnowledgeService:
 
         # 添加到向量存储
         self._vector_store.add_documents(chunks)
+        if self._db is not None:
+            self._db.commit()
 
         # 更新知识库统计
         if self._knowledge_base:
@@ -120,25 +218,87 @@ class KnowledgeService:
         # 4. 向量化存储
         self._vector_store.add_documents(chunks, knowledge_base_id=knowledge_base_id)
 
-        # 5. 提交事务
+        # 5. 更新知识库计数并提交事务
+        self._update_counters(knowledge_base_id, documents=1, chunks=len(chunks), size=doc.file_size)
         self._db.commit()
 
+        # 6. 知识库内容已变化，相关的缓存回答失效
+        if self._answer_cache:
+            self._answer_cache.invalidate(knowledge_base_id)
+
         logger.info(f"添加文档完成 doc_id={doc.id} chunk_count={len(chunks)}")
         return len(chunks)
 
-    def _rewrite_query(self, session_id: str, question: str) -> str:
-        """根据对话历史改写查询（解决指代问题）"""
+    def delete_document(self, knowledge_base_id: str, document_id: str) -> bool:
+        """从知识库删除文档（文档记录软删除，文档块和向量物理删除）
 
-        # 获取历史对话
-        conversation = self._memory.get_conversation(session_id)
+        Returns:
+            文档不存在时返回 False
+        """
+        logger.info(f"删除文档开始 kb_id={knowledge_base_id} doc_id={document_id}")
+        doc = (
+            self._db.query(DocumentModel)
+            .filter(
+                DocumentModel.id == document_id,
+                DocumentModel.knowledge_base_id == knowledge_base_id,
+                DocumentModel.status == 1,
+            )
+            .first()
+        )
+        if not doc:
+            logger.info(f"文档不存在 doc_id={document_id}")
+            return False
+
+        chunk_count = self._vector_store.delete_document(document_id, knowledge_base_id=knowledge_base_id)
+        doc.status = -1
+        self._update_counters(knowledge_base_id, documents=-1, chunks=-chunk_count, size=-(doc.file_size or 0))
+        self._db.commit()
+
+        # 引用了该文档的缓存回答失效
+        if self._answer_cache:
+            self._answer_cache.invalidate_document(knowledge_base_id, document_id)
+
+        logger.info(f"删除文档完成 doc_id={document_id} chunk_count={chunk_count}")
+        return True
+
+    def _update_counters(self, knowledge_base_id: str, documents: int, chunks: int, size: int) -> None:
+        """增减知识库计数（UPDATE ... SET x = x + n，并发添加文档时不会丢失更新），由调用方提交"""
+        self._db.query(KnowledgeBaseModel).filter(KnowledgeBaseModel.id == knowledge_base_id).update(
+            {
+                KnowledgeBaseModel.document_count: KnowledgeBaseModel.document_count + documents,
+                KnowledgeBaseModel.chunk_count: KnowledgeBaseModel.chunk_count + chunks,
+                KnowledgeBaseModel.total_bytes: KnowledgeBaseModel.total_bytes + size,
+            },
+            synchronize_session=False,
+        )
+
+    def _resolve_rewrite_locally(
+        self, session_id: str, history: list[Message], question: str
+    ) -> str | None:
+        """无需调用 LLM 即可确定改写结果时返回结果，否则返回 None"""
 
         # 如果没有历史对话，则直接返回原问题
-        if not conversation.messages:
+        if not history:
+            return question
+
+        # 问题中没有指代词，不依赖上下文，跳过改写
+        if not needs_rewrite(question):
             return question
 
+        if self._rewrite_cache is not None:
+            return self._rewrite_cache.get(
+                self._rewrite_cache_key(session_id, history, question)
+            )
+        return None
+
+    def _call_rewrite_llm(
+        self, session_id: str, history: list[Message], question: str
+    ) -> str:
+        """调用 LLM 改写查询，并写入改写缓存"""
+
         # 构建历史对话文本
         history_text = ""
-        for msg in conversation.messages[-6:]:
+        for msg in history[-6:]:
             role = "用户" if msg.role == MessageRole.USER else "AI"
             history_text += f"{role}: {msg.content}\n"
 
@@ -160,9 +320,82 @@ class KnowledgeService:
 
         # 调用 LLM 进行改写
         messages = [Message(role=MessageRole.USER, content=rewrtie_prompt)]
-        rewritten = self._llm.chat(messages)
+        with span("rewrite"):
+            rewritten = self._llm.chat(messages).strip()
 
-        return rewritten.strip()
+        if self._rewrite_cache is not None:
+            self._rewrite_cache.set(
+                self._rewrite_cache_key(session_id, history, question), rewritten
+            )
+        return rewritten
+
+    @staticmethod
+    def _rewrite_cache_key(session_id: str, history: list[Message], question: str) -> tuple:
+        """改写缓存键：历史消息数变化后（有新对话）旧的改写不再复用"""
+        return (session_id, len(history), question.strip())
+
+    def _retrieve(
+        self,
+        question: str,
+        knowledge_base_id: str,
+        session_id: str,
+        top_k: int,
+    ) -> _Retrieval:
+        """查询改写 + 语义缓存 + 检索
+
+        需要调用 LLM 改写且开启了推测检索时，改写在后台线程执行，
+        主线程同时用原问题检索；改写结果与原问题一致时直接复用检索结果。
+        """
+        if not session_id:
+            return self._lookup_and_search(question, knowledge_base_id, top_k)
+
+        # 1. 查询改写（历史对话在主线程读取，数据库会话不跨线程使用）
+        with span("history"):
+            history = self._memory.get_conversation(session_id).messages
+        search_query = self._resolve_rewrite_locally(session_id, history, question)
+
+        if search_query is None and self._speculative_retrieval:
+            # 复制上下文，后台线程的改写耗时也计入当前请求
+            future = _REWRITE_EXECUTOR.submit(
+                contextvars.copy_context().run,
+                self._call_rewrite_llm, session_id, history, question,
+            )
+            speculative = self._lookup_and_search(question, knowledge_base_id, top_k)
+            search_query = future.result()
+            if search_query.strip() == question.strip():
+                logger.info("推测检索命中，复用原问题的检索结果")
+                return speculative
+        elif search_query is None:
+            search_query = self._call_rewrite_llm(session_id, history, question)
+
+        if search_query != question:
+            logger.info(f"查询改写 original={question} rewritten={search_query}")
+
+        return self._lookup_and_search(search_query, knowledge_base_id, top_k)
+
+    def _lookup_and_search(
+        self, search_query: str, knowledge_base_id: str, top_k: int
+    ) -> _Retrieval:
+        """查找语义缓存，未命中时检索相关文档"""
+        query_vector, cached = self._lookup_cache(search_query, knowledge_base_id)
+        if cached:
+            return _Retrieval(search_query, query_vector, cached=cached)
+
+        cache_generation = self._cache_generation(knowledge_base_id)
+        if self._reranker is None:
+            chunks = self._search(search_query, knowledge_base_id, top_k, query_vector)
+        else:
+            # 两阶段检索：多召回一些候选，由重排序器挑出最相关的 top_k 个
+            candidates = self._search(
+                search_query, knowledge_base_id, max(top_k, self._rerank_candidates), query_vector
+            )
+            with span("rerank"):
+                chunks = self._reranker.rerank(search_query, candidates, top_k)
+            logger.info(f"重排序完成 candidates={len(candidates)}")
+        logger.info(f"检索完成 chunks_found={len(chunks)}")
+        return _Retrieval(
+            search_query, query_vector, chunks=chunks, cache_generation=cache_generation
+        )
 
     def query(
         self,
@@ -184,103 +417,89 @@ class KnowledgeService:
         """
         logger.info(f"RAG查询开始 kb_id={knowledge_base_id} session_id={session_id}")
 
-        # 1. 查询改写（如果有 session_id）
-        search_query = question
-        if session_id:
-            search_query = self._rewrite_query(session_id, question)
-            if search_query != question:
-                logger.info(f"查询改写 original={question} rewritten={search_query}")
-
-
-        # 2. 检索相关文档
-        relevtant_chunks = self._vector_store.search(
-            search_query, knowledge_base_id, top_k
-        )
-        logger.info(f"检索完成 chunks_found={len(relevtant_chunks)}")
-
+        # 1. 查询改写 + 检索（语义缓存命中时直接返回缓存的回答）
+        retrieval = self._retrieve(question, knowledge_base_id, session_id, top_k)
+        if retrieval.cached:
+            return retrieval.cached.answer
+        relevtant_chunks = retrieval.chunks
 
         if not relevtant_chunks:
             return "知识库中没有找到相关内容"
 
-        # 3. 构建上下文
-        context = "\n\n".join([chunk.content for chunk in relevtant_chunks])
-
-        # 4. 构建 RAG Prompt
-        from ai_qa.domain.entities import Message, MessageRole
-
-        system_prompt = """
-            你是一个知识库问答助手。请根据以下提供的参考内容回答用户的问题。
-            如果参考内容中没有相关信息，请诚实地说"根据现有资料无法回答这个问题"。
-            回答时请简洁明了，直接回答问题。
-            """
-
-        user_message = f"""
-            参考内容：
-            {context}
-
-            用户问题：{question}
-
-            请根据参考内容回答问题：
-            """
-
-        messages = [Message(role=MessageRole.USER, content=user_message)]
+        # 3. 构建上下文和 RAG Prompt
+        messages, system_prompt = self._build_rag_prompt(question, relevtant_chunks)
 
         # 5. 调用 LLM 生成回答
-        response = self._llm.chat(messages, system_prompt=system_prompt)
+        with span("llm"):
+            response = self._llm.chat(messages, system_prompt=system_prompt)
+
+        self._store_cache(
+            knowledge_base_id, retrieval.query_vector, response,
+            relevtant_chunks, retrieval.cache_generation
+        )
 
         return response
 
-    def query_stream(
+    async def aquery_stream(
         self,
         question: str,
         knowledge_base_id: str,
         session_id: str = None,
         user_id: str = None,
         top_k: int = 3,
-    ) :
-        """基于知识库回答问题(RAG)
+    ) -> AsyncGenerator[str, None]:
+        """基于知识库回答问题(RAG)，异步流式返回
+
+        查询改写和检索包含历史读取、Embedding、改写 LLM 和数据库检索等同步调用，整体放到线程中执行
+        （同一时刻只有一个线程使用数据库会话）；回答生成使用异步 LLM 流，客户端断开时随生成器关闭而停止。
 
         Args:
             question: 用户问题
+            knowledge_base_id: 知识库 ID
             session_id: 会话 ID
             top_k: 检索的文档块数量
 
         Returns:
             AI 的回答
         """
-        logger.info(f"RAG流式查询开始 kb_id={knowledge_base_id} session_id={session_id}")
-
-        # 1. 查询改写（如果有 session_id）
-        search_query = question
-        if session_id:
-            search_query = self._rewrite_query(session_id, question)
-            if search_query != question:
-                logger.info(f"查询改写 original={question} rewritten={search_query}")
-
-        # 2. 检索相关文档
-        relevtant_chunks = self._vector_store.search(
-            search_query, knowledge_base_id, top_k
-        )
-        logger.info(f"检索完成 chunks_found={len(relevtant_chunks)}")
+        logger.info(f"RAG异步流式查询开始 kb_id={knowledge_base_id} session_id={session_id}")
 
+        # 1. 查询改写 + 检索（语义缓存命中时把缓存的回答按流式回放）
+        retrieval = await asyncio.to_thread(
+            self._retrieve, question, knowledge_base_id, session_id, top_k
+        )
+        if retrieval.cached:
+            for chunk in self._replay(retrieval.cached.answer):
+                yield chunk
+            return
+        relevtant_chunks = retrieval.chunks
 
         if not relevtant_chunks:
-            tips = (
-            "知识库中没有找到相关内容。\n\n"
-            "你可以试试：\n"
-            "1) 换用更具体/更关键的关键词（减少口语，突出专业名词）。\n"
-            "2) 补充上下文信息（场景、对象、时间范围、模块名称等）。\n"
-            "3) 如果你在问某份文档/规范，请提供文档名称或章节号。\n"
-            )
-            # 流式输出
-            yield tips
+            yield NO_RELEVANT_CHUNKS_TIPS
             return
 
-        # 3. 构建上下文
-        context = "\n\n".join([chunk.content for chunk in relevtant_chunks])
+        # 2. 构建上下文和 RAG Prompt
+        messages, system_prompt = self._build_rag_prompt(question, relevtant_chunks)
+
+        # 3. 调用 LLM 生成回答
+        full_response = ""
+        chunks = atimed_stream(self._llm.achat_stream(messages, system_prompt=system_prompt))
+        async with aclosing(chunks):
+            async for chunk in chunks:
+                full_response += chunk
+                yield chunk
+
+        # 只缓存完整生成的回答（中途断开不会执行到这里）
+        self._store_cache(
+            knowledge_base_id, retrieval.query_vector, full_response,
+            relevtant_chunks, retrieval.cache_generation
+        )
 
-        # 4. 构建 RAG Prompt
-        from ai_qa.domain.entities import Message, MessageRole
+    @staticmethod
+    def _build_rag_prompt(question: str, chunks: list[DocumentChunk]) -> tuple[list[Message], str]:
+        """拼接参考内容，返回（消息列表，系统提示词）"""
+        with span("prompt"):
+            context = "\n\n".join([chunk.content for chunk in chunks])
 
         system_prompt = """
             你是一个知识库问答助手。请根据以下提供的参考内容回答用户的问题。
@@ -297,17 +516,137 @@ class KnowledgeService:
             请根据参考内容回答问题：
             """
 
-        messages = [Message(role=MessageRole.USER, content=user_message)]
+        return [Message(role=MessageRole.USER, content=user_message)], system_prompt
 
-        # 5. 调用 LLM 生成回答
+    def _search(
+        self,
+        search_query: str,
+        knowledge_base_id: str,
+        top_k: int,
+        query_vector: list[float] = None,
+    ) -> list[DocumentChunk]:
+        """检索文档块，已有查询向量时直接复用，避免重复向量化
 
-        for chunk in self._llm.chat_stream(messages, system_prompt=system_prompt):
-            yield chunk
+        vector_search 阶段包含向量库内部的查询向量化（同时单独计入 embed 阶段）
+        """
+        started = time.perf_counter()
+        with span("vector_search"):
+            chunks = self._search_store(search_query, knowledge_base_id, top_k, query_vector)
+        self._observe_search(started, chunks)
+        return chunks
+
+    def _observe_search(self, started: float, chunks: list[DocumentChunk]) -> None:
+        """记录检索耗时和结果数指标"""
+        labels = (type(self._vector_store).__name__, self._search_mode.value)
+        VECTOR_SEARCH_LATENCY.labels(*labels).observe(time.perf_counter() - started)
+        VECTOR_SEARCH_RESULTS.labels(*labels).observe(len(chunks))
+
+    def _search_store(
+        self,
+        search_query: str,
+        knowledge_base_id: str,
+        top_k: int,
+        query_vector: list[float] = None,
+    ) -> list[DocumentChunk]:
+        if self._search_mode != SearchMode.VECTOR:
+            return self._vector_store.search(
+                search_query, knowledge_base_id, top_k,
+                mode=self._search_mode, query_embedding=query_vector,
+            )
+        if query_vector is not None:
+            return self._vector_store.search_by_vector(query_vector, knowledge_base_id, top_k)
+        return self._vector_store.search(search_query, knowledge_base_id, top_k)
+
+    def _cache_enabled(self, knowledge_base_id: str) -> bool:
+        """是否启用语义缓存（必须指定知识库）"""
+        return bool(self._answer_cache and self._embedding and knowledge_base_id)
+
+    def _lookup_cache(
+        self, search_query: str, knowledge_base_id: str
+    ) -> tuple[list[float] | None, CachedAnswer | None]:
+        """向量化查询并查找缓存，返回（查询向量，缓存回答）"""
+        if not self._cache_enabled(knowledge_base_id):
+            return None, None
+
+        query_vector = self._embedding.embed_query(search_query)
+        cached = self._answer_cache.lookup(knowledge_base_id, query_vector)
+        if cached:
+            logger.info(
+                f"语义缓存命中 kb_id={knowledge_base_id} similarity={cached.similarity:.4f}"
+            )
+        return query_vector, cached
+
+    def _cache_generation(self, knowledge_base_id: str) -> int | None:
+        """检索前记录缓存版本号，防止写入过期回答"""
+        if not self._cache_enabled(knowledge_base_id):
+            return None
+        return self._answer_cache.generation(knowledge_base_id)
+
+    def _store_cache(
+        self,
+        knowledge_base_id: str,
+        query_vector: list[float] | None,
+        answer: str,
+        chunks: list[DocumentChunk],
+        generation: int | None,
+    ) -> None:
+        """把 LLM 生成的回答写入语义缓存"""
+        if query_vector is None or not answer or not self._cache_enabled(knowledge_base_id):
+            return
+        self._answer_cache.store(
+            knowledge_base_id,
+            query_vector,
+            CachedAnswer(
+                answer=answer,
+                chunk_ids=[f"{chunk.document_id}:{chunk.chunk_id}" for chunk in chunks],
+            ),
+            generation=generation,
+        )
+
+    @staticmethod
+    def _replay(answer: str):
+        """把缓存的回答切片后逐段输出"""
+        for start in range(0, len(answer), CACHE_REPLAY_CHUNK_SIZE):
+            yield answer[start:start + CACHE_REPLAY_CHUNK_SIZE]
 
     def get_relevant_chunks(self, question: str, top_k: int = 3) -> list[DocumentChunk]:
         """获取相关文档块（用于调试或展示来源）"""
-        return self._vector_store.search(question, top_k=top_k)
+        started = time.perf_counter()
+        if self._search_mode != SearchMode.VECTOR:
+            chunks = self._vector_store.search(question, top_k=top_k, mode=self._search_mode)
+        else:
+            chunks = self._vector_store.search(question, top_k=top_k)
+        self._observe_search(started, chunks)
+        return chunks
+
+    def get_relevant_chunks_batch(
+        self, questions: list[str], knowledge_base_id: str = None, top_k: int = 3
+    ) -> list[list[DocumentChunk]]:
+        """批量获取相关文档块（评测等批量场景：一次向量化、一次批量检索）
+
+        Returns:
+            与 questions 一一对应的文档块列表
+        """
+        fetch_k = top_k if self._reranker is None else max(top_k, self._rerank_candidates)
+        if self._search_mode != SearchMode.VECTOR:
+            results = self._vector_store.search_batch(
+                questions, knowledge_base_id, fetch_k, mode=self._search_mode
+            )
+        else:
+            results = self._vector_store.search_batch(questions, knowledge_base_id, fetch_k)
+
+        if self._reranker is not None:
+            results = [
+                self._reranker.rerank(question, candidates, top_k)
+                for question, candidates in zip(questions, results)
+            ]
+        logger.info(f"批量检索完成 queries={len(questions)}")
+        return results
 
     def get_chunk_count(self, knowledge_base_id: str = None) -> int:
         """返回知识库中的文档块数量"""
         return self._vector_store.count(knowledge_base_id=knowledge_base_id)
+
+    def has_chunks(self, knowledge_base_id: str = None) -> bool:
+        """知识库是否有文档块（对话时判断能否使用知识库，不统计全部数量）"""
+        return self._vector_store.has_chunks(knowledge_base_id=knowledge_base_id)
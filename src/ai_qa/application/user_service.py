@@ -4,18 +4,24 @@ from sqlalchemy.orm import Session
 
 from ai_qa.domain.exceptions import ConflictException, ForbiddenException, UnauthorizedException
 from ai_qa.infrastructure.database.models import User
-from ai_qa.infrastructure.auth import hash_password, verify_password, create_access_token
+from ai_qa.infrastructure.auth import (
+    AuthCache,
+    create_access_token,
+    hash_password_async,
+    verify_and_update_password_async,
+)
 
 logger = logging.getLogger(__name__)
 
 class UserService:
     """用户服务"""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, auth_cache: AuthCache = None):
         self._db = db
+        self._auth_cache = auth_cache
 
-    def register(self, username: str, password: str, email: str = None) -> User:
-        """用户注册"""
+    async def register(self, username: str, password: str, email: str = None) -> User:
+        """用户注册（密码哈希在独立线程池中执行，不阻塞事件循环）"""
         logger.info(f"用户注册开始 username={username} email={email}")
 
         # 检查用户名是否已存在
@@ -32,7 +38,7 @@ class UserService:
         # 创建用户
         user = User(
             username=username,
-            password_hash=hash_password(password),
+            password_hash=await hash_password_async(password),
             email=email,
         )
 
@@ -44,8 +50,11 @@ class UserService:
 
         return user
     
-    def login(self, username: str, password: str) -> tuple[User, str]:
-        """ 用户登录，返回（用户，Token）"""
+    async def login(self, username: str, password: str) -> tuple[User, str]:
+        """ 用户登录，返回（用户，Token）
+
+        密码校验在独立线程池中执行；哈希的 bcrypt cost 与当前配置不一致时顺便重新哈希
+        """
         logger.info(f"用户登录开始 username={username}")
 
         # 查找用户
@@ -54,7 +63,8 @@ class UserService:
             raise UnauthorizedException("用户名或密码错误")
         
         # 验证密码
-        if not verify_password(password, user.password_hash):
+        verified, new_hash = await verify_and_update_password_async(password, user.password_hash)
+        if not verified:
             raise UnauthorizedException("用户名或密码错误")
         
         # 检查账号状态(1启动，0禁用)
@@ -63,10 +73,17 @@ class UserService:
         
         # 更新最后登录时间
         user.last_login_at = datetime.now(timezone.utc)
+        if new_hash:
+            user.password_hash = new_hash
+            logger.info(f"密码哈希已按新的 cost 更新 username={username}")
         self._db.commit()
 
         # 生成 Token
-        token = create_access_token({"user_id": user.id, "username": user.username})
+        token = create_access_token({
+            "user_id": user.id,
+            "username": user.username,
+            "ver": user.token_version or 0,
+        })
 
         logger.info(f"用户登录成功 username={username}")
         return user, token
@@ -74,3 +91,23 @@ class UserService:
     def get_user_by_id(self, user_id: str) -> User | None:
         """根据 ID 获取用户"""
         return self._db.query(User).filter(User.id == user_id).first()
+
+    def logout(self, user_id: str) -> None:
+        """登出：使该用户已签发的所有 Token 失效"""
+        self._revoke_tokens(user_id)
+        logger.info(f"用户登出 user_id={user_id}")
+
+    def set_status(self, user_id: str, status: int) -> None:
+        """修改账号状态（1启用，0禁用），禁用后已签发的 Token 立即失效"""
+        self._db.query(User).filter(User.id == user_id).update({User.status: status})
+        self._revoke_tokens(user_id)
+        logger.info(f"用户状态变更 user_id={user_id} status={status}")
+
+    def _revoke_tokens(self, user_id: str) -> None:
+        """token_version 加一并清除鉴权缓存中的用户快照"""
+        self._db.query(User).filter(User.id == user_id).update(
+            {User.token_version: User.token_version + 1}
+        )
+        self._db.commit()
+        if self._auth_cache is not None:
+            self._auth_cache.invalidate_user(user_id)
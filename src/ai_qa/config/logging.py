@@ -1,23 +1,165 @@
+"""日志配置：队列异步输出、JSON 格式、采样和长消息截断
+
+业务代码（多数在事件循环上）调用 logger 时只把日志记录放入内存队列，由 QueueListener 的后台线程
+格式化并写到 stdout，写终端 / 管道的阻塞不再出现在请求延迟里。
+
+- 队列满时丢弃日志而不是阻塞调用方，丢弃数在下一条输出的日志中报告
+- LOG_FORMAT=json 时每行一个 JSON 对象，便于日志平台解析
+- 高频日志（请求访问日志）按 LOG_SAMPLE_RATE 采样，WARNING 及以上始终保留
+- 单条消息超过 LOG_MAX_MESSAGE_LENGTH 个字符时截断（用户输入、模型输出等长文本）
+"""
+import atexit
 import logging
+import logging.handlers
+import queue
+import random
 import sys
+import threading
+from datetime import datetime, timezone
+from typing import TextIO
+
+from ai_qa.infrastructure.utils.json_codec import dumps
+
+# 按 LOG_SAMPLE_RATE 采样的高频 logger
+SAMPLED_LOGGERS = ("ai_qa.interfaces.api.middleware",)
+
+_listener: logging.handlers.QueueListener | None = None
+_queue_handler: logging.Handler | None = None
+
+
+def truncate(text: str, max_length: int) -> str:
+    """超过 max_length 个字符时截断，并注明省略的字符数"""
+    if max_length <= 0 or len(text) <= max_length:
+        return text
+    return f"{text[:max_length]}...(truncated {len(text) - max_length} chars)"
+
+
+class TextFormatter(logging.Formatter):
+    """文本格式，消息过长时截断"""
+
+    def __init__(self, max_message_length: int = 2000):
+        super().__init__("%(asctime)s [%(levelname)s] %(name)s:%(lineno)d - %(message)s")
+        self._max_message_length = max_message_length
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        record.message = truncate(record.message, self._max_message_length)
+        return super().formatMessage(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志一行 JSON"""
+
+    def __init__(self, max_message_length: int = 2000):
+        super().__init__()
+        self._max_message_length = max_message_length
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "line": record.lineno,
+            "message": truncate(record.getMessage(), self._max_message_length),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        return dumps(data)
+
+
+class SamplingFilter(logging.Filter):
+    """按比例保留 INFO 及以下的日志，WARNING 及以上全部保留"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self._rate = rate
 
-def setup_logging(debug: bool = False):
-    """配置日志系统"""
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self._rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """队列满时丢弃日志并计数，不阻塞调用方"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 只在调用方线程合并消息参数和异常堆栈（需要当时的状态），格式化和截断交给后台线程
+        exc_text = record.exc_text
+        if record.exc_info and not exc_text:
+            exc_text = self.formatter.formatException(record.exc_info)
+        record = super().prepare(record)
+        record.exc_text = exc_text
+        with self._lock:
+            dropped, self._dropped = self._dropped, 0
+        if dropped:
+            record.msg = f"{record.msg} [日志队列已满，丢弃 {dropped} 条]"
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+
+
+class _MessageOnlyFormatter(logging.Formatter):
+    """QueueHandler 在调用方线程使用的格式化器：只合并消息参数，不加时间等前缀"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return record.getMessage()
+
+
+def setup_logging(
+    debug: bool = False,
+    log_format: str = "text",
+    queue_size: int = 10000,
+    max_message_length: int = 2000,
+    sample_rate: float = 1.0,
+    stream: TextIO | None = None,
+):
+    """配置日志系统（可重复调用，重新配置时替换之前的队列和后台线程）
+
+    Args:
+        debug: 是否输出 DEBUG 日志
+        log_format: text 或 json
+        queue_size: 日志队列长度，队列满时丢弃新日志
+        max_message_length: 单条消息的最大字符数，0 表示不截断
+        sample_rate: 高频日志的保留比例（0-1）
+        stream: 输出流，默认 stdout
+    """
+    global _listener, _queue_handler
 
     # 根据环境环境决定日志级别
     level = logging.DEBUG if debug else logging.INFO
 
-    # 日志格式
-    format_str = "%(asctime)s [%(levelname)s] %(name)s:%(lineno)d - %(message)s"
+    formatter_class = JsonFormatter if log_format == "json" else TextFormatter
+    output = logging.StreamHandler(stream or sys.stdout)  # 输出到控制台
+    output.setFormatter(formatter_class(max_message_length=max_message_length))
+
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    queue_handler.setFormatter(_MessageOnlyFormatter())
+    listener = logging.handlers.QueueListener(queue_handler.queue, output, respect_handler_level=True)
+
+    # 配置根 logger（保留其他组件添加的处理器，只替换本模块之前添加的）
+    root = logging.getLogger()
+    shutdown_logging()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    listener.start()
+    _listener, _queue_handler = listener, queue_handler
 
-    # 配置根 logger
-    logging.basicConfig(
-        level=level,
-        format=format_str,
-        handlers=[
-            logging.StreamHandler(sys.stdout) # 输出到控制台
-        ]
-    )
+    for name in SAMPLED_LOGGERS:
+        sampled = logging.getLogger(name)
+        for existing in [f for f in sampled.filters if isinstance(f, SamplingFilter)]:
+            sampled.removeFilter(existing)
+        if sample_rate < 1:
+            sampled.addFilter(SamplingFilter(sample_rate))
 
     # 降低第三方库的日志级别
     logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -25,4 +167,18 @@ def setup_logging(debug: bool = False):
     logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
     logging.getLogger("httpcore").setLevel(logging.WARNING)
     logging.getLogger("openai").setLevel(logging.WARNING)
-    logging.getLogger("passlib").setLevel(logging.WARNING)
\ No newline at end of file
+    logging.getLogger("passlib").setLevel(logging.WARNING)
+
+
+def shutdown_logging() -> None:
+    """停止后台线程并输出队列中剩余的日志（进程退出时自动调用）"""
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
@@ -12,10 +12,102 @@ class Settings(BaseSettings):
     # Embedding 配置
     embedding_model_name: str = Field(default="text-embedding-v3",alias="EMBEDDING_MODEL_NAME")
 
+    # HTTP 连接池配置（LLM 与 Embedding 共享）
+    http_max_connections: int = Field(default=100, alias="HTTP_MAX_CONNECTIONS")
+    http_max_keepalive_connections: int = Field(default=20, alias="HTTP_MAX_KEEPALIVE_CONNECTIONS")
+    http_keepalive_expiry: float = Field(default=30.0, alias="HTTP_KEEPALIVE_EXPIRY")
+    http_connect_timeout: float = Field(default=10.0, alias="HTTP_CONNECT_TIMEOUT")
+    http_read_timeout: float = Field(default=120.0, alias="HTTP_READ_TIMEOUT")
+    http2_enabled: bool = Field(default=True, alias="HTTP2_ENABLED")
+
+    # RAG 语义回答缓存
+    semantic_cache_enabled: bool = Field(default=True, alias="SEMANTIC_CACHE_ENABLED")
+    semantic_cache_threshold: float = Field(default=0.95, alias="SEMANTIC_CACHE_THRESHOLD")
+    semantic_cache_ttl: float = Field(default=600, alias="SEMANTIC_CACHE_TTL")
+    semantic_cache_max_entries: int = Field(default=256, alias="SEMANTIC_CACHE_MAX_ENTRIES")
+
+    # 向量存储后端：postgres / faiss
+    vector_store: str = Field(default="postgres", alias="VECTOR_STORE")
+    # pgvector 存储格式：full / halfvec / binary（需执行 scripts/migration_vector_quantization.sql）
+    vector_storage: str = Field(default="full", alias="VECTOR_STORAGE")
+    vector_rescore_factor: int = Field(default=4, alias="VECTOR_RESCORE_FACTOR")
+    # FAISS 索引：flat / ivfpq / hnswsq
+    faiss_index_type: str = Field(default="flat", alias="FAISS_INDEX_TYPE")
+    faiss_nlist: int = Field(default=0, alias="FAISS_NLIST")  # 0 表示按数据量自动选择
+    faiss_pq_m: int = Field(default=64, alias="FAISS_PQ_M")
+    faiss_nprobe: int = Field(default=16, alias="FAISS_NPROBE")
+    faiss_hnsw_m: int = Field(default=32, alias="FAISS_HNSW_M")
+    faiss_ef_search: int = Field(default=64, alias="FAISS_EF_SEARCH")
+    faiss_max_loaded_kbs: int = Field(default=32, alias="FAISS_MAX_LOADED_KBS")  # 常驻内存的知识库索引数
+    faiss_checkpoint_segments: int = Field(default=16, alias="FAISS_CHECKPOINT_SEGMENTS")
+    faiss_compact_segments: int = Field(default=64, alias="FAISS_COMPACT_SEGMENTS")
+    faiss_mmap: bool = Field(default=True, alias="FAISS_MMAP")  # 内存映射加载索引检查点
+
+    # RAG 检索模式：vector / keyword / hybrid（keyword / hybrid 使用全文检索字段，需先回填已有数据）
+    retrieval_mode: str = Field(default="vector", alias="RETRIEVAL_MODE")
+
+    # RAG 重排序：none / lexical / cross-encoder（混合检索已包含 BM25，lexical 与之重复，一般只在纯向量检索时使用）
+    reranker: str = Field(default="none", alias="RERANKER")
+    rerank_candidates: int = Field(default=50, alias="RERANK_CANDIDATES")
+    rerank_model: str = Field(default="BAAI/bge-reranker-base", alias="RERANK_MODEL")
+    rerank_batch_size: int = Field(default=16, alias="RERANK_BATCH_SIZE")
+    rerank_threads: int = Field(default=0, alias="RERANK_THREADS")  # 0 表示使用 PyTorch 默认值
+
+    # RAG 查询改写
+    rewrite_cache_ttl: float = Field(default=600, alias="REWRITE_CACHE_TTL")
+    rewrite_cache_max_size: int = Field(default=2048, alias="REWRITE_CACHE_MAX_SIZE")
+    speculative_retrieval: bool = Field(default=True, alias="SPECULATIVE_RETRIEVAL")
+
+    # 模型用量统计（批量写入 usage_stats，需执行 scripts/migration_add_usage_and_rate_limit.sql）
+    usage_tracking_enabled: bool = Field(default=True, alias="USAGE_TRACKING_ENABLED")
+    usage_flush_interval: float = Field(default=5.0, alias="USAGE_FLUSH_INTERVAL")
+
+    # 按用户限流（令牌桶）：memory（进程内）/ postgres（多实例共享）
+    rate_limit_enabled: bool = Field(default=True, alias="RATE_LIMIT_ENABLED")
+    rate_limit_backend: str = Field(default="memory", alias="RATE_LIMIT_BACKEND")
+    rate_limit_capacity: float = Field(default=20, alias="RATE_LIMIT_CAPACITY")  # 允许的突发请求数
+    rate_limit_refill_per_second: float = Field(default=0.5, alias="RATE_LIMIT_REFILL_PER_SECOND")
+
+    # 密码哈希：bcrypt cost（用 benchmarks/bench_bcrypt.py 按目标耗时校准）和专用线程数
+    bcrypt_rounds: int = Field(default=12, alias="BCRYPT_ROUNDS")
+    password_hash_workers: int = Field(default=4, alias="PASSWORD_HASH_WORKERS")
+
+    # 鉴权缓存：已验证的 Token 和用户状态快照（其他实例的登出 / 禁用最多延迟 TTL 秒生效）
+    auth_cache_ttl: float = Field(default=30, alias="AUTH_CACHE_TTL")
+    auth_cache_max_size: int = Field(default=10000, alias="AUTH_CACHE_MAX_SIZE")
+
+    # SSE 流：心跳间隔、每个流缓冲的事件数、断开后保留多久用于续传（秒）
+    sse_heartbeat_interval: float = Field(default=15, alias="SSE_HEARTBEAT_INTERVAL")
+    sse_buffer_size: int = Field(default=256, alias="SSE_BUFFER_SIZE")
+    sse_resume_ttl: float = Field(default=30, alias="SSE_RESUME_TTL")
+
+    # 响应压缩：超过最小字节数的响应按 Accept-Encoding 使用 brotli（需安装 brotli）或 gzip，SSE 不压缩
+    compression_enabled: bool = Field(default=True, alias="COMPRESSION_ENABLED")
+    compression_minimum_size: int = Field(default=1024, alias="COMPRESSION_MINIMUM_SIZE")
+    compression_gzip_level: int = Field(default=6, alias="COMPRESSION_GZIP_LEVEL")
+    compression_brotli_quality: int = Field(default=4, alias="COMPRESSION_BROTLI_QUALITY")
+
+    # 生产服务器（python -m ai_qa.interfaces.api.server）
+    server_host: str = Field(default="0.0.0.0", alias="SERVER_HOST")
+    server_port: int = Field(default=8000, alias="SERVER_PORT")
+    server_workers: int = Field(default=1, alias="SERVER_WORKERS")  # 进程数
+    server_keepalive: int = Field(default=5, alias="SERVER_KEEPALIVE")  # 空闲 keep-alive 连接保持秒数
+    server_backlog: int = Field(default=2048, alias="SERVER_BACKLOG")  # 等待 accept 的连接队列长度
+    server_limit_concurrency: int = Field(default=0, alias="SERVER_LIMIT_CONCURRENCY")  # 每个进程的最大并发连接数，0 表示不限制
+    server_graceful_timeout: int = Field(default=30, alias="SERVER_GRACEFUL_TIMEOUT")  # 收到 SIGTERM 后等待进行中请求的秒数
+    server_drain_timeout: float = Field(default=10, alias="SERVER_DRAIN_TIMEOUT")  # 之后等待后台 SSE 生成结束的秒数
+    server_warmup: bool = Field(default=True, alias="SERVER_WARMUP")  # 启动时预先创建单例、建立数据库连接
+    # 多进程指标目录（prometheus-client 多进程模式），为空且 SERVER_WORKERS>1 时启动时创建临时目录
+    prometheus_multiproc_dir: str = Field(default="", alias="PROMETHEUS_MULTIPROC_DIR")
+
     # 应用配置
     app_env: str = Field(default="development", alias="APP_ENV")
     # 日志配置
     debug: bool = Field(default= True, alias= "DEBUG")
+    log_format: str = Field(default="text", alias="LOG_FORMAT")  # text / json
+    log_queue_size: int = Field(default=10000, alias="LOG_QUEUE_SIZE")  # 队列满时丢弃新日志
+    log_max_message_length: int = Field(default=2000, alias="LOG_MAX_MESSAGE_LENGTH")  # 0 表示不截断
+    log_sample_rate: float = Field(default=1.0, alias="LOG_SAMPLE_RATE")  # 请求访问日志的保留比例
 
     # 知识库持久化目录
     knowledge_persist_dir: str = Field(
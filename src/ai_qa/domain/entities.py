@@ -9,6 +9,12 @@ class MessageRole(Enum):
     USER = "user"
     ASSISTANT = "assistant"
 
+class SearchMode(Enum):
+    """知识库检索模式枚举"""
+    VECTOR = "vector"     # 向量语义检索
+    KEYWORD = "keyword"   # 关键词全文检索（BM25 / tsvector）
+    HYBRID = "hybrid"     # 向量 + 关键词，RRF 融合
+
 @dataclass
 class Message:
     """消息实体"""
@@ -31,6 +37,49 @@ class Message:
             result["reasoning_steps"] = self.reasoning_steps
         return result
 
+class AgentEventType(Enum):
+    """Agent 流式事件类型"""
+    THINKING = "thinking"        # AI 思考过程
+    TOOL_START = "tool_start"    # 开始调用工具
+    TOOL_RESULT = "tool_result"  # 工具返回结果
+    ANSWER = "answer"            # 最终回答
+    DONE = "done"                # 完成
+    METRICS = "metrics"          # 分阶段耗时
+
+# 需要作为推理步骤保存到对话历史的事件类型
+REASONING_EVENT_TYPES = (AgentEventType.THINKING, AgentEventType.TOOL_START, AgentEventType.TOOL_RESULT)
+
+@dataclass
+class AgentEvent:
+    """Agent 流式事件（在传输层统一序列化）"""
+    type: AgentEventType
+    content: str | None = None
+    tool: str | None = None
+    input: str | None = None
+    output: str | None = None
+    iteration: int | None = None
+    timings: dict | None = None
+
+    def to_dict(self) -> dict:
+        """转换为传输格式，省略空字段"""
+        result = {"type": self.type.value}
+        for key in ("content", "tool", "input", "output", "iteration", "timings"):
+            value = getattr(self, key)
+            if value is not None:
+                result[key] = value
+        return result
+
+    def to_reasoning_step(self) -> dict:
+        """转换为保存到消息 reasoning_steps 的格式"""
+        return {
+            "type": self.type.value,
+            "content": self.content,
+            "tool": self.tool,
+            "input": self.input,
+            "output": self.output,
+            "iteration": self.iteration,
+        }
+
 @dataclass
 class Conversation:
     """对话实体"""
@@ -71,6 +120,14 @@ class DocumentChunk:
         if self.chunk_id is None:
             self.chunk_id = f"chunk_{hash(self.content)}"
 
+@dataclass
+class CachedAnswer:
+    """语义缓存中的 RAG 回答"""
+    answer: str
+    # 回答引用的文档块，格式为 "<document_id>:<chunk_id>"，删除文档时按 document_id 失效
+    chunk_ids: list[str] = field(default_factory=list)
+    similarity: float = 1.0
+
 @dataclass
 class KnowledgeBase:
     """知识库实体"""
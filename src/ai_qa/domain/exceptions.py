@@ -1,3 +1,5 @@
+import math
+
 
 class AppException(Exception):
     status_code: int = 500
@@ -41,4 +43,14 @@ class ConflictException(AppException):
     status_code = 409
 
     def __init__(self, message: str):
-        super().__init__(detail=message)
\ No newline at end of file
+        super().__init__(detail=message)
+
+
+class TooManyRequestsException(AppException):
+    """请求过于频繁 (429)"""
+    status_code = 429
+
+    def __init__(self, retry_after: float, message: str = "请求过于频繁，请稍后再试"):
+        super().__init__(detail=message)
+        self.retry_after = retry_after
+        self.headers = {"Retry-After": str(max(1, math.ceil(retry_after)))}
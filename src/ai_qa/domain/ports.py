@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import Generator
-from .entities import DocumentChunk, Message, Conversation
+from typing import AsyncIterator, Generator
+from .entities import CachedAnswer, DocumentChunk, Message, Conversation, SearchMode
 
 class LLMPort(ABC):
     """LLM 服务端口（抽象接口）
@@ -26,6 +26,14 @@ class LLMPort(ABC):
         """流式发送消息，逐步返回回复"""
         pass
 
+    @abstractmethod
+    def achat_stream(self, messages: list[Message], system_prompt: str = None) -> AsyncIterator[str]:
+        """异步流式发送消息，逐步返回回复
+
+        调用方关闭生成器（或所在任务被取消）时应中止上游请求，不再继续生成
+        """
+        pass
+
     @abstractmethod
     def chat_with_tools(self, messages: list[Message], tools: list, system_prompt: str = None):
         """支持工具调用的对话
@@ -40,6 +48,11 @@ class LLMPort(ABC):
         """
         pass
 
+    @abstractmethod
+    async def achat_with_tools(self, messages: list[Message], tools: list, system_prompt: str = None):
+        """支持工具调用的对话（异步版本，参数和返回值同 chat_with_tools）"""
+        pass
+
 class ConversationMemoryPort(ABC):
     """对话记忆存储端口(抽象接口)
     
@@ -112,8 +125,57 @@ class VectorStorePort(ABC):
         pass
     
     @abstractmethod
-    def search(self, query: str, knowledge_base_id: str = None, top_k: int = 3) -> list[DocumentChunk]:
-        """搜索相关文档块"""
+    def search(
+        self,
+        query: str,
+        knowledge_base_id: str = None,
+        top_k: int = 3,
+        mode: SearchMode = SearchMode.VECTOR,
+        query_embedding: list[float] = None,
+    ) -> list[DocumentChunk]:
+        """搜索相关文档块
+
+        Args:
+            mode: 检索模式（向量 / 关键词 / 混合）
+            query_embedding: 已经向量化的查询，传入时不再重复调用 Embedding
+        """
+        pass
+
+    @abstractmethod
+    def search_batch(
+        self,
+        queries: list[str],
+        knowledge_base_id: str = None,
+        top_k: int = 3,
+        mode: SearchMode = SearchMode.VECTOR,
+    ) -> list[list[DocumentChunk]]:
+        """批量检索：所有查询一次向量化、一次批量检索
+
+        Args:
+            queries: 查询列表
+            mode: 检索模式（向量 / 关键词 / 混合）
+
+        Returns:
+            与 queries 一一对应的检索结果
+        """
+        pass
+
+    @abstractmethod
+    def search_by_vector(self, query_embedding: list[float], knowledge_base_id: str = None, top_k: int = 3) -> list[DocumentChunk]:
+        """使用已经向量化的查询搜索相关文档块（避免重复调用 Embedding）"""
+        pass
+
+    @abstractmethod
+    def delete_document(self, document_id: str, knowledge_base_id: str = None) -> int:
+        """删除一个文档的全部文档块
+
+        Args:
+            document_id: 文档 ID
+            knowledge_base_id: 文档所属知识库
+
+        Returns:
+            删除的文档块数量
+        """
         pass
 
     @abstractmethod
@@ -126,4 +188,100 @@ class VectorStorePort(ABC):
         """返回文档块数量"""
         pass
 
+    def has_chunks(self, knowledge_base_id: str = None) -> bool:
+        """是否有文档块（只需判断非空时使用，实现可以覆盖为更便宜的查询）"""
+        return self.count(knowledge_base_id=knowledge_base_id) > 0
+
+
+
+
+class RerankerPort(ABC):
+    """重排序端口
+
+    对向量检索召回的候选文档块重新打分，只保留最相关的若干条。
+    """
+
+    @abstractmethod
+    def rerank(self, query: str, chunks: list[DocumentChunk], top_n: int) -> list[DocumentChunk]:
+        """按与查询的相关度重新排序，返回前 top_n 个文档块"""
+        pass
+
 
+class AnswerCachePort(ABC):
+    """RAG 回答语义缓存端口
+
+    以知识库 ID + 查询向量相似度为键缓存回答，
+    知识库文档变化时需要调用 invalidate 使缓存失效。
+    """
+
+    @abstractmethod
+    def lookup(self, knowledge_base_id: str, query_embedding: list[float]) -> CachedAnswer | None:
+        """查找与查询向量足够相似的缓存回答，未命中返回 None"""
+        pass
+
+    @abstractmethod
+    def store(
+        self,
+        knowledge_base_id: str,
+        query_embedding: list[float],
+        answer: CachedAnswer,
+        generation: int = None,
+    ) -> None:
+        """写入缓存
+
+        Args:
+            generation: 检索前通过 generation() 获取的版本号，
+                若期间知识库已失效（版本变化）则放弃写入
+        """
+        pass
+
+    @abstractmethod
+    def generation(self, knowledge_base_id: str) -> int:
+        """返回知识库缓存的当前版本号"""
+        pass
+
+    @abstractmethod
+    def invalidate(self, knowledge_base_id: str) -> None:
+        """使指定知识库的缓存全部失效"""
+        pass
+
+    def invalidate_document(self, knowledge_base_id: str, document_id: str) -> None:
+        """使引用了指定文档的缓存回答失效（默认整个知识库失效，实现可以只移除相关条目）"""
+        self.invalidate(knowledge_base_id)
+
+
+class UsageRecorderPort(ABC):
+    """LLM / Embedding 用量记录端口
+
+    用量按当前请求的用户和会话归属（由接口层在请求开始时设置），实现可以批量落库。
+    """
+
+    @abstractmethod
+    def record(self, kind: str, model: str, input_tokens: int = 0, output_tokens: int = 0) -> None:
+        """记录一次模型调用
+
+        Args:
+            kind: 调用类型（llm / embedding）
+            model: 模型名称
+            input_tokens: 输入 token 数
+            output_tokens: 输出 token 数
+        """
+        pass
+
+    @abstractmethod
+    def flush(self) -> None:
+        """把尚未写入的用量立即落库"""
+        pass
+
+
+class RateLimiterPort(ABC):
+    """限流端口（令牌桶）"""
+
+    @abstractmethod
+    def acquire(self, key: str, cost: float = 1.0) -> float:
+        """尝试从 key 对应的令牌桶中取出 cost 个令牌
+
+        Returns:
+            0 表示放行；大于 0 表示令牌不足，为需要等待的秒数
+        """
+        pass
@@ -1,3 +1,21 @@
-from .security import hash_password, verify_password, create_access_token, verify_token
+from .security import (
+    hash_password,
+    hash_password_async,
+    verify_password,
+    verify_and_update_password,
+    verify_and_update_password_async,
+    create_access_token,
+    verify_token,
+)
+from .auth_cache import AuthCache
 
-__all__ = ["hash_password", "verify_password", "create_access_token", "verify_token"]
\ No newline at end of file
+__all__ = [
+    "hash_password",
+    "hash_password_async",
+    "verify_password",
+    "verify_and_update_password",
+    "verify_and_update_password_async",
+    "create_access_token",
+    "verify_token",
+    "AuthCache",
+]
\ No newline at end of file
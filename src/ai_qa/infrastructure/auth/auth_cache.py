@@ -0,0 +1,69 @@
+import time
+from typing import Callable
+
+from ai_qa.infrastructure.auth.security import verify_token
+from ai_qa.infrastructure.cache import TTLCache
+from ai_qa.infrastructure.database.models import User
+
+
+class AuthCache:
+    """鉴权缓存：已验证的 Token 和用户状态快照
+
+    每个请求的鉴权原本要解码 JWT 并查询一次 users 表，缓存命中后只剩两次字典查找。
+
+    - Token 缓存：Token -> payload，过期时间取 TTL 和 Token 自身 exp 的较早者
+    - 用户缓存：user_id -> 用户快照（不绑定数据库会话的 User 对象，只读）
+
+    撤销依赖 users.token_version：Token 中的 ver 与用户当前版本不一致即失效，
+    登出、禁用时版本号加一并清除本进程的用户快照；其他实例最多在 TTL 后看到变化。
+    """
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 30):
+        self._tokens = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self._users = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+
+    def verify(self, token: str) -> dict | None:
+        """验证 Token，返回 payload；无效或已过期返回 None"""
+        payload = self._tokens.get(token)
+        if payload is None:
+            payload = verify_token(token)
+            if not payload:
+                return None
+            self._tokens.set(token, payload)
+        elif payload.get("exp", 0) < time.time():
+            self._tokens.pop(token)
+            return None
+        return payload
+
+    def get_user(self, user_id: str, loader: Callable[[str], User | None]) -> User | None:
+        """读取用户快照，未命中时用 loader 查询并缓存
+
+        Args:
+            user_id: 用户 ID
+            loader: 按 ID 查询用户的函数
+
+        Returns:
+            用户快照，用户不存在时返回 None（不缓存）
+        """
+        snapshot = self._users.get(user_id)
+        if snapshot is None:
+            user = loader(user_id)
+            if user is None:
+                return None
+            snapshot = _snapshot(user)
+            self._users.set(user_id, snapshot)
+        return snapshot
+
+    def invalidate_user(self, user_id: str) -> None:
+        """清除用户快照（用户状态或 token_version 变化后调用）"""
+        self._users.pop(user_id)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._tokens.clear()
+        self._users.clear()
+
+
+def _snapshot(user: User) -> User:
+    """复制用户的列属性，得到不依赖数据库会话、可跨请求共享的对象"""
+    return User(**{column.key: getattr(user, column.key) for column in User.__table__.columns})
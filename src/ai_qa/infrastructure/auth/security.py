@@ -1,11 +1,26 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from ai_qa.config.settings import settings
 
 
-# 密码哈希配置
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# 密码哈希配置：cost 固定为 BCRYPT_ROUNDS，cost 不同的旧哈希在登录时重新计算
+BCRYPT_ROUNDS = settings.bcrypt_rounds
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+# bcrypt 每次耗时上百毫秒，放到独立的有界线程池里执行，
+# 既不阻塞事件循环，登录高峰也不会占满 FastAPI 默认线程池
+_password_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers, thread_name_prefix="password-hash"
+)
 
 # JWT 配置
 SECRET_KEY = settings.jwt_secret_key.get_secret_value()
@@ -20,6 +35,26 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """验证密码"""
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """验证密码，哈希的 cost 与当前配置不一致时同时返回新哈希
+
+    Returns:
+        (是否正确, 新哈希)，不需要更新时新哈希为 None
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+async def hash_password_async(password: str) -> str:
+    """密码哈希（在密码线程池中执行）"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, hash_password, password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """验证密码并检查是否需要重新哈希（在密码线程池中执行）"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _password_executor, verify_and_update_password, plain_password, hashed_password
+    )
+
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     """创建 JWT Token"""
     to_encode = data.copy()
@@ -0,0 +1,4 @@
+from .semantic_cache import InMemorySemanticCache
+from .ttl_cache import TTLCache
+
+__all__ = ["InMemorySemanticCache", "TTLCache"]
@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from ai_qa.domain.entities import CachedAnswer
+from ai_qa.domain.ports import AnswerCachePort
+
+
+@dataclass
+class _Entry:
+    """缓存条目：归一化后的查询向量 + 回答"""
+    vector: np.ndarray
+    answer: CachedAnswer
+    created_at: float
+
+
+class InMemorySemanticCache(AnswerCachePort):
+    """进程内语义回答缓存
+
+    每个知识库独立维护一组条目，按余弦相似度匹配；
+    条目数超过上限时淘汰最久未命中的条目（LRU）。
+
+    注意：缓存只在当前进程内有效，多 worker 部署时其他进程
+    在 TTL 过期前可能仍返回旧回答，TTL 不宜设置过长。
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries_per_kb: int = 256,
+        ttl_seconds: float = 600,
+    ):
+        """
+        Args:
+            threshold: 命中所需的最小余弦相似度
+            max_entries_per_kb: 每个知识库最多缓存的回答数
+            ttl_seconds: 条目存活时间（秒）
+        """
+        self._threshold = threshold
+        self._max_entries = max_entries_per_kb
+        self._ttl = ttl_seconds
+        self._entries: dict[str, OrderedDict[int, _Entry]] = {}
+        self._generations: dict[str, int] = {}
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, knowledge_base_id: str, query_embedding: list[float]) -> CachedAnswer | None:
+        """查找与查询向量足够相似的缓存回答"""
+        query = self._normalize(query_embedding)
+        now = time.monotonic()
+
+        with self._lock:
+            entries = self._entries.get(knowledge_base_id)
+            if not entries:
+                return None
+
+            # 清理过期条目
+            expired = [key for key, entry in entries.items() if now - entry.created_at > self._ttl]
+            for key in expired:
+                del entries[key]
+            if not entries:
+                return None
+
+            keys = list(entries.keys())
+            matrix = np.stack([entries[key].vector for key in keys])
+            similarities = matrix @ query
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self._threshold:
+                return None
+
+            # 命中后移到队尾（最近使用）
+            entries.move_to_end(keys[best])
+            cached = entries[keys[best]].answer
+
+        return CachedAnswer(
+            answer=cached.answer,
+            chunk_ids=list(cached.chunk_ids),
+            similarity=similarity,
+        )
+
+    def store(
+        self,
+        knowledge_base_id: str,
+        query_embedding: list[float],
+        answer: CachedAnswer,
+        generation: int = None,
+    ) -> None:
+        """写入缓存"""
+        vector = self._normalize(query_embedding)
+
+        with self._lock:
+            # 检索期间知识库发生了变化，回答可能已过时
+            if generation is not None and generation != self._generations.get(knowledge_base_id, 0):
+                return
+
+            entries = self._entries.setdefault(knowledge_base_id, OrderedDict())
+            entries[self._next_key] = _Entry(vector=vector, answer=answer, created_at=time.monotonic())
+            self._next_key += 1
+
+            while len(entries) > self._max_entries:
+                entries.popitem(last=False)
+
+    def generation(self, knowledge_base_id: str) -> int:
+        """返回知识库缓存的当前版本号"""
+        with self._lock:
+            return self._generations.get(knowledge_base_id, 0)
+
+    def invalidate(self, knowledge_base_id: str) -> None:
+        """使指定知识库的缓存全部失效"""
+        with self._lock:
+            self._entries.pop(knowledge_base_id, None)
+            self._generations[knowledge_base_id] = self._generations.get(knowledge_base_id, 0) + 1
+
+    def invalidate_document(self, knowledge_base_id: str, document_id: str) -> None:
+        """只移除引用了指定文档的缓存回答
+
+        版本号同样递增：检索期间可能读到了被删除的文档，之前开始的写入全部放弃。
+        """
+        prefix = f"{document_id}:"
+        with self._lock:
+            entries = self._entries.get(knowledge_base_id)
+            if entries:
+                stale = [
+                    key for key, entry in entries.items()
+                    if any(chunk_id.startswith(prefix) for chunk_id in entry.answer.chunk_ids)
+                ]
+                for key in stale:
+                    del entries[key]
+            self._generations[knowledge_base_id] = self._generations.get(knowledge_base_id, 0) + 1
+
+    @staticmethod
+    def _normalize(vector: list[float]) -> np.ndarray:
+        """归一化向量，使点积等于余弦相似度"""
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm > 0 else array
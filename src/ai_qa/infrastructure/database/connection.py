@@ -20,6 +20,17 @@ SessionLocal = sessionmaker(
     bind=engine              # 绑定到上面创建的引擎
 )
 
+def pool_status() -> dict:
+    """连接池使用情况（压测时用来判断连接池是否饱和）"""
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": pool._max_overflow,
+    }
+
 def get_db() -> Generator[Session, None, None]:
     """获取数据库会话（用于 FastAPI 依赖注入）"""
     db = SessionLocal()
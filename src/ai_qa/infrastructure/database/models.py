@@ -1,17 +1,20 @@
-from datetime import datetime
+from datetime import date, datetime
 
-from pgvector.sqlalchemy import Vector
+from pgvector.sqlalchemy import HALFVEC, Vector
 from sqlalchemy import (
     BigInteger,
+    Date,
     DateTime,
+    Float,
     ForeignKey,
     Index,
+    Integer,
     SmallInteger,
     String,
     Text,
     UniqueConstraint,
 )
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 from ai_qa.infrastructure.utils.id_generator import generate_id
@@ -32,6 +35,7 @@ class User(Base):
     nickname: Mapped[str | None] = mapped_column(String(50))
     status: Mapped[int] = mapped_column(SmallInteger, default=1)
     mcp_enabled: Mapped[bool] = mapped_column(default=False)  # MCP 总开关
+    token_version: Mapped[int] = mapped_column(Integer, default=0)  # 登出 / 禁用时加一，使已签发的 Token 失效
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     last_login_at: Mapped[datetime | None] = mapped_column(DateTime)
@@ -51,6 +55,10 @@ class KnowledgeBase(Base):
     name: Mapped[str] = mapped_column(String(100), nullable=False)
     description: Mapped[str | None] = mapped_column(Text)
     status: Mapped[int] = mapped_column(SmallInteger, default=1)
+    # 统计计数：添加 / 删除文档时在同一事务中增减，列表和详情不再 COUNT 文档和文档块
+    document_count: Mapped[int] = mapped_column(Integer, default=0)
+    chunk_count: Mapped[int] = mapped_column(Integer, default=0)
+    total_bytes: Mapped[int] = mapped_column(BigInteger, default=0)  # 文档原始大小之和
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -98,7 +106,10 @@ class DocumentChunk(Base):
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=generate_id)
     document_id: Mapped[str] = mapped_column(String(36), ForeignKey("documents.id"), nullable=False)
     content: Mapped[str] = mapped_column(Text, nullable=False)
-    embedding = mapped_column(Vector(1024))  # pgvector 向量类型
+    # 向量和全文检索字段只在 SQL 中参与排序，查询结果默认不加载（deferred）
+    embedding = mapped_column(Vector(1024), deferred=True)  # pgvector 向量类型
+    embedding_half = mapped_column(HALFVEC(1024), deferred=True)  # 半精度向量（VECTOR_STORAGE=halfvec 时代替 embedding）
+    content_tsv = mapped_column(TSVECTOR, deferred=True)  # 全文检索词项（应用侧分词后写入）
     chunk_index: Mapped[int | None] = mapped_column()
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     
@@ -107,6 +118,7 @@ class DocumentChunk(Base):
     
     __table_args__ = (
         Index("idx_document_chunks_document_id", "document_id"),
+        Index("idx_document_chunks_content_tsv", "content_tsv", postgresql_using="gin"),
     )
 
 
@@ -173,3 +185,40 @@ class UserMcpServer(Base):
 
     def __repr__(self):
         return f"UserMcpServer(id={self.id}, user_id={self.user_id}, server_name={self.server_name}, status={self.status})"
+
+
+class UsageStat(Base):
+    """模型用量统计表（按用户 / 会话 / 天 / 模型聚合，批量累加写入）"""
+    __tablename__ = "usage_stats"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=generate_id)
+    # 不设外键：非请求上下文中的调用（脚本、后台任务）记为空字符串
+    user_id: Mapped[str] = mapped_column(String(36), nullable=False, default="")
+    conversation_id: Mapped[str] = mapped_column(String(36), nullable=False, default="")
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    kind: Mapped[str] = mapped_column(String(20), nullable=False)  # llm / embedding
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+    request_count: Mapped[int] = mapped_column(BigInteger, default=0)
+    input_tokens: Mapped[int] = mapped_column(BigInteger, default=0)
+    output_tokens: Mapped[int] = mapped_column(BigInteger, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "conversation_id", "day", "kind", "model", name="uk_usage_stats"),
+        Index("idx_usage_stats_user_day", "user_id", "day"),
+    )
+
+    def __repr__(self):
+        return f"UsageStat(user_id={self.user_id}, day={self.day}, kind={self.kind}, model={self.model})"
+
+
+class RateLimitBucket(Base):
+    """限流令牌桶表（RATE_LIMIT_BACKEND=postgres 时多个实例共享）"""
+    __tablename__ = "rate_limit_buckets"
+
+    key: Mapped[str] = mapped_column(String(100), primary_key=True)
+    tokens: Mapped[float] = mapped_column(Float, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"RateLimitBucket(key={self.key}, tokens={self.tokens})"
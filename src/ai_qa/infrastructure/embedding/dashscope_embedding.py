@@ -1,22 +1,116 @@
+import time
+from contextlib import contextmanager
+
+import httpx
 from langchain_community.embeddings import DashScopeEmbeddings
 
-from ai_qa.domain.ports import EmbeddingPort
+from ai_qa.domain.ports import EmbeddingPort, UsageRecorderPort
+from ai_qa.infrastructure.observability import span
+from ai_qa.infrastructure.observability.metrics import (
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_LATENCY,
+    EMBEDDING_REQUESTS,
+)
+
+# DashScope OpenAI 兼容接口单次请求最多 10 条文本（text-embedding-v3）
+DEFAULT_BATCH_SIZE = 10
 
 class DashScopeEmbeddingAdapter(EmbeddingPort):
-    """阿里 DashScope Embedding 向量嵌入服务适配器"""
+    """阿里 DashScope Embedding 向量嵌入服务适配器
+
+    传入共享的 httpx 客户端时，通过 OpenAI 兼容接口（/embeddings）调用，
+    与 LLM 复用同一个连接池；否则回退到 DashScope SDK。
+    """
 
-    def __init__(self, api_key: str, model_name: str = "text-embedding-v3"):
-        self._client = DashScopeEmbeddings(
-            model=model_name,
-            dashscope_api_key=api_key
-        )
+    def __init__(
+        self,
+        api_key: str,
+        model_name: str = "text-embedding-v3",
+        base_url: str = None,
+        http_client: httpx.Client = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        usage_recorder: UsageRecorderPort = None,
+    ):
+        """
+        Args:
+            api_key: DashScope API Key
+            model_name: Embedding 模型名称
+            base_url: OpenAI 兼容接口地址（与 LLM 的 base_url 相同）
+            http_client: 共享的同步 httpx 客户端
+            batch_size: 单次请求的最大文本数
+            usage_recorder: 用量记录器（可选，SDK 模式下只记录调用次数）
+        """
+        self._api_key = api_key
+        self._model_name = model_name
+        self._batch_size = batch_size
+        self._usage_recorder = usage_recorder
+        self._http_client = http_client if base_url else None
+        self._endpoint = f"{base_url.rstrip('/')}/embeddings" if base_url else None
+
+        if self._http_client is None:
+            self._client = DashScopeEmbeddings(
+                model=model_name,
+                dashscope_api_key=api_key
+            )
 
     def embed_texts(self, texts: list[str]) -> list[list[float]]:
         """将文本列表转换为向量列表"""
-        return self._client.embed_documents(texts)
-        # 逐个调用 embed_query，避免 embed_documents 的 URL 报错问题
-        # return [self._client.embed_query(text) for text in texts]
+        with span("embed"):
+            if self._http_client is None:
+                with self._observe(len(texts)):
+                    vectors = self._client.embed_documents(texts)
+                self._record_usage()
+                return vectors
+                # 逐个调用 embed_query，避免 embed_documents 的 URL 报错问题
+                # return [self._client.embed_query(text) for text in texts]
+
+            vectors = []
+            for start in range(0, len(texts), self._batch_size):
+                vectors.extend(self._request(texts[start:start + self._batch_size]))
+            return vectors
 
     def embed_query(self, text: str) -> list[float]:
         """将查询文本转换为向量"""
-        return self._client.embed_query(text)
+        with span("embed"):
+            if self._http_client is None:
+                with self._observe(1):
+                    vector = self._client.embed_query(text)
+                self._record_usage()
+                return vector
+            return self._request([text])[0]
+
+    def _record_usage(self, usage: dict = None) -> None:
+        """记录一次 Embedding 调用的 token 用量"""
+        if self._usage_recorder is not None:
+            tokens = (usage or {}).get("total_tokens", 0)
+            self._usage_recorder.record("embedding", self._model_name, input_tokens=tokens)
+
+    @contextmanager
+    def _observe(self, batch_size: int):
+        """记录一次 Embedding 请求的批大小、耗时和结果"""
+        EMBEDDING_BATCH_SIZE.labels(self._model_name).observe(batch_size)
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            EMBEDDING_REQUESTS.labels(self._model_name, "error").inc()
+            raise
+        EMBEDDING_REQUESTS.labels(self._model_name, "ok").inc()
+        EMBEDDING_LATENCY.labels(self._model_name).observe(time.perf_counter() - started)
+
+    def _request(self, texts: list[str]) -> list[list[float]]:
+        """通过共享连接池调用 /embeddings 接口"""
+        with self._observe(len(texts)):
+            response = self._http_client.post(
+                self._endpoint,
+                headers={"Authorization": f"Bearer {self._api_key}"},
+                json={"model": self._model_name, "input": texts, "encoding_format": "float"},
+            )
+            response.raise_for_status()
+
+        body = response.json()
+        self._record_usage(body.get("usage"))
+
+        # 按 index 排序，保证与输入顺序一致
+        data = sorted(body["data"], key=lambda item: item["index"])
+        return [item["embedding"] for item in data]
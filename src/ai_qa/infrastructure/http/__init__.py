@@ -0,0 +1,3 @@
+from .client_pool import HttpClientPool
+
+__all__ = ["HttpClientPool"]
@@ -0,0 +1,74 @@
+"""共享 HTTP 连接池
+
+LLM、Embedding 等所有外部模型服务的请求统一走这里创建的 httpx 客户端，
+保证 keep-alive 连接在各适配器之间复用，突发流量下不会反复进行 TLS 握手。
+"""
+import importlib.util
+import logging
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+def _h2_available() -> bool:
+    """HTTP/2 依赖 h2 包，未安装时自动降级为 HTTP/1.1"""
+    return importlib.util.find_spec("h2") is not None
+
+
+class HttpClientPool:
+    """同步 + 异步 httpx 客户端的持有者（进程内单例使用）"""
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 120.0,
+        http2: bool = True,
+    ):
+        """
+        Args:
+            max_connections: 最大并发连接数
+            max_keepalive_connections: 最多保留的空闲 keep-alive 连接数
+            keepalive_expiry: 空闲连接保留时间（秒）
+            connect_timeout: 建立连接超时（秒）
+            read_timeout: 读取 / 写入 / 等待连接池超时（秒）
+            http2: 是否启用 HTTP/2（需要安装 h2）
+        """
+        if http2 and not _h2_available():
+            logger.warning("未安装 h2，HTTP/2 已降级为 HTTP/1.1（pip install 'httpx[http2]'）")
+            http2 = False
+
+        self.http2 = http2
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+
+        self.sync_client = httpx.Client(limits=self.limits, timeout=self.timeout, http2=http2)
+        self.async_client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout, http2=http2)
+
+    @classmethod
+    def from_settings(cls, settings) -> "HttpClientPool":
+        """根据应用配置创建连接池"""
+        return cls(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry,
+            connect_timeout=settings.http_connect_timeout,
+            read_timeout=settings.http_read_timeout,
+            http2=settings.http2_enabled,
+        )
+
+    def close(self) -> None:
+        """关闭同步客户端"""
+        self.sync_client.close()
+
+    async def aclose(self) -> None:
+        """关闭同步和异步客户端（应用退出时调用）"""
+        self.sync_client.close()
+        await self.async_client.aclose()
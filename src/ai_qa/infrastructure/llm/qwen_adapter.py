@@ -1,32 +1,108 @@
-from typing import Generator
+import asyncio
+import math
+import re
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, Generator
+
+import httpx
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 
 from ai_qa.domain.entities import Message, MessageRole
+from ai_qa.domain.ports import UsageRecorderPort
 from ai_qa.infrastructure.llm.base import BaseLLMAdapter
+from ai_qa.infrastructure.observability.metrics import LLM_LATENCY, LLM_REQUESTS, LLM_TOKENS
+
+# 中日韩字符（约 1 个字符 1 个 token）
+_CJK_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff\uac00-\ud7af]")
+
+
+def estimate_tokens(text: str) -> int:
+    """按字符数估算 token 数：中日韩字符每个约 1 个 token，其他字符约 4 个 1 个 token"""
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
 
 
 class QwenAdapter(BaseLLMAdapter):
     """通义千问适配器"""
 
-    def __init__(self, api_key: str, base_url: str, model_name: str):
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str,
+        model_name: str,
+        http_client: httpx.Client = None,
+        http_async_client: httpx.AsyncClient = None,
+        usage_recorder: UsageRecorderPort = None,
+    ):
+        """
+        Args:
+            http_client: 共享的同步 httpx 客户端（为空时由 SDK 自行创建）
+            http_async_client: 共享的异步 httpx 客户端（为空时由 SDK 自行创建）
+            usage_recorder: 用量记录器（可选），记录每次调用的 token 用量
+        """
         super().__init__(api_key, base_url, model_name)
+        self._usage_recorder = usage_recorder
+
+        # 普通客户端和流式客户端共用同一个连接池
+        client_kwargs = {}
+        if http_client is not None:
+            client_kwargs["http_client"] = http_client
+        if http_async_client is not None:
+            client_kwargs["http_async_client"] = http_async_client
 
         # 创建 LangChain 的 ChatOpenAI 实例
         self._client = ChatOpenAI(
             api_key = self.api_key,
             base_url = self.base_url,
-            model = self.model_name
+            model = self.model_name,
+            **client_kwargs
         )
 
-        # 创建流式客户端
+        # 创建流式客户端（stream_usage 让最后一个 chunk 带上 token 用量）
         self._stream_client = ChatOpenAI(
             api_key=self.api_key,
             base_url=self.base_url,
             model=self.model_name,
-            streaming=True
+            streaming=True,
+            stream_usage=True,
+            **client_kwargs
         )
 
+    def _record_call(
+        self,
+        operation: str,
+        started: float,
+        status: str,
+        usage: dict = None,
+        prompt: list = None,
+        output: str = "",
+    ) -> None:
+        """记录一次 LLM 调用的次数、耗时和 token 用量
+
+        流式调用的用量只在最后一个 chunk 中返回，流被取消或调用失败时没有用量数据，
+        此时按提示词和已生成内容的字符数估算，断开连接不能绕过用量统计。
+
+        Args:
+            usage: 模型返回的用量（usage_metadata）
+            prompt: 发送的 LangChain 消息（用于估算输入 token）
+            output: 已生成的回复内容（用于估算输出 token）
+        """
+        LLM_REQUESTS.labels(self.model_name, operation, status).inc()
+        LLM_LATENCY.labels(self.model_name, operation).observe(time.perf_counter() - started)
+        if isinstance(usage, dict):
+            input_tokens, output_tokens = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+        else:
+            input_tokens = estimate_tokens("".join(str(message.content) for message in prompt or []))
+            output_tokens = estimate_tokens(output)
+        LLM_TOKENS.labels(self.model_name, "input").inc(input_tokens)
+        LLM_TOKENS.labels(self.model_name, "output").inc(output_tokens)
+        if self._usage_recorder is not None:
+            self._usage_recorder.record("llm", self.model_name, input_tokens, output_tokens)
+
     def _conver_message(self, messages: list[Message], system_prompt: str = None) -> list:
         # 把消息转换为 LangChain 格式
         langchain_messages = []
@@ -49,9 +125,25 @@ class QwenAdapter(BaseLLMAdapter):
     def chat(self, messages: list[Message], system_prompt: str = None) -> str:
         """发送消息并获取回复"""
         langchain_messages = self._conver_message(messages, system_prompt)
-        response = self._client.invoke(langchain_messages)
+        started = time.perf_counter()
+        try:
+            response = self._client.invoke(langchain_messages)
+        except Exception:
+            self._record_call("chat", started, "error", prompt=langchain_messages)
+            raise
+        self._record_call(
+            "chat", started, "ok", response.usage_metadata, langchain_messages, response.content
+        )
         return response.content
     
+    def _stream_messages(self, messages: list, system_prompt: str = None) -> list:
+        """流式接口的消息转换，支持领域实体和 LangChain 两种格式"""
+        if messages and isinstance(messages[0], Message):
+            return self._conver_message(messages, system_prompt)
+        if system_prompt:
+            return [SystemMessage(content=system_prompt)] + messages
+        return messages
+
     def chat_stream(self, messages: list, system_prompt: str = None) -> Generator[str, None, None]:
         """流式发送消息，逐步返回回复
         
@@ -59,31 +151,96 @@ class QwenAdapter(BaseLLMAdapter):
         - 领域实体格式: list[Message]
         - LangChain 格式: list[BaseMessage] 
         """
-        if messages and isinstance(messages[0], Message):
-            langchain_messages = self._conver_message(messages, system_prompt)
-        else:
-            langchain_messages = messages
-            if system_prompt:
-                langchain_messages = [SystemMessage(content=system_prompt)] + messages
+        langchain_messages = self._stream_messages(messages, system_prompt)
+
+        started = time.perf_counter()
+        status, usage, output = "ok", None, []
+        try:
+            for chunk in self._stream_client.stream(langchain_messages):
+                if isinstance(chunk.usage_metadata, dict):
+                    usage = chunk.usage_metadata
+                if chunk.content:
+                    output.append(chunk.content)
+                    yield chunk.content
+        except GeneratorExit:
+            # 客户端断开，调用方提前关闭了生成器
+            status = "cancelled"
+            raise
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            self._record_call("stream", started, status, usage, langchain_messages, "".join(output))
 
-        for chunk in self._stream_client.stream(langchain_messages):
-            if chunk.content:
-                yield chunk.content
+    async def achat_stream(self, messages: list, system_prompt: str = None) -> AsyncIterator[str]:
+        """异步流式发送消息，逐步返回回复（消息格式同 chat_stream）
+
+        生成器被关闭或任务被取消时，aclosing 会关闭上游的 SSE 连接，模型不再继续生成
+        """
+        langchain_messages = self._stream_messages(messages, system_prompt)
+
+        started = time.perf_counter()
+        status, usage, output = "ok", None, []
+        try:
+            async with aclosing(self._stream_client.astream(langchain_messages)) as stream:
+                async for chunk in stream:
+                    if isinstance(chunk.usage_metadata, dict):
+                        usage = chunk.usage_metadata
+                    if chunk.content:
+                        output.append(chunk.content)
+                        yield chunk.content
+        except (GeneratorExit, asyncio.CancelledError):
+            status = "cancelled"
+            raise
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            self._record_call("stream", started, status, usage, langchain_messages, "".join(output))
     
-    def chat_with_tools(self, messages: list[Message], tools: list, system_prompt: str = None) -> AIMessage:
-        """支持工具调用的对话"""
+    def _bind_tools(self, messages: list, tools: list, system_prompt: str = None) -> tuple:
+        """工具调用的公共准备：添加系统提示词并绑定工具
+
+        Returns:
+            (消息列表, 绑定了工具的 LLM)
+        """
         # 如果有系统提示词，添加到消息开头
         if system_prompt:
             messages = [SystemMessage(content=system_prompt)] + messages
-        
+
         # 绑定工具到 LLM
         if tools:
-            llm_with_tools = self._client.bind_tools(tools)
-        else:
-            llm_with_tools = self._client
-        
+            return messages, self._client.bind_tools(tools)
+        return messages, self._client
+
+    def chat_with_tools(self, messages: list[Message], tools: list, system_prompt: str = None) -> AIMessage:
+        """支持工具调用的对话"""
+        messages, llm_with_tools = self._bind_tools(messages, tools, system_prompt)
+
         # 调用并返回完整的 AIMessage
-        response = llm_with_tools.invoke(messages)
+        started = time.perf_counter()
+        try:
+            response = llm_with_tools.invoke(messages)
+        except Exception:
+            self._record_call("tools", started, "error", prompt=messages)
+            raise
+        self._record_call("tools", started, "ok", response.usage_metadata, messages, str(response.content))
+        return response
+
+    async def achat_with_tools(self, messages: list[Message], tools: list, system_prompt: str = None) -> AIMessage:
+        """支持工具调用的对话（异步版本，等待模型响应时不占用事件循环）"""
+        messages, llm_with_tools = self._bind_tools(messages, tools, system_prompt)
+
+        started = time.perf_counter()
+        try:
+            response = await llm_with_tools.ainvoke(messages)
+        except asyncio.CancelledError:
+            self._record_call("tools", started, "cancelled", prompt=messages)
+            raise
+        except Exception:
+            self._record_call("tools", started, "error", prompt=messages)
+            raise
+        self._record_call("tools", started, "ok", response.usage_metadata, messages, str(response.content))
         return response
 
     # def chat_stream_langchain(
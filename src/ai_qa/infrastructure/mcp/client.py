@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import time
 from abc import ABC
 from dataclasses import dataclass, field
 from enum import Enum
@@ -11,6 +12,8 @@ from mcp.client.sse import sse_client
 from mcp.types import Tool as MCPTool
 from pydantic import BaseModel, create_model
 
+from ai_qa.infrastructure.observability.metrics import MCP_CALL_LATENCY
+
 logger = logging.getLogger(__name__)
 
 # ============ 传输类型枚举 ============
@@ -436,9 +439,11 @@ class MCPClientService:
         conn = self._connections[server_name]
         logger.info(f"调用工具: {server_name}/{tool_name} args={arguments}")
 
+        started = time.perf_counter()
         try:
             result = await conn.session.call_tool(name=tool_name, arguments=arguments)
             logger.debug(f"工具返回：{result}")
+            MCP_CALL_LATENCY.labels(server_name, tool_name, "ok").observe(time.perf_counter() - started)
 
             # 提取结果内容
             if result.content:
@@ -453,6 +458,7 @@ class MCPClientService:
             return str(result)
         
         except Exception as e:
+            MCP_CALL_LATENCY.labels(server_name, tool_name, "error").observe(time.perf_counter() - started)
             logger.error(f"工具调用失败: {e}")
             raise
     
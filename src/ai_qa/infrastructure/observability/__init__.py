@@ -0,0 +1,15 @@
+from .metrics import mark_worker_exit, register_db_pool, render_metrics
+from .timing import RequestTimings, atimed_stream, current_timings, record, span, start_request, timed_stream
+
+__all__ = [
+    "RequestTimings",
+    "atimed_stream",
+    "current_timings",
+    "mark_worker_exit",
+    "record",
+    "register_db_pool",
+    "render_metrics",
+    "span",
+    "start_request",
+    "timed_stream",
+]
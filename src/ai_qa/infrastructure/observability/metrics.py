@@ -0,0 +1,208 @@
+"""Prometheus 指标
+
+依赖 prometheus-client，未安装时所有指标退化为空操作，业务代码无需判断。
+
+多 worker 共用一个监听端口，每次抓取只会落到其中一个 worker，因此多进程部署使用 prometheus-client
+的多进程模式：设置环境变量 PROMETHEUS_MULTIPROC_DIR（生产入口在 SERVER_WORKERS>1 时自动设置），
+各 worker 把指标写入该目录下的文件，/metrics 汇总所有 worker 的数据；worker 退出时调用
+mark_process_dead 清理它的 Gauge 数据。该变量必须在 worker 进程导入 prometheus-client 之前设置。
+"""
+import os
+from typing import Callable
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        REGISTRY,
+        CollectorRegistry,
+        Counter,
+        Gauge,
+        Histogram,
+        generate_latest,
+        multiprocess,
+    )
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:  # pragma: no cover - 取决于运行环境
+    Counter = Gauge = Histogram = None
+
+# prometheus-client 多进程模式使用的目录（环境变量名由 prometheus-client 规定）
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+
+def multiprocess_enabled() -> bool:
+    """是否启用了多进程模式"""
+    return Counter is not None and bool(os.environ.get(MULTIPROC_DIR_ENV))
+
+
+class _NoopMetric:
+    """未安装 prometheus-client 时的占位指标"""
+
+    def labels(self, *args, **kwargs) -> "_NoopMetric":
+        return self
+
+    def observe(self, value: float) -> None:
+        pass
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def dec(self, amount: float = 1) -> None:
+        pass
+
+
+def _counter(name: str, documentation: str, labelnames: tuple):
+    if Counter is None:
+        return _NoopMetric()
+    return Counter(name, documentation, labelnames)
+
+
+def _gauge(name: str, documentation: str, labelnames: tuple):
+    if Gauge is None:
+        return _NoopMetric()
+    # 多进程模式下汇总存活 worker 的值（单进程时该参数不生效）
+    return Gauge(name, documentation, labelnames, multiprocess_mode="livesum")
+
+
+def _histogram(name: str, documentation: str, labelnames: tuple, buckets: tuple):
+    if Histogram is None:
+        return _NoopMetric()
+    return Histogram(name, documentation, labelnames, buckets=buckets)
+
+
+# 覆盖从几毫秒的本地操作到几十秒的 LLM 生成
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# 数量类分布（向量化批大小、检索结果数）
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+STAGE_DURATION = _histogram(
+    "ai_qa_stage_duration_seconds",
+    "请求内各阶段耗时（鉴权、历史加载、改写、向量化、检索、LLM 等）",
+    ("stage",),
+    LATENCY_BUCKETS,
+)
+
+# ============ LLM ============
+LLM_REQUESTS = _counter(
+    "ai_qa_llm_requests_total",
+    "LLM 调用次数",
+    ("model", "operation", "status"),
+)
+LLM_LATENCY = _histogram(
+    "ai_qa_llm_latency_seconds",
+    "LLM 调用耗时（流式为整个流的耗时）",
+    ("model", "operation"),
+    LATENCY_BUCKETS,
+)
+LLM_TOKENS = _counter(
+    "ai_qa_llm_tokens_total",
+    "LLM 消耗的 token 数（direction=input/output）",
+    ("model", "direction"),
+)
+
+# ============ Embedding ============
+EMBEDDING_REQUESTS = _counter(
+    "ai_qa_embedding_requests_total",
+    "Embedding 接口调用次数（每个批次一次）",
+    ("model", "status"),
+)
+EMBEDDING_BATCH_SIZE = _histogram(
+    "ai_qa_embedding_batch_size",
+    "单次 Embedding 请求的文本数",
+    ("model",),
+    COUNT_BUCKETS,
+)
+EMBEDDING_LATENCY = _histogram(
+    "ai_qa_embedding_latency_seconds",
+    "单次 Embedding 请求耗时",
+    ("model",),
+    LATENCY_BUCKETS,
+)
+
+# ============ 向量检索 ============
+VECTOR_SEARCH_LATENCY = _histogram(
+    "ai_qa_vector_search_latency_seconds",
+    "向量库检索耗时（含查询向量化）",
+    ("backend", "mode"),
+    LATENCY_BUCKETS,
+)
+VECTOR_SEARCH_RESULTS = _histogram(
+    "ai_qa_vector_search_results",
+    "单次检索返回的文档块数",
+    ("backend", "mode"),
+    COUNT_BUCKETS,
+)
+
+# ============ MCP ============
+MCP_CALL_LATENCY = _histogram(
+    "ai_qa_mcp_call_latency_seconds",
+    "MCP 工具调用耗时",
+    ("server", "tool", "status"),
+    LATENCY_BUCKETS,
+)
+
+# ============ SSE ============
+SSE_ACTIVE_STREAMS = _gauge(
+    "ai_qa_sse_active_streams",
+    "正在输出的 SSE 流数量",
+    ("path",),
+)
+SSE_BYTES_SENT = _counter(
+    "ai_qa_sse_bytes_sent_total",
+    "SSE 流已发送的字节数",
+    ("path",),
+)
+
+
+class _DatabasePoolCollector:
+    """抓取时读取连接池状态（不需要在业务代码里更新）"""
+
+    def __init__(self, status: Callable[[], dict]):
+        self._status = status
+
+    def collect(self):
+        status = self._status()
+        family = GaugeMetricFamily(
+            "ai_qa_db_pool_connections", "数据库连接池连接数", labels=["state"]
+        )
+        for state in ("size", "checked_in", "checked_out", "overflow", "max_overflow"):
+            family.add_metric([state], status[state])
+        yield family
+
+
+_pool_collector = None
+
+
+def register_db_pool(status: Callable[[], dict]) -> None:
+    """注册数据库连接池指标
+
+    Args:
+        status: 返回 size / checked_in / checked_out / overflow / max_overflow 的函数
+    """
+    global _pool_collector
+    if Gauge is None or _pool_collector is not None:
+        return
+    _pool_collector = _DatabasePoolCollector(status)
+    REGISTRY.register(_pool_collector)
+
+
+def render_metrics() -> tuple[bytes, str] | None:
+    """导出 Prometheus 文本格式，返回（内容，Content-Type）；未安装 prometheus-client 时返回 None
+
+    多进程模式下汇总所有 worker 写入的指标；连接池指标在抓取时读取，只反映响应本次抓取的 worker。
+    """
+    if Counter is None:
+        return None
+    if not multiprocess_enabled():
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    if _pool_collector is not None:
+        registry.register(_pool_collector)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_exit() -> None:
+    """worker 退出时清理它在多进程目录中的 Gauge 数据（未启用多进程模式时不做任何事）"""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,109 @@
+"""请求级分阶段计时
+
+中间件在请求开始时创建 RequestTimings 并放入 contextvars，各层用 span() 记录阶段耗时：
+- 同一请求内的线程池任务（同步依赖、同步流式生成器）由 anyio 复制上下文，能拿到同一个对象
+- 自行提交到线程池的任务需要用 contextvars.copy_context().run 包装（asyncio.to_thread 会自动复制）
+
+同名阶段多次出现（例如多次工具调用）时累加耗时。结果用于 Server-Timing 响应头、
+流式响应最后的 metrics 事件，并同时写入 Prometheus 直方图。
+"""
+import threading
+import time
+from contextlib import aclosing, contextmanager
+from contextvars import ContextVar
+from typing import AsyncGenerator, Iterator
+
+from ai_qa.infrastructure.observability.metrics import STAGE_DURATION
+
+_current: ContextVar["RequestTimings | None"] = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """一次请求内各阶段的累计耗时（秒）"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self._stages: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._stages[stage] = self._stages.get(stage, 0.0) + seconds
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def to_dict(self) -> dict[str, float]:
+        """各阶段耗时（毫秒），附带请求开始至今的 total"""
+        with self._lock:
+            stages = {stage: round(seconds * 1000, 2) for stage, seconds in self._stages.items()}
+        stages["total"] = round(self.elapsed() * 1000, 2)
+        return stages
+
+    def server_timing(self) -> str:
+        """格式化为 Server-Timing 响应头，例如 `auth;dur=1.2, llm;dur=830.5, total;dur=842.0`"""
+        return ", ".join(f"{stage};dur={ms}" for stage, ms in self.to_dict().items())
+
+
+def start_request() -> RequestTimings:
+    """开始记录当前请求"""
+    timings = RequestTimings()
+    _current.set(timings)
+    return timings
+
+
+def current_timings() -> RequestTimings | None:
+    """当前请求的计时，不在请求上下文中时返回 None"""
+    return _current.get()
+
+
+def record(stage: str, seconds: float) -> None:
+    """记录一个阶段的耗时"""
+    STAGE_DURATION.labels(stage).observe(seconds)
+    timings = _current.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def span(stage: str):
+    """计时代码块
+
+    Example:
+        with span("history"):
+            conversation = memory.get_conversation(session_id)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def timed_stream(chunks: Iterator, stage: str = "llm") -> Iterator:
+    """为流式输出计时：首个 chunk 记为 `{stage}_ttft`，整个流记为 stage"""
+    start = time.perf_counter()
+    first = True
+    try:
+        for chunk in chunks:
+            if first:
+                record(f"{stage}_ttft", time.perf_counter() - start)
+                first = False
+            yield chunk
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+async def atimed_stream(chunks: AsyncGenerator, stage: str = "llm") -> AsyncGenerator:
+    """timed_stream 的异步版本，关闭时同时关闭被计时的异步生成器"""
+    start = time.perf_counter()
+    first = True
+    try:
+        async with aclosing(chunks):
+            async for chunk in chunks:
+                if first:
+                    record(f"{stage}_ttft", time.perf_counter() - start)
+                    first = False
+                yield chunk
+    finally:
+        record(stage, time.perf_counter() - start)
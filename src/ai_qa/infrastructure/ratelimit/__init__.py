@@ -0,0 +1,3 @@
+from .token_bucket import InMemoryTokenBucket, PostgresTokenBucket
+
+__all__ = ["InMemoryTokenBucket", "PostgresTokenBucket"]
@@ -0,0 +1,117 @@
+import threading
+import time
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from ai_qa.domain.ports import RateLimiterPort
+
+
+class InMemoryTokenBucket(RateLimiterPort):
+    """进程内令牌桶
+
+    每个 key 一个桶，容量 capacity，每秒补充 refill_rate 个令牌；桶满后长期不用的 key 会被清理。
+    多 worker 部署时每个进程各自限流（实际上限约为 worker 数倍），需要全局限制请使用 PostgresTokenBucket。
+    """
+
+    def __init__(
+        self,
+        capacity: float,
+        refill_rate: float,
+        clock: Callable[[], float] = time.monotonic,
+        max_keys: int = 100_000,
+    ):
+        """
+        Args:
+            capacity: 桶容量（允许的突发请求数）
+            refill_rate: 每秒补充的令牌数（长期平均速率）
+            clock: 时钟函数（测试时注入）
+            max_keys: 桶数量超过该值时清理已补满的桶
+        """
+        self._capacity = capacity
+        self._refill_rate = refill_rate
+        self._clock = clock
+        self._max_keys = max_keys
+        self._buckets: dict[str, tuple[float, float]] = {}  # key -> (令牌数, 上次更新时间)
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, cost: float = 1.0) -> float:
+        """尝试取出令牌，成功返回 0，否则返回需要等待的秒数"""
+        now = self._clock()
+        with self._lock:
+            tokens = self._available(key, now)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                allowed = True
+            else:
+                self._buckets[key] = (tokens, now)
+                allowed = False
+
+            if len(self._buckets) > self._max_keys:
+                self._evict_full(now)
+
+        if allowed:
+            return 0.0
+        return (cost - tokens) / self._refill_rate
+
+    def _available(self, key: str, now: float) -> float:
+        """按经过的时间补充后的令牌数"""
+        tokens, updated_at = self._buckets.get(key, (self._capacity, now))
+        return min(self._capacity, tokens + (now - updated_at) * self._refill_rate)
+
+    def _evict_full(self, now: float) -> None:
+        """清理已补满的桶（与新建的桶等价）"""
+        full = [key for key in self._buckets if self._available(key, now) >= self._capacity]
+        for key in full:
+            del self._buckets[key]
+
+
+class PostgresTokenBucket(RateLimiterPort):
+    """基于 PostgreSQL 的共享令牌桶（多个实例 / worker 共用同一个桶）
+
+    补充和扣减在一条 UPSERT 中完成，行锁保证并发安全；需要执行
+    scripts/migration_add_usage_and_rate_limit.sql 创建 rate_limit_buckets 表。
+    """
+
+    _ACQUIRE_SQL = text("""
+        INSERT INTO rate_limit_buckets AS b (key, tokens, updated_at)
+        VALUES (:key, :capacity - :cost, now())
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = LEAST(:capacity, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * :rate) - :cost,
+            updated_at = now()
+        WHERE LEAST(:capacity, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * :rate) >= :cost
+        RETURNING tokens
+    """)
+
+    _AVAILABLE_SQL = text("""
+        SELECT LEAST(:capacity, tokens + EXTRACT(EPOCH FROM now() - updated_at) * :rate)
+        FROM rate_limit_buckets WHERE key = :key
+    """)
+
+    def __init__(self, session_factory: Callable[[], Session], capacity: float, refill_rate: float):
+        """
+        Args:
+            session_factory: 创建数据库会话的工厂（每次取令牌使用独立的短事务）
+            capacity: 桶容量
+            refill_rate: 每秒补充的令牌数
+        """
+        self._session_factory = session_factory
+        self._capacity = capacity
+        self._refill_rate = refill_rate
+
+    def acquire(self, key: str, cost: float = 1.0) -> float:
+        """尝试取出令牌，成功返回 0，否则返回需要等待的秒数"""
+        params = {"key": key, "capacity": self._capacity, "rate": self._refill_rate, "cost": cost}
+        session = self._session_factory()
+        try:
+            acquired = session.execute(self._ACQUIRE_SQL, params).first()
+            if acquired is not None:
+                session.commit()
+                return 0.0
+            available = session.execute(self._AVAILABLE_SQL, params).scalar()
+            session.commit()
+        finally:
+            session.close()
+
+        return max(0.0, (cost - float(available or 0)) / self._refill_rate)
@@ -0,0 +1,4 @@
+from .cross_encoder import CrossEncoderReranker
+from .lexical import LexicalReranker
+
+__all__ = ["CrossEncoderReranker", "LexicalReranker"]
@@ -0,0 +1,62 @@
+import logging
+
+from ai_qa.domain.entities import DocumentChunk
+from ai_qa.domain.ports import RerankerPort
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker(RerankerPort):
+    """本地 Cross-Encoder 重排序器（CPU 推理）
+
+    依赖 sentence-transformers（pip install ".[rerank]"），首次使用时才加载模型。
+    """
+
+    def __init__(
+        self,
+        model_name: str = "BAAI/bge-reranker-base",
+        batch_size: int = 16,
+        num_threads: int = 0,
+        max_length: int = 512,
+    ):
+        """
+        Args:
+            model_name: HuggingFace 模型名或本地路径
+            batch_size: 单次推理的 (查询, 文档) 对数量
+            num_threads: PyTorch 推理线程数，0 表示使用默认值
+            max_length: 单个 (查询, 文档) 对的最大 token 数
+        """
+        self._model_name = model_name
+        self._batch_size = batch_size
+        self._num_threads = num_threads
+        self._max_length = max_length
+        self._model = None
+
+    def _load_model(self):
+        """延迟加载模型（避免未启用重排序时引入 torch）"""
+        if self._model is None:
+            from sentence_transformers import CrossEncoder
+
+            if self._num_threads > 0:
+                import torch
+                # 进程级设置，影响同进程内所有 PyTorch 推理
+                torch.set_num_threads(self._num_threads)
+
+            logger.info(f"加载重排序模型 model={self._model_name}")
+            self._model = CrossEncoder(
+                self._model_name, max_length=self._max_length, device="cpu"
+            )
+        return self._model
+
+    def rerank(self, query: str, chunks: list[DocumentChunk], top_n: int) -> list[DocumentChunk]:
+        """按与查询的相关度重新排序，返回前 top_n 个文档块"""
+        if len(chunks) <= 1:
+            return chunks[:top_n]
+
+        pairs = [(query, chunk.content) for chunk in chunks]
+        scores = self._load_model().predict(
+            pairs, batch_size=self._batch_size, show_progress_bar=False
+        )
+
+        ranked = sorted(zip(scores, range(len(chunks))), key=lambda item: item[0], reverse=True)
+        return [chunks[position] for _, position in ranked[:top_n]]
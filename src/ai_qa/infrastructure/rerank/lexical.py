@@ -0,0 +1,24 @@
+from ai_qa.domain.entities import DocumentChunk
+from ai_qa.domain.ports import RerankerPort
+from ai_qa.infrastructure.vectorstore.hybrid import BM25Index, reciprocal_rank_fusion
+
+
+class LexicalReranker(RerankerPort):
+    """基于词项匹配的轻量重排序器（无需模型，纯 CPU）
+
+    在候选集合内建立 BM25 索引打分，再与召回时的原始排名做 RRF 融合，
+    既能把精确命中查询词的文档块提上来，又不丢掉向量检索的语义排序。
+    """
+
+    def rerank(self, query: str, chunks: list[DocumentChunk], top_n: int) -> list[DocumentChunk]:
+        """按与查询的相关度重新排序，返回前 top_n 个文档块"""
+        if len(chunks) <= 1:
+            return chunks[:top_n]
+
+        index = BM25Index()
+        for position, chunk in enumerate(chunks):
+            index.add(position, chunk.content)
+
+        lexical_ranking = [position for position, _ in index.search(query, len(chunks))]
+        fused = reciprocal_rank_fusion([list(range(len(chunks))), lexical_ranking], top_n)
+        return [chunks[position] for position in fused]
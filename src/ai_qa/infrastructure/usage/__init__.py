@@ -0,0 +1,4 @@
+from .context import UsageScope, current_usage_scope, start_usage_scope
+from .recorder import BatchedUsageRecorder
+
+__all__ = ["BatchedUsageRecorder", "UsageScope", "current_usage_scope", "start_usage_scope"]
@@ -0,0 +1,28 @@
+"""用量归属上下文
+
+中间件在请求开始时创建 UsageScope 放入 contextvars，鉴权依赖填入用户和会话 ID。
+同步依赖在线程池中执行（上下文是副本），因此放入的是可变对象，依赖里修改字段对整个请求可见。
+"""
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+_current: ContextVar["UsageScope | None"] = ContextVar("usage_scope", default=None)
+
+
+@dataclass
+class UsageScope:
+    """一次请求的用量归属"""
+    user_id: str = ""
+    conversation_id: str = ""
+
+
+def start_usage_scope() -> UsageScope:
+    """开始一个新的归属范围（每个请求一次）"""
+    scope = UsageScope()
+    _current.set(scope)
+    return scope
+
+
+def current_usage_scope() -> UsageScope | None:
+    """当前请求的归属，不在请求上下文中时返回 None"""
+    return _current.get()
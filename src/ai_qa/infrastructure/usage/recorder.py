@@ -0,0 +1,192 @@
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Callable
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from ai_qa.domain.ports import UsageRecorderPort
+from ai_qa.infrastructure.database.models import UsageStat
+from ai_qa.infrastructure.usage.context import current_usage_scope
+from ai_qa.infrastructure.utils.id_generator import generate_id
+
+logger = logging.getLogger(__name__)
+
+
+class BatchedUsageRecorder(UsageRecorderPort):
+    """批量写入的用量记录器
+
+    record() 只在内存中按 (用户, 会话, 天, 类型, 模型) 累加，由后台线程每隔 flush_interval 秒
+    （或累积的分组数达到 max_pending 时）用一条 INSERT ... ON CONFLICT DO UPDATE 合并写入 usage_stats，
+    模型调用路径上没有数据库写入。进程退出时会再写一次。
+
+    写入失败时用量放回内存，按指数退避（最长 max_backoff 秒）重试；连续失败期间内存中最多保留
+    max_pending 个分组，新分组直接丢弃并计数，错误堆栈只在每轮连续失败的第一次打印。
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        flush_interval: float = 5.0,
+        max_pending: int = 1000,
+        max_backoff: float = 300.0,
+    ):
+        """
+        Args:
+            session_factory: 创建数据库会话的工厂（写入在后台线程，不能复用请求的会话）
+            flush_interval: 定时写入间隔（秒）
+            max_pending: 内存中累积的分组数上限，超过时立即唤醒写入；写入失败时放回的分组也不超过该数
+            max_backoff: 连续写入失败时的最长重试间隔（秒）
+        """
+        self._session_factory = session_factory
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._max_backoff = max_backoff
+        self._failures = 0
+        self._dropped = 0
+        self._drop_warned = False
+        self._retry_at = 0.0
+        self._pending: dict[tuple, list[int]] = defaultdict(lambda: [0, 0, 0])
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def record(self, kind: str, model: str, input_tokens: int = 0, output_tokens: int = 0) -> None:
+        """累加一次调用的用量（按当前请求的用户和会话归属）"""
+        scope = current_usage_scope()
+        key = (
+            scope.user_id if scope else "",
+            scope.conversation_id if scope else "",
+            datetime.now(timezone.utc).date(),
+            kind,
+            model,
+        )
+        with self._lock:
+            if self._failures and key not in self._pending and len(self._pending) >= self._max_pending:
+                # 写入持续失败时不再接收新分组，避免积压无限增长
+                self._dropped += 1
+                return
+            counts = self._pending[key]
+            counts[0] += 1
+            counts[1] += input_tokens or 0
+            counts[2] += output_tokens or 0
+            pending = len(self._pending)
+
+        self._ensure_thread()
+        if pending >= self._max_pending:
+            self._wakeup.set()
+
+    def flush(self) -> None:
+        """把累积的用量合并写入数据库，失败时放回内存等待下次写入"""
+        with self._flush_lock:
+            rows = self._drain()
+            if not rows:
+                return
+
+            stmt = insert(UsageStat).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                constraint="uk_usage_stats",
+                set_={
+                    "request_count": UsageStat.request_count + stmt.excluded.request_count,
+                    "input_tokens": UsageStat.input_tokens + stmt.excluded.input_tokens,
+                    "output_tokens": UsageStat.output_tokens + stmt.excluded.output_tokens,
+                    "updated_at": func.now(),
+                },
+            )
+            session = self._session_factory()
+            try:
+                session.execute(stmt)
+                session.commit()
+            except Exception:
+                session.rollback()
+                self._on_failure(rows)
+            else:
+                self._on_success()
+            finally:
+                session.close()
+
+    def _on_failure(self, rows: list[dict]) -> None:
+        """写入失败：放回用量并推迟下次重试，同一轮连续失败只打印一次堆栈"""
+        self._failures += 1
+        backoff = min(self._flush_interval * 2 ** (self._failures - 1), self._max_backoff)
+        self._retry_at = time.monotonic() + backoff
+        self._restore(rows)
+
+        if self._failures == 1:
+            logger.exception(f"用量写入失败，{backoff:.0f}s 后重试 rows={len(rows)}")
+        else:
+            logger.debug(
+                f"用量写入仍然失败 failures={self._failures} rows={len(rows)} retry_in={backoff:.0f}s"
+            )
+        if self._dropped and not self._drop_warned:
+            self._drop_warned = True
+            logger.warning(f"用量积压超过 {self._max_pending} 个分组，新分组将被丢弃，直到写入恢复")
+
+    def _on_success(self) -> None:
+        """写入成功：结束本轮连续失败"""
+        if not self._failures:
+            return
+        with self._lock:
+            logger.info(f"用量写入已恢复 failures={self._failures} dropped={self._dropped}")
+            self._failures = 0
+            self._dropped = 0
+        self._drop_warned = False
+        self._retry_at = 0.0
+
+    def _drain(self) -> list[dict]:
+        """取出内存中累积的用量"""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(lambda: [0, 0, 0])
+
+        return [
+            {
+                "id": generate_id(),
+                "user_id": user_id,
+                "conversation_id": conversation_id,
+                "day": day,
+                "kind": kind,
+                "model": model,
+                "request_count": counts[0],
+                "input_tokens": counts[1],
+                "output_tokens": counts[2],
+            }
+            for (user_id, conversation_id, day, kind, model), counts in pending.items()
+        ]
+
+    def _restore(self, rows: list[dict]) -> None:
+        """写入失败时把用量加回内存（分组数达到 max_pending 后，新的分组被丢弃并计数）"""
+        with self._lock:
+            for row in rows:
+                key = (row["user_id"], row["conversation_id"], row["day"], row["kind"], row["model"])
+                if key not in self._pending and len(self._pending) >= self._max_pending:
+                    self._dropped += 1
+                    continue
+                counts = self._pending[key]
+                counts[0] += row["request_count"]
+                counts[1] += row["input_tokens"]
+                counts[2] += row["output_tokens"]
+
+    def _ensure_thread(self) -> None:
+        """首次记录时启动后台写入线程"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="usage-flush", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self._flush_interval)
+            self._wakeup.clear()
+            if time.monotonic() < self._retry_at:
+                continue
+            self.flush()
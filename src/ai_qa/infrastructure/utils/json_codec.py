@@ -0,0 +1,25 @@
+"""JSON 编码（流式输出热路径使用）
+
+安装了 orjson 时使用 orjson（比标准库快数倍，直接输出 UTF-8），否则退化为标准库 json，
+两种实现的输出都不转义非 ASCII 字符。
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 取决于运行环境
+    orjson = None
+
+
+def dumps_bytes(data) -> bytes:
+    """序列化为 UTF-8 字节"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps(data) -> str:
+    """序列化为字符串"""
+    if orjson is not None:
+        return orjson.dumps(data).decode("utf-8")
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
@@ -0,0 +1,186 @@
+import logging
+import math
+from dataclasses import dataclass
+from enum import Enum
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class FaissIndexType(Enum):
+    """FAISS 索引类型枚举"""
+    FLAT = "flat"       # 精确检索，float32 原始向量（4 * d 字节/条）
+    IVFPQ = "ivfpq"     # 倒排 + 乘积量化（pq_m 字节/条），需要训练
+    HNSWSQ = "hnswsq"   # HNSW 图 + 8bit 标量量化（d 字节/条 + 图结构）
+
+
+# 乘积量化每个子空间的编码位数（256 个聚类中心）
+PQ_BITS = 8
+# FAISS 建议每个聚类中心至少 39 个训练样本
+MIN_POINTS_PER_CENTROID = 39
+# 标量量化只需要估计每维取值范围，少量样本即可
+HNSWSQ_MIN_TRAINING = 1000
+
+
+@dataclass
+class FaissIndexConfig:
+    """FAISS 索引配置"""
+    index_type: FaissIndexType = FaissIndexType.FLAT
+    nlist: int = 0          # IVF 倒排列表数，0 表示按数据量自动选择（约 sqrt(n)）
+    pq_m: int = 64          # PQ 子空间数（必须整除向量维度）
+    nprobe: int = 16        # IVF 查询时访问的倒排列表数
+    hnsw_m: int = 32        # HNSW 每个节点的邻居数
+    ef_search: int = 64     # HNSW 查询时的候选队列长度
+
+    @classmethod
+    def from_settings(cls, settings) -> "FaissIndexConfig":
+        """从应用配置创建"""
+        return cls(
+            index_type=FaissIndexType(settings.faiss_index_type),
+            nlist=settings.faiss_nlist,
+            pq_m=settings.faiss_pq_m,
+            nprobe=settings.faiss_nprobe,
+            hnsw_m=settings.faiss_hnsw_m,
+            ef_search=settings.faiss_ef_search,
+        )
+
+
+def _nlist_for(config: FaissIndexConfig, count: int) -> int:
+    """IVF 倒排列表数"""
+    return config.nlist or max(1, int(math.sqrt(count)))
+
+
+def min_training_size(config: FaissIndexConfig, count: int) -> int:
+    """训练压缩索引所需的最少向量数，Flat 索引不需要训练"""
+    if config.index_type == FaissIndexType.IVFPQ:
+        return MIN_POINTS_PER_CENTROID * max(_nlist_for(config, count), 2 ** PQ_BITS)
+    if config.index_type == FaissIndexType.HNSWSQ:
+        return HNSWSQ_MIN_TRAINING
+    return 0
+
+
+def create_index(config: FaissIndexConfig, dimension: int, training_vectors: np.ndarray) -> faiss.Index:
+    """按配置创建（并训练）空索引
+
+    训练数据不足以训练压缩索引时返回 IndexFlatL2，
+    调用方在数据增长后可通过 upgrade_index 升级。
+    """
+    count = len(training_vectors)
+    if config.index_type == FaissIndexType.FLAT or count < min_training_size(config, count):
+        index = faiss.IndexFlatL2(dimension)
+    elif config.index_type == FaissIndexType.IVFPQ:
+        quantizer = faiss.IndexFlatL2(dimension)
+        index = faiss.IndexIVFPQ(quantizer, dimension, _nlist_for(config, count), config.pq_m, PQ_BITS)
+        index.train(training_vectors)
+    else:
+        index = faiss.IndexHNSWSQ(dimension, faiss.ScalarQuantizer.QT_8bit, config.hnsw_m)
+        index.train(training_vectors)
+
+    apply_search_params(index, config)
+    return index
+
+
+def build_index(config: FaissIndexConfig, dimension: int, vectors: np.ndarray) -> faiss.Index:
+    """按配置创建索引并加入向量（向量 ID 与行号一致）
+
+    Args:
+        config: 索引配置
+        dimension: 向量维度
+        vectors: 已有向量，形状 (n, dimension)，float32
+
+    Returns:
+        已加入全部向量的索引
+    """
+    index = create_index(config, dimension, vectors)
+    if len(vectors):
+        index.add(vectors)
+    logger.info(f"构建 FAISS 索引 type={type(index).__name__} count={len(vectors)}")
+    return index
+
+
+def build_id_index(
+    config: FaissIndexConfig, dimension: int, vectors: np.ndarray, ids: np.ndarray
+) -> faiss.IndexIDMap2:
+    """按配置创建以稳定 ID 寻址的索引（IndexIDMap2）并加入向量
+
+    Args:
+        ids: 与 vectors 一一对应的 int64 ID
+    """
+    index = faiss.IndexIDMap2(create_index(config, dimension, vectors))
+    if len(vectors):
+        index.add_with_ids(vectors, ids.astype(np.int64))
+    logger.info(f"构建 FAISS 索引 type={type(base_index(index)).__name__} count={len(vectors)}")
+    return index
+
+
+def base_index(index: faiss.Index) -> faiss.Index:
+    """取出 IndexIDMap 包装的底层索引"""
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def should_upgrade(index: faiss.Index, config: FaissIndexConfig) -> bool:
+    """当前是 Flat 索引、配置了压缩索引且数据量已足够训练时返回 True"""
+    return (
+        config.index_type != FaissIndexType.FLAT
+        and isinstance(base_index(index), faiss.IndexFlat)
+        and index.ntotal >= min_training_size(config, index.ntotal)
+    )
+
+
+def upgrade_index(index: faiss.Index, config: FaissIndexConfig) -> faiss.Index:
+    """把 Flat 索引中的向量取出，训练并重建为压缩索引（保留原有 ID）"""
+    vectors = base_index(index).reconstruct_n(0, index.ntotal)
+    if isinstance(index, faiss.IndexIDMap):
+        ids = faiss.vector_to_array(index.id_map)
+        return build_id_index(config, index.d, vectors, ids)
+    return build_index(config, index.d, vectors)
+
+
+def remove_vectors(index: faiss.IndexIDMap2, config: FaissIndexConfig, ids: np.ndarray) -> faiss.IndexIDMap2:
+    """从以稳定 ID 寻址的索引中删除向量
+
+    Flat / IVF 直接 remove_ids；HNSW 图不支持删除，取出剩余向量重建。
+
+    Args:
+        index: IndexIDMap2 索引
+        config: 索引配置（重建时使用）
+        ids: 要删除的 ID
+
+    Returns:
+        删除后的索引（可能是新对象）
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if not len(ids):
+        return index
+    if isinstance(base_index(index), faiss.IndexHNSW):
+        all_ids = faiss.vector_to_array(index.id_map)
+        keep = ~np.isin(all_ids, ids)
+        vectors = base_index(index).reconstruct_n(0, index.ntotal)[keep]
+        return build_id_index(config, index.d, vectors, all_ids[keep])
+    index.remove_ids(faiss.IDSelectorBatch(ids))
+    return index
+
+
+def mmap_io_flags(index: faiss.Index) -> int:
+    """按索引类型选择内存映射读取标志
+
+    IVF 的倒排列表用 IO_FLAG_MMAP 映射为只读的磁盘倒排表；
+    Flat / HNSW / SQ 等按编码连续存储的索引（以及 IndexIDMap 的 ID 数组）用 IO_FLAG_MMAP_IFC 映射。
+    映射加载的索引只读，不能再添加或删除向量。
+    """
+    if isinstance(base_index(index), faiss.IndexIVF):
+        return faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    return faiss.IO_FLAG_MMAP_IFC
+
+
+def apply_search_params(index: faiss.Index, config: FaissIndexConfig) -> None:
+    """设置查询参数（nprobe / efSearch），从磁盘加载后也需要调用"""
+    index = base_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = config.nprobe
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = config.ef_search
@@ -0,0 +1,335 @@
+import glob
+import json
+import logging
+import os
+import sqlite3
+from typing import Iterator
+
+import faiss
+import numpy as np
+
+from ai_qa.domain.entities import DocumentChunk
+from ai_qa.infrastructure.vectorstore.faiss_index import mmap_io_flags
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_DIR = "segments"
+CHECKPOINT_DIR = "checkpoints"
+DB_FILE = "chunks.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id          INTEGER PRIMARY KEY,   -- FAISS 稳定 ID
+    content     TEXT NOT NULL,
+    document_id TEXT,
+    chunk_key   TEXT,                  -- DocumentChunk.chunk_id（JSON 编码，保留原类型）
+    metadata    TEXT                   -- JSON
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_document_id ON chunks(document_id);
+CREATE TABLE IF NOT EXISTS segments (
+    seq   INTEGER PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tombstones (
+    id INTEGER PRIMARY KEY                 -- 已删除、但向量仍在段和检查点中的 ID
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _fsync_replace(tmp_path: str, path: str) -> None:
+    """把已写完的临时文件落盘后原子替换目标文件"""
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _save_npy(path: str, array: np.ndarray) -> None:
+    """原子写入 .npy 文件"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    _fsync_replace(tmp_path, path)
+
+
+class SegmentStore:
+    """单个知识库的追加式磁盘存储
+
+    目录结构：
+        chunks.db                    SQLite：文档块、段登记表、元数据（WAL 模式）
+        segments/seg-<seq>.npy       每次写入追加一个向量段（float32，按 mmap 读取）
+        segments/seg-<seq>.ids.npy   段内向量对应的稳定 ID
+        checkpoints/index-<seq>.faiss  FAISS 索引检查点，包含 seq 及之前所有段
+
+    写入顺序保证崩溃安全：先原子写入段文件，再在一个 SQLite 事务中登记段和文档块；
+    未登记的段文件、未被引用的检查点都视为残留，加载时清理。
+    删除文档块时只删除 SQLite 中的行并记录墓碑，向量在下次合并时才从段中移除。
+
+    文档块按稳定 ID（主键）随用随取，不整体加载到内存；
+    段和检查点可以内存映射读取，多个工作进程共享操作系统的页缓存。
+    """
+
+    def __init__(self, directory: str, dimension: int):
+        """
+        Args:
+            directory: 知识库目录
+            dimension: 向量维度
+        """
+        self._directory = directory
+        self._dimension = dimension
+        os.makedirs(os.path.join(directory, SEGMENT_DIR), exist_ok=True)
+        os.makedirs(os.path.join(directory, CHECKPOINT_DIR), exist_ok=True)
+
+        self._conn = sqlite3.connect(os.path.join(directory, DB_FILE), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._remove_orphans()
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        """目录下是否有已初始化的存储"""
+        return os.path.exists(os.path.join(directory, DB_FILE))
+
+    @staticmethod
+    def read_meta(directory: str) -> dict:
+        """不加载存储，只读取知识库 ID 和文档块数量"""
+        conn = sqlite3.connect(os.path.join(directory, DB_FILE))
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'knowledge_base_id'").fetchone()
+            count = conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            return {"knowledge_base_id": row[0] if row else None, "count": count}
+        finally:
+            conn.close()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    # ============ 元数据 ============
+
+    def _get_meta(self, key: str, default: str = None) -> str | None:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    @staticmethod
+    def _set_meta(conn: sqlite3.Connection, key: str, value) -> None:
+        conn.execute(
+            "INSERT INTO meta(key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, str(value)),
+        )
+
+    def set_knowledge_base_id(self, knowledge_base_id: str) -> None:
+        with self._conn:
+            self._set_meta(self._conn, "knowledge_base_id", knowledge_base_id)
+
+    def next_id(self) -> int:
+        """下一个可分配的稳定 ID"""
+        return int(self._get_meta("next_id", "0"))
+
+    def checkpoint_seq(self) -> int:
+        """最新检查点包含的最后一个段号，没有检查点时为 0"""
+        return int(self._get_meta("checkpoint_seq", "0"))
+
+    # ============ 段 ============
+
+    def _segment_path(self, seq: int, suffix: str = ".npy") -> str:
+        return os.path.join(self._directory, SEGMENT_DIR, f"seg-{seq:08d}{suffix}")
+
+    def _checkpoint_path(self, seq: int) -> str:
+        return os.path.join(self._directory, CHECKPOINT_DIR, f"index-{seq:08d}.faiss")
+
+    def segment_seqs(self) -> list[int]:
+        """已登记的段号（升序）"""
+        return [row[0] for row in self._conn.execute("SELECT seq FROM segments ORDER BY seq")]
+
+    def append(self, ids: np.ndarray, vectors: np.ndarray, chunks: list[DocumentChunk]) -> int:
+        """追加一个段：写入向量文件并登记文档块
+
+        Args:
+            ids: 稳定 ID（int64），从 next_id() 开始连续分配
+            vectors: 向量，形状 (n, dimension)
+            chunks: 与 ids 一一对应的文档块
+
+        Returns:
+            新段的段号
+        """
+        seq = (self.segment_seqs() or [0])[-1] + 1
+        _save_npy(self._segment_path(seq), vectors.astype(np.float32))
+        _save_npy(self._segment_path(seq, ".ids.npy"), ids.astype(np.int64))
+
+        # 段文件已落盘，在一个事务中登记段和文档块
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO chunks(id, content, document_id, chunk_key, metadata) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        int(chunk_id),
+                        chunk.content,
+                        chunk.document_id,
+                        json.dumps(chunk.chunk_id, default=str),
+                        json.dumps(chunk.metadata or {}, ensure_ascii=False, default=str),
+                    )
+                    for chunk_id, chunk in zip(ids.tolist(), chunks)
+                ],
+            )
+            self._conn.execute("INSERT INTO segments(seq, count) VALUES (?, ?)", (seq, len(ids)))
+            self._set_meta(self._conn, "next_id", int(ids[-1]) + 1)
+        return seq
+
+    def read_segment(self, seq: int) -> tuple[np.ndarray, np.ndarray]:
+        """以内存映射方式读取一个段，返回（ID，向量）"""
+        ids = np.load(self._segment_path(seq, ".ids.npy"), mmap_mode="r")
+        vectors = np.load(self._segment_path(seq), mmap_mode="r")
+        return ids, vectors
+
+    def iter_segments(self, after: int = 0) -> Iterator[tuple[int, np.ndarray, np.ndarray]]:
+        """按顺序读取段号大于 after 的段"""
+        for seq in self.segment_seqs():
+            if seq > after:
+                ids, vectors = self.read_segment(seq)
+                yield seq, ids, vectors
+
+    # ============ 文档块 ============
+
+    def get_chunks(self, ids: list[int]) -> dict[int, DocumentChunk]:
+        """按稳定 ID 读取文档块，不存在的 ID 不出现在结果中"""
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        rows = self._conn.execute(
+            f"SELECT id, content, document_id, chunk_key, metadata FROM chunks WHERE id IN ({placeholders})",
+            [int(chunk_id) for chunk_id in ids],
+        ).fetchall()
+        return {
+            chunk_id: DocumentChunk(
+                content=content,
+                document_id=document_id,
+                chunk_id=json.loads(chunk_key) if chunk_key else None,
+                metadata=json.loads(metadata) if metadata else {},
+            )
+            for chunk_id, content, document_id, chunk_key, metadata in rows
+        }
+
+    def iter_contents(self) -> Iterator[tuple[int, str]]:
+        """逐行读取（稳定 ID，文本），用于构建关键词索引，不构造文档块对象"""
+        yield from self._conn.execute("SELECT id, content FROM chunks")
+
+    def delete_document(self, document_id: str) -> list[int]:
+        """删除一个文档的全部文档块，并为其向量记录墓碑
+
+        Returns:
+            被删除的稳定 ID
+        """
+        with self._conn:
+            ids = [
+                row[0]
+                for row in self._conn.execute("SELECT id FROM chunks WHERE document_id = ?", (document_id,))
+            ]
+            if ids:
+                self._conn.execute("DELETE FROM chunks WHERE document_id = ?", (document_id,))
+                self._conn.executemany("INSERT OR IGNORE INTO tombstones(id) VALUES (?)", [(i,) for i in ids])
+        return ids
+
+    def tombstone_ids(self) -> set[int]:
+        """向量仍在段和检查点中、但文档块已删除的 ID"""
+        return {row[0] for row in self._conn.execute("SELECT id FROM tombstones")}
+
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    # ============ 检查点与压缩 ============
+
+    def load_checkpoint(self, mmap: bool = False) -> faiss.Index | None:
+        """读取最新检查点，没有时返回 None
+
+        Args:
+            mmap: 内存映射读取（只读，打开快、不占用进程私有内存）
+        """
+        seq = self.checkpoint_seq()
+        if not seq:
+            return None
+        if mmap:
+            flags = int(self._get_meta("checkpoint_io_flags", str(faiss.IO_FLAG_MMAP_IFC)))
+            return faiss.read_index(self._checkpoint_path(seq), flags)
+        return faiss.read_index(self._checkpoint_path(seq))
+
+    def write_checkpoint(self, index: faiss.Index, upto_seq: int) -> None:
+        """写入包含 upto_seq 及之前所有段的索引检查点（原子替换）"""
+        path = self._checkpoint_path(upto_seq)
+        faiss.write_index(index, path + ".tmp")
+        _fsync_replace(path + ".tmp", path)
+
+        previous = self.checkpoint_seq()
+        with self._conn:
+            self._set_meta(self._conn, "checkpoint_seq", upto_seq)
+            self._set_meta(self._conn, "checkpoint_io_flags", mmap_io_flags(index))
+        if previous and previous != upto_seq:
+            os.remove(self._checkpoint_path(previous))
+
+    def segments_since_checkpoint(self) -> int:
+        checkpoint = self.checkpoint_seq()
+        return sum(1 for seq in self.segment_seqs() if seq > checkpoint)
+
+    def compact(self, index: faiss.Index) -> None:
+        """把所有段合并为一个段（只保留仍存在的文档块），同时写入新检查点并清空墓碑
+
+        Args:
+            index: 与合并后数据一致（已删除墓碑向量）的内存索引，作为新检查点写入
+        """
+        old_seqs = self.segment_seqs()
+        if not old_seqs:
+            return
+
+        live_ids = {row[0] for row in self._conn.execute("SELECT id FROM chunks")}
+        ids_parts, vector_parts = [], []
+        for _, ids, vectors in self.iter_segments():
+            keep = np.fromiter((chunk_id in live_ids for chunk_id in ids.tolist()), dtype=bool, count=len(ids))
+            ids_parts.append(ids[keep])
+            vector_parts.append(vectors[keep])
+
+        # 新段号大于所有旧段，先写段文件和检查点，再在一个事务中切换
+        seq = old_seqs[-1] + 1
+        ids = np.concatenate(ids_parts) if ids_parts else np.empty(0, dtype=np.int64)
+        vectors = np.concatenate(vector_parts) if vector_parts else np.empty((0, self._dimension), dtype=np.float32)
+        _save_npy(self._segment_path(seq), vectors)
+        _save_npy(self._segment_path(seq, ".ids.npy"), ids)
+
+        path = self._checkpoint_path(seq)
+        faiss.write_index(index, path + ".tmp")
+        _fsync_replace(path + ".tmp", path)
+
+        previous_checkpoint = self.checkpoint_seq()
+        with self._conn:
+            self._conn.execute("DELETE FROM segments")
+            self._conn.execute("DELETE FROM tombstones")
+            self._conn.execute("INSERT INTO segments(seq, count) VALUES (?, ?)", (seq, len(ids)))
+            self._set_meta(self._conn, "checkpoint_seq", seq)
+            self._set_meta(self._conn, "checkpoint_io_flags", mmap_io_flags(index))
+
+        for old_seq in old_seqs:
+            os.remove(self._segment_path(old_seq))
+            os.remove(self._segment_path(old_seq, ".ids.npy"))
+        if previous_checkpoint:
+            os.remove(self._checkpoint_path(previous_checkpoint))
+        logger.info(f"FAISS 段合并完成 segments={len(old_seqs)} -> 1 count={len(ids)}")
+
+    def _remove_orphans(self) -> None:
+        """清理崩溃残留：临时文件、未登记的段、未被引用的检查点"""
+        live_segments = {
+            path
+            for seq in self.segment_seqs()
+            for path in (self._segment_path(seq), self._segment_path(seq, ".ids.npy"))
+        }
+        checkpoint = self.checkpoint_seq()
+        live_checkpoint = self._checkpoint_path(checkpoint) if checkpoint else None
+
+        for path in glob.glob(os.path.join(self._directory, SEGMENT_DIR, "*")):
+            if path not in live_segments:
+                os.remove(path)
+        for path in glob.glob(os.path.join(self._directory, CHECKPOINT_DIR, "*")):
+            if path != live_checkpoint:
+                os.remove(path)
@@ -1,134 +1,709 @@
+import hashlib
+import logging
 import os
 import pickle
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+
 import faiss
 import numpy as np
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows 没有 fcntl，不加进程锁
+    fcntl = None
+
 from ai_qa.domain.ports import VectorStorePort, EmbeddingPort
-from ai_qa.domain.entities import DocumentChunk
+from ai_qa.domain.entities import DocumentChunk, SearchMode
+from ai_qa.infrastructure.vectorstore.faiss_index import (
+    FaissIndexConfig,
+    apply_search_params,
+    build_id_index,
+    remove_vectors,
+    should_upgrade,
+    upgrade_index,
+)
+from ai_qa.infrastructure.vectorstore.faiss_segments import SegmentStore
+from ai_qa.infrastructure.vectorstore.hybrid import (
+    BM25Index,
+    candidate_count,
+    reciprocal_rank_fusion,
+)
+
+logger = logging.getLogger(__name__)
+
+# 未指定知识库的文档块存放在默认分区，检索时也只检索默认分区
+DEFAULT_KB = "_default"
+# 默认最多同时常驻内存的知识库索引数
+DEFAULT_MAX_LOADED_KBS = 32
+# 每个知识库一个子目录
+KB_ROOT = "kb"
+# 持久化目录下的进程锁文件
+PROCESS_LOCK_FILE = ".lock"
+# 检查点之后累计的段数达到该值时写入新检查点（缩短重启时的段回放）
+DEFAULT_CHECKPOINT_SEGMENTS = 16
+# 段数达到该值时合并为一个段
+DEFAULT_COMPACT_SEGMENTS = 64
+# 已删除（墓碑）向量占比超过该值时从索引中清除
+TOMBSTONE_RATIO = 0.2
+
+
+class _ReadWriteLock:
+    """读写锁：检索可以并发，写入（添加/删除）独占"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writing:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
+class _KnowledgeBaseIndex:
+    """单个知识库的向量索引、文档块和关键词索引
+
+    持久化时文档块不常驻内存，检索命中后再按 ID 从 SQLite 读取；
+    不持久化时文档块保存在内存字典中。
+
+    删除文档时先记录墓碑（检索时过滤），墓碑累计较多时再从向量索引中清除。
+    """
+
+    def __init__(
+        self,
+        index: faiss.IndexIDMap2,
+        next_id: int,
+        storage: SegmentStore = None,
+        size: int = 0,
+        delta: faiss.IndexIDMap2 = None,
+        tombstones: set[int] = None,
+    ):
+        """
+        Args:
+            index: 以稳定 ID 寻址的向量索引（内存映射加载时只读）
+            next_id: 下一个可分配的 ID（单调递增，删除后也不复用）
+            storage: 磁盘存储（不持久化时为空）
+            size: 文档块数量
+            delta: 内存映射加载时，检查点之后回放的段所在的内存索引
+            tombstones: 已删除但向量仍在索引中的 ID
+        """
+        self.index = index
+        self.delta = delta
+        self.next_id = next_id
+        self.storage = storage
+        self.size = size
+        self.tombstones = tombstones or set()
+        self.chunks: dict[int, DocumentChunk] | None = {} if storage is None else None
+        # 不持久化时维护 文档 ID -> 稳定 ID（持久化时由 SQLite 的 document_id 索引查询）
+        self.documents: dict[str, list[int]] | None = {} if storage is None else None
+        self._bm25: BM25Index | None = None
+        self._bm25_lock = threading.Lock()
+        self.lock = _ReadWriteLock()
+        # 正在使用该索引的请求数，大于 0 时不会被淘汰出内存
+        self.users = 0
+
+    @property
+    def mapped(self) -> bool:
+        """向量索引是否为内存映射的只读索引"""
+        return self.delta is not None
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal + (self.delta.ntotal if self.delta is not None else 0)
+
+    def remove_chunks(self, ids: list[int]) -> None:
+        """登记已删除的文档块，向量留在索引中并记为墓碑（调用方需持有写锁）"""
+        self.size -= len(ids)
+        self.tombstones.update(ids)
+        for chunk_id in ids:
+            if self.chunks is not None:
+                self.chunks.pop(chunk_id, None)
+            if self._bm25 is not None:
+                self._bm25.remove(chunk_id)
+
+    def find_chunks(self, ids: list[int]) -> dict[int, DocumentChunk]:
+        """按 ID 取文档块，已不存在的 ID 不出现在结果中"""
+        if self.storage is None:
+            return {chunk_id: self.chunks[chunk_id] for chunk_id in ids if chunk_id in self.chunks}
+        return self.storage.get_chunks(ids)
+
+    def get_chunks(self, ids: list[int]) -> list[DocumentChunk]:
+        """按 ID 取文档块（保持顺序，跳过已不存在的 ID）"""
+        found = self.find_chunks(ids)
+        return [found[chunk_id] for chunk_id in ids if chunk_id in found]
+
+    def keyword_index(self) -> BM25Index:
+        """关键词索引，首次关键词检索时构建（只读取文本，不构造文档块）"""
+        with self._bm25_lock:
+            if self._bm25 is None:
+                if self.storage is None:
+                    contents = ((chunk_id, chunk.content) for chunk_id, chunk in self.chunks.items())
+                else:
+                    contents = self.storage.iter_contents()
+                bm25 = BM25Index()
+                for chunk_id, content in contents:
+                    bm25.add(chunk_id, content)
+                self._bm25 = bm25
+            return self._bm25
+
+    def add_chunks(self, ids: list[int], chunks: list[DocumentChunk]) -> None:
+        """登记新写入的文档块（调用方需持有写锁）"""
+        self.size += len(ids)
+        for chunk_id, chunk in zip(ids, chunks):
+            if self.chunks is not None:
+                self.chunks[chunk_id] = chunk
+                self.documents.setdefault(chunk.document_id, []).append(chunk_id)
+            # 关键词索引尚未构建时无需更新，构建时会从 SQLite 读到新数据
+            if self._bm25 is not None:
+                self._bm25.add(chunk_id, chunk.content)
+
+
+# 本进程持有的目录锁：目录真实路径 -> (进程号, 锁文件)
+_process_locks: dict[str, tuple[int, object]] = {}
+_process_locks_guard = threading.Lock()
+
+
+def _lock_directory(directory: str) -> None:
+    """对持久化目录加进程级排他锁
+
+    段文件、检查点和段序号只能由一个进程维护，多个进程同时写入会互相覆盖。
+    同一进程内的多个实例共用一把锁；其他进程（包括 fork 出的子进程）已持有时立即失败。
+    锁文件保持打开直到进程退出，进程退出（包括崩溃）时由操作系统释放。
+
+    Args:
+        directory: 持久化目录
+
+    Raises:
+        RuntimeError: 目录已被其他进程占用
+    """
+    if fcntl is None:
+        return
+    path = os.path.realpath(directory)
+    with _process_locks_guard:
+        held = _process_locks.get(path)
+        if held is not None and held[0] == os.getpid():
+            return
+
+        os.makedirs(path, exist_ok=True)
+        lock_file = open(os.path.join(path, PROCESS_LOCK_FILE), "a")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise RuntimeError(
+                f"FAISS 持久化目录已被其他进程使用 directory={path}，"
+                "VECTOR_STORE=faiss 只支持单进程（SERVER_WORKERS=1），多进程部署请改用 VECTOR_STORE=postgres"
+            ) from None
+        _process_locks[path] = (os.getpid(), lock_file)
+
 
 class FaissVectorStore(VectorStorePort):
-    """FAISS 向量存储实现"""
+    """FAISS 向量存储实现
+
+    每个知识库一个独立的 IndexIDMap2 子索引（ID 为知识库内单调递增的稳定 ID），
+    首次访问时从磁盘加载，超过 max_loaded_kbs 时按 LRU 把冷知识库移出内存。
+
+    开启 mmap 时检查点以内存映射方式只读加载，之后的段回放到一个小的内存增量索引，
+    检索同时查询两者；首次写入时才把检查点完整读入内存。
+
+    持久化目录由一个进程独占（见 _lock_directory），另一个进程打开同一目录时构造失败。
+    """
 
     def __init__(
-            self, 
-            embedding: EmbeddingPort, 
+            self,
+            embedding: EmbeddingPort,
             dimension: int = 1024,
-            persist_directory: str = None
+            persist_directory: str = None,
+            index_config: FaissIndexConfig = None,
+            max_loaded_kbs: int = DEFAULT_MAX_LOADED_KBS,
+            checkpoint_segments: int = DEFAULT_CHECKPOINT_SEGMENTS,
+            compact_segments: int = DEFAULT_COMPACT_SEGMENTS,
+            mmap: bool = True,
             ):
         """
         Args:
             embedding: 向量化服务
             dimension: 向量维度（text-embedding-v3 默认是1024
+            persist_directory: 持久化目录，为空时只保存在内存（不会淘汰）
+            index_config: 索引配置（默认精确检索 IndexFlatL2）
+            max_loaded_kbs: 最多同时常驻内存的知识库数
+            checkpoint_segments: 累计多少个新段后写入索引检查点
+            compact_segments: 段数达到多少时合并
+            mmap: 以内存映射方式加载索引检查点（冷启动快）
+
+        Raises:
+            RuntimeError: 持久化目录已被其他进程使用
         """
         self._embedding = embedding
         self._dimension = dimension
         self._persist_directory = persist_directory
+        self._index_config = index_config or FaissIndexConfig()
+        self._max_loaded_kbs = max_loaded_kbs
+        self._checkpoint_segments = checkpoint_segments
+        self._compact_segments = compact_segments
+        self._mmap = mmap
+
+        # 已加载的知识库（按最近使用排序）
+        self._loaded: OrderedDict[str, _KnowledgeBaseIndex] = OrderedDict()
+        self._lock = threading.Lock()
+        # 每个知识库一把加载锁：加载（可能包含训练）期间只阻塞同一知识库，不持有全局锁
+        self._loading_locks: dict[str, threading.Lock] = {}
 
-        # 尝试从磁盘加载，否则创建新的
-        if persist_directory and self._load():
-            print(f"从{persist_directory} 加载了已有知识库")
-        else:
-            # 创建 FAISS 索引（使用 L2 距离）
-            self._index = faiss.IndexFlatL2(dimension)
-            # 存储原始文档块（FAISS 只存向量，我们需要额外存储文本）
-            self._chunks : list[DocumentChunk] = []
+        if persist_directory:
+            _lock_directory(persist_directory)
+            self._migrate_legacy_layout()
 
     def add_documents(self, chunks: list[DocumentChunk], knowledge_base_id: str = None) -> None:
         """添加文档块到向量存储"""
         if not chunks:
-            return 
-        
+            return
+
         # 提取文本内容
         texts = [chunk.content for chunk in chunks]
 
-        # 向量化
+        # 向量化（网络调用，不持有锁）
         vectors = self._embedding.embed_texts(texts)
 
         # 转换为 numpy 数组
         vectors_np = np.array(vectors, dtype=np.float32)
 
-        # 添加到 FAISS 索引
-        self._index.add(vectors_np)
+        with self._acquire(knowledge_base_id, create=True, write=True) as kb:
+            self._ensure_writable(kb)
 
-        # 保存原始文档块
-        self._chunks.extend(chunks)
+            # 分配稳定 ID，先追加写入磁盘段（只写本批数据），再更新内存
+            ids = np.arange(kb.next_id, kb.next_id + len(chunks), dtype=np.int64)
+            if kb.storage is not None:
+                kb.storage.append(ids, vectors_np, chunks)
 
-        # 自动保存到本地磁盘
-        self._save()
+            kb.index.add_with_ids(vectors_np, ids)
+            kb.next_id += len(chunks)
+            kb.add_chunks(ids.tolist(), chunks)
 
-    def search(self, query, top_k = 3, knowledge_base_id: str = None):
+            # 数据量达到训练要求后，从 Flat 索引升级为配置的压缩索引
+            upgraded = should_upgrade(kb.index, self._index_config)
+            if upgraded:
+                kb.index = upgrade_index(kb.index, self._index_config)
+
+            if kb.storage is not None:
+                self._maintain(kb, force_checkpoint=upgraded)
+
+    def delete_document(self, document_id: str, knowledge_base_id: str = None) -> int:
+        """删除一个文档的全部文档块
+
+        只删除文档块并记录墓碑，代价与该文档的块数成正比；
+        墓碑占比超过 TOMBSTONE_RATIO 时再从向量索引中清除并合并磁盘段。
+        """
+        if not self._exists(knowledge_base_id):
+            return 0
+
+        with self._acquire(knowledge_base_id, write=True) as kb:
+            if kb is None:
+                return 0
+            if kb.storage is not None:
+                ids = kb.storage.delete_document(document_id)
+            else:
+                ids = kb.documents.pop(document_id, [])
+            if not ids:
+                return 0
+
+            kb.remove_chunks(ids)
+            if len(kb.tombstones) > kb.ntotal * TOMBSTONE_RATIO:
+                self._purge(kb)
+
+        logger.info(f"FAISS 删除文档 kb={self._kb_key(knowledge_base_id)} document_id={document_id} count={len(ids)}")
+        return len(ids)
+
+    def search(
+            self,
+            query: str,
+            knowledge_base_id: str = None,
+            top_k: int = 3,
+            mode: SearchMode = SearchMode.VECTOR,
+            query_embedding: list[float] = None,
+            ) -> list[DocumentChunk]:
         """搜索相关文档块"""
-        if self._index.ntotal == 0:
+        if not self._exists(knowledge_base_id):
             return []
-        
-        # 向量化查询
-        query_vector = self._embedding.embed_query(query)
-        query_np = np.array([query_vector], dtype=np.float32)
-
-        # 搜索最相似的 top_k 个向量
-        distances, indices = self._index.search(query_np,min(top_k, self._index.ntotal))
-
-        # 返回对应的文档块
-        results = []
-        for idx in indices[0]:
-            if idx >= 0 and idx < len(self._chunks):
-                results.append(self._chunks[idx])
-        
-        return results
+
+        # 向量化查询（网络调用，不持有锁）
+        if mode != SearchMode.KEYWORD and query_embedding is None:
+            query_embedding = self._embedding.embed_query(query)
+
+        with self._acquire(knowledge_base_id) as kb:
+            if kb is None or not kb.size:
+                return []
+
+            if mode == SearchMode.KEYWORD:
+                ids = [chunk_id for chunk_id, _ in kb.keyword_index().search(query, top_k)]
+            elif mode == SearchMode.VECTOR:
+                ids = self._vector_ids(kb, query_embedding, top_k)
+            else:
+                # 混合检索：向量和 BM25 两路各召回一批候选，再用 RRF 融合
+                candidates = candidate_count(top_k)
+                vector_ids = self._vector_ids(kb, query_embedding, candidates)
+                keyword_ids = [chunk_id for chunk_id, _ in kb.keyword_index().search(query, candidates)]
+                ids = reciprocal_rank_fusion([vector_ids, keyword_ids], top_k)
+
+            # 只读取最终返回的文档块
+            return kb.get_chunks(ids)
+
+    def search_batch(
+            self,
+            queries: list[str],
+            knowledge_base_id: str = None,
+            top_k: int = 3,
+            mode: SearchMode = SearchMode.VECTOR,
+            ) -> list[list[DocumentChunk]]:
+        """批量检索：一次 Embedding 调用 + 一次矩阵检索，文档块一次读取"""
+        if not queries or not self._exists(knowledge_base_id):
+            return [[] for _ in queries]
+
+        # 向量化全部查询（网络调用，不持有锁）
+        query_matrix = None
+        if mode != SearchMode.KEYWORD:
+            query_matrix = np.array(self._embedding.embed_texts(queries), dtype=np.float32)
+
+        with self._acquire(knowledge_base_id) as kb:
+            if kb is None or not kb.size:
+                return [[] for _ in queries]
+
+            if mode == SearchMode.KEYWORD:
+                id_lists = [[chunk_id for chunk_id, _ in kb.keyword_index().search(query, top_k)] for query in queries]
+            elif mode == SearchMode.VECTOR:
+                id_lists = self._vector_ids_batch(kb, query_matrix, top_k)
+            else:
+                candidates = candidate_count(top_k)
+                bm25 = kb.keyword_index()
+                id_lists = [
+                    reciprocal_rank_fusion(
+                        [vector_ids, [chunk_id for chunk_id, _ in bm25.search(query, candidates)]], top_k
+                    )
+                    for query, vector_ids in zip(queries, self._vector_ids_batch(kb, query_matrix, candidates))
+                ]
+
+            # 所有查询命中的文档块一次读取，再按查询分组
+            found = kb.find_chunks(list({chunk_id for ids in id_lists for chunk_id in ids}))
+            return [[found[chunk_id] for chunk_id in ids if chunk_id in found] for ids in id_lists]
+
+    def search_by_vector(self, query_embedding: list[float], knowledge_base_id: str = None, top_k: int = 3) -> list[DocumentChunk]:
+        """使用查询向量搜索相关文档块"""
+        with self._acquire(knowledge_base_id) as kb:
+            if kb is None:
+                return []
+            return kb.get_chunks(self._vector_ids(kb, query_embedding, top_k))
+
+    @classmethod
+    def _vector_ids(cls, kb: _KnowledgeBaseIndex, query_embedding: list[float], top_k: int) -> list[int]:
+        """向量检索，返回稳定 ID 列表（调用方需持有读锁）"""
+        return cls._vector_ids_batch(kb, np.array([query_embedding], dtype=np.float32), top_k)[0]
+
+    @staticmethod
+    def _vector_ids_batch(kb: _KnowledgeBaseIndex, query_matrix: np.ndarray, top_k: int) -> list[list[int]]:
+        """批量向量检索，每个查询返回一个稳定 ID 列表（调用方需持有读锁）
+
+        Args:
+            query_matrix: 查询向量矩阵，形状 (n, dimension)，一次 index.search 完成
+        """
+        results: list[list[tuple[float, int]]] = [[] for _ in range(len(query_matrix))]
+        if kb.ntotal == 0:
+            return [[] for _ in results]
+
+        # 分别搜索检查点索引和增量索引中最相似的向量，再按距离合并；
+        # 多取墓碑数量的结果，过滤已删除的向量后仍能凑满 top_k
+        for index in (kb.index, kb.delta):
+            if index is None or index.ntotal == 0:
+                continue
+            distances, ids = index.search(query_matrix, min(top_k + len(kb.tombstones), index.ntotal))
+            for row, (row_distances, row_ids) in enumerate(zip(distances, ids)):
+                results[row].extend(
+                    (float(distance), int(chunk_id))
+                    for distance, chunk_id in zip(row_distances, row_ids)
+                    if chunk_id >= 0 and chunk_id not in kb.tombstones
+                )
+
+        return [[chunk_id for _, chunk_id in sorted(hits)[:top_k]] for hits in results]
 
     def clear(self, knowledge_base_id: str = None):
-        """清空向量存储"""
-        self._index = faiss.IndexFlatL2(self._dimension)
-        self._chunks = []
-
-        # 删除持久化文件
-        if self._persist_directory:
-            # 创建存储路径
-            index_path = os.path.join(self._persist_directory, "index.faiss")
-            chunks_path = os.path.join(self._persist_directory, "chunks.pkl")
-            if os.path.exists(index_path):
-                os.remove(index_path)
-            if os.path.exists(chunks_path):
-                os.remove(chunks_path)
-            
-    @property
+        """清空向量存储（未指定知识库时清空全部）"""
+        # 先取得相关知识库的加载锁，避免正在进行的加载在清空后又登记回来
+        with self._lock:
+            keys = sorted(self._loading_locks) if knowledge_base_id is None else [self._kb_key(knowledge_base_id)]
+        with ExitStack() as stack:
+            for key in keys:
+                stack.enter_context(self._loading_lock(key))
+            self._clear(knowledge_base_id)
+
+    def _clear(self, knowledge_base_id: str = None):
+        with self._lock:
+            if knowledge_base_id is None:
+                removed = list(self._loaded.values())
+                self._loaded.clear()
+                paths = [self._kb_root()] if self._persist_directory else []
+            else:
+                key = self._kb_key(knowledge_base_id)
+                removed = [kb for kb in [self._loaded.pop(key, None)] if kb is not None]
+                paths = [self._kb_dir(key)] if self._persist_directory else []
+
+            for kb in removed:
+                if kb.storage is not None:
+                    kb.storage.close()
+
+            # 删除持久化文件
+            for path in paths:
+                if os.path.exists(path):
+                    shutil.rmtree(path)
+
     def count(self, knowledge_base_id: str = None) -> int:
-        """返回存储的文档块数量"""
-        return len(self._chunks)
-    
-    def _save(self) -> None:
-        """保存到磁盘"""
+        """返回文档块数量（未指定知识库时返回全部知识库的总数）"""
+        if knowledge_base_id is not None:
+            return self._count(self._kb_key(knowledge_base_id))
+        return sum(self._count(key) for key in self._kb_keys())
+
+    # ============ 知识库索引的加载与淘汰 ============
+
+    @contextmanager
+    def _acquire(self, knowledge_base_id: str = None, create: bool = False, write: bool = False):
+        """获取知识库索引并加锁，使用期间不会被淘汰
+
+        Args:
+            create: 知识库不存在时创建空索引
+            write: 加写锁（否则加读锁）
+
+        Yields:
+            知识库索引，不存在且 create=False 时为 None
+        """
+        key = self._kb_key(knowledge_base_id)
+        kb = self._pin(key)
+        if kb is None:
+            # 冷知识库：在全局锁之外加载，其他知识库的检索和写入不受影响
+            with self._loading_lock(key):
+                kb = self._pin(key)  # 等待期间可能已被其他线程加载
+                if kb is None:
+                    kb = self._load(key)
+                    # 只有磁盘上不存在时才新建（加载失败会抛出异常，不会覆盖已有数据）
+                    if kb is None and create:
+                        kb = _KnowledgeBaseIndex(self._new_index(), 0, self._open_storage(key))
+                    if kb is not None:
+                        with self._lock:
+                            self._loaded[key] = kb
+                            kb.users += 1
+                            self._evict()
+
+        if kb is None:
+            yield None
+            return
+
+        try:
+            with (kb.lock.write() if write else kb.lock.read()):
+                yield kb
+        finally:
+            with self._lock:
+                kb.users -= 1
+
+    def _pin(self, key: str) -> _KnowledgeBaseIndex | None:
+        """取已加载的知识库索引并标记为使用中，未加载时返回 None"""
+        with self._lock:
+            kb = self._loaded.get(key)
+            if kb is not None:
+                self._loaded.move_to_end(key)
+                kb.users += 1
+            return kb
+
+    def _loading_lock(self, key: str) -> threading.Lock:
+        """知识库的加载锁（加锁顺序：加载锁在前，全局锁在后）"""
+        with self._lock:
+            return self._loading_locks.setdefault(key, threading.Lock())
+
+    def _evict(self) -> None:
+        """淘汰最久未使用且空闲的知识库索引（调用方需持有 self._lock）
+
+        每次写入后都已保存到磁盘，淘汰时直接丢弃内存中的索引即可。
+        """
         if not self._persist_directory:
             return
-        
-        os.makedirs(self._persist_directory, exist_ok=True)
+        for key in list(self._loaded):
+            if len(self._loaded) <= self._max_loaded_kbs:
+                break
+            if self._loaded[key].users == 0:
+                kb = self._loaded.pop(key)
+                kb.storage.close()
+                logger.info(f"FAISS 知识库索引移出内存 kb={key}")
 
-        # 创建存储路径
-        index_path = os.path.join(self._persist_directory, "index.faiss")
-        chunks_path = os.path.join(self._persist_directory, "chunks.pkl")
+    def _new_index(self) -> faiss.IndexIDMap2:
+        """创建空索引（数据量达到要求后再升级为压缩索引）"""
+        return build_id_index(
+            self._index_config, self._dimension,
+            np.empty((0, self._dimension), dtype=np.float32), np.empty(0, dtype=np.int64),
+        )
+
+    def _exists(self, knowledge_base_id: str = None) -> bool:
+        """知识库是否有数据（已加载或磁盘上存在）"""
+        key = self._kb_key(knowledge_base_id)
+        if key in self._loaded:
+            return True
+        return bool(self._persist_directory) and SegmentStore.exists(self._kb_dir(key))
+
+    def _count(self, key: str) -> int:
+        """单个知识库的文档块数量，未加载时从 SQLite 读取"""
+        kb = self._loaded.get(key)
+        if kb is not None:
+            return kb.size
+        if not self._persist_directory or not SegmentStore.exists(self._kb_dir(key)):
+            return 0
+        return SegmentStore.read_meta(self._kb_dir(key))["count"]
+
+    def _kb_keys(self) -> set[str]:
+        """所有知识库（已加载 + 磁盘上）"""
+        keys = set(self._loaded)
+        root = self._kb_root() if self._persist_directory else None
+        if root and os.path.isdir(root):
+            for name in os.listdir(root):
+                kb_dir = os.path.join(root, name)
+                if SegmentStore.exists(kb_dir):
+                    keys.add(SegmentStore.read_meta(kb_dir)["knowledge_base_id"])
+        return keys
+
+    # ============ 持久化 ============
+
+    @staticmethod
+    def _kb_key(knowledge_base_id: str = None) -> str:
+        return knowledge_base_id or DEFAULT_KB
+
+    def _kb_root(self) -> str:
+        return os.path.join(self._persist_directory, KB_ROOT)
 
-        faiss.write_index(self._index, index_path)
-        with open(chunks_path, "wb") as f:
-            pickle.dump(self._chunks, f)
-        
-    def _load(self) -> bool:
-        """从磁盘加载，成功返回 True"""
+    def _kb_dir(self, key: str) -> str:
+        """知识库子目录，ID 含特殊字符时使用哈希作为目录名"""
+        name = key if re.fullmatch(r"[\w-]+", key) else hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self._kb_root(), name)
+
+    def _open_storage(self, key: str) -> SegmentStore | None:
+        """打开（或创建）知识库的磁盘存储"""
         if not self._persist_directory:
-            return False
-    
-        # 创建存储路径
-        index_path = os.path.join(self._persist_directory, "index.faiss")
-        chunks_path = os.path.join(self._persist_directory, "chunks.pkl")
+            return None
+        storage = SegmentStore(self._kb_dir(key), self._dimension)
+        storage.set_knowledge_base_id(key)
+        return storage
 
-        if not os.path.exists(index_path) or not os.path.exists(chunks_path):
-            return False
-        
+    def _ensure_writable(self, kb: _KnowledgeBaseIndex) -> None:
+        """写入前把内存映射的只读索引换成完整读入内存的可写索引（调用方需持有写锁）"""
+        if not kb.mapped:
+            return
+        storage = kb.storage
+        index = storage.load_checkpoint()
+        for _, ids, vectors in storage.iter_segments(after=storage.checkpoint_seq()):
+            index.add_with_ids(np.ascontiguousarray(vectors), np.ascontiguousarray(ids))
+        apply_search_params(index, self._index_config)
+        kb.index, kb.delta = index, None
+
+    def _purge(self, kb: _KnowledgeBaseIndex) -> None:
+        """从向量索引中清除墓碑向量，持久化时同时合并磁盘段（调用方需持有写锁）"""
+        self._ensure_writable(kb)
+        kb.index = remove_vectors(kb.index, self._index_config, np.fromiter(kb.tombstones, dtype=np.int64))
+        kb.tombstones.clear()
+        if kb.storage is not None:
+            kb.storage.compact(kb.index)
+
+    def _maintain(self, kb: _KnowledgeBaseIndex, force_checkpoint: bool = False) -> None:
+        """写入后维护：段过多时合并，新段累计较多时写检查点（调用方需持有写锁）"""
+        storage = kb.storage
+        if len(storage.segment_seqs()) >= self._compact_segments:
+            # 合并会丢弃已删除文档块的向量，检查点也要先清除墓碑
+            self._purge(kb)
+        elif force_checkpoint or storage.segments_since_checkpoint() >= self._checkpoint_segments:
+            storage.write_checkpoint(kb.index, storage.segment_seqs()[-1])
+
+    def _load(self, key: str) -> _KnowledgeBaseIndex | None:
+        """从磁盘加载知识库索引：读取最新检查点，再回放之后追加的段
+
+        文档块不在这里加载，检索命中后按 ID 读取。
+
+        Returns:
+            磁盘上没有该知识库时返回 None
+
+        Raises:
+            Exception: 磁盘上有该知识库但读取失败（检查点或段损坏、SQLite 错误等）
+        """
+        if not self._persist_directory or not SegmentStore.exists(self._kb_dir(key)):
+            return None
+
+        storage = self._open_storage(key)
         try:
-            self._index = faiss.read_index(index_path)
-            with open(chunks_path, "rb") as f:
-                self._chunks = pickle.load(f)
-            return True
+            delta = None
+            index = storage.load_checkpoint(mmap=self._mmap)
+            if index is None:
+                # 没有检查点：用全部段重建（数据量足够时直接训练压缩索引）
+                segments = list(storage.iter_segments())
+                ids = np.concatenate([seg_ids for _, seg_ids, _ in segments]) if segments else np.empty(0, dtype=np.int64)
+                vectors = (
+                    np.concatenate([seg_vectors for _, _, seg_vectors in segments])
+                    if segments else np.empty((0, self._dimension), dtype=np.float32)
+                )
+                index = build_id_index(self._index_config, self._dimension, vectors, ids)
+            else:
+                # 映射加载的检查点只读，之后的段回放到内存增量索引
+                if self._mmap:
+                    delta = faiss.IndexIDMap2(faiss.IndexFlatL2(self._dimension))
+                target = index if delta is None else delta
+                for _, ids, vectors in storage.iter_segments(after=storage.checkpoint_seq()):
+                    target.add_with_ids(np.ascontiguousarray(vectors), np.ascontiguousarray(ids))
+            apply_search_params(index, self._index_config)
+
+            size = storage.count()
+            logger.info(f"FAISS 知识库索引加载 kb={key} count={size} mmap={delta is not None}")
+            return _KnowledgeBaseIndex(index, storage.next_id(), storage, size, delta, storage.tombstone_ids())
         except Exception as e:
-            print(f"加载数据库失败:{e}")
-            return False
+            # 不能当作知识库不存在：否则写入时会在已有数据上新建空索引，ID 从 0 重新分配
+            storage.close()
+            logger.error(f"加载 FAISS 知识库索引失败 kb={key}: {e}")
+            raise
+
+    def _migrate_legacy_layout(self) -> None:
+        """把旧版全局索引（根目录下的 index.faiss + chunks.pkl）迁移为默认分区"""
+        index_path = os.path.join(self._persist_directory, "index.faiss")
+        chunks_path = os.path.join(self._persist_directory, "chunks.pkl")
+        if not os.path.exists(index_path) or not os.path.exists(chunks_path):
+            return
+
+        legacy_index = faiss.read_index(index_path)
+        with open(chunks_path, "rb") as f:
+            legacy_chunks: list[DocumentChunk] = pickle.load(f)
+
+        # 旧索引的行号即为稳定 ID，整体写成一个段
+        if legacy_chunks:
+            vectors = legacy_index.reconstruct_n(0, legacy_index.ntotal)
+            ids = np.arange(len(legacy_chunks), dtype=np.int64)
+            storage = self._open_storage(DEFAULT_KB)
+            storage.append(ids, vectors, legacy_chunks)
+            storage.close()
 
+        os.remove(index_path)
+        os.remove(chunks_path)
+        logger.info(f"旧版 FAISS 索引已迁移到默认分区 count={len(legacy_chunks)}")
@@ -0,0 +1,150 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Hashable, Iterable
+
+# 英文/数字词：保留错误码、SKU 等带连接符的整体（如 e-1024、v2.3.1）
+_ASCII_TOKEN = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+# 连续的中日韩字符
+_CJK_RUN = re.compile(r"[㐀-䶿一-鿿豈-﫿぀-ヿ가-힯]+")
+
+# RRF 平滑常数（Cormack et al. 推荐值）
+RRF_K = 60
+# 混合检索时每一路召回 top_k 的倍数
+HYBRID_CANDIDATE_MULTIPLIER = 4
+HYBRID_MIN_CANDIDATES = 20
+# 倍数放大后每一路召回的上限：启用重排序时 top_k 已经是重排序候选数（如 50），
+# 不再放大到 200 行，每一路只召回 top_k 个
+HYBRID_MAX_CANDIDATES = 50
+
+
+def tokenize(text: str) -> list[str]:
+    """面向关键词检索的分词
+
+    英文和数字按词切分并转小写；中文等 CJK 文本没有空格分隔，
+    按相邻两字（bigram）切分，单字片段保留单字。
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        词项列表（可能有重复，用于统计词频）
+    """
+    text = text.lower()
+    tokens = _ASCII_TOKEN.findall(text)
+    for run in _CJK_RUN.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def candidate_count(top_k: int) -> int:
+    """混合检索时每一路召回的候选数量（不少于 top_k）"""
+    return max(top_k, min(max(top_k * HYBRID_CANDIDATE_MULTIPLIER, HYBRID_MIN_CANDIDATES), HYBRID_MAX_CANDIDATES))
+
+
+def reciprocal_rank_fusion(
+    rankings: Iterable[list[Hashable]], top_k: int, k: int = RRF_K
+) -> list[Hashable]:
+    """倒数排名融合（RRF）
+
+    每个结果的得分为各路排名的 1 / (k + rank) 之和，
+    只依赖排名、不依赖各路分数的量纲，适合融合向量距离和 BM25 分数。
+
+    Args:
+        rankings: 多路检索结果，每一路按相关度从高到低排列
+        top_k: 返回数量
+        k: 平滑常数
+
+    Returns:
+        融合后的结果键列表
+    """
+    scores: dict[Hashable, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] += 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)[:top_k]
+
+
+class BM25Index:
+    """进程内 BM25 倒排索引（Okapi BM25）"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self._k1 = k1
+        self._b = b
+        # 词项 -> {文档键: 词频}
+        self._postings: dict[str, dict[Hashable, int]] = defaultdict(dict)
+        self._doc_lengths: dict[Hashable, int] = {}
+        # 文档键 -> 包含的词项（删除时只需访问这些倒排表）
+        self._doc_terms: dict[Hashable, tuple[str, ...]] = {}
+        self._total_length = 0
+
+    def add(self, key: Hashable, text: str) -> None:
+        """索引一篇文档（键已存在时先删除旧内容）"""
+        if key in self._doc_lengths:
+            self.remove(key)
+
+        terms = Counter(tokenize(text))
+        for term, freq in terms.items():
+            self._postings[term][key] = freq
+        length = sum(terms.values())
+        self._doc_terms[key] = tuple(terms)
+        self._doc_lengths[key] = length
+        self._total_length += length
+
+    def remove(self, key: Hashable) -> None:
+        """从索引中删除文档"""
+        length = self._doc_lengths.pop(key, None)
+        if length is None:
+            return
+        self._total_length -= length
+        for term in self._doc_terms.pop(key, ()):
+            postings = self._postings[term]
+            postings.pop(key, None)
+            if not postings:
+                del self._postings[term]
+
+    def clear(self) -> None:
+        """清空索引"""
+        self._postings.clear()
+        self._doc_lengths.clear()
+        self._doc_terms.clear()
+        self._total_length = 0
+
+    def search(
+        self, query: str, top_k: int, allowed: set[Hashable] = None
+    ) -> list[tuple[Hashable, float]]:
+        """BM25 检索
+
+        Args:
+            query: 查询文本
+            top_k: 返回数量
+            allowed: 只在这些文档中检索（用于按知识库过滤），为空表示不过滤
+
+        Returns:
+            [(文档键, 分数)]，按分数从高到低排列
+        """
+        doc_count = len(self._doc_lengths)
+        if doc_count == 0:
+            return []
+        avg_length = self._total_length / doc_count
+
+        scores: dict[Hashable, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for key, freq in postings.items():
+                if allowed is not None and key not in allowed:
+                    continue
+                norm = self._k1 * (1 - self._b + self._b * self._doc_lengths[key] / avg_length)
+                scores[key] += idf * freq * (self._k1 + 1) / (freq + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:top_k]
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
@@ -1,27 +1,78 @@
-from sqlalchemy.orm import Session
+from enum import Enum
+from functools import reduce
 
-from ai_qa.domain.entities import DocumentChunk
+from pgvector.sqlalchemy import BIT, HALFVEC, Vector
+from sqlalchemy import cast, func, literal, select, true, union_all
+from sqlalchemy.orm import Session, aliased
+
+from ai_qa.domain.entities import DocumentChunk, SearchMode
 from ai_qa.domain.ports import VectorStorePort, EmbeddingPort
 from ai_qa.infrastructure import embedding
 from ai_qa.infrastructure.database.models import (
     DocumentChunk as DocumentChunkModel,
     Document as DocumentModel
 )
+from ai_qa.infrastructure.vectorstore.hybrid import (
+    candidate_count,
+    reciprocal_rank_fusion,
+    tokenize,
+)
+
+# 向量维度（与 document_chunks.embedding 一致）
+EMBEDDING_DIMENSION = 1024
+
+
+class VectorStorage(Enum):
+    """向量存储格式枚举"""
+    FULL = "full"         # vector(1024)，float32，约 4 KB/行
+    HALFVEC = "halfvec"   # halfvec(1024)，float16，约 2 KB/行，精度损失可忽略
+    BINARY = "binary"     # 保留 float32，用二值量化索引（128 B/行）召回后全精度重排
+
+
+# 全文检索配置：分词已在应用侧完成（CJK bigram），数据库只按空白切分、不做词干化
+TS_CONFIG = "simple"
+
+
+def to_search_text(text: str) -> str:
+    """把文本分词后用空格拼接，作为 to_tsvector / tsquery 的输入"""
+    return " ".join(tokenize(text))
+
+
+def keyword_tsquery(terms: list[str]):
+    """任意词项命中即可召回（OR）的 tsquery，由排名函数区分相关度
+
+    每个词项单独用 plainto_tsquery 解析（不识别 or、-、引号等运算符），再用 || 合并，
+    词项本身是 "or" 或以 "-" 开头时也只按普通文本匹配。
+    """
+    return reduce(
+        lambda left, right: left.op("||")(right),
+        (func.plainto_tsquery(TS_CONFIG, term) for term in terms),
+    )
 
 class PostgresVectorStore(VectorStorePort):
     """基于 PostgreSQL + pgvector 的向量存储"""
 
-    def __init__(self, db: Session, embedding: EmbeddingPort):
+    def __init__(
+        self,
+        db: Session,
+        embedding: EmbeddingPort,
+        storage: VectorStorage = VectorStorage.FULL,
+        rescore_factor: int = 4,
+    ):
         """
         Args:
             db: 数据库会话
             embedding: 向量化服务
+            storage: 向量存储格式（需先执行 migration_vector_quantization.sql）
+            rescore_factor: 二值量化召回 top_k * rescore_factor 个候选再全精度重排
         """
         self._db = db
         self._embedding = embedding
+        self._storage = storage
+        self._rescore_factor = rescore_factor
 
     def add_documents(self, chunks: list[DocumentChunk], knowledge_base_id: str = None) -> None:
-        """添加文档块到向量存储"""
+        """添加文档块到向量存储（不提交事务）"""
         if not chunks:
             return
         
@@ -35,47 +86,214 @@ class PostgresVectorStore(VectorStorePort):
                 document_id = chunk.document_id,
                 content = chunk.content,
                 metadata = chunk.metadata,
-                embedding = vector,
+                **self._vector_columns(vector),
+                content_tsv = func.to_tsvector(TS_CONFIG, to_search_text(chunk.content)),
                 chunk_index = chunk.chunk_id
             )
             for chunk, vector in zip(chunks, embeddings)
         ]
 
-        # 批量插入到数据库
+        # 批量插入到数据库（只 flush，由调用方与文档记录、知识库计数一起提交）
         self._db.add_all(chunk_models)
-        self._db.commit()
+        self._db.flush()
 
-    def search(self, query: str, knowledge_base_id: str = None, top_k: int = 3) -> list[DocumentChunk]:
+    def search(
+        self,
+        query: str,
+        knowledge_base_id: str = None,
+        top_k: int = 3,
+        mode: SearchMode = SearchMode.VECTOR,
+        query_embedding: list[float] = None,
+    ) -> list[DocumentChunk]:
         """搜索相关文档块"""
+        if mode == SearchMode.KEYWORD:
+            return self._keyword_search(query, knowledge_base_id, top_k)
+
         # 把查询文本向量化
-        query_embedding = self._embedding.embed_query(query)
+        if query_embedding is None:
+            query_embedding = self._embedding.embed_query(query)
+        if mode == SearchMode.VECTOR:
+            return self.search_by_vector(query_embedding, knowledge_base_id, top_k)
 
-        # 构建查询
-        query_obj = self._db.query(DocumentChunkModel)
+        # 混合检索：向量和全文两路各召回一批候选，再用 RRF 融合
+        candidates = candidate_count(top_k)
+        vector_hits = self.search_by_vector(query_embedding, knowledge_base_id, candidates)
+        keyword_hits = self._keyword_search(query, knowledge_base_id, candidates)
 
-        # 如果指定了知识库，进行过滤
+        chunks_by_id = {chunk.chunk_id: chunk for chunk in vector_hits + keyword_hits}
+        fused_ids = reciprocal_rank_fusion(
+            [[chunk.chunk_id for chunk in vector_hits], [chunk.chunk_id for chunk in keyword_hits]],
+            top_k,
+        )
+        return [chunks_by_id[chunk_id] for chunk_id in fused_ids]
+
+    def search_batch(
+        self,
+        queries: list[str],
+        knowledge_base_id: str = None,
+        top_k: int = 3,
+        mode: SearchMode = SearchMode.VECTOR,
+    ) -> list[list[DocumentChunk]]:
+        """批量检索：一次 Embedding 调用，向量部分用一条 LATERAL 查询完成"""
+        if not queries:
+            return []
+        if mode == SearchMode.KEYWORD:
+            return [self._keyword_search(query, knowledge_base_id, top_k) for query in queries]
+
+        embeddings = self._embedding.embed_texts(queries)
+        if mode == SearchMode.VECTOR:
+            return self._search_by_vectors(embeddings, knowledge_base_id, top_k)
+
+        # 混合检索：向量一路批量召回，全文一路逐条召回，再逐条 RRF 融合
+        candidates = candidate_count(top_k)
+        vector_hits = self._search_by_vectors(embeddings, knowledge_base_id, candidates)
+        results = []
+        for query, vector_chunks in zip(queries, vector_hits):
+            keyword_chunks = self._keyword_search(query, knowledge_base_id, candidates)
+            chunks_by_id = {chunk.chunk_id: chunk for chunk in vector_chunks + keyword_chunks}
+            fused_ids = reciprocal_rank_fusion(
+                [[chunk.chunk_id for chunk in vector_chunks], [chunk.chunk_id for chunk in keyword_chunks]],
+                top_k,
+            )
+            results.append([chunks_by_id[chunk_id] for chunk_id in fused_ids])
+        return results
+
+    def _search_by_vectors(
+        self, query_embeddings: list[list[float]], knowledge_base_id: str, top_k: int
+    ) -> list[list[DocumentChunk]]:
+        """多个查询向量的 top_k 检索：查询向量作为一张表，对每一行 LATERAL 执行 ORDER BY 距离 LIMIT top_k
+
+        每个 LATERAL 子查询仍然走向量索引（HNSW / IVFFlat），整批只需一次数据库往返。
+        """
+        if self._storage == VectorStorage.BINARY:
+            # 二值量化的两阶段检索不便写成 LATERAL，逐条执行
+            return [self._binary_search(vector, knowledge_base_id, top_k) for vector in query_embeddings]
+
+        if self._storage == VectorStorage.HALFVEC:
+            column, vector_type = DocumentChunkModel.embedding_half, HALFVEC(EMBEDDING_DIMENSION)
+        else:
+            column, vector_type = DocumentChunkModel.embedding, Vector(EMBEDDING_DIMENSION)
+
+        query_table = union_all(*(
+            select(literal(position).label("position"), cast(vector, vector_type).label("embedding"))
+            for position, vector in enumerate(query_embeddings)
+        )).subquery("query_vectors")
+
+        # 子查询只取结果需要的列，不把向量等大字段带出 LATERAL
+        distance = column.l2_distance(query_table.c.embedding)
+        hits_query = select(
+            DocumentChunkModel.id,
+            DocumentChunkModel.document_id,
+            DocumentChunkModel.content,
+            DocumentChunkModel.chunk_index,
+            DocumentChunkModel.created_at,
+            distance.label("distance"),
+        )
         if knowledge_base_id is not None:
-            query_obj = query_obj.join(DocumentModel).filter(DocumentModel.knowledge_base_id == knowledge_base_id)
+            hits_query = hits_query.join(DocumentModel).where(DocumentModel.knowledge_base_id == knowledge_base_id)
+        hits = hits_query.order_by(distance).limit(top_k).lateral("hits")
+        chunk = aliased(DocumentChunkModel, hits)
+
+        rows = self._db.execute(
+            select(query_table.c.position, chunk)
+            .select_from(query_table)
+            .join(hits, true())
+            .order_by(query_table.c.position, hits.c.distance)
+        ).all()
+
+        results: list[list[DocumentChunk]] = [[] for _ in query_embeddings]
+        for position, db_chunk in rows:
+            results[position].append(self._to_entity(db_chunk))
+        return results
+
+    def _keyword_search(self, query: str, knowledge_base_id: str = None, top_k: int = 3) -> list[DocumentChunk]:
+        """基于 tsvector + GIN 索引的全文检索，按 ts_rank_cd 排序"""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        ts_query = keyword_tsquery(sorted(terms))
+        query_obj = self._filtered_query(knowledge_base_id).filter(
+            DocumentChunkModel.content_tsv.op("@@")(ts_query)
+        )
 
-        # 使用 pgvector 的 L2 距离排序，然后限制结果数量为 top_k
         query_obj = query_obj.order_by(
-            DocumentChunkModel.embedding.l2_distance(query_embedding)
+            func.ts_rank_cd(DocumentChunkModel.content_tsv, ts_query).desc()
         ).limit(top_k)
 
+        return [self._to_entity(db_chunk) for db_chunk in query_obj.all()]
+
+    def search_by_vector(self, query_embedding: list[float], knowledge_base_id: str = None, top_k: int = 3) -> list[DocumentChunk]:
+        """使用查询向量搜索相关文档块"""
+        if self._storage == VectorStorage.BINARY:
+            return self._binary_search(query_embedding, knowledge_base_id, top_k)
+
+        # 构建查询
+        query_obj = self._filtered_query(knowledge_base_id)
+
+        # 使用 pgvector 的 L2 距离排序，然后限制结果数量为 top_k
+        if self._storage == VectorStorage.HALFVEC:
+            distance = DocumentChunkModel.embedding_half.l2_distance(query_embedding)
+        else:
+            distance = DocumentChunkModel.embedding.l2_distance(query_embedding)
+        query_obj = query_obj.order_by(distance).limit(top_k)
+
         # 返回对应的文档块
         db_chunks = query_obj.all()
 
         # 转换为领域实体
-        results = [
-            DocumentChunk(
-                chunk_id = db_chunk.id,
-                content = db_chunk.content,
-                metadata = db_chunk.metadata
+        return [self._to_entity(db_chunk) for db_chunk in db_chunks]
+
+    def _binary_search(self, query_embedding: list[float], knowledge_base_id: str, top_k: int) -> list[DocumentChunk]:
+        """二值量化检索：先按汉明距离召回候选（走 bit 表达式索引），再用 float32 向量重排"""
+        query_vector = cast(query_embedding, Vector(EMBEDDING_DIMENSION))
+        candidates = (
+            self._filtered_query(knowledge_base_id, DocumentChunkModel.id)
+            .order_by(
+                cast(func.binary_quantize(DocumentChunkModel.embedding), BIT(EMBEDDING_DIMENSION))
+                .hamming_distance(func.binary_quantize(query_vector))
             )
-            for db_chunk in db_chunks
-        ]
- 
-        return results
+            .limit(top_k * self._rescore_factor)
+            .subquery()
+        )
+
+        db_chunks = (
+            self._db.query(DocumentChunkModel)
+            .filter(DocumentChunkModel.id.in_(select(candidates.c.id)))
+            .order_by(DocumentChunkModel.embedding.l2_distance(query_embedding))
+            .limit(top_k)
+            .all()
+        )
+        return [self._to_entity(db_chunk) for db_chunk in db_chunks]
+
+    def _filtered_query(self, knowledge_base_id: str = None, *entities):
+        """构建查询，指定知识库时按知识库过滤"""
+        query_obj = self._db.query(*(entities or (DocumentChunkModel,)))
+        if knowledge_base_id is not None:
+            query_obj = query_obj.join(DocumentModel).filter(DocumentModel.knowledge_base_id == knowledge_base_id)
+        return query_obj
+
+    def _vector_columns(self, vector: list[float]) -> dict:
+        """按存储格式决定写入哪个向量字段"""
+        if self._storage == VectorStorage.HALFVEC:
+            return {"embedding_half": vector}
+        return {"embedding": vector}
+
+    @staticmethod
+    def _to_entity(db_chunk: DocumentChunkModel) -> DocumentChunk:
+        """数据库模型转换为领域实体"""
+        return DocumentChunk(
+            chunk_id = db_chunk.id,
+            document_id = db_chunk.document_id,
+            content = db_chunk.content,
+            metadata = db_chunk.metadata
+        )
+
+    def delete_document(self, document_id: str, knowledge_base_id: str = None) -> int:
+        """删除一个文档的全部文档块（走 document_id 索引，与事务一起提交）"""
+        return self._db.query(DocumentChunkModel).filter(
+            DocumentChunkModel.document_id == document_id
+        ).delete(synchronize_session=False)
 
     def clear(self, knowledge_base_id: str = None) -> None:
         """清空向量存储"""
@@ -97,4 +315,11 @@ class PostgresVectorStore(VectorStorePort):
         query = self._db.query(DocumentChunkModel)
         if knowledge_base_id is not None:
             query = query.join(DocumentModel).filter(DocumentModel.knowledge_base_id == knowledge_base_id)
-        return query.count()
\ No newline at end of file
+        return query.count()
+
+    def has_chunks(self, knowledge_base_id: str = None) -> bool:
+        """EXISTS 查询，找到第一个文档块即返回，不统计全部"""
+        query = self._db.query(DocumentChunkModel.id)
+        if knowledge_base_id is not None:
+            query = query.join(DocumentModel).filter(DocumentModel.knowledge_base_id == knowledge_base_id)
+        return self._db.query(query.exists()).scalar()
\ No newline at end of file
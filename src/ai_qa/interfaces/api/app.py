@@ -1,20 +1,30 @@
 from pathlib import Path
 
 from fastapi import FastAPI
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, Response
 from fastapi.staticfiles import StaticFiles
 
 from ai_qa.config.logging import setup_logging
 from ai_qa.config.settings import settings
+from ai_qa.infrastructure.database.connection import pool_status
+from ai_qa.infrastructure.observability import register_db_pool, render_metrics
 from ai_qa.interfaces.api.auth_routes import router as auth_router
+from ai_qa.interfaces.api.compression import CompressionMiddleware
 from ai_qa.interfaces.api.conversation_routes import router as conversation_router
 from ai_qa.interfaces.api.exceptions import register_exception_handlers
 from ai_qa.interfaces.api.knowledge_routes import router as knowledge_router
+from ai_qa.interfaces.api.lifecycle import lifespan
 from ai_qa.interfaces.api.mcp_routes import router as mcp_router
 from ai_qa.interfaces.api.middleware import logging_middleware
 
 # 配置日志
-setup_logging(debug=settings.debug)
+setup_logging(
+    debug=settings.debug,
+    log_format=settings.log_format,
+    queue_size=settings.log_queue_size,
+    max_message_length=settings.log_max_message_length,
+    sample_rate=settings.log_sample_rate,
+)
 
 # 定义 API 标签的描述
 tags_metadata = [
@@ -70,11 +80,19 @@ app = FastAPI(
     openapi_tags=tags_metadata,
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 # 注册统一异常处理器
 register_exception_handlers(app)
 # 注册中间件
 app.middleware("http")(logging_middleware)
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+    )
 
 # 注册 API 路由
 app.include_router(conversation_router, prefix="/api/v1", tags=["对话"])
@@ -96,4 +114,21 @@ async def root():
 @app.get("/health")
 async def health_check():
     """健康检查"""
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@app.get("/health/pool")
+async def health_pool():
+    """数据库连接池状态"""
+    return pool_status()
+
+# 连接池状态在抓取指标时读取
+register_db_pool(pool_status)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 指标"""
+    rendered = render_metrics()
+    if rendered is None:
+        return PlainTextResponse("prometheus-client 未安装", status_code=503)
+    content, media_type = rendered
+    return Response(content=content, media_type=media_type)
\ No newline at end of file
@@ -31,7 +31,7 @@ async def register(
     - **email**: 邮箱，可选，不可重复
     """
     try:
-        user = user_service.register(
+        user = await user_service.register(
             username=request.username, password=request.password, email=request.email
         )
         return user
@@ -61,7 +61,7 @@ async def login(
         Authorization: Bearer {access_token}
     ```
     """
-    user, token = user_service.login(
+    user, token = await user_service.login(
         username=request.username, password=request.password
     )
     return TokenResponse(access_token=token)
@@ -80,3 +80,19 @@ async def get_me(current_user: User = Depends(get_current_user)):
     需要在请求头中携带有效的 JWT Token。
     """
     return current_user
+
+
+@router.post(
+    "/logout",
+    status_code=204,
+    summary="退出登录",
+    responses={401: {"description": "未登录或 Token 无效"}},
+)
+async def logout(
+    current_user: User = Depends(get_current_user),
+    user_service: UserService = Depends(get_user_service),
+):
+    """
+    退出登录，该用户已签发的所有 Token 立即失效（包括其他设备上的登录）。
+    """
+    user_service.logout(current_user.id)
@@ -0,0 +1,121 @@
+"""响应压缩中间件：Brotli / GZip
+
+按 Accept-Encoding 选择编码：安装了 brotli 且客户端支持时优先 br（同等 CPU 下体积更小），否则 gzip。
+Accept-Encoding 按编码和 q 值解析（br;q=0 表示拒绝）。依赖 Starlette 1.5+ 的 GZip 响应器
+（IdentityResponder 的 exclude_content_types 参数和异步 apply_compression）。
+小于 minimum_size 的响应不压缩；SSE（text/event-stream）和图片等已压缩类型不压缩——SSE 压缩后
+事件会被压缩器缓冲，心跳和逐字输出失去实时性。
+"""
+try:
+    import brotli
+except ImportError:  # pragma: no cover - 取决于运行环境
+    brotli = None
+
+import anyio.to_thread
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES, GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# 超过该大小的响应体在线程中压缩（与 Starlette GZip 一致）
+THREAD_MINIMUM_SIZE = 128 * 1024
+
+
+class BrotliResponder(IdentityResponder):
+    """Brotli 编码（复用 Starlette GZip 的响应头和分块处理逻辑）"""
+
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int, exclude_content_types: tuple[str, ...]):
+        super().__init__(app, minimum_size, exclude_content_types=exclude_content_types)
+        self.quality = quality
+        self._compressor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if self._compressor is None:
+            self._compressor = brotli.Compressor(quality=self.quality)
+        if len(body) >= THREAD_MINIMUM_SIZE:
+            # 大响应放到线程中压缩，避免阻塞事件循环
+            return await anyio.to_thread.run_sync(self._compress_body, body, more_body)
+        return self._compress_body(body, more_body)
+
+    def _compress_body(self, body: bytes, more_body: bool) -> bytes:
+        if more_body:
+            return self._compressor.process(body) + self._compressor.flush()
+        return self._compressor.process(body) + self._compressor.finish()
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    """解析 Accept-Encoding，返回 {编码: q 值}
+
+    例如 "gzip, br;q=0" -> {"gzip": 1.0, "br": 0.0}；q 值缺失或无法解析时按 1 处理。
+    """
+    codings = {}
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 1.0
+        codings[coding] = q
+    return codings
+
+
+def accepts_encoding(codings: dict[str, float], coding: str) -> bool:
+    """客户端是否接受该编码（q=0 表示明确拒绝；未列出时看通配符 *）"""
+    return codings.get(coding, codings.get("*", 0.0)) > 0
+
+
+class CompressionMiddleware:
+    """按客户端支持的编码压缩响应"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        exclude_content_types: tuple[str, ...] = DEFAULT_EXCLUDED_CONTENT_TYPES,
+    ):
+        """
+        Args:
+            app: 下游 ASGI 应用
+            minimum_size: 小于该字节数的响应不压缩
+            gzip_level: gzip 压缩级别（1-9）
+            brotli_quality: brotli 压缩质量（0-11，动态响应建议 4-5）
+            exclude_content_types: 不压缩的 Content-Type，默认包含 text/event-stream
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.exclude_content_types = exclude_content_types
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        codings = parse_accept_encoding(Headers(scope=scope).get("Accept-Encoding", ""))
+        if brotli is not None and accepts_encoding(codings, "br"):
+            responder = BrotliResponder(
+                self.app, self.minimum_size, self.brotli_quality, self.exclude_content_types
+            )
+        elif accepts_encoding(codings, "gzip"):
+            responder = GZipResponder(
+                self.app,
+                self.minimum_size,
+                compresslevel=self.gzip_level,
+                exclude_content_types=self.exclude_content_types,
+            )
+        else:
+            responder = IdentityResponder(
+                self.app, self.minimum_size, exclude_content_types=self.exclude_content_types
+            )
+        await responder(scope, receive, send)
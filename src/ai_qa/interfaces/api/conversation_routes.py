@@ -1,24 +1,34 @@
-import json
+import asyncio
+from contextlib import aclosing
+from typing import AsyncGenerator, Callable
 
-from fastapi import APIRouter, Depends
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, Header
+from sqlalchemy.orm import Session
 
 from ai_qa.application.agent_service import AgentService
 from ai_qa.application.chat_service import ChatService
 from ai_qa.application.knowledge_service import KnowledgeService
-from ai_qa.domain.entities import Conversation, MessageRole
+from ai_qa.domain.entities import AgentEvent, Conversation, MessageRole
 from ai_qa.domain.exceptions import NotFoundException
 from ai_qa.domain.ports import ConversationMemoryPort
 from ai_qa.infrastructure.database.models import User
 from ai_qa.infrastructure.mcp.client import MCPClientService
+from ai_qa.infrastructure.observability import current_timings
 from ai_qa.interfaces.api.dependencies import (
+    enforce_rate_limit,
     get_agent_service,
+    get_agent_service_factory,
     get_chat_service,
+    get_chat_service_factory,
     get_current_user,
     get_knowledge_service,
+    get_knowledge_service_factory,
     get_mcp_client,
     get_memory,
+    get_sse_registry,
 )
+from ai_qa.interfaces.api.responses import FastJSONResponse
+from ai_qa.interfaces.api.sse import SSEStreamRegistry, format_event
 from ai_qa.interfaces.api.schemas import (
     AgentChatRequest,
     AgentChatResponse,
@@ -35,6 +45,24 @@ from ai_qa.interfaces.api.schemas import (
 router = APIRouter(prefix="/conversations", tags=["对话"])
 
 
+def _metrics_event() -> str:
+    """流末尾的分阶段耗时事件
+
+    使用命名事件（event: metrics），只按 data 行拼接回答的客户端会跳过整个事件块。
+    """
+    timings = current_timings()
+    if timings is None:
+        return ""
+    return format_event(timings.to_dict(), event="metrics")
+
+
+async def _agent_sse(events: AsyncGenerator[AgentEvent, None]) -> AsyncGenerator[str, None]:
+    """把 Agent 事件序列化为 SSE 事件"""
+    async with aclosing(events):
+        async for event in events:
+            yield format_event(event.to_dict())
+
+
 # ============ 会话管理 ============
 @router.post(
     "",
@@ -119,6 +147,8 @@ async def delete_conversation(
 # ============ 消息：普通对话 ============
 @router.get(
     "/{session_id}/messages",
+    response_model=MessagesResponse,
+    response_class=FastJSONResponse,
     summary="获取消息历史",
     responses={
         401: {"description": "未登录或 Token 无效"},
@@ -134,26 +164,31 @@ async def get_messages(
 
     conversation = memory.get_conversation(session_id, user_id=current_user.id)
 
-    return MessagesResponse(
-        session_id=session_id,
-        messages=[
-            MessageItem(
-                role=msg.role.value, 
-                content=msg.content,
-                reasoning_steps=msg.reasoning_steps
-            )
-            for msg in conversation.messages
-        ],
+    # 长会话的消息列表较大，跳过 jsonable_encoder 直接序列化
+    return FastJSONResponse(
+        MessagesResponse(
+            session_id=session_id,
+            messages=[
+                MessageItem(
+                    role=msg.role.value,
+                    content=msg.content,
+                    reasoning_steps=msg.reasoning_steps
+                )
+                for msg in conversation.messages
+            ],
+        )
     )
 
 
 @router.post(
     "/{session_id}/messages",
+    dependencies=[Depends(enforce_rate_limit)],
     response_model=MessageResponse,
     summary="发送消息",
     responses={
         401: {"description": "未登录或 Token 无效"},
         404: {"description": "会话不存在"},
+        429: {"description": "请求过于频繁"},
     },
 )
 async def send_message(
@@ -171,9 +206,10 @@ async def send_message(
     - **knowledge_base_id**: 使用知识库时需指定知识库 ID
     """
 
+    # 数据库操作放到线程中执行，不阻塞事件循环
     if (
         request.use_knowledge
-        and knowledge_service.get_chunk_count(request.knowledge_base_id) > 0
+        and await asyncio.to_thread(knowledge_service.has_chunks, request.knowledge_base_id)
     ):
         # 使用知识库回答
         response_content = knowledge_service.query(
@@ -203,81 +239,128 @@ async def send_message(
 
 @router.post(
     "/{session_id}/messages/stream",
+    dependencies=[Depends(enforce_rate_limit)],
     summary="发送消息（流式）",
     responses={
         401: {"description": "未登录或 Token 无效"},
         404: {"description": "会话不存在"},
+        429: {"description": "请求过于频繁"},
     },
 )
 async def send_message_stream(
     session_id: str,
     request: SendMessageRequest,
     current_user: User = Depends(get_current_user),
-    chat_service: ChatService = Depends(get_chat_service),
-    memory: ConversationMemoryPort = Depends(get_memory),
-    knowledge_service: KnowledgeService = Depends(get_knowledge_service),
+    chat_service_factory: Callable[[Session], ChatService] = Depends(get_chat_service_factory),
+    knowledge_service_factory: Callable[[Session], KnowledgeService] = Depends(get_knowledge_service_factory),
+    sse: SSEStreamRegistry = Depends(get_sse_registry),
 ):
     """
         发送消息并获取 AI 回复（流式响应）。
 
         使用 Server-Sent Events (SSE) 格式返回，实现打字机效果。
+        每个事件带 `id`，空闲时发送 `: ping` 心跳；连接中断后用
+        `GET /{session_id}/messages/stream/resume` 携带 Last-Event-ID 续传。
+        客户端断开且超过续传时间无人续传时停止生成，已生成的部分回复保存到对话历史。
 
         响应格式：
     ```
+        id: 3f2a...:1
         data: "你"
+
+        id: 3f2a...:2
         data: "好"
-        data: "！"
+
+        : ping
+
+        id: 3f2a...:3
+        event: metrics
+        data: {"auth": 1.8, "history": 3.2, "llm_ttft": 412.0, "llm": 1830.5, "persist": 4.1, "total": 1851.2}
+
+        id: 3f2a...:4
         data: [DONE]
     ```
     """
     # 流式暂时只支持普通对话，知识库对话后续可以扩展
-    if (
-        request.use_knowledge
-        and knowledge_service.get_chunk_count(request.knowledge_base_id) > 0
-    ):
-
-        def generate():
-            full_response = ""
-
-            # 知识库模式用非流式返回
-            for chunk in knowledge_service.query_stream(
-                request.content,
-                session_id=session_id,
-                user_id=current_user.id,
-                knowledge_base_id=request.knowledge_base_id,
-            ):
-                full_response += chunk
-                yield f"data: {json.dumps(chunk)}\n\n"
-
-            # 同时保存到对话历史
-            conversation = memory.get_conversation(session_id, user_id=current_user.id)
-            conversation.add_message(MessageRole.USER, request.content)
-            conversation.add_message(MessageRole.ASSISTANT, full_response)
-            memory.save_conversation(conversation)
-
-            yield "data: [DONE]\n\n"
-
-        return StreamingResponse(generate(), media_type="text/event-stream")
-
-    def generate():
-        for chunk in chat_service.chat_stream(
-            session_id, request.content, user_id=current_user.id
+    # 在后台任务自己的数据库会话上创建服务（流可能在请求结束后继续生成）
+    async def generate(db: Session):
+        chat_service = chat_service_factory(db)
+        knowledge_service = knowledge_service_factory(db) if request.use_knowledge else None
+
+        # 数据库操作放到线程中执行，不阻塞事件循环
+        if knowledge_service is not None and await asyncio.to_thread(
+            knowledge_service.has_chunks, request.knowledge_base_id
         ):
-            # SSE 格式： data:{内容}\n\n
-            yield f"data: {json.dumps(chunk)}\n\n"
+            full_response = ""
+            completed = False
+
+            try:
+                async with aclosing(knowledge_service.aquery_stream(
+                    request.content,
+                    session_id=session_id,
+                    user_id=current_user.id,
+                    knowledge_base_id=request.knowledge_base_id,
+                )) as chunks:
+                    async for chunk in chunks:
+                        full_response += chunk
+                        yield format_event(chunk)
+                completed = True
+            finally:
+                # 同时保存到对话历史（客户端中途断开时保存已生成的部分）
+                if completed or full_response:
+                    await chat_service.asave_exchange(
+                        session_id, request.content, full_response, user_id=current_user.id
+                    )
+        else:
+            async with aclosing(chat_service.achat_stream(
+                session_id, request.content, user_id=current_user.id
+            )) as chunks:
+                async for chunk in chunks:
+                    # SSE 格式： data:{内容}\n\n
+                    yield format_event(chunk)
+
+        metrics = _metrics_event()
+        if metrics:
+            yield metrics
         yield "data: [DONE]\n\n"
 
-    return StreamingResponse(generate(), media_type="text/event-stream")
+    return sse.response(generate, user_id=current_user.id, session_id=session_id)
+
+
+@router.get(
+    "/{session_id}/messages/stream/resume",
+    summary="续传流式回复",
+    responses={
+        200: {"description": "SSE 流式响应", "content": {"text/event-stream": {}}},
+        401: {"description": "未登录或 Token 无效"},
+        404: {"description": "流不存在、已过期或无法从该位置续传"},
+    },
+)
+async def resume_message_stream(
+    session_id: str,
+    last_event_id: str = Header(..., alias="Last-Event-ID"),
+    current_user: User = Depends(get_current_user),
+    sse: SSEStreamRegistry = Depends(get_sse_registry),
+):
+    """
+    连接中断后续传流式回复（普通对话和 Agent 对话通用）。
+
+    请求头 `Last-Event-ID` 为最后收到的事件 id，从下一个事件开始输出，格式与原来的流相同。
+    服务端在连接断开后保留流一小段时间（SSE_RESUME_TTL），超时后无法续传。
+    """
+    return sse.resume(last_event_id, user_id=current_user.id, session_id=session_id)
 
 
 # ============ 消息：Agent 对话 ============
 @router.post(
     "/{session_id}/messages/agent",
+    dependencies=[Depends(enforce_rate_limit)],
     response_model=AgentChatResponse,
     summary="Agent 对话",
     responses={
         401: {"description": "未登录或 Token 无效"},
         404: {"description": "会话不存在"},
+        429: {"description": "请求过于频繁"},
     },
 )
 async def send_agent_message(
@@ -314,19 +397,22 @@ async def send_agent_message(
 
 @router.post(
     "/{session_id}/messages/agent/stream",
+    dependencies=[Depends(enforce_rate_limit)],
     summary="Agent 对话（流式）",
     responses={
         200: {"description": "SSE 流式响应", "content": {"text/event-stream": {}}},
         401: {"description": "未登录或 Token 无效"},
         404: {"description": "会话不存在"},
+        429: {"description": "请求过于频繁"},
     },
 )
 async def send_agent_message_stream(
     session_id: str,
     request: AgentChatRequest,
     current_user: User = Depends(get_current_user),
-    agent_service: AgentService = Depends(get_agent_service),
+    agent_service_factory: Callable[[Session], AgentService] = Depends(get_agent_service_factory),
     mcp_client: MCPClientService = Depends(get_mcp_client),
+    sse: SSEStreamRegistry = Depends(get_sse_registry),
 ):
     """
     Agent 模式对话（流式）, AI 可自主调用工具，
@@ -341,6 +427,8 @@ async def send_agent_message_stream(
     - `tool_result`: 工具返回结果
     - `answer`: 最终回答（逐字）
     - `done`: 完成
+
+    事件 id、心跳和断线续传同普通对话的流式接口。
     """
 
     if request.mcp_servers:
@@ -349,12 +437,13 @@ async def send_agent_message_stream(
     else:
         mcp_tools = []
 
-    return StreamingResponse(
-        agent_service.chat_stream(
+    # 在后台任务自己的数据库会话上创建服务（流可能在请求结束后继续生成）
+    def generate(db: Session) -> AsyncGenerator[str, None]:
+        return _agent_sse(agent_service_factory(db).chat_stream(
             session_id=session_id,
             user_input=request.content,
             user_id=current_user.id,
             extra_tools=mcp_tools,
-        ),
-        media_type="text/event-stream",
-    )
+        ))
+
+    return sse.response(generate, user_id=current_user.id, session_id=session_id)
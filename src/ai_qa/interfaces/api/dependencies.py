@@ -1,6 +1,7 @@
 from functools import lru_cache
+from typing import Callable
 
-from fastapi import Depends
+from fastapi import Depends, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.orm import Session
 
@@ -10,24 +11,38 @@ from ai_qa.application.knowledge_base_service import KnowledgeBaseService
 from ai_qa.application.knowledge_service import KnowledgeService
 from ai_qa.application.user_service import UserService
 from ai_qa.config.settings import Settings
-from ai_qa.domain.exceptions import ForbiddenException, UnauthorizedException
+from ai_qa.domain.entities import SearchMode
+from ai_qa.domain.exceptions import ForbiddenException, TooManyRequestsException, UnauthorizedException
 from ai_qa.domain.ports import (
+    AnswerCachePort,
     ConversationMemoryPort,
     EmbeddingPort,
     LLMPort,
+    RateLimiterPort,
+    RerankerPort,
+    UsageRecorderPort,
     VectorStorePort,
 )
-from ai_qa.infrastructure.auth.security import verify_token
-from ai_qa.infrastructure.database.connection import get_db
+from ai_qa.infrastructure.auth import AuthCache, verify_token
+from ai_qa.infrastructure.cache import InMemorySemanticCache, TTLCache
+from ai_qa.infrastructure.database.connection import SessionLocal, get_db
 from ai_qa.infrastructure.database.models import User
 from ai_qa.infrastructure.embedding.dashscope_embedding import DashScopeEmbeddingAdapter
+from ai_qa.infrastructure.http import HttpClientPool
 from ai_qa.infrastructure.llm.qwen_adapter import QwenAdapter
 from ai_qa.infrastructure.mcp.client import MCPClientService
+from ai_qa.infrastructure.observability import span
+from ai_qa.infrastructure.ratelimit import InMemoryTokenBucket, PostgresTokenBucket
 from ai_qa.infrastructure.memory.postgres_memory import PostgresConversationMemory
+from ai_qa.infrastructure.rerank import CrossEncoderReranker, LexicalReranker
 from ai_qa.infrastructure.tools import calculator
 from ai_qa.infrastructure.tools.knowledge_search import create_knowledge_search_tool
 from ai_qa.infrastructure.tools.time_tool import get_current_time
-from ai_qa.infrastructure.vectorstore.postgres_store import PostgresVectorStore
+from ai_qa.infrastructure.usage import BatchedUsageRecorder, current_usage_scope
+from ai_qa.infrastructure.vectorstore.faiss_index import FaissIndexConfig
+from ai_qa.infrastructure.vectorstore.faiss_store import FaissVectorStore
+from ai_qa.infrastructure.vectorstore.postgres_store import PostgresVectorStore, VectorStorage
+from ai_qa.interfaces.api.sse import SSEStreamRegistry
 
 # ============ 配置 ============
 
@@ -37,14 +52,34 @@ def get_settings() -> Settings:
     return Settings()
 
 # ============ AI 相关（单例）============
+@lru_cache
+def get_http_pool() -> HttpClientPool:
+    """获取共享 HTTP 连接池（单例，LLM 与 Embedding 共用）"""
+    return HttpClientPool.from_settings(get_settings())
+
+@lru_cache
+def get_usage_recorder() -> UsageRecorderPort | None:
+    """获取模型用量记录器（单例，未启用时返回 None）"""
+    settings = get_settings()
+    if not settings.usage_tracking_enabled:
+        return None
+    return BatchedUsageRecorder(
+        session_factory=SessionLocal,
+        flush_interval=settings.usage_flush_interval
+    )
+
 @lru_cache
 def get_llm() -> LLMPort:
     """获取 LLM 实例（单例）"""
     settings = get_settings()
+    http_pool = get_http_pool()
     return QwenAdapter(
         api_key=settings.llm_api_key.get_secret_value(),
         base_url=settings.llm_base_url,
-        model_name=settings.llm_model
+        model_name=settings.llm_model,
+        http_client=http_pool.sync_client,
+        http_async_client=http_pool.async_client,
+        usage_recorder=get_usage_recorder()
     )
 
 @lru_cache
@@ -53,7 +88,59 @@ def get_embedding() -> EmbeddingPort:
     settings = get_settings()
     return DashScopeEmbeddingAdapter(
         model_name=settings.embedding_model_name,
-        api_key=settings.llm_api_key.get_secret_value()
+        api_key=settings.llm_api_key.get_secret_value(),
+        base_url=settings.llm_base_url,
+        http_client=get_http_pool().sync_client,
+        usage_recorder=get_usage_recorder()
+    )
+
+@lru_cache
+def get_answer_cache() -> AnswerCachePort | None:
+    """获取 RAG 语义回答缓存（单例，未启用时返回 None）"""
+    settings = get_settings()
+    if not settings.semantic_cache_enabled:
+        return None
+    return InMemorySemanticCache(
+        threshold=settings.semantic_cache_threshold,
+        max_entries_per_kb=settings.semantic_cache_max_entries,
+        ttl_seconds=settings.semantic_cache_ttl
+    )
+
+@lru_cache
+def get_reranker() -> RerankerPort | None:
+    """获取 RAG 重排序器（单例，未启用时返回 None）"""
+    settings = get_settings()
+    if settings.reranker == "lexical":
+        return LexicalReranker()
+    if settings.reranker == "cross-encoder":
+        return CrossEncoderReranker(
+            model_name=settings.rerank_model,
+            batch_size=settings.rerank_batch_size,
+            num_threads=settings.rerank_threads
+        )
+    return None
+
+@lru_cache
+def get_rewrite_cache() -> TTLCache:
+    """获取 RAG 查询改写缓存（单例）"""
+    settings = get_settings()
+    return TTLCache(
+        max_size=settings.rewrite_cache_max_size,
+        ttl_seconds=settings.rewrite_cache_ttl
+    )
+
+@lru_cache
+def get_faiss_store() -> FaissVectorStore:
+    """获取 FAISS 向量存储（单例，索引常驻内存）"""
+    settings = get_settings()
+    return FaissVectorStore(
+        embedding=get_embedding(),
+        persist_directory=settings.knowledge_persist_dir,
+        index_config=FaissIndexConfig.from_settings(settings),
+        max_loaded_kbs=settings.faiss_max_loaded_kbs,
+        checkpoint_segments=settings.faiss_checkpoint_segments,
+        compact_segments=settings.faiss_compact_segments,
+        mmap=settings.faiss_mmap
     )
 
 @lru_cache
@@ -64,6 +151,17 @@ def get_mcp_client() -> MCPClientService:
         config_path=settings.mcp_config_path
     )
 
+@lru_cache
+def get_sse_registry() -> SSEStreamRegistry:
+    """获取 SSE 流登记表（单例，缓冲流式输出用于续传）"""
+    settings = get_settings()
+    return SSEStreamRegistry(
+        buffer_size=settings.sse_buffer_size,
+        heartbeat_interval=settings.sse_heartbeat_interval,
+        resume_ttl=settings.sse_resume_ttl,
+        session_factory=SessionLocal
+    )
+
 # ============ 数据库相关（每次请求）============
 
 def get_memory(db: Session = Depends(get_db)) -> ConversationMemoryPort:
@@ -73,13 +171,15 @@ def get_memory(db: Session = Depends(get_db)) -> ConversationMemoryPort:
 
 def get_vector_store(db: Session = Depends(get_db)) -> VectorStorePort:
     """获取向量存储实例"""
-    # embedding = get_embedding()
-    # settings = get_settings()
-    # return FaissVectorStore(
-    #     embedding = embedding,
-    #     persist_directory=settings.knowledge_persist_dir
-    # )
-    return PostgresVectorStore(db, get_embedding())
+    settings = get_settings()
+    if settings.vector_store == "faiss":
+        return get_faiss_store()
+    return PostgresVectorStore(
+        db,
+        get_embedding(),
+        storage=VectorStorage(settings.vector_storage),
+        rescore_factor=settings.vector_rescore_factor
+    )
 
 # ============ 服务层（每次请求）============
 
@@ -102,7 +202,14 @@ def get_knowledge_service(
         vector_store=vector_store,
         llm=get_llm(),
         memory=memory,
-        db=db
+        db=db,
+        embedding=get_embedding(),
+        answer_cache=get_answer_cache(),
+        rewrite_cache=get_rewrite_cache(),
+        speculative_retrieval=get_settings().speculative_retrieval,
+        search_mode=SearchMode(get_settings().retrieval_mode),
+        reranker=get_reranker(),
+        rerank_candidates=get_settings().rerank_candidates
     )
 
 def get_knowledge_base_service(db: Session = Depends(get_db)) -> KnowledgeBaseService:
@@ -113,31 +220,56 @@ def get_knowledge_base_service(db: Session = Depends(get_db)) -> KnowledgeBaseSe
 
 security = HTTPBearer(auto_error=False)
 
+@lru_cache
+def get_auth_cache() -> AuthCache:
+    """获取鉴权缓存（单例）"""
+    settings = get_settings()
+    return AuthCache(
+        max_size=settings.auth_cache_max_size,
+        ttl_seconds=settings.auth_cache_ttl
+    )
+
 def get_user_service(db: Session = Depends(get_db)) -> UserService:
     """获取用户服务"""
-    return UserService(db)
+    return UserService(db, auth_cache=get_auth_cache())
 
 def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ) -> User:
-    """获取当前登录用户（必须登录）"""
+    """获取当前登录用户（必须登录），同时把本次请求的模型用量归属到该用户和会话
+
+    Token 和用户状态走鉴权缓存，返回的是只读的用户快照（不绑定本次请求的数据库会话）
+    """
     if not credentials:
         raise UnauthorizedException("未提供认证信息")
     
-    payload = verify_token(credentials.credentials)
-    if not payload:
-        raise UnauthorizedException("Token 无效或已过期")
-    
-    user_id = payload.get("user_id")
-    user = db.query(User).filter(User.id == user_id).first()
+    auth_cache = get_auth_cache()
+    with span("auth"):
+        payload = auth_cache.verify(credentials.credentials)
+        if not payload:
+            raise UnauthorizedException("Token 无效或已过期")
+
+        user = auth_cache.get_user(
+            payload.get("user_id"),
+            lambda user_id: db.query(User).filter(User.id == user_id).first()
+        )
 
     if not user:
         raise UnauthorizedException("用户不存在")
+
+    if payload.get("ver", 0) != (user.token_version or 0):
+        raise UnauthorizedException("Token 已失效，请重新登录")
     
     if user.status != 1:
         raise ForbiddenException("用户账号已被禁用")
-    
+
+    scope = current_usage_scope()
+    if scope is not None:
+        scope.user_id = user.id
+        scope.conversation_id = request.path_params.get("session_id", "")
+
     return user
 
 def get_current_user_optional(
@@ -174,3 +306,53 @@ def get_agent_service(
             tools=tools,
         )
     
+
+# ====== 流式接口（后台任务的数据库会话）======
+# SSE 流在后台任务中生成，请求结束后可能继续运行（等待续传），不能使用请求的数据库会话；
+# 流式接口注入下面的工厂，在后台任务自己打开的会话上创建服务
+
+def get_chat_service_factory() -> Callable[[Session], ChatService]:
+    """获取聊天服务工厂"""
+    return lambda db: get_chat_service(get_memory(db))
+
+def get_knowledge_service_factory() -> Callable[[Session], KnowledgeService]:
+    """获取知识库服务工厂"""
+    return lambda db: get_knowledge_service(db, get_vector_store(db), get_memory(db))
+
+def get_agent_service_factory() -> Callable[[Session], AgentService]:
+    """获取 Agent 服务工厂"""
+    def factory(db: Session) -> AgentService:
+        memory = get_memory(db)
+        knowledge_service = get_knowledge_service(db, get_vector_store(db), memory)
+        return get_agent_service(db, memory, knowledge_service)
+    return factory
+
+# ====== 限流 ======
+
+@lru_cache
+def get_rate_limiter() -> RateLimiterPort | None:
+    """获取限流器（单例，未启用时返回 None）"""
+    settings = get_settings()
+    if not settings.rate_limit_enabled:
+        return None
+    if settings.rate_limit_backend == "postgres":
+        return PostgresTokenBucket(
+            session_factory=SessionLocal,
+            capacity=settings.rate_limit_capacity,
+            refill_rate=settings.rate_limit_refill_per_second
+        )
+    return InMemoryTokenBucket(
+        capacity=settings.rate_limit_capacity,
+        refill_rate=settings.rate_limit_refill_per_second
+    )
+
+def enforce_rate_limit(
+    current_user: User = Depends(get_current_user),
+    limiter: RateLimiterPort | None = Depends(get_rate_limiter),
+) -> None:
+    """按用户限流，用于调用 LLM / Embedding 的接口（在进入业务逻辑之前拒绝）"""
+    if limiter is None:
+        return
+    retry_after = limiter.acquire(f"user:{current_user.id}")
+    if retry_after > 0:
+        raise TooManyRequestsException(retry_after)
@@ -23,5 +23,6 @@ async def app_exception_handler(request: Request, exc: AppException):
     logger.warning(f"业务异常 url={request.url} status={exc.status_code} detail={exc.detail}")
     return JSONResponse(
         status_code=exc.status_code,
-        content={"detail":exc.detail}
+        content={"detail":exc.detail},
+        headers=getattr(exc, "headers", None)
     )
\ No newline at end of file
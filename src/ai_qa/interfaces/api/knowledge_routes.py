@@ -6,6 +6,7 @@ from ai_qa.domain.exceptions import NotFoundException, ValidationException
 from ai_qa.infrastructure.database.models import User
 from ai_qa.infrastructure.document.pdf_reader import extract_text_from_pdf
 from ai_qa.interfaces.api.dependencies import (
+    enforce_rate_limit,
     get_current_user,
     get_knowledge_base_service,
     get_knowledge_service,
@@ -67,23 +68,12 @@ async def list_knowledge_bases(
     kb_service: KnowledgeBaseService = Depends(get_knowledge_base_service),
 ):
     """获取当前用户的所有知识库。"""
-    kbs = kb_service.list_by_user(current_user.id)
-
-    result = []
-    for kb in kbs:
-        stats = kb_service.get_stats(kb.id, current_user.id)
-        result.append(
-            KnowledgeBaseResponse(
-                id=kb.id,
-                name=kb.name,
-                description=kb.description,
-                document_count=stats["document_count"] if stats else 0,
-                chunk_count=stats["chunk_count"] if stats else 0,
-                created_at=kb.created_at,
-                updated_at=kb.updated_at,
-            )
-        )
-    return KnowledgeBaseListResponse(knowledge_bases=result)
+    return KnowledgeBaseListResponse(
+        knowledge_bases=[
+            KnowledgeBaseResponse(**stats)
+            for stats in kb_service.list_with_stats(current_user.id)
+        ]
+    )
 
 
 @router.get(
@@ -205,11 +195,13 @@ async def clear_documents(
 
 @router.post(
     "/knowledge-bases/{kb_id}/documents/text",
+    dependencies=[Depends(enforce_rate_limit)],
     response_model=SuccessResponse,
     summary="添加文本文档",
     responses={
         401: {"description": "未登录或 Token 无效"},
         404: {"description": "知识库不存在"},
+        429: {"description": "请求过于频繁"},
     },
 )
 async def add_document(
@@ -237,14 +229,45 @@ async def add_document(
     return SuccessResponse(message=f"文档已添加。共切分为 {chunk_count} 个文档块")
 
 
+@router.delete(
+    "/knowledge-bases/{kb_id}/documents/{doc_id}",
+    response_model=SuccessResponse,
+    summary="删除文档",
+    responses={
+        401: {"description": "未登录或 Token 无效"},
+        404: {"description": "知识库或文档不存在"},
+    },
+)
+async def delete_document(
+    kb_id: str,
+    doc_id: str,
+    current_user: User = Depends(get_current_user),
+    knowledge_service: KnowledgeService = Depends(get_knowledge_service),
+    kb_service: KnowledgeBaseService = Depends(get_knowledge_base_service),
+):
+    """从知识库删除文档及其全部文档块。更新文档时先删除再重新添加。"""
+
+    # 验证知识库归属
+    kb = kb_service.get_by_id(kb_id, current_user.id)
+    if not kb:
+        raise NotFoundException(resource="知识库")
+
+    if not knowledge_service.delete_document(knowledge_base_id=kb_id, document_id=doc_id):
+        raise NotFoundException(resource="文档")
+
+    return SuccessResponse(message="文档已删除")
+
+
 @router.post(
     "/knowledge-bases/{kb_id}/documents/upload",
+    dependencies=[Depends(enforce_rate_limit)],
     response_model=SuccessResponse,
     summary="上传文件",
     responses={
         400: {"description": "文件类型不支持或内容为空"},
         401: {"description": "未登录或 Token 无效"},
         404: {"description": "知识库不存在"},
+        429: {"description": "请求过于频繁"},
     },
 )
 async def upload_document(
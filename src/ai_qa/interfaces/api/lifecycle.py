@@ -0,0 +1,103 @@
+"""应用生命周期：启动预热和退出清理
+
+- 启动：预先创建 LLM、Embedding、鉴权缓存等单例并建立一个数据库连接，
+  避免第一批请求承担初始化耗时（worker 启动完成前不会接收请求）；
+  VECTOR_STORE=faiss 时总是先打开 FAISS 存储，持久化目录已被其他进程占用时启动失败
+- 退出（SIGTERM）：uvicorn 先停止接收新连接并等待进行中的请求（SERVER_GRACEFUL_TIMEOUT），
+  之后执行这里的清理：等待后台 SSE 生成结束、断开 MCP 连接、写入剩余的用量、关闭 HTTP 连接池、
+  清理本 worker 的多进程指标
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Callable
+
+from fastapi import FastAPI
+from sqlalchemy import text
+
+from ai_qa.config.settings import settings
+from ai_qa.infrastructure.database.connection import engine
+from ai_qa.infrastructure.observability import mark_worker_exit
+from ai_qa.interfaces.api.dependencies import (
+    get_auth_cache,
+    get_embedding,
+    get_faiss_store,
+    get_http_pool,
+    get_llm,
+    get_mcp_client,
+    get_rate_limiter,
+    get_reranker,
+    get_sse_registry,
+    get_usage_recorder,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up() -> None:
+    """创建单例并建立数据库连接（在线程中执行），失败只记录日志，不阻止启动"""
+    singletons = [
+        get_http_pool,
+        get_usage_recorder,
+        get_llm,
+        get_embedding,
+        get_reranker,
+        get_auth_cache,
+        get_rate_limiter,
+        get_sse_registry,
+        get_mcp_client,
+    ]
+    for getter in singletons:
+        try:
+            getter()
+        except Exception as e:
+            logger.warning(f"预热失败 {getter.__name__} error={e}")
+
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    except Exception as e:
+        logger.warning(f"预热数据库连接失败 error={e}")
+    logger.info("预热完成")
+
+
+def _created(getter: Callable):
+    """返回已创建的单例，未创建过时返回 None（退出时不为清理而新建实例）"""
+    return getter() if getter.cache_info().currsize else None
+
+
+async def shutdown() -> None:
+    """退出清理，每一步失败不影响后续步骤"""
+    sse = _created(get_sse_registry)
+    if sse is not None:
+        await sse.drain(settings.server_drain_timeout)
+
+    mcp_client = _created(get_mcp_client)
+    if mcp_client is not None:
+        try:
+            await mcp_client.disconnect_all()
+        except Exception as e:
+            logger.warning(f"断开 MCP 连接失败 error={e}")
+
+    recorder = _created(get_usage_recorder)
+    if recorder is not None:
+        await asyncio.to_thread(recorder.flush)
+
+    http_pool = _created(get_http_pool)
+    if http_pool is not None:
+        await http_pool.aclose()
+
+    mark_worker_exit()
+    logger.info("应用已停止")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """FastAPI lifespan"""
+    if settings.vector_store == "faiss":
+        # FAISS 持久化目录由一个进程独占：被其他 worker 占用时直接启动失败，而不是每个请求报错
+        await asyncio.to_thread(get_faiss_store)
+    if settings.server_warmup:
+        await asyncio.to_thread(warm_up)
+    yield
+    await shutdown()
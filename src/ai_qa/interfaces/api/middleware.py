@@ -3,26 +3,61 @@ import time
 
 from fastapi import Request
 
+from ai_qa.infrastructure.observability import start_request
+from ai_qa.infrastructure.observability.metrics import SSE_ACTIVE_STREAMS, SSE_BYTES_SENT
+from ai_qa.infrastructure.usage import start_usage_scope
+
 logger = logging.getLogger(__name__)
 
 async def logging_middleware(request: Request, call_text):
-    """请求日志中间件"""
+    """请求日志中间件
+
+    同时为请求创建分阶段计时和用量归属范围，处理完成后把已记录的阶段写入 Server-Timing 响应头
+    （流式响应只包含开始输出前的阶段，完整计时见流末尾的 metrics 事件）。
+    """
     start_time = time.time()
+    timings = start_request()
+    start_usage_scope()
 
     # 处理请求
     response = await call_text(request)
 
     # 计算耗时
     duration = time.time() - start_time
+    response.headers["Server-Timing"] = timings.server_timing()
+
+    if response.headers.get("content-type", "").startswith("text/event-stream"):
+        _meter_stream(request, response)
 
     # 记录日志
     # # 跳过静态文件日志
     # path = request.url.path
     # if not path.startswith("/static"):
-    logger.info(
+    # 访问日志按 LOG_SAMPLE_RATE 采样，服务端错误用 WARNING 级别保证不被采样丢弃
+    level = logging.WARNING if response.status_code >= 500 else logging.INFO
+    logger.log(
+        level,
         f"{request.method} {request.url.path} "
         f"status={response.status_code} "
         f"duration={duration:.3f}s"
     )
     
-    return response
\ No newline at end of file
+    return response
+
+
+def _meter_stream(request: Request, response) -> None:
+    """统计 SSE 活跃流数量和发送字节数（按路由模板聚合，避免会话 ID 进入标签）"""
+    route = request.scope.get("route")
+    path = getattr(route, "path", request.url.path)
+    body = response.body_iterator
+
+    async def metered():
+        SSE_ACTIVE_STREAMS.labels(path).inc()
+        try:
+            async for chunk in body:
+                SSE_BYTES_SENT.labels(path).inc(len(chunk))
+                yield chunk
+        finally:
+            SSE_ACTIVE_STREAMS.labels(path).dec()
+
+    response.body_iterator = metered()
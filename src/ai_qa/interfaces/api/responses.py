@@ -0,0 +1,25 @@
+"""高频接口使用的快速 JSON 响应
+
+FastAPI 默认对没有 response_model 的返回值先做 jsonable_encoder（逐个字段递归转换）再 json.dumps，
+消息很多时这一步是主要的 CPU 开销。FastJSONResponse 跳过 jsonable_encoder：
+
+- Pydantic 模型：直接用 model_dump_json（pydantic-core 实现）输出字节
+- 其他数据：使用 json_codec（安装了 orjson 时使用 orjson）
+
+路由直接返回 FastJSONResponse 实例，同时声明 response_model 保留 OpenAPI 文档。
+"""
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from ai_qa.infrastructure.utils.json_codec import dumps_bytes
+
+
+class FastJSONResponse(JSONResponse):
+    """不经过 jsonable_encoder 的 JSON 响应"""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.model_dump_json().encode("utf-8")
+        return dumps_bytes(content)
@@ -27,6 +27,7 @@ class KnowledgeBaseResponse(BaseModel):
     description: str | None = Field(None, description="知识库描述")
     document_count: int = Field(0, description="文档数量")
     chunk_count: int = Field(0, description="文档块数量")
+    total_bytes: int = Field(0, description="文档总字节数")
     created_at: datetime | None = None
     updated_at: datetime | None = None
 
@@ -0,0 +1,86 @@
+"""生产环境启动入口：多进程 uvicorn
+
+    python -m ai_qa.interfaces.api.server
+
+进程数、keep-alive、连接队列和并发上限由 SERVER_* 配置决定（开发环境使用 run_api.py 的自动重载）。
+每个 worker 是独立进程，进程内的缓存、限流桶和 SSE 续传缓冲区不共享：多 worker 时
+限流使用 RATE_LIMIT_BACKEND=postgres，SSE 续传需要负载均衡按会话做粘性路由。
+VECTOR_STORE=faiss 的段文件、检查点和段序号由单个进程维护，多个进程同时写入会互相覆盖，
+因此 FAISS 只支持 SERVER_WORKERS=1，多 worker 部署需要使用 VECTOR_STORE=postgres。这里启动前检查配置；
+不经过本入口（如 uvicorn --workers N）时，FAISS 存储对持久化目录加的进程锁会让第二个 worker 启动失败。
+
+多 worker 共用一个端口，每次 /metrics 抓取只落到一个 worker，因此 SERVER_WORKERS>1 时启用
+prometheus-client 的多进程模式（PROMETHEUS_MULTIPROC_DIR，未配置时创建临时目录），由 /metrics 汇总所有 worker。
+
+收到 SIGTERM 后停止接收新连接，等待进行中的请求最多 SERVER_GRACEFUL_TIMEOUT 秒，
+再执行 lifespan 清理（等待后台 SSE 生成最多 SERVER_DRAIN_TIMEOUT 秒）。
+容器的停止等待时间需要大于两者之和。
+"""
+import os
+import tempfile
+from pathlib import Path
+
+import uvicorn
+
+from ai_qa.config.settings import settings
+from ai_qa.infrastructure.observability.metrics import MULTIPROC_DIR_ENV
+
+
+def check_workers(vector_store: str, workers: int) -> None:
+    """检查进程数与向量存储是否兼容
+
+    Args:
+        vector_store: 向量存储类型
+        workers: 进程数
+
+    Raises:
+        ValueError: FAISS 存储配置了多个进程
+    """
+    if vector_store == "faiss" and workers > 1:
+        raise ValueError(
+            f"VECTOR_STORE=faiss 不支持多进程（SERVER_WORKERS={workers}），"
+            "请设置 SERVER_WORKERS=1 或改用 VECTOR_STORE=postgres"
+        )
+
+
+def prepare_metrics_dir(workers: int, directory: str = "") -> str | None:
+    """为多进程指标准备目录并写入环境变量（在启动 worker 之前调用，worker 继承该变量）
+
+    目录中上次运行遗留的指标文件会被删除，避免已退出进程的计数被重复汇总。
+
+    Args:
+        workers: 进程数
+        directory: 配置的目录，为空时单进程不启用、多进程创建临时目录
+
+    Returns:
+        启用的目录；不需要多进程模式时返回 None
+    """
+    if not directory and workers <= 1:
+        return None
+    path = Path(directory) if directory else Path(tempfile.mkdtemp(prefix="ai_qa_metrics_"))
+    path.mkdir(parents=True, exist_ok=True)
+    for stale in path.glob("*.db"):
+        stale.unlink()
+    os.environ[MULTIPROC_DIR_ENV] = str(path)
+    return str(path)
+
+
+def main() -> None:
+    check_workers(settings.vector_store, settings.server_workers)
+    prepare_metrics_dir(settings.server_workers, settings.prometheus_multiproc_dir)
+    uvicorn.run(
+        "ai_qa.interfaces.api.app:app",
+        host=settings.server_host,
+        port=settings.server_port,
+        workers=settings.server_workers,
+        backlog=settings.server_backlog,
+        limit_concurrency=settings.server_limit_concurrency or None,
+        timeout_keep_alive=settings.server_keepalive,
+        timeout_graceful_shutdown=settings.server_graceful_timeout,
+        proxy_headers=True,
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""SSE 流：事件 ID、心跳、背压和断线续传
+
+业务生成器产出的 SSE 事件（`data: ...\\n\\n`）不直接交给 StreamingResponse，而是由后台任务写入
+每个流独立的有界缓冲区，响应从缓冲区读取：
+
+- 事件 ID：每个事件加上 `id: <stream_id>:<序号>`，客户端断线后用 Last-Event-ID 续传
+- 心跳：超过 heartbeat_interval 秒没有事件时发送注释行 `: ping`，避免代理断开空闲连接
+- 背压：客户端读取慢时，未发送的事件达到缓冲区一半后暂停读取业务生成器（也就暂停了 LLM 流）
+- 续传：客户端断开后流在 resume_ttl 秒内保留，期间可以续传；超时无人续传则取消生成，
+  业务生成器按客户端断开处理（关闭上游 LLM 流、保存已生成的部分）
+
+后台任务可能在请求结束后继续运行（等待续传），不能使用请求的数据库会话：
+业务生成器由工厂在后台任务中创建，传入该任务自己打开、结束时关闭的数据库会话。
+
+缓冲区在进程内，多 worker 部署时续传请求需要落到同一个 worker（按会话做粘性路由）。
+"""
+import asyncio
+import logging
+import uuid
+from collections import deque
+from contextlib import aclosing
+from typing import AsyncGenerator, Callable
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from ai_qa.domain.exceptions import NotFoundException
+from ai_qa.infrastructure.utils.json_codec import dumps
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT = ": ping\n\n"
+
+# 业务生成器工厂：参数是后台任务的数据库会话（登记表没有配置会话工厂时为 None）
+SourceFactory = Callable[[Session | None], AsyncGenerator[str, None]]
+
+# 防止代理缓存 / 缓冲 SSE 响应
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def format_event(data, event: str = None) -> str:
+    """序列化为一个 SSE 事件（流式输出中唯一的一次 JSON 编码）
+
+    Args:
+        data: 可 JSON 序列化的数据
+        event: 事件名，为空时是默认的 message 事件
+    """
+    if event:
+        return f"event: {event}\ndata: {dumps(data)}\n\n"
+    return f"data: {dumps(data)}\n\n"
+
+
+class _BufferedStream:
+    """一个 SSE 流的缓冲区和状态（只在事件循环线程中访问）"""
+
+    def __init__(self, stream_id: str, user_id: str, session_id: str, buffer_size: int):
+        self.stream_id = stream_id
+        self.user_id = user_id
+        self.session_id = session_id
+        self.events: deque[tuple[int, str]] = deque(maxlen=buffer_size)
+        # 未发送事件数达到 window 时暂停生产，保证缓冲区里始终留有已发送的事件用于续传
+        self.window = max(1, buffer_size // 2)
+        self.last_seq = 0
+        self.delivered = 0
+        self.finished = False
+        self.consumers = 0
+        self.changed = asyncio.Condition()
+        self.producer: asyncio.Task | None = None
+        self.expiry: asyncio.TimerHandle | None = None
+
+    def first_seq(self) -> int:
+        """缓冲区中最早事件的序号"""
+        return self.events[0][0] if self.events else self.last_seq + 1
+
+    def events_after(self, seq: int) -> list[tuple[int, str]]:
+        return [(event_seq, event) for event_seq, event in self.events if event_seq > seq]
+
+
+class SSEStreamRegistry:
+    """进程内的 SSE 流登记表"""
+
+    def __init__(
+        self,
+        buffer_size: int = 256,
+        heartbeat_interval: float = 15,
+        resume_ttl: float = 30,
+        session_factory: Callable[[], Session] | None = None,
+    ):
+        """
+        Args:
+            buffer_size: 每个流保留的事件数
+            heartbeat_interval: 心跳间隔（秒）
+            resume_ttl: 客户端断开或流结束后保留多久用于续传（秒）
+            session_factory: 数据库会话工厂，每个流的后台任务打开一个会话
+        """
+        self._session_factory = session_factory
+        self._buffer_size = buffer_size
+        self._heartbeat_interval = heartbeat_interval
+        self._resume_ttl = resume_ttl
+        self._streams: dict[str, _BufferedStream] = {}
+
+    def response(self, source: SourceFactory, user_id: str, session_id: str) -> StreamingResponse:
+        """在后台开始消费业务生成器，返回从缓冲区读取的 SSE 响应
+
+        Args:
+            source: 业务生成器工厂，在后台任务中以该任务的数据库会话调用，生成器每项是一个完整的 SSE 事件
+            user_id: 用户 ID（续传时校验）
+            session_id: 会话 ID（续传时校验）
+        """
+        stream_id = uuid.uuid4().hex
+        stream = _BufferedStream(stream_id, user_id, session_id, self._buffer_size)
+        self._streams[stream_id] = stream
+        # create_task 复制当前上下文，请求计时和用量归属在后台任务中仍然有效
+        stream.producer = asyncio.create_task(self._produce(stream, source))
+        # 响应没有被读取（例如连接在开始输出前断开）时也能按期清理
+        self._schedule_expiry(stream)
+        return StreamingResponse(
+            self._consume(stream, after_seq=0),
+            media_type="text/event-stream",
+            headers={**SSE_HEADERS, "X-Stream-Id": stream_id},
+        )
+
+    def resume(self, last_event_id: str, user_id: str, session_id: str) -> StreamingResponse:
+        """按 Last-Event-ID 续传，从下一个事件开始输出
+
+        Raises:
+            NotFoundException: 流不存在、已过期、不属于当前用户，或需要的事件已不在缓冲区
+        """
+        stream_id, _, seq = last_event_id.partition(":")
+        stream = self._streams.get(stream_id)
+        if (
+            stream is None
+            or stream.user_id != user_id
+            or stream.session_id != session_id
+            or not seq.isdigit()
+            or int(seq) + 1 < stream.first_seq()
+        ):
+            raise NotFoundException("可续传的流")
+        return StreamingResponse(
+            self._consume(stream, after_seq=int(seq)),
+            media_type="text/event-stream",
+            headers={**SSE_HEADERS, "X-Stream-Id": stream_id},
+        )
+
+    async def _produce(self, stream: _BufferedStream, source_factory: SourceFactory) -> None:
+        """读取业务生成器写入缓冲区，未发送的事件过多时等待"""
+        db = self._session_factory() if self._session_factory is not None else None
+        try:
+            source = source_factory(db)
+            async with aclosing(source):
+                async for event in source:
+                    if not event:
+                        # 空字符串不是合法的 SSE 事件，不占用序号
+                        continue
+                    async with stream.changed:
+                        await stream.changed.wait_for(
+                            lambda: stream.last_seq - stream.delivered < stream.window
+                        )
+                        self._append(stream, event)
+        except asyncio.CancelledError:
+            # 断开后无人续传，已由 _expire 清理
+            stream.finished = True
+            raise
+        except Exception as e:
+            logger.exception(f"SSE 流生成失败 stream_id={stream.stream_id} error={e}")
+            async with stream.changed:
+                self._append(stream, format_event({"message": "生成回答失败"}, event="error"))
+        finally:
+            # 业务生成器已关闭（包括保存部分回复），不再使用会话；再次被取消时关闭仍会完成
+            if db is not None:
+                await asyncio.shield(asyncio.to_thread(db.close))
+
+        async with stream.changed:
+            stream.finished = True
+            stream.changed.notify_all()
+        if stream.consumers == 0:
+            self._schedule_expiry(stream)
+
+    @staticmethod
+    def _append(stream: _BufferedStream, event: str) -> None:
+        """追加事件并唤醒读取方（调用方持有锁）"""
+        stream.last_seq += 1
+        stream.events.append((stream.last_seq, event))
+        stream.changed.notify_all()
+
+    async def _consume(self, stream: _BufferedStream, after_seq: int) -> AsyncGenerator[str, None]:
+        """从缓冲区输出 after_seq 之后的事件，空闲时发送心跳"""
+        stream.consumers += 1
+        if stream.expiry is not None:
+            stream.expiry.cancel()
+            stream.expiry = None
+
+        position = after_seq
+        try:
+            while True:
+                async with stream.changed:
+                    try:
+                        await asyncio.wait_for(
+                            stream.changed.wait_for(lambda: stream.last_seq > position or stream.finished),
+                            self._heartbeat_interval,
+                        )
+                    except asyncio.TimeoutError:
+                        pending = None
+                    else:
+                        pending = stream.events_after(position)
+
+                if pending is None:
+                    yield HEARTBEAT
+                    continue
+                if not pending and stream.finished:
+                    return
+
+                for seq, event in pending:
+                    yield f"id: {stream.stream_id}:{seq}\n{event}"
+                    position = seq
+                async with stream.changed:
+                    stream.delivered = max(stream.delivered, position)
+                    stream.changed.notify_all()
+        finally:
+            # 取消时不能再 await，这里只做同步的状态更新
+            stream.consumers -= 1
+            if stream.consumers == 0:
+                self._schedule_expiry(stream)
+
+    def _schedule_expiry(self, stream: _BufferedStream) -> None:
+        if stream.expiry is not None:
+            stream.expiry.cancel()
+        stream.expiry = asyncio.get_running_loop().call_later(
+            self._resume_ttl, self._expire, stream.stream_id
+        )
+
+    def _expire(self, stream_id: str) -> None:
+        """无人续传：停止生成并移除"""
+        stream = self._streams.get(stream_id)
+        if stream is None or stream.consumers > 0:
+            return
+        del self._streams[stream_id]
+        if stream.producer is not None and not stream.producer.done():
+            logger.info(f"SSE 流无人续传，停止生成 stream_id={stream_id}")
+            stream.producer.cancel()
+
+    async def drain(self, timeout: float) -> None:
+        """等待正在生成的流结束（进程退出前调用），超时后取消剩余的流
+
+        取消后业务生成器按客户端断开处理，已生成的部分回复仍会保存。
+        """
+        producers = [
+            stream.producer
+            for stream in self._streams.values()
+            if stream.producer is not None and not stream.producer.done()
+        ]
+        if not producers:
+            return
+        logger.info(f"等待 SSE 流结束 count={len(producers)} timeout={timeout}s")
+        _, pending = await asyncio.wait(producers, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"SSE 流未在 {timeout}s 内结束，已取消 count={len(pending)}")
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def __len__(self) -> int:
+        return len(self._streams)
@@ -136,6 +136,13 @@ async function checkAuth() {
 }
 
 function logout() {
+    if (token) {
+        // 通知服务端使 Token 失效，不等待结果
+        fetch(`${API_BASE}/auth/logout`, {
+            method: 'POST',
+            headers: { 'Authorization': `Bearer ${token}` }
+        }).catch(() => {});
+    }
     token = null;
     currentUser = null;
     currentConversationId = null;
@@ -591,40 +598,27 @@ async function sendNormalMessage(message, useKnowledge, kbId, typingId) {
     removeTypingIndicator(typingId);
     
     // 处理流式响应
-    const reader = response.body.getReader();
-    const decoder = new TextDecoder();
     let assistantMessage = '';
     let messageElement = null;
     
-    while (true) {
-        const { done, value } = await reader.read();
-        if (done) break;
+    await readEventStream(response, currentConversationId, (rawData) => {
+        if (rawData === '[DONE]') return;
         
-        const chunk = decoder.decode(value);
-        const lines = chunk.split('\n\n');
+        try {
+            const data = JSON.parse(rawData);
+            assistantMessage += data;
+        } catch (e) {
+            assistantMessage += rawData;
+        }
         
-        for (const line of lines) {
-            if (line.startsWith('data: ')) {
-                const rawData = line.slice(6);
-                if (rawData === '[DONE]') continue;
-                
-                try {
-                    const data = JSON.parse(rawData);
-                    assistantMessage += data;
-                } catch (e) {
-                    assistantMessage += rawData;
-                }
-                
-                if (!messageElement) {
-                    messageElement = appendMessage('assistant', assistantMessage);
-                } else {
-                    messageElement.textContent = assistantMessage;
-                }
-                
-                scrollToBottom();
-            }
+        if (!messageElement) {
+            messageElement = appendMessage('assistant', assistantMessage);
+        } else {
+            messageElement.textContent = assistantMessage;
         }
-    }
+        
+        scrollToBottom();
+    });
 }
 
 async function sendAgentMessage(message, typingId) {
@@ -647,88 +641,143 @@ async function sendAgentMessage(message, typingId) {
     removeTypingIndicator(typingId);
 
     // 处理流式响应
-    const reader = response.body.getReader();
-    const decoder = new TextDecoder();
-
     let steps = [];            // 按时间顺序记录所有步骤
     let answerContent = '';    // 最终回答
     let messageElement = null; // 消息 DOM 元素
 
+    await readEventStream(response, currentConversationId, (data) => {
+        const rawData = data.trim();
+        if (!rawData) return;
+
+        try {
+            const event = JSON.parse(rawData);
+
+            switch (event.type) {
+                case 'thinking':
+                    // 记录思考步骤
+                    steps.push({ type: 'thinking', content: event.content });
+                    if (!messageElement) {
+                        messageElement = appendAgentMessage(steps, answerContent);
+                    } else {
+                        updateAgentMessage(messageElement, steps, answerContent);
+                    }
+                    scrollToBottom();
+                    break;
+
+                case 'tool_start':
+                    // 记录工具调用开始
+                    steps.push({
+                        type: 'tool_start',
+                        tool: event.tool,
+                        input: event.input
+                    });
+                    if (!messageElement) {
+                        messageElement = appendAgentMessage(steps, answerContent);
+                    } else {
+                        updateAgentMessage(messageElement, steps, answerContent);
+                    }
+                    scrollToBottom();
+                    break;
+
+                case 'tool_result':
+                    // 记录工具调用结果
+                    steps.push({
+                        type: 'tool_result',
+                        tool: event.tool,
+                        output: event.output
+                    });
+                    if (!messageElement) {
+                        messageElement = appendAgentMessage(steps, answerContent);
+                    } else {
+                        updateAgentMessage(messageElement, steps, answerContent);
+                    }
+                    scrollToBottom();
+                    break;
+
+                case 'answer':
+                    // 流式回答
+                    answerContent += event.content;
+                    if (!messageElement) {
+                        messageElement = appendAgentMessage(steps, answerContent);
+                    } else {
+                        updateAgentMessage(messageElement, steps, answerContent);
+                    }
+                    scrollToBottom();
+                    break;
+
+                case 'done':
+                    // 完成
+                    break;
+            }
+        } catch (e) {
+            console.error('解析 Agent 事件失败:', e, rawData);
+        }
+    });
+}
+
+// ============ SSE 流读取 ============
+// 连接中断后最多续传的次数
+const SSE_MAX_RESUME = 5;
+
+/**
+ * 读取 SSE 响应，把默认事件（无 event 字段）的 data 交给 onMessage。
+ * 连接中途断开时携带 Last-Event-ID 调用续传接口，从断点继续读取。
+ */
+async function readEventStream(response, sessionId, onMessage) {
+    let lastEventId = null;
+
+    for (let attempt = 0; ; attempt++) {
+        try {
+            await parseEventStream(response, (event) => {
+                if (event.id) lastEventId = event.id;
+                if (event.event === 'message') onMessage(event.data);
+            });
+            return;
+        } catch (error) {
+            if (!lastEventId || attempt >= SSE_MAX_RESUME) throw error;
+            console.warn('流式连接中断，尝试续传:', error);
+        }
+
+        await new Promise(resolve => setTimeout(resolve, 1000 * (attempt + 1)));
+        response = await fetch(`${API_BASE}/conversations/${sessionId}/messages/stream/resume`, {
+            headers: { ...authHeaders(), 'Last-Event-ID': lastEventId }
+        });
+        if (!response.ok) throw new Error(`续传失败: ${response.status}`);
+    }
+}
+
+/**
+ * 按 SSE 格式解析响应体：事件以空行分隔、可能跨多个网络分片，注释行（心跳）忽略。
+ */
+async function parseEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
     while (true) {
         const { done, value } = await reader.read();
-        if (done) break;
-
-        const chunk = decoder.decode(value);
-        const lines = chunk.split('\n\n');
-
-        for (const line of lines) {
-            if (!line.startsWith('data: ')) continue;
-
-            const rawData = line.slice(6).trim();
-            if (!rawData) continue;
-
-            try {
-                const event = JSON.parse(rawData);
-
-                switch (event.type) {
-                    case 'thinking':
-                        // 记录思考步骤
-                        steps.push({ type: 'thinking', content: event.content });
-                        if (!messageElement) {
-                            messageElement = appendAgentMessage(steps, answerContent);
-                        } else {
-                            updateAgentMessage(messageElement, steps, answerContent);
-                        }
-                        scrollToBottom();
-                        break;
-
-                    case 'tool_start':
-                        // 记录工具调用开始
-                        steps.push({
-                            type: 'tool_start',
-                            tool: event.tool,
-                            input: event.input
-                        });
-                        if (!messageElement) {
-                            messageElement = appendAgentMessage(steps, answerContent);
-                        } else {
-                            updateAgentMessage(messageElement, steps, answerContent);
-                        }
-                        scrollToBottom();
-                        break;
-
-                    case 'tool_result':
-                        // 记录工具调用结果
-                        steps.push({
-                            type: 'tool_result',
-                            tool: event.tool,
-                            output: event.output
-                        });
-                        if (!messageElement) {
-                            messageElement = appendAgentMessage(steps, answerContent);
-                        } else {
-                            updateAgentMessage(messageElement, steps, answerContent);
-                        }
-                        scrollToBottom();
-                        break;
-
-                    case 'answer':
-                        // 流式回答
-                        answerContent += event.content;
-                        if (!messageElement) {
-                            messageElement = appendAgentMessage(steps, answerContent);
-                        } else {
-                            updateAgentMessage(messageElement, steps, answerContent);
-                        }
-                        scrollToBottom();
-                        break;
-
-                    case 'done':
-                        // 完成
-                        break;
-                }
-            } catch (e) {
-                console.error('解析 Agent 事件失败:', e, rawData);
+        if (done) return;
+
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            const event = { id: null, event: 'message', data: [] };
+            for (const line of block.split('\n')) {
+                if (!line || line.startsWith(':')) continue;
+                const colon = line.indexOf(':');
+                const field = colon < 0 ? line : line.slice(0, colon);
+                let fieldValue = colon < 0 ? '' : line.slice(colon + 1);
+                if (fieldValue.startsWith(' ')) fieldValue = fieldValue.slice(1);
+
+                if (field === 'data') event.data.push(fieldValue);
+                else if (field === 'event') event.event = fieldValue;
+                else if (field === 'id') event.id = fieldValue;
+            }
+            if (event.data.length) {
+                onEvent({ ...event, data: event.data.join('\n') });
             }
         }
     }
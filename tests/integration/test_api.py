@@ -1,14 +1,38 @@
 """API 集成测试"""
+import json
 from datetime import datetime
 import pytest
 from unittest.mock import MagicMock, patch
 from fastapi.testclient import TestClient
 
+from ai_qa.domain.entities import Conversation, MessageRole
 from ai_qa.interfaces.api.app import app
-from ai_qa.interfaces.api.dependencies import get_db, get_current_user
+from ai_qa.interfaces.api.dependencies import (
+    get_chat_service_factory,
+    get_auth_cache,
+    get_current_user,
+    get_db,
+    get_memory,
+    get_rate_limiter,
+)
 from ai_qa.infrastructure.database.models import User
 
 
+def parse_sse(text: str) -> list[dict]:
+    """把 SSE 响应解析为事件列表（忽略心跳注释）"""
+    events = []
+    for block in text.strip().split("\n\n"):
+        event = {}
+        for line in block.split("\n"):
+            if line.startswith(":"):
+                continue
+            field, _, value = line.partition(": ")
+            event[field] = value
+        if event:
+            events.append(event)
+    return events
+
+
 # ============ Fixtures ============
 
 @pytest.fixture
@@ -66,6 +90,26 @@ class TestHealthCheck:
         assert response.status_code == 200
         assert response.json() == {"status": "ok"}
 
+    def test_health_pool(self, client):
+        """测试：连接池状态包含容量和占用情况"""
+        response = client.get("/health/pool")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["size"] == 5
+        assert data["max_overflow"] == 10
+        assert {"checked_in", "checked_out", "overflow"} <= data.keys()
+
+    def test_metrics_exports_prometheus_text(self, client):
+        """测试：/metrics 导出 Prometheus 文本格式（含连接池指标）"""
+        pytest.importorskip("prometheus_client")
+
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'ai_qa_db_pool_connections{state="size"} 5.0' in response.text
+
 
 # ============ 认证 API 测试 ============
 
@@ -114,6 +158,36 @@ class TestAuthAPI:
         data = response.json()
         assert data["username"] == mock_user.username
 
+    def test_token_and_user_are_cached(self, client_no_auth, mock_db):
+        """测试：同一 Token 的后续请求不再查询用户表"""
+        from ai_qa.infrastructure.auth import create_access_token
+        get_auth_cache().clear()
+        mock_db.query.return_value.filter.return_value.first.return_value = User(
+            id="user_123", username="testuser", password_hash="x", status=1, token_version=0
+        )
+        headers = {"Authorization": f"Bearer {create_access_token({'user_id': 'user_123', 'ver': 0})}"}
+
+        first = client_no_auth.get("/api/v1/auth/me", headers=headers)
+        second = client_no_auth.get("/api/v1/auth/me", headers=headers)
+
+        assert first.status_code == second.status_code == 200
+        assert mock_db.query.call_count == 1
+        get_auth_cache().clear()
+
+    def test_revoked_token_rejected(self, client_no_auth, mock_db):
+        """测试：token_version 变化后旧 Token 返回 401"""
+        from ai_qa.infrastructure.auth import create_access_token
+        get_auth_cache().clear()
+        mock_db.query.return_value.filter.return_value.first.return_value = User(
+            id="user_123", username="testuser", password_hash="x", status=1, token_version=1
+        )
+        headers = {"Authorization": f"Bearer {create_access_token({'user_id': 'user_123', 'ver': 0})}"}
+
+        response = client_no_auth.get("/api/v1/auth/me", headers=headers)
+
+        assert response.status_code == 401
+        get_auth_cache().clear()
+
 
 # ============ 会话 API 测试 ============
 
@@ -139,6 +213,151 @@ class TestConversationAPI:
         data = response.json()
         assert "conversations" in data
 
+    def test_get_messages_is_compressed(self, client):
+        """测试：长会话的消息历史按 gzip 压缩返回"""
+        # Arrange
+        conversation = Conversation(id="s1")
+        for i in range(50):
+            conversation.add_message(MessageRole.USER, f"第 {i} 个问题")
+            conversation.add_message(MessageRole.ASSISTANT, "这是一个比较长的回答。" * 20)
+        memory = MagicMock()
+        memory.get_conversation.return_value = conversation
+        app.dependency_overrides[get_memory] = lambda: memory
+
+        # Act
+        response = client.get("/api/v1/conversations/s1/messages", headers={"Accept-Encoding": "gzip"})
+
+        # Assert
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        data = response.json()
+        assert len(data["messages"]) == 100
+        assert data["messages"][1] == {
+            "role": "assistant",
+            "content": "这是一个比较长的回答。" * 20,
+            "reasoning_steps": None,
+        }
+
+    def test_stream_ends_with_metrics_event(self, client):
+        """测试：流式回答在 [DONE] 前发送分阶段耗时事件"""
+        async def fake_chat_stream(session_id, content, user_id=None):
+            from ai_qa.infrastructure.observability import span
+            with span("llm"):
+                yield "你好"
+
+        chat_service = MagicMock()
+        chat_service.achat_stream.side_effect = fake_chat_stream
+        app.dependency_overrides[get_chat_service_factory] = lambda: lambda db: chat_service
+
+        response = client.post(
+            "/api/v1/conversations/s1/messages/stream", json={"content": "你好"}
+        )
+
+        assert response.status_code == 200
+        assert "total;dur=" in response.headers["server-timing"]
+        events = parse_sse(response.text)
+        assert json.loads(events[0]["data"]) == "你好"
+        assert events[1]["event"] == "metrics"
+        assert set(json.loads(events[1]["data"])) == {"llm", "total"}
+        assert events[2]["data"] == "[DONE]"
+
+    def test_stream_events_have_ids_and_can_resume(self, client):
+        """测试：事件带递增 id，携带 Last-Event-ID 续传时从下一个事件开始"""
+        async def fake_chat_stream(session_id, content, user_id=None):
+            for chunk in ["你", "好"]:
+                yield chunk
+
+        chat_service = MagicMock()
+        chat_service.achat_stream.side_effect = fake_chat_stream
+        app.dependency_overrides[get_chat_service_factory] = lambda: lambda db: chat_service
+
+        response = client.post(
+            "/api/v1/conversations/s1/messages/stream", json={"content": "你好"}
+        )
+        events = parse_sse(response.text)
+        stream_id = response.headers["x-stream-id"]
+        resumed = client.get(
+            "/api/v1/conversations/s1/messages/stream/resume",
+            headers={"Last-Event-ID": events[0]["id"]},
+        )
+
+        assert [event["id"] for event in events] == [f"{stream_id}:{i}" for i in range(1, len(events) + 1)]
+        assert resumed.status_code == 200
+        assert parse_sse(resumed.text) == events[1:]
+
+    def test_stream_uses_its_own_database_session(self, client, mock_db):
+        """测试：流式服务在后台任务自己的数据库会话上创建，不使用请求的会话"""
+        sessions = []
+
+        async def fake_chat_stream(session_id, content, user_id=None):
+            yield "你好"
+
+        def factory(db):
+            sessions.append(db)
+            chat_service = MagicMock()
+            chat_service.achat_stream.side_effect = fake_chat_stream
+            return chat_service
+
+        app.dependency_overrides[get_chat_service_factory] = lambda: factory
+
+        response = client.post(
+            "/api/v1/conversations/s1/messages/stream", json={"content": "你好"}
+        )
+
+        assert response.status_code == 200
+        assert len(sessions) == 1
+        assert sessions[0] is not None and sessions[0] is not mock_db
+
+    def test_resume_unknown_stream_returns_404(self, client):
+        """测试：流不存在或属于其他会话时无法续传"""
+        response = client.get(
+            "/api/v1/conversations/s1/messages/stream/resume",
+            headers={"Last-Event-ID": "missing:3"},
+        )
+
+        assert response.status_code == 404
+
+    def test_stream_bytes_are_counted(self, client):
+        """测试：SSE 发送的字节数按路由模板计入指标，结束后活跃流归零"""
+        prometheus_client = pytest.importorskip("prometheus_client")
+
+        def sample(name):
+            return sum(
+                s.value
+                for metric in prometheus_client.REGISTRY.collect()
+                for s in metric.samples
+                if s.name == name and s.labels.get("path", "").endswith("{session_id}/messages/stream")
+            )
+
+        async def fake_chat_stream(session_id, content, user_id=None):
+            yield "你好"
+
+        chat_service = MagicMock()
+        chat_service.achat_stream.side_effect = fake_chat_stream
+        app.dependency_overrides[get_chat_service_factory] = lambda: lambda db: chat_service
+        before = sample("ai_qa_sse_bytes_sent_total")
+
+        response = client.post(
+            "/api/v1/conversations/s1/messages/stream", json={"content": "你好"}
+        )
+
+        assert sample("ai_qa_sse_bytes_sent_total") - before == len(response.content)
+        assert sample("ai_qa_sse_active_streams") == 0
+
+    def test_rate_limited_returns_429(self, client):
+        """测试：超出限流时返回 429 和 Retry-After"""
+        limiter = MagicMock()
+        limiter.acquire.return_value = 4.2
+        app.dependency_overrides[get_rate_limiter] = lambda: limiter
+
+        response = client.post(
+            "/api/v1/conversations/s1/messages/stream", json={"content": "你好"}
+        )
+
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "5"
+        limiter.acquire.assert_called_once_with("user:user_123")
+
 
 # ============ 知识库 API 测试 ============
 
@@ -3,6 +3,7 @@
 import pytest
 from unittest.mock import MagicMock, AsyncMock
 from ai_qa.application.agent_service import AgentService
+from ai_qa.domain.entities import AgentEvent, AgentEventType, Conversation
 
 
 @pytest.mark.asyncio
@@ -17,7 +18,7 @@ class TestAgentService:
         response.tool_calls = []
         response.content = "直接回答"
 
-        mock_llm.chat_with_tools.return_value = response
+        mock_llm.achat_with_tools = AsyncMock(return_value=response)
         service = AgentService(mock_llm, mock_memory, tools=[])
 
         # Act 执行
@@ -25,7 +26,7 @@ class TestAgentService:
 
         # Assert 验证
         assert result == "直接回答"
-        mock_llm.chat_with_tools.assert_called_once()
+        mock_llm.achat_with_tools.assert_awaited_once()
 
 
     async def test_chat_with_tool_calls(self, mock_llm, mock_memory, mock_tool):
@@ -45,7 +46,7 @@ class TestAgentService:
         second_response.content = "计算结果是 42"
 
         # 设置 side_effect：按顺序返回
-        mock_llm.chat_with_tools.side_effect = [first_response, second_response]
+        mock_llm.achat_with_tools = AsyncMock(side_effect=[first_response, second_response])
 
         # Mock tool.ainvoke 为异步函数（代码实际调用 ainvoke）
         mock_tool.ainvoke = AsyncMock(return_value="42")
@@ -62,7 +63,7 @@ class TestAgentService:
 
         # Assert
         assert result == "计算结果是 42"
-        assert mock_llm.chat_with_tools.call_count == 2  # LLM 被调用了两次
+        assert mock_llm.achat_with_tools.await_count == 2  # LLM 被调用了两次
         mock_tool.ainvoke.assert_called_once()  # 工具被调用了一次
 
     async def test_chat_saves_conversation(self, mock_llm, mock_memory):
@@ -72,7 +73,7 @@ class TestAgentService:
         response.tool_calls = []
         response.content = "回复内容"
 
-        mock_llm.chat_with_tools.return_value = response
+        mock_llm.achat_with_tools = AsyncMock(return_value=response)
         service = AgentService(llm=mock_llm, memory=mock_memory, tools=[])
 
         # Act
@@ -95,7 +96,7 @@ class TestAgentService:
         ]
         response.content = ""
 
-        mock_llm.chat_with_tools.return_value = response
+        mock_llm.achat_with_tools = AsyncMock(return_value=response)
         service = AgentService(llm=mock_llm, memory=mock_memory, tools=[mock_tool])
 
         # Act
@@ -103,4 +104,66 @@ class TestAgentService:
 
         # Assert
         assert "简化" in result  # 包含错误提示关键词
-        assert mock_llm.chat_with_tools.call_count == 10  # 达到最大迭代次数
+        assert mock_llm.achat_with_tools.await_count == 10  # 达到最大迭代次数
+
+    async def test_chat_stream_yields_typed_events(self, mock_llm, mock_memory, mock_tool):
+        """测试：chat_stream 产出类型化事件，并把推理步骤和回答保存到历史"""
+        # Arrange
+        tool_response = MagicMock()
+        tool_response.tool_calls = [{"name": "mock_calculator", "args": {"expression": "6*7"}, "id": "call_1"}]
+        tool_response.content = "[思考] 需要计算"
+        final_response = MagicMock()
+        final_response.tool_calls = []
+        final_response.content = "结果是 42"
+        mock_llm.achat_with_tools = AsyncMock(side_effect=[tool_response, final_response])
+        mock_tool.ainvoke = AsyncMock(return_value="42")
+        conversation = Conversation(id="test_session")
+        mock_memory.get_conversation.return_value = conversation
+        service = AgentService(mock_llm, mock_memory, tools=[mock_tool])
+
+        # Act
+        events = [event async for event in service.chat_stream("test_session", "6*7=?")]
+
+        # Assert
+        assert [event.type for event in events] == [
+            AgentEventType.THINKING,
+            AgentEventType.TOOL_START,
+            AgentEventType.TOOL_RESULT,
+            AgentEventType.ANSWER,
+            AgentEventType.DONE,
+        ]
+        assert events[2].to_dict() == {"type": "tool_result", "tool": "mock_calculator", "output": "42"}
+        assert events[3] == AgentEvent(AgentEventType.ANSWER, content="结果是 42")
+        ai_message = conversation.messages[-1]
+        assert ai_message.content == "结果是 42"
+        assert [step["type"] for step in ai_message.reasoning_steps] == ["thinking", "tool_start", "tool_result"]
+        assert ai_message.reasoning_steps[1]["input"] == '{"expression": "6*7"}'
+
+
+    async def test_chat_stream_runs_database_calls_in_threads(self, mock_llm, mock_memory):
+        """测试：历史读取和保存在线程中执行，不阻塞事件循环"""
+        # Arrange
+        import threading
+
+        response = MagicMock()
+        response.tool_calls = []
+        response.content = "你好"
+        mock_llm.achat_with_tools = AsyncMock(return_value=response)
+        threads = []
+        conversation = Conversation(id="test_session")
+
+        def get_conversation(session_id, user_id=None):
+            threads.append(threading.current_thread())
+            return conversation
+
+        mock_memory.get_conversation.side_effect = get_conversation
+        mock_memory.save_conversation.side_effect = lambda c: threads.append(threading.current_thread())
+        service = AgentService(mock_llm, mock_memory, tools=[])
+
+        # Act
+        [event async for event in service.chat_stream("test_session", "你好")]
+
+        # Assert
+        assert len(threads) == 2
+        assert threading.main_thread() not in threads
+        mock_llm.chat_with_tools.assert_not_called()
@@ -0,0 +1,117 @@
+"""鉴权缓存单元测试"""
+import time
+from unittest.mock import MagicMock, patch
+
+from ai_qa.infrastructure.auth import AuthCache
+from ai_qa.infrastructure.database.models import User
+
+
+def make_user(**kwargs) -> User:
+    fields = dict(id="user_123", username="testuser", password_hash="x", status=1, token_version=0)
+    fields.update(kwargs)
+    return User(**fields)
+
+
+class TestAuthCacheVerify:
+    """Token 验证缓存测试"""
+
+    def test_decodes_token_once(self):
+        """测试：同一 Token 只解码一次"""
+        # Arrange
+        cache = AuthCache()
+        payload = {"user_id": "user_123", "exp": time.time() + 60}
+
+        # Act
+        with patch("ai_qa.infrastructure.auth.auth_cache.verify_token", return_value=payload) as verify:
+            first = cache.verify("token")
+            second = cache.verify("token")
+
+        # Assert
+        assert first == second == payload
+        verify.assert_called_once_with("token")
+
+    def test_invalid_token_not_cached(self):
+        """测试：无效 Token 不缓存，每次都重新验证"""
+        # Arrange
+        cache = AuthCache()
+
+        # Act
+        with patch("ai_qa.infrastructure.auth.auth_cache.verify_token", return_value=None) as verify:
+            assert cache.verify("bad") is None
+            assert cache.verify("bad") is None
+
+        # Assert
+        assert verify.call_count == 2
+
+    def test_expired_cached_token_rejected(self):
+        """测试：缓存中的 Token 过期后不再通过"""
+        # Arrange
+        cache = AuthCache(ttl_seconds=600)
+        payload = {"user_id": "user_123", "exp": time.time() + 60}
+        with patch("ai_qa.infrastructure.auth.auth_cache.verify_token", return_value=payload):
+            cache.verify("token")
+
+        # Act
+        payload["exp"] = time.time() - 1
+
+        # Assert
+        assert cache.verify("token") is None
+
+
+class TestAuthCacheUser:
+    """用户快照缓存测试"""
+
+    def test_loads_user_once(self):
+        """测试：命中缓存时不再查询数据库"""
+        # Arrange
+        cache = AuthCache()
+        loader = MagicMock(return_value=make_user())
+
+        # Act
+        first = cache.get_user("user_123", loader)
+        second = cache.get_user("user_123", loader)
+
+        # Assert
+        loader.assert_called_once_with("user_123")
+        assert first is second
+        assert first.username == "testuser"
+
+    def test_snapshot_is_detached_copy(self):
+        """测试：缓存的是用户副本，不是数据库会话中的对象"""
+        # Arrange
+        cache = AuthCache()
+        user = make_user()
+
+        # Act
+        snapshot = cache.get_user("user_123", lambda _: user)
+
+        # Assert
+        assert snapshot is not user
+        assert snapshot.id == user.id and snapshot.token_version == user.token_version
+
+    def test_missing_user_not_cached(self):
+        """测试：用户不存在时返回 None 且不缓存"""
+        # Arrange
+        cache = AuthCache()
+        loader = MagicMock(return_value=None)
+
+        # Act
+        cache.get_user("ghost", loader)
+        cache.get_user("ghost", loader)
+
+        # Assert
+        assert loader.call_count == 2
+
+    def test_invalidate_user_reloads(self):
+        """测试：清除快照后重新查询，读到最新状态"""
+        # Arrange
+        cache = AuthCache()
+        cache.get_user("user_123", lambda _: make_user())
+
+        # Act
+        cache.invalidate_user("user_123")
+        snapshot = cache.get_user("user_123", lambda _: make_user(status=0, token_version=1))
+
+        # Assert
+        assert snapshot.status == 0
+        assert snapshot.token_version == 1
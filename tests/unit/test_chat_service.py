@@ -1,4 +1,8 @@
 """ChatService 单元测试"""
+import asyncio
+
+import pytest
+
 from ai_qa.application.chat_service import ChatService
 from ai_qa.domain.entities import Conversation, MessageRole
 
@@ -56,4 +60,111 @@ class TestChatService:
         # Assert: 验证 LLM 被调用时传入了正确的 system_prompt
         mock_llm.chat.assert_called_once()
         call_kwargs = mock_llm.chat.call_args.kwargs
-        assert call_kwargs["system_prompt"] == custom_prompt
\ No newline at end of file
+        assert call_kwargs["system_prompt"] == custom_prompt
+
+
+@pytest.mark.asyncio
+class TestChatServiceAsyncStream:
+    """ChatService 异步流式测试"""
+
+    async def test_achat_stream_yields_and_saves(self, mock_llm, mock_memory):
+        """测试：achat_stream 逐段返回，结束后保存完整回复"""
+        # Arrange
+        async def fake_stream(messages, system_prompt=None):
+            for chunk in ["你", "好"]:
+                yield chunk
+
+        conversation = Conversation(id="test_session")
+        mock_memory.get_conversation.return_value = conversation
+        mock_llm.achat_stream = fake_stream
+        service = ChatService(llm=mock_llm, memory=mock_memory)
+
+        # Act
+        chunks = [chunk async for chunk in service.achat_stream("test_session", "你好")]
+
+        # Assert
+        assert chunks == ["你", "好"]
+        assert conversation.messages[-1].content == "你好"
+        mock_memory.save_conversation.assert_called_once_with(conversation)
+
+    async def test_achat_stream_cancel_saves_partial_and_closes_llm(self, mock_llm, mock_memory):
+        """测试：任务被取消（客户端断开）时关闭 LLM 流并保存已生成的部分"""
+        # Arrange
+        llm_closed = asyncio.Event()
+        first_chunk = asyncio.Event()
+
+        async def fake_stream(messages, system_prompt=None):
+            try:
+                yield "部分"
+                await asyncio.sleep(3600)
+                yield "不会到达"
+            finally:
+                llm_closed.set()
+
+        conversation = Conversation(id="test_session")
+        mock_memory.get_conversation.return_value = conversation
+        mock_llm.achat_stream = fake_stream
+        service = ChatService(llm=mock_llm, memory=mock_memory)
+
+        async def consume():
+            async for _ in service.achat_stream("test_session", "你好"):
+                first_chunk.set()
+
+        # Act
+        task = asyncio.create_task(consume())
+        await first_chunk.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        # Assert
+        assert llm_closed.is_set()
+        assert conversation.messages[-1].role == MessageRole.ASSISTANT
+        assert conversation.messages[-1].content == "部分"
+        mock_memory.save_conversation.assert_called_once_with(conversation)
+
+
+    async def test_achat_stream_runs_database_calls_in_threads(self, mock_llm, mock_memory):
+        """测试：历史读取和保存在线程中执行，不阻塞事件循环"""
+        # Arrange
+        import threading
+
+        async def fake_stream(messages, system_prompt=None):
+            yield "你好"
+
+        threads = []
+        conversation = Conversation(id="test_session")
+
+        def get_conversation(session_id, user_id=None):
+            threads.append(threading.current_thread())
+            return conversation
+
+        mock_memory.get_conversation.side_effect = get_conversation
+        mock_memory.save_conversation.side_effect = lambda c: threads.append(threading.current_thread())
+        mock_llm.achat_stream = fake_stream
+        service = ChatService(llm=mock_llm, memory=mock_memory)
+
+        # Act
+        [chunk async for chunk in service.achat_stream("test_session", "你好")]
+
+        # Assert
+        assert len(threads) == 2
+        assert threading.main_thread() not in threads
+
+    async def test_asave_exchange_appends_question_and_answer(self, mock_llm, mock_memory):
+        """测试：asave_exchange 把问题和回答追加到对话历史并保存"""
+        # Arrange
+        conversation = Conversation(id="test_session")
+        mock_memory.get_conversation.return_value = conversation
+        service = ChatService(llm=mock_llm, memory=mock_memory)
+
+        # Act
+        await service.asave_exchange("test_session", "问题", "回答", user_id="u1")
+
+        # Assert
+        mock_memory.get_conversation.assert_called_once_with("test_session", user_id="u1")
+        assert [(m.role, m.content) for m in conversation.messages] == [
+            (MessageRole.USER, "问题"),
+            (MessageRole.ASSISTANT, "回答"),
+        ]
+        mock_memory.save_conversation.assert_called_once_with(conversation)
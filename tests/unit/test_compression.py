@@ -0,0 +1,149 @@
+"""响应压缩和快速 JSON 响应单元测试"""
+from datetime import datetime
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from ai_qa.interfaces.api.compression import CompressionMiddleware, accepts_encoding, parse_accept_encoding
+from ai_qa.interfaces.api.responses import FastJSONResponse
+from ai_qa.interfaces.api.schemas import ConversationResponse, MessageItem, MessagesResponse
+
+LARGE_TEXT = "召回阶段取更多候选，重排序再按相关性精排。" * 200
+
+
+def create_client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/large")
+    async def large():
+        return PlainTextResponse(LARGE_TEXT)
+
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("ok")
+
+    @app.get("/stream")
+    async def stream():
+        async def events():
+            yield f"data: {LARGE_TEXT}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return TestClient(app)
+
+
+class TestCompressionMiddleware:
+    """按大小和 Content-Type 决定是否压缩"""
+
+    def test_large_response_is_gzipped(self):
+        """测试：超过阈值的响应按 Accept-Encoding 使用 gzip"""
+        # Arrange
+        client = create_client()
+
+        # Act
+        response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+        # Assert
+        assert response.headers["content-encoding"] == "gzip"
+        assert int(response.headers["content-length"]) < len(LARGE_TEXT.encode("utf-8"))
+        assert response.text == LARGE_TEXT
+
+    def test_small_response_not_compressed(self):
+        """测试：小于阈值的响应不压缩"""
+        client = create_client()
+
+        response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+
+        assert "content-encoding" not in response.headers
+        assert response.text == "ok"
+
+    def test_event_stream_not_compressed(self):
+        """测试：SSE 响应不压缩，保证事件实时输出"""
+        client = create_client()
+
+        response = client.get("/stream", headers={"Accept-Encoding": "gzip, br"})
+
+        assert "content-encoding" not in response.headers
+        assert response.text == f"data: {LARGE_TEXT}\n\n"
+
+    def test_identity_when_client_does_not_accept(self):
+        """测试：客户端不支持压缩时原样返回"""
+        client = create_client()
+
+        response = client.get("/large", headers={"Accept-Encoding": "identity"})
+
+        assert "content-encoding" not in response.headers
+        assert response.text == LARGE_TEXT
+
+    def test_rejected_encoding_not_used(self):
+        """测试：q=0 表示客户端拒绝该编码，即使名字出现在 Accept-Encoding 中"""
+        client = create_client()
+
+        response = client.get("/large", headers={"Accept-Encoding": "gzip;q=0, identity"})
+
+        assert "content-encoding" not in response.headers
+        assert response.text == LARGE_TEXT
+
+
+class TestAcceptEncoding:
+    """Accept-Encoding 解析测试"""
+
+    def test_parses_codings_and_q_values(self):
+        """测试：按逗号拆分编码，解析 q 值，大小写和空白不敏感"""
+        # Act
+        codings = parse_accept_encoding("GZip, br ; q=0, deflate;q=0.5")
+
+        # Assert
+        assert codings == {"gzip": 1.0, "br": 0.0, "deflate": 0.5}
+
+    def test_q_zero_rejects_coding(self):
+        """测试：br;q=0 不接受 br，gzip 仍然可用"""
+        codings = parse_accept_encoding("gzip, br;q=0")
+
+        assert not accepts_encoding(codings, "br")
+        assert accepts_encoding(codings, "gzip")
+
+    def test_wildcard_applies_to_unlisted_codings(self):
+        """测试：未列出的编码按通配符 * 的 q 值判断"""
+        codings = parse_accept_encoding("gzip;q=0, *")
+
+        assert accepts_encoding(codings, "br")
+        assert not accepts_encoding(codings, "gzip")
+        assert not accepts_encoding(parse_accept_encoding("identity"), "br")
+
+
+class TestFastJSONResponse:
+    """跳过 jsonable_encoder 的 JSON 响应"""
+
+    def test_renders_pydantic_model(self):
+        """测试：Pydantic 模型直接序列化，非 ASCII 字符不转义"""
+        # Arrange
+        content = MessagesResponse(
+            session_id="s1",
+            messages=[MessageItem(role="user", content="你好", reasoning_steps=None)],
+        )
+
+        # Act
+        body = FastJSONResponse(content).body
+
+        # Assert
+        assert body == content.model_dump_json().encode("utf-8")
+        assert "你好".encode("utf-8") in body
+
+    def test_renders_datetime_fields(self):
+        """测试：日期字段输出为 ISO 格式"""
+        content = ConversationResponse(
+            session_id="s1", title="t", created_at=datetime(2024, 1, 1), updated_at=datetime(2024, 1, 2)
+        )
+
+        body = FastJSONResponse(content).body
+
+        assert b'"created_at":"2024-01-01T00:00:00"' in body
+
+    def test_renders_plain_data(self):
+        """测试：普通字典使用 json_codec 编码"""
+        body = FastJSONResponse({"total": 1, "name": "知识库"}).body
+
+        assert body == '{"total":1,"name":"知识库"}'.encode("utf-8")
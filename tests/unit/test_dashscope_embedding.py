@@ -0,0 +1,79 @@
+"""DashScopeEmbeddingAdapter 单元测试"""
+import json
+
+import httpx
+
+from ai_qa.infrastructure.embedding.dashscope_embedding import DashScopeEmbeddingAdapter
+from ai_qa.infrastructure.http import HttpClientPool
+
+
+def make_client(requests: list):
+    """创建记录请求、按输入返回假向量的 httpx 客户端"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(body)
+        # 故意倒序返回，验证适配器按 index 重新排序
+        data = [
+            {"index": i, "embedding": [float(len(text)), float(i)]}
+            for i, text in enumerate(body["input"])
+        ]
+        return httpx.Response(200, json={"data": list(reversed(data))})
+
+    return httpx.Client(transport=httpx.MockTransport(handler))
+
+
+class TestDashScopeEmbeddingAdapter:
+    """通过共享连接池调用 Embedding 接口"""
+
+    def test_embed_query_uses_shared_client(self):
+        """测试：embed_query 走 OpenAI 兼容接口"""
+        # Arrange
+        requests = []
+        adapter = DashScopeEmbeddingAdapter(
+            api_key="key",
+            base_url="https://api.test.com/v1/",
+            http_client=make_client(requests),
+        )
+
+        # Act
+        vector = adapter.embed_query("abc")
+
+        # Assert
+        assert vector == [3.0, 0.0]
+        assert requests[0]["model"] == "text-embedding-v3"
+        assert requests[0]["input"] == ["abc"]
+
+    def test_embed_texts_batches_and_keeps_order(self):
+        """测试：embed_texts 按批次请求并保持输入顺序"""
+        # Arrange
+        requests = []
+        adapter = DashScopeEmbeddingAdapter(
+            api_key="key",
+            base_url="https://api.test.com/v1",
+            http_client=make_client(requests),
+            batch_size=2,
+        )
+        texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+
+        # Act
+        vectors = adapter.embed_texts(texts)
+
+        # Assert
+        assert [v[0] for v in vectors] == [1.0, 2.0, 3.0, 4.0, 5.0]
+        assert len(requests) == 3
+
+
+class TestHttpClientPool:
+    """共享连接池测试"""
+
+    def test_falls_back_to_http1_without_h2(self, monkeypatch):
+        """测试：未安装 h2 时自动关闭 HTTP/2"""
+        monkeypatch.setattr(
+            "ai_qa.infrastructure.http.client_pool._h2_available", lambda: False
+        )
+
+        pool = HttpClientPool(max_connections=5, http2=True)
+
+        assert pool.http2 is False
+        assert pool.limits.max_connections == 5
+        pool.close()
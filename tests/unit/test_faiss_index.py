@@ -0,0 +1,97 @@
+"""FAISS 索引工厂与压缩索引单元测试"""
+import faiss
+import numpy as np
+
+from ai_qa.domain.entities import DocumentChunk
+from ai_qa.infrastructure.vectorstore import FaissVectorStore
+from ai_qa.infrastructure.vectorstore.faiss_index import (
+    FaissIndexConfig,
+    FaissIndexType,
+    base_index,
+    build_id_index,
+    build_index,
+    min_training_size,
+    remove_vectors,
+)
+
+
+class RandomEmbedding:
+    """按文本哈希生成确定性随机向量"""
+
+    def __init__(self, dimension: int):
+        self._dimension = dimension
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        rng = np.random.default_rng(abs(hash(text)) % (2 ** 32))
+        return rng.normal(size=self._dimension).astype(np.float32).tolist()
+
+
+class TestBuildIndex:
+    """索引工厂测试"""
+
+    def test_falls_back_to_flat_without_enough_training_data(self):
+        """测试：数据量不足以训练时使用 Flat 索引"""
+        config = FaissIndexConfig(index_type=FaissIndexType.IVFPQ, pq_m=4)
+        vectors = np.random.default_rng(0).normal(size=(10, 16)).astype(np.float32)
+
+        index = build_index(config, 16, vectors)
+
+        assert isinstance(index, faiss.IndexFlat)
+        assert index.ntotal == 10
+
+    def test_builds_hnswsq_with_search_params(self):
+        """测试：数据量足够时创建 HNSWSQ 并设置 efSearch"""
+        config = FaissIndexConfig(index_type=FaissIndexType.HNSWSQ, ef_search=40)
+        count = min_training_size(config, 0)
+        vectors = np.random.default_rng(0).normal(size=(count, 16)).astype(np.float32)
+
+        index = build_index(config, 16, vectors)
+
+        assert isinstance(index, faiss.IndexHNSWSQ)
+        assert index.hnsw.efSearch == 40
+        assert index.ntotal == count
+
+
+class TestRemoveVectors:
+    """按 ID 删除向量测试"""
+
+    def test_removes_from_flat_and_hnsw(self):
+        """测试：Flat 直接删除，HNSW 重建后同样不再包含被删除的 ID"""
+        vectors = np.random.default_rng(0).normal(size=(1200, 16)).astype(np.float32)
+        ids = np.arange(100, 1300, dtype=np.int64)
+
+        for index_type in (FaissIndexType.FLAT, FaissIndexType.HNSWSQ):
+            config = FaissIndexConfig(index_type=index_type)
+            index = remove_vectors(build_id_index(config, 16, vectors, ids), config, np.array([100, 101]))
+
+            _, found = index.search(vectors[:2], 1)
+            assert index.ntotal == 1198
+            assert not {100, 101} & set(found.ravel().tolist())
+
+
+class TestFaissStoreIndexUpgrade:
+    """FaissVectorStore 自动升级压缩索引测试"""
+
+    def test_store_upgrades_to_compressed_index_and_keeps_results(self):
+        """测试：数据量达到训练要求后升级索引，检索结果仍然正确"""
+        # Arrange
+        dimension = 16
+        config = FaissIndexConfig(index_type=FaissIndexType.HNSWSQ)
+        store = FaissVectorStore(
+            embedding=RandomEmbedding(dimension), dimension=dimension, index_config=config
+        )
+        texts = [f"文档 {i}" for i in range(min_training_size(config, 0))]
+
+        # Act
+        store.add_documents([DocumentChunk(content=text) for text in texts[:10]], "kb1")
+        flat_index = base_index(store._loaded["kb1"].index)
+        store.add_documents([DocumentChunk(content=text) for text in texts[10:]], "kb1")
+        result = store.search(texts[123], "kb1", top_k=1)
+
+        # Assert
+        assert isinstance(flat_index, faiss.IndexFlat)
+        assert isinstance(base_index(store._loaded["kb1"].index), faiss.IndexHNSWSQ)
+        assert result[0].content == texts[123]
@@ -0,0 +1,84 @@
+"""FAISS 存储单进程保护单元测试"""
+import subprocess
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+from ai_qa.infrastructure.vectorstore import FaissVectorStore
+from ai_qa.interfaces.api.server import check_workers
+
+pytest.importorskip("fcntl")
+
+# 在另一个进程中打开同一个持久化目录，成功时输出 ok
+OPEN_STORE_SCRIPT = (
+    "import sys\n"
+    "from unittest.mock import MagicMock\n"
+    "from ai_qa.infrastructure.vectorstore import FaissVectorStore\n"
+    "try:\n"
+    "    FaissVectorStore(embedding=MagicMock(), persist_directory=sys.argv[1])\n"
+    "except RuntimeError as e:\n"
+    "    print(e)\n"
+    "else:\n"
+    "    print('ok')\n"
+)
+
+
+def open_in_other_process(directory) -> str:
+    """在子进程中打开 FAISS 存储，返回其输出"""
+    result = subprocess.run(
+        [sys.executable, "-c", OPEN_STORE_SCRIPT, str(directory)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.strip()
+
+
+class TestFaissProcessLock:
+    """多进程共用 FAISS 持久化目录的保护测试"""
+
+    def test_second_process_is_rejected(self, tmp_path):
+        """测试：目录已被本进程打开时，其他进程打开同一目录失败"""
+        # Arrange
+        store = FaissVectorStore(embedding=MagicMock(), persist_directory=str(tmp_path))
+
+        # Act
+        output = open_in_other_process(tmp_path)
+
+        # Assert
+        assert "已被其他进程使用" in output
+        assert store.count() == 0  # 本进程的实例不受影响
+
+    def test_same_process_can_reopen(self, tmp_path):
+        """测试：同一进程内的多个实例共用目录锁"""
+        # Arrange
+        first = FaissVectorStore(embedding=MagicMock(), persist_directory=str(tmp_path))
+
+        # Act
+        second = FaissVectorStore(embedding=MagicMock(), persist_directory=str(tmp_path))
+
+        # Assert
+        assert first is not second
+
+    def test_lock_released_when_process_exits(self, tmp_path):
+        """测试：持有锁的进程退出后，其他进程可以打开目录"""
+        # Act
+        first = open_in_other_process(tmp_path)
+        second = open_in_other_process(tmp_path)
+
+        # Assert
+        assert first == second == "ok"
+        assert (tmp_path / ".lock").exists()
+
+
+class TestCheckWorkers:
+    """生产入口的进程数检查测试"""
+
+    def test_faiss_rejects_multiple_workers(self):
+        """测试：FAISS 存储配置多个进程时拒绝启动，单进程或 postgres 存储正常"""
+        # Act & Assert
+        with pytest.raises(ValueError, match="SERVER_WORKERS=4"):
+            check_workers("faiss", 4)
+        check_workers("faiss", 1)
+        check_workers("postgres", 4)
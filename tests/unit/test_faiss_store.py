@@ -0,0 +1,426 @@
+"""FaissVectorStore 多知识库（每个知识库独立子索引）单元测试"""
+import os
+import pickle
+import threading
+
+import faiss
+import numpy as np
+import pytest
+
+from ai_qa.domain.entities import DocumentChunk, SearchMode
+from ai_qa.infrastructure.vectorstore import FaissVectorStore
+
+
+class HashEmbedding:
+    """按文本生成确定性随机向量"""
+
+    dimension = 8
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        seed = sum(ord(char) for char in text)
+        return np.random.default_rng(seed).normal(size=self.dimension).tolist()
+
+
+@pytest.fixture
+def make_store(tmp_path):
+    """创建持久化到临时目录的 FaissVectorStore"""
+    def factory(**kwargs):
+        return FaissVectorStore(
+            embedding=HashEmbedding(),
+            dimension=HashEmbedding.dimension,
+            persist_directory=str(tmp_path),
+            **kwargs,
+        )
+    return factory
+
+
+def chunks(*contents: str) -> list[DocumentChunk]:
+    return [DocumentChunk(content=content) for content in contents]
+
+
+class TestKnowledgeBaseIsolation:
+    """知识库隔离测试"""
+
+    def test_search_only_returns_chunks_of_the_knowledge_base(self, make_store):
+        """测试：检索只返回指定知识库的文档块"""
+        # Arrange
+        store = make_store()
+        store.add_documents(chunks("苹果", "香蕉"), "kb1")
+        store.add_documents(chunks("汽车", "火车"), "kb2")
+
+        # Act
+        result = store.search("苹果", "kb2", top_k=5)
+
+        # Assert
+        assert {chunk.content for chunk in result} == {"汽车", "火车"}
+        assert store.search("苹果", "kb_missing") == []
+
+    def test_count_and_clear_per_knowledge_base(self, make_store):
+        """测试：count 按知识库统计，clear 只清空指定知识库"""
+        # Arrange
+        store = make_store()
+        store.add_documents(chunks("a", "b", "c"), "kb1")
+        store.add_documents(chunks("d"), "kb2")
+
+        # Act
+        store.clear("kb1")
+
+        # Assert
+        assert store.count("kb1") == 0
+        assert store.count("kb2") == 1
+        assert store.count() == 1
+
+
+class TestLazyLoadingAndEviction:
+    """懒加载与 LRU 淘汰测试"""
+
+    def test_cold_knowledge_base_evicted_and_reloaded(self, make_store):
+        """测试：超过常驻上限时淘汰最久未使用的知识库，再次访问时从磁盘加载"""
+        # Arrange
+        store = make_store(max_loaded_kbs=1)
+        store.add_documents(chunks("苹果"), "kb1")
+        store.add_documents(chunks("汽车"), "kb2")
+
+        # Assert：kb1 已移出内存，但计数和检索仍然正确
+        assert list(store._loaded) == ["kb2"]
+        assert store.count("kb1") == 1
+        assert store.search("苹果", "kb1")[0].content == "苹果"
+        assert list(store._loaded) == ["kb1"]
+
+    def test_new_instance_loads_from_disk_lazily(self, make_store):
+        """测试：重启后按需加载知识库"""
+        make_store().add_documents(chunks("苹果", "香蕉"), "kb1")
+
+        store = make_store()
+
+        assert store._loaded == {}
+        assert store.count() == 2
+        assert len(store.search("香蕉", "kb1", top_k=2)) == 2
+
+    def test_cold_load_does_not_block_other_knowledge_bases(self, make_store):
+        """测试：加载冷知识库期间其他知识库可以检索，同一知识库的并发请求只加载一次"""
+        # Arrange
+        seed = make_store()
+        seed.add_documents(chunks("苹果"), "kb1")
+        seed.add_documents(chunks("汽车"), "kb2")
+        store = make_store()
+        store.search("汽车", "kb2")
+
+        loading, release = threading.Event(), threading.Event()
+        load = store._load
+        loads = []
+
+        def slow_load(key):
+            loads.append(key)
+            loading.set()
+            release.wait(5)
+            return load(key)
+
+        store._load = slow_load
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(store.search("苹果", "kb1")))
+            for _ in range(2)
+        ]
+
+        # Act
+        for thread in threads:
+            thread.start()
+        assert loading.wait(5)
+        other = []
+        searcher = threading.Thread(target=lambda: other.extend(store.search("汽车", "kb2")))
+        searcher.start()
+        searcher.join(2)
+        finished_while_loading = not searcher.is_alive()
+        release.set()
+        for thread in [searcher, *threads]:
+            thread.join(5)
+
+        # Assert
+        assert finished_while_loading
+        assert other[0].content == "汽车"
+        assert loads == ["kb1"]
+        assert [[chunk.content for chunk in result] for result in results] == [["苹果"], ["苹果"]]
+
+
+class TestLegacyLayoutMigration:
+    """旧版全局索引迁移测试"""
+
+    def test_legacy_global_index_becomes_default_partition(self, tmp_path, make_store):
+        """测试：旧版根目录下的索引迁移为默认分区"""
+        # Arrange
+        embedding = HashEmbedding()
+        legacy = faiss.IndexFlatL2(HashEmbedding.dimension)
+        legacy.add(np.array(embedding.embed_texts(["苹果", "汽车"]), dtype=np.float32))
+        faiss.write_index(legacy, str(tmp_path / "index.faiss"))
+        with open(tmp_path / "chunks.pkl", "wb") as f:
+            pickle.dump(chunks("苹果", "汽车"), f)
+
+        # Act
+        store = make_store()
+
+        # Assert
+        assert not os.path.exists(tmp_path / "index.faiss")
+        assert store.count() == 2
+        assert store.search("汽车", top_k=1)[0].content == "汽车"
+
+
+class TestAppendOnlyPersistence:
+    """追加式段存储测试"""
+
+    def test_each_add_appends_one_segment(self, tmp_path, make_store):
+        """测试：每次写入只追加一个新段，不重写已有数据"""
+        # Arrange
+        store = make_store()
+        store.add_documents(chunks("苹果"), "kb1")
+        segment_dir = tmp_path / "kb" / "kb1" / "segments"
+        first_segment = segment_dir / "seg-00000001.npy"
+        mtime = os.path.getmtime(first_segment)
+
+        # Act
+        store.add_documents(chunks("香蕉"), "kb1")
+
+        # Assert
+        assert sorted(os.listdir(segment_dir)) == [
+            "seg-00000001.ids.npy", "seg-00000001.npy",
+            "seg-00000002.ids.npy", "seg-00000002.npy",
+        ]
+        assert os.path.getmtime(first_segment) == mtime
+
+    def test_unregistered_segment_from_crash_is_ignored(self, tmp_path, make_store):
+        """测试：崩溃残留的未登记段文件在加载时被清理，不影响数据"""
+        # Arrange
+        make_store().add_documents(chunks("苹果"), "kb1")
+        segment_dir = tmp_path / "kb" / "kb1" / "segments"
+        np.save(segment_dir / "seg-00000099.npy", np.ones((1, HashEmbedding.dimension), dtype=np.float32))
+        (segment_dir / "seg-00000002.npy.tmp").write_bytes(b"partial")
+
+        # Act
+        store = make_store()
+        result = store.search("苹果", "kb1", top_k=5)
+
+        # Assert
+        assert [chunk.content for chunk in result] == ["苹果"]
+        assert sorted(os.listdir(segment_dir)) == ["seg-00000001.ids.npy", "seg-00000001.npy"]
+
+    def test_checkpoint_then_replay_segments(self, tmp_path, make_store):
+        """测试：重启时读取检查点并回放之后追加的段"""
+        # Arrange
+        store = make_store(checkpoint_segments=2)
+        for text in ["苹果", "香蕉", "橙子"]:
+            store.add_documents(chunks(text), "kb1")
+
+        # Act
+        reloaded = make_store()
+
+        # Assert
+        assert os.listdir(tmp_path / "kb" / "kb1" / "checkpoints") == ["index-00000002.faiss"]
+        assert reloaded.count("kb1") == 3
+        assert reloaded.search("橙子", "kb1", top_k=1)[0].content == "橙子"
+        assert reloaded._loaded["kb1"].ntotal == 3
+
+    def test_compaction_merges_segments(self, tmp_path, make_store):
+        """测试：段数达到阈值时合并为一个段，数据不变"""
+        # Arrange
+        store = make_store(compact_segments=3)
+
+        # Act
+        for text in ["苹果", "香蕉", "橙子"]:
+            store.add_documents(chunks(text), "kb1")
+        reloaded = make_store()
+
+        # Assert
+        assert sorted(os.listdir(tmp_path / "kb" / "kb1" / "segments")) == [
+            "seg-00000004.ids.npy", "seg-00000004.npy",
+        ]
+        assert reloaded.count("kb1") == 3
+        assert reloaded.search("香蕉", "kb1", top_k=1)[0].content == "香蕉"
+
+
+    def test_corrupt_segment_raises_and_keeps_data(self, tmp_path, make_store):
+        """测试：段文件损坏时加载报错，写入不会在已有数据上新建空索引"""
+        # Arrange
+        make_store().add_documents(chunks("苹果", "香蕉"), "kb1")
+        (tmp_path / "kb" / "kb1" / "segments" / "seg-00000001.npy").write_bytes(b"corrupt")
+        store = make_store()
+
+        # Act & Assert
+        with pytest.raises(Exception):
+            store.search("苹果", "kb1")
+        with pytest.raises(Exception):
+            store.add_documents(chunks("橙子"), "kb1")
+        assert "kb1" not in store._loaded
+        assert store.count("kb1") == 2
+
+
+class TestMemoryMappedLoading:
+    """内存映射加载与按需读取文档块测试"""
+
+    def test_checkpoint_is_mapped_and_tail_replayed_into_delta(self, make_store):
+        """测试：检查点以只读映射加载，之后的段回放到增量索引，两者都能检索到"""
+        # Arrange
+        store = make_store(checkpoint_segments=2)
+        for text in ["苹果", "香蕉", "橙子"]:
+            store.add_documents(chunks(text), "kb1")
+
+        # Act
+        reloaded = make_store()
+        apple = reloaded.search("苹果", "kb1", top_k=1)
+        orange = reloaded.search("橙子", "kb1", top_k=1)
+
+        # Assert
+        kb = reloaded._loaded["kb1"]
+        assert kb.mapped
+        assert (kb.index.ntotal, kb.delta.ntotal) == (2, 1)
+        assert [chunk.content for chunk in apple + orange] == ["苹果", "橙子"]
+
+    def test_first_write_makes_mapped_index_writable(self, make_store):
+        """测试：映射加载后首次写入时换成可写索引，数据完整"""
+        # Arrange
+        store = make_store(checkpoint_segments=1)
+        store.add_documents(chunks("苹果", "香蕉"), "kb1")
+        reloaded = make_store(checkpoint_segments=1)
+        reloaded.search("苹果", "kb1")
+
+        # Act
+        reloaded.add_documents(chunks("橙子"), "kb1")
+
+        # Assert
+        kb = reloaded._loaded["kb1"]
+        assert not kb.mapped
+        assert kb.index.ntotal == 3
+        assert reloaded.search("橙子", "kb1", top_k=1)[0].content == "橙子"
+        assert make_store().search("香蕉", "kb1", top_k=1)[0].content == "香蕉"
+
+    def test_chunks_are_read_on_demand(self, make_store):
+        """测试：持久化的文档块不常驻内存，关键词检索也能按 ID 取回"""
+        # Arrange
+        make_store().add_documents(
+            [DocumentChunk(content="错误码 E-1024", document_id="doc1", chunk_id=0, metadata={"page": 1})], "kb1"
+        )
+
+        # Act
+        reloaded = make_store()
+        result = reloaded.search("E-1024", "kb1", top_k=1, mode=SearchMode.KEYWORD)
+
+        # Assert
+        assert reloaded._loaded["kb1"].chunks is None
+        assert result[0].document_id == "doc1"
+        assert result[0].chunk_id == 0
+        assert result[0].metadata == {"page": 1}
+
+
+def doc_chunks(document_id: str, *contents: str) -> list[DocumentChunk]:
+    return [DocumentChunk(content=content, document_id=document_id) for content in contents]
+
+
+class TestDeleteDocument:
+    """按文档删除测试"""
+
+    def test_deleted_document_is_not_returned(self, make_store):
+        """测试：删除文档后检索不再返回其文档块，其它文档不受影响"""
+        # Arrange
+        store = make_store()
+        store.add_documents(doc_chunks("doc1", "苹果", "香蕉"), "kb1")
+        store.add_documents(doc_chunks("doc2", "汽车"), "kb1")
+
+        # Act
+        deleted = store.delete_document("doc1", "kb1")
+
+        # Assert
+        assert deleted == 2
+        assert store.count("kb1") == 1
+        assert [chunk.content for chunk in store.search("苹果", "kb1", top_k=5)] == ["汽车"]
+        assert store.search("香蕉", "kb1", top_k=5, mode=SearchMode.KEYWORD) == []
+
+    def test_delete_survives_restart(self, make_store):
+        """测试：删除后重启，已删除的文档块不会重新出现"""
+        # Arrange
+        store = make_store(checkpoint_segments=1)
+        store.add_documents(doc_chunks("doc1", "苹果"), "kb1")
+        store.add_documents(doc_chunks("doc2", *[f"水果{i}" for i in range(9)]), "kb1")
+
+        # Act
+        store.delete_document("doc1", "kb1")
+        reloaded = make_store()
+
+        # Assert
+        assert reloaded.count("kb1") == 9
+        assert "苹果" not in [chunk.content for chunk in reloaded.search("苹果", "kb1", top_k=10)]
+        assert len(reloaded.search("苹果", "kb1", top_k=9)) == 9
+
+    def test_tombstones_are_purged_from_index_and_segments(self, tmp_path, make_store):
+        """测试：墓碑占比超过阈值时从索引中清除，并合并磁盘段"""
+        # Arrange
+        store = make_store()
+        store.add_documents(doc_chunks("doc1", "苹果", "香蕉"), "kb1")
+        store.add_documents(doc_chunks("doc2", "汽车"), "kb1")
+
+        # Act
+        store.delete_document("doc1", "kb1")
+        reloaded = make_store()
+
+        # Assert
+        kb = store._loaded["kb1"]
+        assert kb.index.ntotal == 1
+        assert kb.tombstones == set()
+        assert sorted(os.listdir(tmp_path / "kb" / "kb1" / "segments")) == [
+            "seg-00000003.ids.npy", "seg-00000003.npy",
+        ]
+        assert [chunk.content for chunk in reloaded.search("苹果", "kb1", top_k=5)] == ["汽车"]
+
+    def test_delete_in_memory_store(self):
+        """测试：不持久化的存储也支持按文档删除"""
+        # Arrange
+        store = FaissVectorStore(embedding=HashEmbedding(), dimension=HashEmbedding.dimension)
+        store.add_documents(doc_chunks("doc1", "苹果"), "kb1")
+        store.add_documents(doc_chunks("doc2", "汽车"), "kb1")
+
+        # Act
+        store.delete_document("doc1", "kb1")
+
+        # Assert
+        assert store.count("kb1") == 1
+        assert [chunk.content for chunk in store.search("苹果", "kb1", top_k=5)] == ["汽车"]
+        assert store.delete_document("missing", "kb1") == 0
+
+
+class TestSearchBatch:
+    """批量检索测试"""
+
+    def test_batch_matches_single_searches(self, make_store):
+        """测试：批量检索的结果与逐条检索一致，且只调用一次 Embedding"""
+        # Arrange
+        store = make_store(checkpoint_segments=1)
+        store.add_documents(chunks("苹果", "香蕉", "汽车", "火车"), "kb1")
+        store.add_documents(chunks("橙子"), "kb1")
+        store = make_store()
+        queries = ["苹果", "火车", "橙子"]
+        expected = [store.search(query, "kb1", top_k=2) for query in queries]
+        calls = []
+        embed_texts = store._embedding.embed_texts
+        store._embedding.embed_texts = lambda texts: calls.append(texts) or embed_texts(texts)
+
+        # Act
+        results = store.search_batch(queries, "kb1", top_k=2)
+
+        # Assert
+        assert calls == [queries]
+        assert [[c.content for c in r] for r in results] == [[c.content for c in r] for r in expected]
+
+    def test_batch_hybrid_and_missing_knowledge_base(self, make_store):
+        """测试：混合检索批量可用；知识库不存在时每个查询返回空列表"""
+        # Arrange
+        store = make_store()
+        store.add_documents(chunks("错误码 E-1024", "错误码 E-2048"), "kb1")
+
+        # Act
+        hybrid = store.search_batch(["E-2048"], "kb1", top_k=1, mode=SearchMode.HYBRID)
+        missing = store.search_batch(["苹果", "香蕉"], "kb2")
+
+        # Assert
+        assert hybrid[0][0].content == "错误码 E-2048"
+        assert missing == [[], []]
@@ -0,0 +1,168 @@
+"""混合检索（BM25 + 向量，RRF 融合）单元测试"""
+from unittest.mock import MagicMock
+
+from ai_qa.application.knowledge_service import KnowledgeService
+from ai_qa.domain.entities import DocumentChunk, SearchMode
+from ai_qa.infrastructure.vectorstore import FaissVectorStore
+from ai_qa.infrastructure.vectorstore.hybrid import (
+    BM25Index,
+    candidate_count,
+    reciprocal_rank_fusion,
+    tokenize,
+)
+
+
+class FakeEmbedding:
+    """按文本查表返回向量，未登记的文本返回默认向量"""
+
+    def __init__(self, vectors: dict[str, list[float]], default: list[float]):
+        self._vectors = vectors
+        self._default = default
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._vectors.get(text, self._default)
+
+
+class TestTokenize:
+    """分词测试"""
+
+    def test_tokenize_keeps_codes_and_splits_cjk_bigrams(self):
+        """测试：错误码整体保留，中文按 bigram 切分"""
+        tokens = tokenize("错误码 E-1024 机器学习")
+
+        assert "e-1024" in tokens
+        assert tokens.count("机器") == 1
+        assert "器学" in tokens
+        assert "学习" in tokens
+
+
+class TestBM25Index:
+    """BM25 索引测试"""
+
+    def test_search_ranks_exact_term_first(self):
+        """测试：包含查询词的文档排在前面"""
+        index = BM25Index()
+        index.add("a", "订单支付失败，返回错误码 E-1024")
+        index.add("b", "订单支付成功后发送通知")
+        index.add("c", "用户登录流程说明")
+
+        result = index.search("E-1024 是什么错误", top_k=3)
+
+        assert result[0][0] == "a"
+        assert "c" not in [key for key, _ in result]
+
+    def test_remove_and_allowed_filter(self):
+        """测试：删除的文档不再召回，allowed 限制检索范围"""
+        index = BM25Index()
+        index.add("a", "python 教程")
+        index.add("b", "python 进阶")
+
+        index.remove("a")
+
+        assert [key for key, _ in index.search("python", top_k=5)] == ["b"]
+        assert index.search("python", top_k=5, allowed={"x"}) == []
+
+
+class TestReciprocalRankFusion:
+    """RRF 融合测试"""
+
+    def test_items_in_both_rankings_rank_first(self):
+        """测试：两路都召回的结果排在前面"""
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]], top_k=2)
+
+        assert fused[0] == "c"
+        assert len(fused) == 2
+
+
+class TestCandidateCount:
+    """混合检索每一路召回数量测试"""
+
+    def test_small_top_k_is_expanded(self):
+        """测试：top_k 较小时放大召回，保证融合有足够候选"""
+        assert candidate_count(3) == 20
+        assert candidate_count(10) == 40
+
+    def test_rerank_candidates_are_not_multiplied(self):
+        """测试：启用重排序时（top_k 为重排序候选数）每一路只召回 top_k 个，不再放大 4 倍"""
+        assert candidate_count(50) == 50
+        assert candidate_count(80) == 80
+
+
+class TestFaissHybridSearch:
+    """FAISS 混合检索测试"""
+
+    def test_hybrid_recovers_exact_term_missed_by_vector(self):
+        """测试：向量检索漏掉的精确词命中文档，混合检索可以召回"""
+        # Arrange：查询向量与干扰文档完全相同，与目标文档相距最远
+        texts = ["SKU-88731 退货政策", "退货流程说明", "退货常见问题", "售后服务介绍"]
+        embedding = FakeEmbedding(
+            vectors={
+                texts[0]: [0.0, 0.0, 10.0],
+                texts[1]: [1.0, 0.0, 0.0],
+                texts[2]: [1.0, 0.1, 0.0],
+                texts[3]: [1.0, 0.2, 0.0],
+            },
+            default=[1.0, 0.0, 0.0],
+        )
+        store = FaissVectorStore(embedding=embedding, dimension=3)
+        store.add_documents([DocumentChunk(content=text) for text in texts])
+
+        # Act
+        vector_only = store.search("SKU-88731 怎么退货", top_k=2)
+        hybrid = store.search("SKU-88731 怎么退货", top_k=2, mode=SearchMode.HYBRID)
+        keyword = store.search("SKU-88731 怎么退货", top_k=1, mode=SearchMode.KEYWORD)
+
+        # Assert
+        assert texts[0] not in [chunk.content for chunk in vector_only]
+        assert texts[0] in [chunk.content for chunk in hybrid]
+        assert keyword[0].content == texts[0]
+
+
+class TestKnowledgeServiceSearchMode:
+    """KnowledgeService 检索模式测试"""
+
+    def test_hybrid_mode_passes_mode_and_query_vector(self, mock_llm, mock_memory):
+        """测试：混合模式下调用 search 并复用已计算的查询向量"""
+        # Arrange
+        vector_store = MagicMock()
+        vector_store.search.return_value = [DocumentChunk(content="内容")]
+        service = KnowledgeService(
+            vector_store=vector_store,
+            llm=mock_llm,
+            memory=mock_memory,
+            search_mode=SearchMode.HYBRID,
+        )
+
+        # Act
+        service.query("什么是混合检索", "kb123")
+
+        # Assert
+        kwargs = vector_store.search.call_args.kwargs
+        assert kwargs["mode"] == SearchMode.HYBRID
+        assert kwargs["query_embedding"] is None
+        vector_store.search_by_vector.assert_not_called()
+
+
+class TestPostgresKeywordQuery:
+    """PostgreSQL 全文检索 tsquery 构造测试"""
+
+    def test_terms_are_not_parsed_as_operators(self):
+        """测试：词项 or、-开头的词项按普通文本匹配，多个词项用 || 合并"""
+        # Arrange
+        from sqlalchemy.dialects import postgresql
+
+        from ai_qa.infrastructure.vectorstore.postgres_store import keyword_tsquery
+
+        # Act
+        compiled = keyword_tsquery(["or", "-secret", "退货"]).compile(dialect=postgresql.dialect())
+        sql = str(compiled)
+
+        # Assert
+        assert "websearch_to_tsquery" not in sql
+        assert sql.count("plainto_tsquery(") == 3
+        assert sql.count("||") == 2
+        # 词项作为绑定参数传入，不拼接进查询语法
+        assert {"or", "-secret", "退货"} <= set(compiled.params.values())
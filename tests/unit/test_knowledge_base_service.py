@@ -87,4 +87,44 @@ class TestKnowledgeBaseServiceDelete:
         result = service.delete("nonexistent", "user_123")
         
         # Assert
-        assert result is False
\ No newline at end of file
+        assert result is False
+
+
+class TestKnowledgeBaseServiceStats:
+    """知识库统计测试"""
+
+    def test_get_stats_reads_counters(self, mock_db):
+        """测试：统计信息来自知识库上的计数，不再 COUNT 文档和文档块"""
+        # Arrange
+        kb = KnowledgeBaseModel(
+            id="kb_123", name="测试知识库", document_count=2, chunk_count=15, total_bytes=4096
+        )
+        mock_db.query.return_value.filter.return_value.first.return_value = kb
+        service = KnowledgeBaseService(mock_db)
+
+        # Act
+        stats = service.get_stats("kb_123", "user_123")
+
+        # Assert
+        assert stats["document_count"] == 2
+        assert stats["chunk_count"] == 15
+        assert stats["total_bytes"] == 4096
+        mock_db.query.assert_called_once_with(KnowledgeBaseModel)
+
+    def test_list_with_stats_single_query(self, mock_db):
+        """测试：列表和统计一次查询返回"""
+        # Arrange
+        kbs = [
+            KnowledgeBaseModel(id="kb_1", name="A", document_count=1, chunk_count=3, total_bytes=10),
+            KnowledgeBaseModel(id="kb_2", name="B"),
+        ]
+        mock_db.query.return_value.filter.return_value.order_by.return_value.all.return_value = kbs
+        service = KnowledgeBaseService(mock_db)
+
+        # Act
+        result = service.list_with_stats("user_123")
+
+        # Assert
+        assert [stats["chunk_count"] for stats in result] == [3, 0]
+        assert mock_db.query.call_count == 1
+
@@ -2,7 +2,7 @@
 import pytest
 from unittest.mock import MagicMock, patch, Mock
 
-from ai_qa.application.knowledge_service import KnowledgeService
+from ai_qa.application.knowledge_service import KnowledgeService, NO_RELEVANT_CHUNKS_TIPS, needs_rewrite
 from ai_qa.domain.entities import DocumentChunk, Conversation, Message, MessageRole, KnowledgeBase
 
 
@@ -230,8 +230,134 @@ class TestAddDocument:
         assert doc_model.file_path == file_path
 
 
+    def test_add_document_increments_kb_counters(
+        self, knowledge_service, mock_db, mock_vector_store
+    ):
+        """测试：添加文档时在同一事务中增加知识库计数"""
+        # Arrange
+        def mock_flush():
+            mock_db.add.call_args[0][0].id = "doc123"
+
+        mock_db.flush = mock_flush
+        content = "Document content " * 20
+
+        # Act
+        chunk_count = knowledge_service.add_document("kb123", "Test", content)
+
+        # Assert
+        values = mock_db.query.return_value.filter.return_value.update.call_args[0][0]
+        increments = {column.key: expr.right.value for column, expr in values.items()}
+        assert increments == {
+            "document_count": 1,
+            "chunk_count": chunk_count,
+            "total_bytes": len(content.encode("utf-8")),
+        }
+        mock_db.commit.assert_called_once()
+
+    def test_add_document_commits_once_with_postgres_store(self, mock_llm, mock_memory, mock_db):
+        """测试：文档、文档块和知识库计数在同一个事务中提交，向量存储只 flush"""
+        # Arrange
+        from ai_qa.infrastructure.vectorstore.postgres_store import PostgresVectorStore
+
+        embedding = MagicMock()
+        embedding.embed_texts.side_effect = lambda texts: [[0.1, 0.2] for _ in texts]
+        mock_db.add.side_effect = lambda doc: setattr(doc, "id", "doc123")
+        service = KnowledgeService(
+            vector_store=PostgresVectorStore(mock_db, embedding),
+            llm=mock_llm,
+            memory=mock_memory,
+            db=mock_db,
+        )
+
+        # Act
+        service.add_document("kb123", "Test", "Document content " * 20)
+
+        # Assert
+        mock_db.add_all.assert_called_once()
+        mock_db.commit.assert_called_once()
+        assert mock_db.method_calls[-1] == ("commit", (), {})
+
+
+class TestDeleteDocument:
+    """从知识库删除文档测试"""
+
+    def test_delete_document_removes_chunks_and_soft_deletes_record(
+        self, knowledge_service, mock_db, mock_vector_store
+    ):
+        """测试：删除文档时删除向量存储中的文档块，并软删除文档记录"""
+        # Arrange
+        doc = MagicMock(status=1)
+        mock_db.query.return_value.filter.return_value.first.return_value = doc
+
+        # Act
+        result = knowledge_service.delete_document("kb123", "doc123")
+
+        # Assert
+        assert result is True
+        assert doc.status == -1
+        mock_vector_store.delete_document.assert_called_once_with("doc123", knowledge_base_id="kb123")
+        mock_db.commit.assert_called_once()
+
+    def test_delete_document_decrements_kb_counters(
+        self, knowledge_service, mock_db, mock_vector_store
+    ):
+        """测试：删除文档时减少知识库计数"""
+        # Arrange
+        doc = MagicMock(status=1, file_size=300)
+        mock_db.query.return_value.filter.return_value.first.return_value = doc
+        mock_vector_store.delete_document.return_value = 4
+
+        # Act
+        knowledge_service.delete_document("kb123", "doc123")
+
+        # Assert
+        values = mock_db.query.return_value.filter.return_value.update.call_args[0][0]
+        increments = {column.key: expr.right.value for column, expr in values.items()}
+        assert increments == {"document_count": -1, "chunk_count": -4, "total_bytes": -300}
+
+    def test_delete_missing_document_returns_false(
+        self, knowledge_service, mock_db, mock_vector_store
+    ):
+        """测试：文档不存在时返回 False，不操作向量存储"""
+        # Arrange
+        mock_db.query.return_value.filter.return_value.first.return_value = None
+
+        # Act
+        result = knowledge_service.delete_document("kb123", "missing")
+
+        # Assert
+        assert result is False
+        mock_vector_store.delete_document.assert_not_called()
+
+
+class TestNeedsRewrite:
+    """查询改写启发式判断测试"""
+
+    @pytest.mark.parametrize("question", [
+        "它支持哪些数据库类型？",
+        "这个参数的默认值是多少？",
+        "上述步骤在 Windows 上也适用吗？",
+        "该接口的超时时间怎么设置？",
+        "What is the default value of it?",
+    ])
+    def test_reference_words_need_rewrite(self, question):
+        """测试：包含指代词的问题需要改写"""
+        assert needs_rewrite(question) is True
+
+    @pytest.mark.parametrize("question", [
+        "应该如何配置数据库连接池？",
+        "因此需要开通哪些权限呢？",
+        "其他模块的部署方式是什么？",
+        "那么如何安装项目的依赖包？",
+        "How do I configure the database pool?",
+    ])
+    def test_common_words_do_not_trigger_rewrite(self, question):
+        """测试：常见词中的单字（应该、因此、其他、那么）不触发改写"""
+        assert needs_rewrite(question) is False
+
+
 class TestRewriteQuery:
-    """查询改写功能测试"""
+    """查询改写功能测试（通过 _retrieve 检查实际用于检索的查询）"""
 
     def test_rewrite_query_with_no_history(self, knowledge_service, mock_memory, mock_llm):
         """测试：没有历史对话时直接返回原问题"""
@@ -243,7 +369,7 @@ class TestRewriteQuery:
         )
 
         # Act
-        result = knowledge_service._rewrite_query(session_id, question)
+        result = knowledge_service._retrieve(question, "kb123", session_id, top_k=3).search_query
 
         # Assert
         assert result == question
@@ -264,7 +390,7 @@ class TestRewriteQuery:
         mock_llm.chat.return_value = "Python 是什么?"
 
         # Act
-        result = knowledge_service._rewrite_query(session_id, question)
+        result = knowledge_service._retrieve(question, "kb123", session_id, top_k=3).search_query
 
         # Assert
         assert result == "Python 是什么?"
@@ -286,7 +412,7 @@ class TestRewriteQuery:
         mock_llm.chat.return_value = "Rewritten question"
 
         # Act
-        result = knowledge_service._rewrite_query(session_id, question)
+        result = knowledge_service._retrieve(question, "kb123", session_id, top_k=3).search_query
 
         # Assert
         assert result == "Rewritten question"
@@ -297,6 +423,87 @@ class TestRewriteQuery:
         assert "Question 9" in prompt_content
         assert "Question 4" in prompt_content
 
+    def test_rewrite_query_skips_llm_without_reference(
+        self, knowledge_service, mock_memory, mock_llm
+    ):
+        """测试：问题中没有指代词时不调用 LLM 改写"""
+        # Arrange
+        session_id = "session123"
+        question = "Python 的 GIL 是什么机制?"
+        mock_memory.get_conversation.return_value = Conversation(
+            id=session_id,
+            messages=[Message(role=MessageRole.USER, content="介绍一下 Python")],
+        )
+
+        # Act
+        result = knowledge_service._retrieve(question, "kb123", session_id, top_k=3).search_query
+
+        # Assert
+        assert result == question
+        mock_llm.chat.assert_not_called()
+
+    def test_rewrite_query_uses_cache(self, mock_vector_store, mock_llm, mock_memory):
+        """测试：相同会话、相同问题的改写结果从缓存读取"""
+        # Arrange
+        from ai_qa.infrastructure.cache import TTLCache
+
+        service = KnowledgeService(
+            vector_store=mock_vector_store,
+            llm=mock_llm,
+            memory=mock_memory,
+            rewrite_cache=TTLCache(),
+        )
+        mock_memory.get_conversation.return_value = Conversation(
+            id="session123",
+            messages=[Message(role=MessageRole.USER, content="介绍一下 Python")],
+        )
+        mock_llm.chat.return_value = "Python 是什么?"
+
+        # Act
+        first = service._retrieve("它是什么?", "kb123", "session123", top_k=3).search_query
+        second = service._retrieve("它是什么?", "kb123", "session123", top_k=3).search_query
+
+        # Assert
+        assert first == second == "Python 是什么?"
+        mock_llm.chat.assert_called_once()
+
+    @pytest.mark.parametrize(
+        "rewritten, searched",
+        [
+            ("它是什么?", ["它是什么?"]),
+            ("Python 是什么?", ["它是什么?", "Python 是什么?"]),
+        ],
+        ids=["hit", "miss"],
+    )
+    def test_speculative_retrieval(
+        self, mock_vector_store, mock_llm, mock_memory, rewritten, searched
+    ):
+        """测试：推测检索用原问题检索，改写结果相同时复用，不同时用改写后的问题再检索"""
+        # Arrange
+        service = KnowledgeService(
+            vector_store=mock_vector_store,
+            llm=mock_llm,
+            memory=mock_memory,
+            speculative_retrieval=True,
+        )
+        mock_memory.get_conversation.return_value = Conversation(
+            id="session123",
+            messages=[Message(role=MessageRole.USER, content="介绍一下 Python")],
+        )
+        mock_llm.chat.return_value = rewritten
+        mock_vector_store.search.side_effect = lambda query, *args, **kwargs: [
+            DocumentChunk(content=f"结果：{query}", metadata={})
+        ]
+
+        # Act
+        retrieval = service._retrieve("它是什么?", "kb123", "session123", top_k=3)
+
+        # Assert
+        assert [c.args[0] for c in mock_vector_store.search.call_args_list] == searched
+        assert retrieval.search_query == rewritten
+        assert [chunk.content for chunk in retrieval.chunks] == [f"结果：{rewritten}"]
+        mock_llm.chat.assert_called_once()
+
 
 class TestQuery:
     """RAG 查询功能测试"""
@@ -356,6 +563,62 @@ class TestQuery:
         search_call_args = mock_vector_store.search.call_args[0]
         assert search_call_args[0] == "Python 是什么?"
 
+    def test_query_speculative_retrieval_reuses_raw_results(
+        self, mock_vector_store, mock_llm, mock_memory
+    ):
+        """测试：推测检索时改写结果与原问题相同，复用原问题的检索结果"""
+        # Arrange
+        service = KnowledgeService(
+            vector_store=mock_vector_store,
+            llm=mock_llm,
+            memory=mock_memory,
+            speculative_retrieval=True,
+        )
+        question = "它是什么?"
+        mock_memory.get_conversation.return_value = Conversation(
+            id="session123",
+            messages=[Message(role=MessageRole.USER, content="介绍 Python")],
+        )
+        mock_llm.chat.side_effect = [question, "回答"]
+        mock_vector_store.search.return_value = [
+            DocumentChunk(content="Python info", metadata={})
+        ]
+
+        # Act
+        result = service.query(question, "kb123", session_id="session123")
+
+        # Assert
+        assert result == "回答"
+        mock_vector_store.search.assert_called_once()
+        assert mock_vector_store.search.call_args[0][0] == question
+
+    def test_query_speculative_retrieval_searches_rewritten_query(
+        self, mock_vector_store, mock_llm, mock_memory
+    ):
+        """测试：推测检索时改写结果不同，使用改写后的问题重新检索"""
+        # Arrange
+        service = KnowledgeService(
+            vector_store=mock_vector_store,
+            llm=mock_llm,
+            memory=mock_memory,
+            speculative_retrieval=True,
+        )
+        mock_memory.get_conversation.return_value = Conversation(
+            id="session123",
+            messages=[Message(role=MessageRole.USER, content="介绍 Python")],
+        )
+        mock_llm.chat.side_effect = ["Python 是什么?", "回答"]
+        mock_vector_store.search.return_value = [
+            DocumentChunk(content="Python info", metadata={})
+        ]
+
+        # Act
+        service.query("它是什么?", "kb123", session_id="session123")
+
+        # Assert
+        assert mock_vector_store.search.call_count == 2
+        assert mock_vector_store.search.call_args[0][0] == "Python 是什么?"
+
     def test_query_no_relevant_chunks(self, knowledge_service, mock_vector_store):
         """测试：没有找到相关文档块"""
         # Arrange
@@ -391,27 +654,31 @@ class TestQuery:
 class TestQueryStream:
     """流式 RAG 查询测试"""
 
-    def test_query_stream_yields_chunks(
+    @pytest.mark.asyncio
+    async def test_aquery_stream_yields_chunks(
         self, knowledge_service, mock_vector_store, mock_llm
     ):
-        """测试：query_stream 流式返回响应"""
+        """测试：aquery_stream 在线程中检索，异步流式返回响应"""
         # Arrange
-        question = "What is AI?"
-        kb_id = "kb123"
         mock_vector_store.search.return_value = [
             DocumentChunk(content="AI content", metadata={})
         ]
-        mock_llm.chat_stream.return_value = iter(["AI ", "is ", "great"])
+
+        async def fake_stream(messages, system_prompt=None):
+            for chunk in ["AI ", "is ", "great"]:
+                yield chunk
+
+        mock_llm.achat_stream = fake_stream
 
         # Act
-        result = list(knowledge_service.query_stream(question, kb_id))
+        result = [chunk async for chunk in knowledge_service.aquery_stream("What is AI?", "kb123")]
 
         # Assert
         assert result == ["AI ", "is ", "great"]
         mock_vector_store.search.assert_called_once()
-        mock_llm.chat_stream.assert_called_once()
 
-    def test_query_stream_no_relevant_chunks(self, knowledge_service, mock_vector_store):
+    @pytest.mark.asyncio
+    async def test_query_stream_no_relevant_chunks(self, knowledge_service, mock_vector_store):
         """测试：流式查询没有找到相关文档"""
         # Arrange
         question = "Unknown"
@@ -419,20 +686,126 @@ class TestQueryStream:
         mock_vector_store.search.return_value = []
 
         # Act
-        result_gen = knowledge_service.query_stream(question, kb_id)
+        result_list = [chunk async for chunk in knowledge_service.aquery_stream(question, kb_id)]
+
+        # Assert: 只返回一条"没有找到相关内容"提示
+        assert result_list == [NO_RELEVANT_CHUNKS_TIPS]
+
+
+class TestSemanticCache:
+    """语义回答缓存测试"""
+
+    @pytest.fixture
+    def cached_service(self, mock_vector_store, mock_llm, mock_memory, mock_db):
+        """启用语义缓存的 KnowledgeService"""
+        from ai_qa.infrastructure.cache import InMemorySemanticCache
+
+        embedding = MagicMock()
+        embedding.embed_query.return_value = [1.0, 0.0]
+        return KnowledgeService(
+            vector_store=mock_vector_store,
+            llm=mock_llm,
+            memory=mock_memory,
+            db=mock_db,
+            embedding=embedding,
+            answer_cache=InMemorySemanticCache(threshold=0.9),
+        )
+
+    def test_query_second_time_served_from_cache(
+        self, cached_service, mock_vector_store, mock_llm
+    ):
+        """测试：相同问题第二次查询不再检索、不再调用 LLM"""
+        # Arrange
+        mock_vector_store.search_by_vector.return_value = [
+            DocumentChunk(content="AI content", metadata={}, chunk_id="c1")
+        ]
+        mock_llm.chat.return_value = "缓存的回答"
+
+        # Act
+        first = cached_service.query("What is AI?", "kb123")
+        second = cached_service.query("What is AI?", "kb123")
 
         # Assert
-        # query_stream 是 generator 函数，即使在 return 时也返回 generator 对象
-        # 但它会立即抛出 StopIteration 包含返回值
-        # 我们需要尝试迭代它来获取返回值
-        try:
-            result_list = list(result_gen)
-            # 如果没有抛出异常，结果列表应该为空或包含错误消息
-            assert len(result_list) == 0 or result_list == ["知识库中没有找到相关内容"]
-        except StopIteration as e:
-            # 如果函数使用 return，返回值会在 StopIteration.value 中
-            if hasattr(e, 'value'):
-                assert e.value == "知识库中没有找到相关内容"
+        assert first == second == "缓存的回答"
+        mock_vector_store.search_by_vector.assert_called_once()
+        mock_vector_store.search.assert_not_called()
+        mock_llm.chat.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_query_stream_replays_cached_answer(
+        self, cached_service, mock_vector_store, mock_llm
+    ):
+        """测试：流式查询命中缓存时按流式回放"""
+        # Arrange
+        mock_vector_store.search_by_vector.return_value = [
+            DocumentChunk(content="AI content", metadata={}, chunk_id="c1")
+        ]
+        answer = "这是一个比较长的回答，" * 5
+        calls = []
+
+        async def fake_stream(messages, system_prompt=None):
+            calls.append(messages)
+            yield answer
+
+        mock_llm.achat_stream = fake_stream
+
+        # Act
+        [chunk async for chunk in cached_service.aquery_stream("What is AI?", "kb123")]
+        replayed = [chunk async for chunk in cached_service.aquery_stream("What is AI?", "kb123")]
+
+        # Assert
+        assert len(replayed) > 1
+        assert "".join(replayed) == answer
+        assert len(calls) == 1
+
+    def test_add_document_invalidates_cache(
+        self, cached_service, mock_vector_store, mock_llm, mock_db
+    ):
+        """测试：添加文档后缓存失效"""
+        # Arrange
+        mock_vector_store.search_by_vector.return_value = [
+            DocumentChunk(content="AI content", metadata={}, chunk_id="c1")
+        ]
+        cached_service.query("What is AI?", "kb123")
+
+        # Act
+        cached_service.add_document("kb123", "新文档", "新的内容")
+        cached_service.query("What is AI?", "kb123")
+
+        # Assert
+        assert mock_llm.chat.call_count == 2
+
+    def test_cached_answer_records_source_chunks(self, mock_vector_store, mock_llm, mock_memory, mock_db):
+        """测试：缓存回答按 document_id:chunk_id 记录来源，删除文档时按文档失效"""
+        # Arrange
+        answer_cache = MagicMock()
+        answer_cache.lookup.return_value = None
+        answer_cache.generation.return_value = 0
+        embedding = MagicMock()
+        embedding.embed_query.return_value = [1.0, 0.0]
+        service = KnowledgeService(
+            vector_store=mock_vector_store,
+            llm=mock_llm,
+            memory=mock_memory,
+            db=mock_db,
+            embedding=embedding,
+            answer_cache=answer_cache,
+        )
+        mock_vector_store.search_by_vector.return_value = [
+            DocumentChunk(content="A", metadata={}, document_id="doc1", chunk_id=0),
+            DocumentChunk(content="B", metadata={}, document_id="doc2", chunk_id=0),
+        ]
+        mock_db.query.return_value.filter.return_value.first.return_value = MagicMock(status=1)
+        mock_vector_store.delete_document.return_value = 1
+
+        # Act
+        service.query("What is AI?", "kb123")
+        service.delete_document("kb123", "doc1")
+
+        # Assert
+        stored = answer_cache.store.call_args[0][2]
+        assert stored.chunk_ids == ["doc1:0", "doc2:0"]
+        answer_cache.invalidate_document.assert_called_once_with("kb123", "doc1")
 
 
 class TestGetRelevantChunks:
@@ -458,6 +831,45 @@ class TestGetRelevantChunks:
         mock_vector_store.search.assert_called_once_with(question, top_k=2)
 
 
+class TestGetRelevantChunksBatch:
+    """批量检索测试"""
+
+    def test_batch_issues_single_store_call(self, knowledge_service, mock_vector_store):
+        """测试：多个问题只调用一次 search_batch，结果与问题一一对应"""
+        # Arrange
+        mock_vector_store.search_batch.return_value = [
+            [DocumentChunk(content="A")],
+            [DocumentChunk(content="B")],
+        ]
+
+        # Act
+        results = knowledge_service.get_relevant_chunks_batch(["问题一", "问题二"], "kb123", top_k=1)
+
+        # Assert
+        mock_vector_store.search_batch.assert_called_once_with(["问题一", "问题二"], "kb123", 1)
+        assert [[chunk.content for chunk in chunks] for chunks in results] == [["A"], ["B"]]
+
+    def test_batch_reranks_each_query(self, mock_vector_store, mock_llm, mock_memory):
+        """测试：启用重排序时批量召回候选，再逐个问题重排"""
+        # Arrange
+        reranker = MagicMock()
+        reranker.rerank.side_effect = lambda query, chunks, top_n: chunks[::-1][:top_n]
+        service = KnowledgeService(
+            vector_store=mock_vector_store, llm=mock_llm, memory=mock_memory,
+            reranker=reranker, rerank_candidates=10,
+        )
+        mock_vector_store.search_batch.return_value = [
+            [DocumentChunk(content="A1"), DocumentChunk(content="A2")],
+        ]
+
+        # Act
+        results = service.get_relevant_chunks_batch(["问题一"], "kb123", top_k=1)
+
+        # Assert
+        mock_vector_store.search_batch.assert_called_once_with(["问题一"], "kb123", 10)
+        assert [chunk.content for chunk in results[0]] == ["A2"]
+
+
 class TestGetChunkCount:
     """获取文档块数量测试"""
 
@@ -486,6 +898,19 @@ class TestGetChunkCount:
         assert result == 100
         mock_vector_store.count.assert_called_once_with(knowledge_base_id=None)
 
+    def test_has_chunks_delegates_to_store(self, knowledge_service, mock_vector_store):
+        """测试：判断知识库非空使用 has_chunks，不统计数量"""
+        # Arrange
+        mock_vector_store.has_chunks.return_value = True
+
+        # Act
+        result = knowledge_service.has_chunks("kb123")
+
+        # Assert
+        assert result is True
+        mock_vector_store.has_chunks.assert_called_once_with(knowledge_base_id="kb123")
+        mock_vector_store.count.assert_not_called()
+
 
 class TestKnowledgeServiceIntegration:
     """KnowledgeService 集成测试"""
@@ -0,0 +1,131 @@
+"""日志配置单元测试"""
+import io
+import json
+import logging
+import queue
+import sys
+
+import pytest
+
+from ai_qa.config.logging import (
+    DroppingQueueHandler,
+    JsonFormatter,
+    SamplingFilter,
+    TextFormatter,
+    setup_logging,
+    shutdown_logging,
+    truncate,
+)
+
+
+def make_record(message: str, level: int = logging.INFO, exc_info=None) -> logging.LogRecord:
+    return logging.LogRecord("ai_qa.test", level, __file__, 10, message, None, exc_info)
+
+
+@pytest.fixture
+def restore_logging():
+    """测试结束后恢复根 logger 的级别"""
+    root = logging.getLogger()
+    level = root.level
+    yield
+    shutdown_logging()
+    root.setLevel(level)
+
+
+class TestFormatters:
+    """格式化和截断测试"""
+
+    def test_truncate_long_message(self):
+        """测试：超长消息截断并注明省略的字符数"""
+        assert truncate("a" * 10, 4) == "aaaa...(truncated 6 chars)"
+        assert truncate("short", 10) == "short"
+        assert truncate("a" * 10, 0) == "a" * 10
+
+    def test_json_formatter_outputs_one_object(self):
+        """测试：JSON 格式包含级别、logger 和截断后的消息"""
+        # Arrange
+        formatter = JsonFormatter(max_message_length=5)
+
+        # Act
+        data = json.loads(formatter.format(make_record("用户输入很长很长")))
+
+        # Assert
+        assert data["level"] == "INFO"
+        assert data["logger"] == "ai_qa.test"
+        assert data["message"] == "用户输入很...(truncated 3 chars)"
+
+    def test_json_formatter_includes_exception(self):
+        """测试：异常堆栈放在 exception 字段"""
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = make_record("失败", logging.ERROR, exc_info=sys.exc_info())
+
+        data = json.loads(JsonFormatter().format(record))
+
+        assert "ValueError: boom" in data["exception"]
+
+    def test_text_formatter_truncates(self):
+        """测试：文本格式同样截断消息"""
+        output = TextFormatter(max_message_length=3).format(make_record("abcdef"))
+
+        assert output.endswith("- abc...(truncated 3 chars)")
+
+
+class TestSamplingFilter:
+    """采样测试"""
+
+    def test_drops_info_keeps_warning(self):
+        """测试：比例为 0 时丢弃 INFO，保留 WARNING"""
+        sampling = SamplingFilter(0)
+
+        assert sampling.filter(make_record("GET /", logging.INFO)) is False
+        assert sampling.filter(make_record("GET /", logging.WARNING)) is True
+
+
+class TestQueueLogging:
+    """队列异步输出测试"""
+
+    def test_records_written_by_listener(self, restore_logging):
+        """测试：日志经队列由后台线程写出，停止时清空队列"""
+        # Arrange
+        stream = io.StringIO()
+        setup_logging(log_format="json", stream=stream)
+
+        # Act
+        logging.getLogger("ai_qa.test").info("消息 %s", 1)
+        shutdown_logging()
+
+        # Assert
+        data = json.loads(stream.getvalue().strip().splitlines()[-1])
+        assert data["message"] == "消息 1"
+
+    def test_exception_survives_queue(self, restore_logging):
+        """测试：经过队列后仍保留异常堆栈"""
+        stream = io.StringIO()
+        setup_logging(stream=stream)
+
+        try:
+            raise RuntimeError("队列异常")
+        except RuntimeError:
+            logging.getLogger("ai_qa.test").exception("处理失败")
+        shutdown_logging()
+
+        output = stream.getvalue()
+        assert "处理失败" in output
+        assert "RuntimeError: 队列异常" in output
+
+    def test_full_queue_drops_without_blocking(self):
+        """测试：队列满时丢弃日志，下一条日志报告丢弃数"""
+        # Arrange
+        handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+        handler.setFormatter(logging.Formatter())
+
+        # Act
+        handler.handle(make_record("第一条"))
+        handler.handle(make_record("第二条"))
+        handler.queue.get_nowait()
+        handler.handle(make_record("第三条"))
+
+        # Assert
+        assert handler.queue.get_nowait().getMessage() == "第三条 [日志队列已满，丢弃 1 条]"
@@ -0,0 +1,64 @@
+"""Prometheus 多进程指标单元测试"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from ai_qa.infrastructure.observability.metrics import MULTIPROC_DIR_ENV, render_metrics
+from ai_qa.interfaces.api.server import prepare_metrics_dir
+
+prometheus_client = pytest.importorskip("prometheus_client")
+
+# 模拟一个 worker：在多进程模式下记录一次 LLM 调用后退出
+WORKER_SCRIPT = (
+    "from ai_qa.infrastructure.observability.metrics import LLM_REQUESTS\n"
+    "LLM_REQUESTS.labels('qwen-test', 'chat', 'ok').inc()\n"
+)
+
+
+class TestMultiprocessMetrics:
+    """多 worker 指标汇总测试"""
+
+    def test_render_aggregates_all_workers(self, tmp_path, monkeypatch):
+        """测试：启用多进程模式后，/metrics 汇总所有 worker 写入的计数"""
+        # Arrange：两个独立进程各记录一次
+        env = {**os.environ, MULTIPROC_DIR_ENV: str(tmp_path)}
+        for _ in range(2):
+            subprocess.run([sys.executable, "-c", WORKER_SCRIPT], env=env, check=True)
+        monkeypatch.setenv(MULTIPROC_DIR_ENV, str(tmp_path))
+
+        # Act
+        content, _ = render_metrics()
+
+        # Assert
+        assert (
+            'ai_qa_llm_requests_total{model="qwen-test",operation="chat",status="ok"} 2.0'
+            in content.decode()
+        )
+
+    def test_single_worker_uses_process_registry(self, monkeypatch):
+        """测试：单进程且未配置目录时不启用多进程模式"""
+        # Arrange
+        monkeypatch.delenv(MULTIPROC_DIR_ENV, raising=False)
+
+        # Act
+        directory = prepare_metrics_dir(workers=1)
+
+        # Assert
+        assert directory is None
+        assert MULTIPROC_DIR_ENV not in os.environ
+
+    def test_multiple_workers_prepare_clean_directory(self, tmp_path, monkeypatch):
+        """测试：多 worker 启动前设置环境变量，并删除上次运行遗留的指标文件"""
+        # Arrange
+        monkeypatch.delenv(MULTIPROC_DIR_ENV, raising=False)
+        (tmp_path / "counter_123.db").write_bytes(b"stale")
+
+        # Act
+        directory = prepare_metrics_dir(workers=2, directory=str(tmp_path))
+
+        # Assert
+        assert directory == str(tmp_path)
+        assert os.environ[MULTIPROC_DIR_ENV] == str(tmp_path)
+        assert list(tmp_path.glob("*.db")) == []
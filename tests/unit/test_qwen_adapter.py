@@ -1,6 +1,6 @@
 """QwenAdapter 单元测试"""
 import pytest
-from unittest.mock import MagicMock, patch, Mock
+from unittest.mock import AsyncMock, MagicMock, patch, Mock
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 
 from ai_qa.infrastructure.llm.qwen_adapter import QwenAdapter
@@ -42,6 +42,25 @@ class TestQwenAdapterInitialization:
             # 验证 ChatOpenAI 被调用了两次（普通客户端和流式客户端）
             assert mock_chat_openai.call_count == 2
 
+    def test_init_shares_http_clients(self):
+        """测试：普通客户端和流式客户端共用注入的 httpx 连接池"""
+        http_client = MagicMock()
+        http_async_client = MagicMock()
+        with patch('ai_qa.infrastructure.llm.qwen_adapter.ChatOpenAI') as mock_chat_openai:
+            # Act
+            QwenAdapter(
+                api_key="test_key",
+                base_url="https://api.test.com",
+                model_name="qwen-max",
+                http_client=http_client,
+                http_async_client=http_async_client
+            )
+
+            # Assert
+            for call in mock_chat_openai.call_args_list:
+                assert call.kwargs["http_client"] is http_client
+                assert call.kwargs["http_async_client"] is http_async_client
+
 
 class TestConvertMessage:
     """消息转换功能测试"""
@@ -179,6 +198,59 @@ class TestChat:
         # Assert
         assert result == ""
 
+    def test_chat_records_token_usage(self, qwen_adapter):
+        """测试：chat 把响应中的 token 用量计入指标"""
+        prometheus_client = pytest.importorskip("prometheus_client")
+
+        # Arrange
+        def tokens(direction):
+            return prometheus_client.REGISTRY.get_sample_value(
+                "ai_qa_llm_tokens_total", {"model": "qwen-test", "direction": direction}
+            ) or 0
+
+        before = tokens("input"), tokens("output")
+        mock_response = MagicMock()
+        mock_response.content = "Hi"
+        mock_response.usage_metadata = {"input_tokens": 12, "output_tokens": 3, "total_tokens": 15}
+        qwen_adapter._client.invoke = MagicMock(return_value=mock_response)
+
+        # Act
+        qwen_adapter.chat([Message(role=MessageRole.USER, content="Hello")])
+
+        # Assert
+        assert tokens("input") - before[0] == 12
+        assert tokens("output") - before[1] == 3
+
+    def test_chat_records_usage_for_current_user(self, qwen_adapter):
+        """测试：chat 把 token 用量交给用量记录器"""
+        # Arrange
+        recorder = MagicMock()
+        qwen_adapter._usage_recorder = recorder
+        mock_response = MagicMock()
+        mock_response.content = "Hi"
+        mock_response.usage_metadata = {"input_tokens": 12, "output_tokens": 3, "total_tokens": 15}
+        qwen_adapter._client.invoke = MagicMock(return_value=mock_response)
+
+        # Act
+        qwen_adapter.chat([Message(role=MessageRole.USER, content="Hello")])
+
+        # Assert
+        recorder.record.assert_called_once_with("llm", "qwen-test", 12, 3)
+
+    def test_chat_error_records_estimated_input(self, qwen_adapter):
+        """测试：调用失败时按提示词估算输入用量"""
+        # Arrange
+        recorder = MagicMock()
+        qwen_adapter._usage_recorder = recorder
+        qwen_adapter._client.invoke = MagicMock(side_effect=RuntimeError("timeout"))
+
+        # Act
+        with pytest.raises(RuntimeError):
+            qwen_adapter.chat([Message(role=MessageRole.USER, content="Hello world")])
+
+        # Assert
+        recorder.record.assert_called_once_with("llm", "qwen-test", 3, 0)
+
 
 class TestChatStream:
     """流式聊天功能测试"""
@@ -263,6 +335,72 @@ class TestChatStream:
         assert result == []
 
 
+@pytest.mark.asyncio
+class TestAsyncChatStream:
+    """异步流式聊天测试"""
+
+    async def test_achat_stream_yields_chunks(self, qwen_adapter):
+        """测试：achat_stream 逐步返回非空内容"""
+        # Arrange
+        async def fake_astream(messages):
+            for content in ["Hello", "", " there"]:
+                yield MagicMock(content=content, usage_metadata=None)
+
+        qwen_adapter._stream_client.astream = fake_astream
+
+        # Act
+        result = [chunk async for chunk in qwen_adapter.achat_stream(
+            [Message(role=MessageRole.USER, content="Hello")]
+        )]
+
+        # Assert
+        assert result == ["Hello", " there"]
+
+    async def test_achat_stream_close_stops_upstream(self, qwen_adapter):
+        """测试：关闭生成器时上游流也被关闭"""
+        # Arrange
+        upstream_closed = False
+
+        async def fake_astream(messages):
+            nonlocal upstream_closed
+            try:
+                while True:
+                    yield MagicMock(content="token", usage_metadata=None)
+            finally:
+                upstream_closed = True
+
+        qwen_adapter._stream_client.astream = fake_astream
+        stream = qwen_adapter.achat_stream([Message(role=MessageRole.USER, content="Hello")])
+
+        # Act
+        assert await stream.__anext__() == "token"
+        await stream.aclose()
+
+        # Assert
+        assert upstream_closed
+
+    async def test_achat_stream_cancelled_records_estimated_usage(self, qwen_adapter):
+        """测试：流中途关闭（没有用量数据）时按提示词和已生成内容估算用量"""
+        # Arrange
+        recorder = MagicMock()
+        qwen_adapter._usage_recorder = recorder
+
+        async def fake_astream(messages):
+            while True:
+                yield MagicMock(content="你好", usage_metadata=None)
+
+        qwen_adapter._stream_client.astream = fake_astream
+        stream = qwen_adapter.achat_stream([Message(role=MessageRole.USER, content="介绍一下 Python")])
+
+        # Act
+        await stream.__anext__()
+        await stream.__anext__()
+        await stream.aclose()
+
+        # Assert：输入 "介绍一下" 4 + " Python" 2，输出 "你好你好" 4
+        recorder.record.assert_called_once_with("llm", "qwen-test", 6, 4)
+
+
 class TestChatWithTools:
     """带工具调用的聊天功能测试"""
 
@@ -335,6 +473,50 @@ class TestChatWithTools:
         assert result == mock_response
 
 
+@pytest.mark.asyncio
+class TestAsyncChatWithTools:
+    """异步工具调用测试"""
+
+    async def test_achat_with_tools_awaits_ainvoke(self, qwen_adapter):
+        """测试：achat_with_tools 通过 ainvoke 调用模型并记录用量"""
+        # Arrange
+        recorder = MagicMock()
+        qwen_adapter._usage_recorder = recorder
+        tools = [MagicMock()]
+        mock_response = MagicMock()
+        mock_response.content = "4"
+        mock_response.usage_metadata = {"input_tokens": 20, "output_tokens": 1, "total_tokens": 21}
+        mock_llm_with_tools = MagicMock()
+        mock_llm_with_tools.ainvoke = AsyncMock(return_value=mock_response)
+        qwen_adapter._client.bind_tools = MagicMock(return_value=mock_llm_with_tools)
+
+        # Act
+        result = await qwen_adapter.achat_with_tools(
+            [HumanMessage(content="2+2")], tools, system_prompt="You are a math assistant"
+        )
+
+        # Assert
+        assert result == mock_response
+        mock_llm_with_tools.invoke.assert_not_called()
+        call_args = mock_llm_with_tools.ainvoke.await_args[0][0]
+        assert isinstance(call_args[0], SystemMessage)
+        recorder.record.assert_called_once_with("llm", "qwen-test", 20, 1)
+
+    async def test_achat_with_tools_error_records_estimated_input(self, qwen_adapter):
+        """测试：异步工具调用失败时按提示词估算输入用量"""
+        # Arrange
+        recorder = MagicMock()
+        qwen_adapter._usage_recorder = recorder
+        qwen_adapter._client.ainvoke = AsyncMock(side_effect=RuntimeError("timeout"))
+
+        # Act
+        with pytest.raises(RuntimeError):
+            await qwen_adapter.achat_with_tools([HumanMessage(content="Hello world")], [])
+
+        # Assert
+        recorder.record.assert_called_once_with("llm", "qwen-test", 3, 0)
+
+
 class TestQwenAdapterIntegration:
     """QwenAdapter 集成测试"""
 
@@ -0,0 +1,69 @@
+"""令牌桶限流单元测试"""
+from ai_qa.infrastructure.ratelimit import InMemoryTokenBucket
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestInMemoryTokenBucket:
+    """进程内令牌桶测试"""
+
+    def test_allows_burst_up_to_capacity(self):
+        """测试：容量内的突发请求全部放行，超出后返回等待时间"""
+        # Arrange
+        bucket = InMemoryTokenBucket(capacity=3, refill_rate=1, clock=FakeClock())
+
+        # Act
+        results = [bucket.acquire("user:1") for _ in range(4)]
+
+        # Assert
+        assert results[:3] == [0.0, 0.0, 0.0]
+        assert results[3] == 1.0
+
+    def test_refills_over_time(self):
+        """测试：令牌按速率补充，且不超过容量"""
+        # Arrange
+        clock = FakeClock()
+        bucket = InMemoryTokenBucket(capacity=2, refill_rate=0.5, clock=clock)
+        bucket.acquire("user:1")
+        bucket.acquire("user:1")
+        assert bucket.acquire("user:1") > 0
+
+        # Act
+        clock.now = 2.0
+
+        # Assert
+        assert bucket.acquire("user:1") == 0.0
+        assert bucket.acquire("user:1") == 2.0
+
+    def test_keys_are_isolated(self):
+        """测试：不同用户的桶互不影响"""
+        # Arrange
+        bucket = InMemoryTokenBucket(capacity=1, refill_rate=1, clock=FakeClock())
+        bucket.acquire("user:1")
+
+        # Act & Assert
+        assert bucket.acquire("user:1") > 0
+        assert bucket.acquire("user:2") == 0.0
+
+    def test_evicts_full_buckets(self):
+        """测试：桶数量超过上限时清理已补满的桶"""
+        # Arrange
+        clock = FakeClock()
+        bucket = InMemoryTokenBucket(capacity=1, refill_rate=1, clock=clock, max_keys=2)
+        bucket.acquire("a")
+        bucket.acquire("b")
+
+        # Act
+        clock.now = 10.0
+        bucket.acquire("c")
+
+        # Assert
+        assert set(bucket._buckets) == {"c"}
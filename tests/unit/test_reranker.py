@@ -0,0 +1,83 @@
+"""重排序器单元测试"""
+from unittest.mock import MagicMock
+
+from ai_qa.application.knowledge_service import KnowledgeService
+from ai_qa.domain.entities import DocumentChunk
+from ai_qa.infrastructure.rerank import CrossEncoderReranker, LexicalReranker
+
+
+def make_chunks(*contents: str) -> list[DocumentChunk]:
+    return [DocumentChunk(content=content, chunk_id=i) for i, content in enumerate(contents)]
+
+
+class TestLexicalReranker:
+    """词项重排序测试"""
+
+    def test_rerank_promotes_exact_match(self):
+        """测试：精确命中查询词的候选被提前"""
+        # Arrange
+        chunks = make_chunks("退货流程说明", "发票开具说明", "错误码 E-1024 表示库存不足")
+
+        # Act
+        result = LexicalReranker().rerank("E-1024 是什么意思", chunks, top_n=2)
+
+        # Assert
+        assert len(result) == 2
+        assert result[0].chunk_id == 2
+
+    def test_rerank_keeps_original_order_without_overlap(self):
+        """测试：没有词项命中时保持召回顺序"""
+        chunks = make_chunks("alpha", "beta", "gamma")
+
+        result = LexicalReranker().rerank("delta", chunks, top_n=3)
+
+        assert [chunk.chunk_id for chunk in result] == [0, 1, 2]
+
+
+class TestCrossEncoderReranker:
+    """Cross-Encoder 重排序测试"""
+
+    def test_rerank_sorts_by_model_score_in_batches(self):
+        """测试：按模型分数排序，并按配置的 batch_size 推理"""
+        # Arrange
+        reranker = CrossEncoderReranker(batch_size=8)
+        reranker._model = MagicMock()
+        reranker._model.predict.return_value = [0.1, 0.9, 0.5]
+        chunks = make_chunks("a", "b", "c")
+
+        # Act
+        result = reranker.rerank("query", chunks, top_n=2)
+
+        # Assert
+        assert [chunk.chunk_id for chunk in result] == [1, 2]
+        _, kwargs = reranker._model.predict.call_args
+        assert kwargs["batch_size"] == 8
+
+
+class TestKnowledgeServiceRerank:
+    """KnowledgeService 两阶段检索测试"""
+
+    def test_query_over_fetches_then_reranks(
+        self, mock_llm, mock_memory
+    ):
+        """测试：先召回 rerank_candidates 个候选，再重排取 top_k"""
+        # Arrange
+        vector_store = MagicMock()
+        candidates = make_chunks(*[f"内容{i}" for i in range(10)])
+        vector_store.search.return_value = candidates
+        reranker = MagicMock()
+        reranker.rerank.return_value = candidates[:3]
+        service = KnowledgeService(
+            vector_store=vector_store,
+            llm=mock_llm,
+            memory=mock_memory,
+            reranker=reranker,
+            rerank_candidates=10,
+        )
+
+        # Act
+        service.query("问题", "kb123", top_k=3)
+
+        # Assert
+        assert vector_store.search.call_args[0][2] == 10
+        reranker.rerank.assert_called_once_with("问题", candidates, 3)
@@ -6,7 +6,10 @@ from jose import jwt
 
 from ai_qa.infrastructure.auth.security import (
     hash_password,
+    hash_password_async,
     verify_password,
+    verify_and_update_password,
+    verify_and_update_password_async,
     create_access_token,
     verify_token,
     SECRET_KEY,
@@ -94,6 +97,66 @@ class TestPasswordVerification:
         assert result is False
 
 
+class TestPasswordRehash:
+    """bcrypt cost 变更后的重新哈希测试"""
+
+    def test_current_cost_needs_no_update(self):
+        """测试：按当前 cost 生成的哈希不需要更新"""
+        # Arrange
+        hashed = hash_password("my_password123")
+
+        # Act
+        verified, new_hash = verify_and_update_password("my_password123", hashed)
+
+        # Assert
+        assert verified is True
+        assert new_hash is None
+
+    def test_outdated_cost_returns_new_hash(self):
+        """测试：cost 不同的旧哈希验证通过后返回按当前 cost 生成的新哈希"""
+        # Arrange
+        from passlib.hash import bcrypt
+        from ai_qa.infrastructure.auth.security import BCRYPT_ROUNDS
+        old_rounds = 4 if BCRYPT_ROUNDS != 4 else 5
+        hashed = bcrypt.using(rounds=old_rounds).hash("my_password123")
+
+        # Act
+        verified, new_hash = verify_and_update_password("my_password123", hashed)
+
+        # Assert
+        assert verified is True
+        assert new_hash.startswith(f"$2b${BCRYPT_ROUNDS:02d}$")
+        assert verify_password("my_password123", new_hash)
+
+    def test_wrong_password_returns_no_hash(self):
+        """测试：密码错误时不返回新哈希"""
+        # Arrange
+        from passlib.hash import bcrypt
+        hashed = bcrypt.using(rounds=4).hash("my_password123")
+
+        # Act
+        verified, new_hash = verify_and_update_password("wrong", hashed)
+
+        # Assert
+        assert verified is False
+        assert new_hash is None
+
+
+@pytest.mark.asyncio
+class TestPasswordAsync:
+    """线程池中的密码操作测试"""
+
+    async def test_async_hash_and_verify(self):
+        """测试：异步哈希结果可以被异步验证"""
+        # Act
+        hashed = await hash_password_async("my_password123")
+        verified, new_hash = await verify_and_update_password_async("my_password123", hashed)
+
+        # Assert
+        assert verified is True
+        assert new_hash is None
+
+
 class TestCreateAccessToken:
     """JWT Token 创建功能测试"""
 
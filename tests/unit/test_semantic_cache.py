@@ -0,0 +1,63 @@
+"""InMemorySemanticCache 单元测试"""
+from ai_qa.domain.entities import CachedAnswer
+from ai_qa.infrastructure.cache import InMemorySemanticCache
+
+
+class TestInMemorySemanticCache:
+    """语义缓存测试"""
+
+    def test_lookup_hits_similar_query(self):
+        """测试：相似度超过阈值时命中"""
+        cache = InMemorySemanticCache(threshold=0.9)
+        cache.store("kb1", [1.0, 0.0], CachedAnswer(answer="答案", chunk_ids=["c1"]))
+
+        result = cache.lookup("kb1", [0.99, 0.05])
+
+        assert result.answer == "答案"
+        assert result.chunk_ids == ["c1"]
+        assert result.similarity > 0.9
+
+    def test_lookup_misses_dissimilar_query_and_other_kb(self):
+        """测试：不相似或不同知识库时未命中"""
+        cache = InMemorySemanticCache(threshold=0.9)
+        cache.store("kb1", [1.0, 0.0], CachedAnswer(answer="答案"))
+
+        assert cache.lookup("kb1", [0.0, 1.0]) is None
+        assert cache.lookup("kb2", [1.0, 0.0]) is None
+
+    def test_invalidate_clears_and_rejects_stale_store(self):
+        """测试：失效后清空缓存，并拒绝失效前开始的写入"""
+        cache = InMemorySemanticCache()
+        generation = cache.generation("kb1")
+        cache.store("kb1", [1.0, 0.0], CachedAnswer(answer="旧答案"))
+
+        cache.invalidate("kb1")
+        cache.store("kb1", [1.0, 0.0], CachedAnswer(answer="过期答案"), generation=generation)
+
+        assert cache.lookup("kb1", [1.0, 0.0]) is None
+
+    def test_invalidate_document_removes_only_citing_answers(self):
+        """测试：删除文档只移除引用该文档的回答，并拒绝之前开始的写入"""
+        cache = InMemorySemanticCache(threshold=0.99)
+        generation = cache.generation("kb1")
+        cache.store("kb1", [1.0, 0.0], CachedAnswer(answer="a", chunk_ids=["doc1:0", "doc2:3"]))
+        cache.store("kb1", [0.0, 1.0], CachedAnswer(answer="b", chunk_ids=["doc10:0"]))
+
+        cache.invalidate_document("kb1", "doc1")
+        cache.store("kb1", [1.0, 1.0], CachedAnswer(answer="过期答案"), generation=generation)
+
+        assert cache.lookup("kb1", [1.0, 0.0]) is None
+        assert cache.lookup("kb1", [0.0, 1.0]).answer == "b"
+        assert cache.lookup("kb1", [1.0, 1.0]) is None
+
+    def test_evicts_least_recently_used(self):
+        """测试：超过容量时淘汰最久未使用的条目"""
+        cache = InMemorySemanticCache(threshold=0.99, max_entries_per_kb=2)
+        cache.store("kb1", [1.0, 0.0, 0.0], CachedAnswer(answer="a"))
+        cache.store("kb1", [0.0, 1.0, 0.0], CachedAnswer(answer="b"))
+        cache.lookup("kb1", [1.0, 0.0, 0.0])  # a 变为最近使用
+
+        cache.store("kb1", [0.0, 0.0, 1.0], CachedAnswer(answer="c"))
+
+        assert cache.lookup("kb1", [1.0, 0.0, 0.0]).answer == "a"
+        assert cache.lookup("kb1", [0.0, 1.0, 0.0]) is None
@@ -0,0 +1,196 @@
+"""SSE 流登记表单元测试"""
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from ai_qa.domain.exceptions import NotFoundException
+from ai_qa.interfaces.api.sse import HEARTBEAT, SSEStreamRegistry
+
+
+@pytest.mark.asyncio
+class TestSSEStreamRegistry:
+    """事件 ID、心跳、背压和续传测试"""
+
+    async def test_events_get_sequential_ids(self):
+        """测试：每个事件加上 stream_id:序号"""
+        # Arrange
+        async def source(db):
+            yield "data: 1\n\n"
+            yield "data: 2\n\n"
+
+        registry = SSEStreamRegistry()
+        response = registry.response(source, user_id="u1", session_id="s1")
+        stream_id = response.headers["x-stream-id"]
+
+        # Act
+        events = [event async for event in response.body_iterator]
+
+        # Assert
+        assert events == [f"id: {stream_id}:1\ndata: 1\n\n", f"id: {stream_id}:2\ndata: 2\n\n"]
+
+    async def test_empty_events_are_skipped(self):
+        """测试：业务生成器产出的空字符串不会变成只有 id 行的事件"""
+        # Arrange
+        async def source(db):
+            yield "data: 1\n\n"
+            yield ""
+            yield "data: [DONE]\n\n"
+
+        registry = SSEStreamRegistry()
+        response = registry.response(source, user_id="u1", session_id="s1")
+        stream_id = response.headers["x-stream-id"]
+
+        # Act
+        events = [event async for event in response.body_iterator]
+
+        # Assert
+        assert events == [f"id: {stream_id}:1\ndata: 1\n\n", f"id: {stream_id}:2\ndata: [DONE]\n\n"]
+
+    async def test_heartbeat_when_idle(self):
+        """测试：超过心跳间隔没有事件时发送注释行"""
+        # Arrange
+        async def source(db):
+            await asyncio.sleep(0.05)
+            yield "data: late\n\n"
+
+        registry = SSEStreamRegistry(heartbeat_interval=0.01)
+        response = registry.response(source, user_id="u1", session_id="s1")
+
+        # Act
+        events = [event async for event in response.body_iterator]
+
+        # Assert
+        assert events[0] == HEARTBEAT
+        assert events[-1].endswith("data: late\n\n")
+
+    async def test_slow_client_pauses_producer(self):
+        """测试：未发送事件达到缓冲区一半时暂停读取业务生成器"""
+        # Arrange
+        produced = 0
+
+        async def source(db):
+            nonlocal produced
+            for i in range(100):
+                produced += 1
+                yield f"data: {i}\n\n"
+
+        registry = SSEStreamRegistry(buffer_size=8)
+        response = registry.response(source, user_id="u1", session_id="s1")
+
+        # Act：没有客户端读取
+        await asyncio.sleep(0.05)
+
+        # Assert：缓冲了 window（4）个事件，第 5 个等待写入，不再继续读取
+        assert produced == 5
+        consumer = response.body_iterator
+        await consumer.__anext__()
+        await consumer.aclose()
+
+    async def test_resume_from_last_event_id(self):
+        """测试：续传从 Last-Event-ID 的下一个事件开始，并校验所属用户"""
+        # Arrange
+        async def source(db):
+            for i in range(3):
+                yield f"data: {i}\n\n"
+
+        registry = SSEStreamRegistry()
+        response = registry.response(source, user_id="u1", session_id="s1")
+        stream_id = response.headers["x-stream-id"]
+        [event async for event in response.body_iterator]
+
+        # Act
+        resumed = registry.resume(f"{stream_id}:1", user_id="u1", session_id="s1")
+        events = [event async for event in resumed.body_iterator]
+
+        # Assert
+        assert events == [f"id: {stream_id}:2\ndata: 1\n\n", f"id: {stream_id}:3\ndata: 2\n\n"]
+        with pytest.raises(NotFoundException):
+            registry.resume(f"{stream_id}:1", user_id="u2", session_id="s1")
+
+    async def test_abandoned_stream_cancels_producer(self):
+        """测试：断开后超过续传时间无人续传，取消生成并关闭业务生成器"""
+        # Arrange
+        closed = asyncio.Event()
+
+        async def source(db):
+            try:
+                yield "data: first\n\n"
+                await asyncio.sleep(3600)
+            finally:
+                closed.set()
+
+        registry = SSEStreamRegistry(resume_ttl=0.01)
+        response = registry.response(source, user_id="u1", session_id="s1")
+        consumer = response.body_iterator
+
+        # Act：读取一个事件后断开
+        await consumer.__anext__()
+        await consumer.aclose()
+        await asyncio.wait_for(closed.wait(), 1)
+
+        # Assert
+        assert len(registry) == 0
+
+    async def test_drain_waits_then_cancels(self):
+        """测试：退出前等待生成结束，超时的流被取消并关闭业务生成器"""
+        # Arrange
+        finished = asyncio.Event()
+        closed = asyncio.Event()
+
+        async def quick(db):
+            await asyncio.sleep(0.01)
+            yield "data: done\n\n"
+            finished.set()
+
+        async def stuck(db):
+            try:
+                yield "data: first\n\n"
+                await asyncio.sleep(3600)
+            finally:
+                closed.set()
+
+        registry = SSEStreamRegistry()
+        registry.response(quick, user_id="u1", session_id="s1")
+        registry.response(stuck, user_id="u1", session_id="s2")
+
+        # Act
+        await registry.drain(timeout=0.1)
+
+        # Assert
+        assert finished.is_set()
+        assert closed.is_set()
+
+    async def test_producer_owns_database_session(self):
+        """测试：每个流的后台任务打开自己的数据库会话，生成结束或被取消后关闭"""
+        # Arrange
+        sessions = []
+
+        def session_factory():
+            sessions.append(MagicMock())
+            return sessions[-1]
+
+        async def finished(db):
+            yield "data: done\n\n"
+
+        async def stuck(db):
+            yield "data: first\n\n"
+            await asyncio.sleep(3600)
+
+        received = []
+        registry = SSEStreamRegistry(session_factory=session_factory)
+
+        # Act
+        response = registry.response(
+            lambda db: received.append(db) or finished(db), user_id="u1", session_id="s1"
+        )
+        [event async for event in response.body_iterator]
+        registry.response(stuck, user_id="u1", session_id="s2")
+        await asyncio.sleep(0.01)
+        await registry.drain(timeout=0.01)
+
+        # Assert
+        assert received == [sessions[0]]
+        assert len(sessions) == 2
+        for session in sessions:
+            session.close.assert_called_once()
@@ -0,0 +1,83 @@
+"""请求分阶段计时单元测试"""
+import contextvars
+import threading
+
+from ai_qa.infrastructure.observability import current_timings, span, start_request, timed_stream
+
+
+def _run_in_request(func):
+    """在独立上下文中模拟一次请求"""
+    def wrapper():
+        start_request()
+        func()
+        return current_timings()
+    return contextvars.copy_context().run(wrapper)
+
+
+class TestRequestTimings:
+    """分阶段计时测试"""
+
+    def test_span_accumulates_same_stage(self):
+        """测试：同名阶段多次出现时累加"""
+        def handle():
+            with span("tool"):
+                pass
+            with span("tool"):
+                pass
+            with span("llm"):
+                pass
+
+        timings = _run_in_request(handle)
+
+        stages = timings.to_dict()
+        assert set(stages) == {"tool", "llm", "total"}
+        assert stages["total"] >= stages["tool"]
+
+    def test_span_outside_request_is_ignored(self):
+        """测试：不在请求上下文中时只记录指标，不报错"""
+        def handle():
+            with span("history"):
+                pass
+
+        contextvars.copy_context().run(handle)
+
+        assert current_timings() is None
+
+    def test_copied_context_records_into_same_request(self):
+        """测试：复制上下文的后台线程记录到同一个请求"""
+        def handle():
+            context = contextvars.copy_context()
+
+            def work():
+                with span("rewrite"):
+                    pass
+
+            thread = threading.Thread(target=context.run, args=(work,))
+            thread.start()
+            thread.join()
+
+        timings = _run_in_request(handle)
+
+        assert "rewrite" in timings.to_dict()
+
+    def test_timed_stream_records_ttft_and_total(self):
+        """测试：流式计时分别记录首个 chunk 和整个流"""
+        def handle():
+            assert list(timed_stream(iter(["a", "b"]))) == ["a", "b"]
+
+        timings = _run_in_request(handle)
+
+        stages = timings.to_dict()
+        assert stages["llm"] >= stages["llm_ttft"]
+
+    def test_server_timing_header_format(self):
+        """测试：Server-Timing 头格式为 name;dur=毫秒"""
+        def handle():
+            with span("auth"):
+                pass
+
+        header = _run_in_request(handle).server_timing()
+
+        parts = [part.split(";dur=") for part in header.split(", ")]
+        assert [name for name, _ in parts] == ["auth", "total"]
+        assert all(float(value) >= 0 for _, value in parts)
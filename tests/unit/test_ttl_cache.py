@@ -0,0 +1,31 @@
+"""TTLCache 单元测试"""
+import time
+
+from ai_qa.infrastructure.cache import TTLCache
+
+
+class TestTTLCache:
+    """TTL 缓存测试"""
+
+    def test_get_returns_default_after_expiry(self):
+        """测试：过期后返回默认值"""
+        cache = TTLCache(ttl_seconds=0.01)
+        cache.set("k", "v")
+        assert cache.get("k") == "v"
+
+        time.sleep(0.02)
+
+        assert cache.get("k", "default") == "default"
+
+    def test_evicts_least_recently_used(self):
+        """测试：超过容量时淘汰最久未使用的条目"""
+        cache = TTLCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
@@ -0,0 +1,113 @@
+"""用量记录器单元测试"""
+import contextvars
+from unittest.mock import MagicMock
+
+from ai_qa.infrastructure.usage import BatchedUsageRecorder, start_usage_scope
+
+
+def _record_as(recorder, user_id, conversation_id, *args):
+    """在指定用户 / 会话的请求上下文中记录用量"""
+    def run():
+        scope = start_usage_scope()
+        scope.user_id, scope.conversation_id = user_id, conversation_id
+        recorder.record(*args)
+    contextvars.copy_context().run(run)
+
+
+class TestBatchedUsageRecorder:
+    """批量用量记录测试"""
+
+    def test_aggregates_by_user_conversation_and_model(self):
+        """测试：同一用户 / 会话 / 模型的多次调用合并为一行"""
+        # Arrange
+        recorder = BatchedUsageRecorder(session_factory=MagicMock(), flush_interval=3600)
+        _record_as(recorder, "u1", "c1", "llm", "qwen", 10, 5)
+        _record_as(recorder, "u1", "c1", "llm", "qwen", 20, 7)
+        _record_as(recorder, "u2", "", "embedding", "text-embedding-v3", 8)
+
+        # Act
+        rows = {(row["user_id"], row["kind"]): row for row in recorder._drain()}
+
+        # Assert
+        assert len(rows) == 2
+        assert rows[("u1", "llm")]["request_count"] == 2
+        assert rows[("u1", "llm")]["input_tokens"] == 30
+        assert rows[("u1", "llm")]["output_tokens"] == 12
+        assert rows[("u2", "embedding")]["input_tokens"] == 8
+        assert recorder._drain() == []
+
+    def test_record_outside_request_is_anonymous(self):
+        """测试：不在请求上下文中的调用归属为空用户"""
+        # Arrange
+        recorder = BatchedUsageRecorder(session_factory=MagicMock(), flush_interval=3600)
+
+        # Act
+        contextvars.copy_context().run(recorder.record, "llm", "qwen", 1, 1)
+
+        # Assert
+        rows = recorder._drain()
+        assert rows[0]["user_id"] == "" and rows[0]["conversation_id"] == ""
+
+    def test_flush_writes_one_statement(self):
+        """测试：flush 用一条语句写入全部分组并提交"""
+        # Arrange
+        session = MagicMock()
+        recorder = BatchedUsageRecorder(session_factory=lambda: session, flush_interval=3600)
+        _record_as(recorder, "u1", "c1", "llm", "qwen", 10, 5)
+        _record_as(recorder, "u2", "c2", "llm", "qwen", 1, 1)
+
+        # Act
+        recorder.flush()
+
+        # Assert
+        session.execute.assert_called_once()
+        session.commit.assert_called_once()
+        session.close.assert_called_once()
+
+    def test_flush_failure_keeps_usage(self):
+        """测试：写入失败时用量放回内存，下次一起写入"""
+        # Arrange
+        session = MagicMock()
+        session.execute.side_effect = RuntimeError("db down")
+        recorder = BatchedUsageRecorder(session_factory=lambda: session, flush_interval=3600)
+        _record_as(recorder, "u1", "c1", "llm", "qwen", 10, 5)
+
+        # Act
+        recorder.flush()
+
+        # Assert
+        session.rollback.assert_called_once()
+        rows = recorder._drain()
+        assert rows[0]["input_tokens"] == 10
+
+    def test_repeated_flush_failures_log_once_and_cap_pending(self, caplog):
+        """测试：连续写入失败只打印一次堆栈，积压分组不超过 max_pending，恢复后重新计数"""
+        # Arrange
+        session = MagicMock()
+        session.execute.side_effect = RuntimeError("relation usage_stats does not exist")
+        recorder = BatchedUsageRecorder(
+            session_factory=lambda: session, flush_interval=3600, max_pending=2
+        )
+        _record_as(recorder, "u1", "c1", "llm", "qwen", 1, 1)
+
+        # Act
+        with caplog.at_level("DEBUG", logger="ai_qa.infrastructure.usage.recorder"):
+            for i in range(5):
+                _record_as(recorder, f"u{i + 2}", "c1", "llm", "qwen", 1, 1)
+                recorder.flush()
+
+        # Assert
+        errors = [r for r in caplog.records if r.levelname == "ERROR"]
+        warnings = [r for r in caplog.records if r.levelname == "WARNING"]
+        assert len(errors) == 1 and errors[0].exc_info
+        assert len(warnings) == 1
+        assert len(recorder._pending) == 2
+        assert recorder._retry_at > 0
+
+        # Act：写入恢复
+        session.execute.side_effect = None
+        recorder.flush()
+
+        # Assert
+        assert recorder._failures == 0 and recorder._retry_at == 0.0
+        assert recorder._pending == {}
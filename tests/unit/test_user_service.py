@@ -1,29 +1,30 @@
 """UserService 单元测试"""
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from ai_qa.application.user_service import UserService
 from ai_qa.domain.exceptions import ConflictException, ForbiddenException, UnauthorizedException
 
 
+@pytest.mark.asyncio
 class TestUserServiceRegister:
     """注册功能测试"""
 
-    def test_register_success(self, mock_db):
+    async def test_register_success(self, mock_db):
         """测试：正常注册成功"""
         # Arrange
         mock_db.query.return_value.filter.return_value.first.return_value = None  # 用户不存在
         service = UserService(mock_db)
 
         # Act
-        with patch('ai_qa.infrastructure.auth.hash_password', return_value="hashed_pwd"):
-            user = service.register("testuser", "password123", "test@example.com")
+        with patch('ai_qa.application.user_service.hash_password_async', AsyncMock(return_value="hashed_pwd")):
+            user = await service.register("testuser", "password123", "test@example.com")
         
         # Assert
         mock_db.add.assert_called_once()     # 验证调用了 add
         mock_db.commit.assert_called_once()  # 验证调用了 commit
     
-    def test_register_duplicate_username_raisers_conflict(self, mock_db):
+    async def test_register_duplicate_username_raisers_conflict(self, mock_db):
         """测试：用户名重复应抛出 ConflictException"""
         # Arrange 模拟用户已存在
         existing_user = MagicMock()
@@ -32,15 +33,16 @@ class TestUserServiceRegister:
 
         # Act
         with pytest.raises(ConflictException) as exc_info:
-            service.register("existing_user", "password123")
+            await service.register("existing_user", "password123")
 
         # Assert
         assert "用户名已存在" in str(exc_info.value)
 
+@pytest.mark.asyncio
 class TestUserServiceLogin:
     """登录功能测试"""
 
-    def test_login_success(self, mock_db):
+    async def test_login_success(self, mock_db):
         """测试：正常登录成功"""
         # Arrange：模拟已存在的用户
         mock_user = MagicMock()
@@ -53,15 +55,15 @@ class TestUserServiceLogin:
         service = UserService(mock_db)
         
         # Act
-        with patch('ai_qa.application.user_service.verify_password', return_value=True):
+        with patch('ai_qa.application.user_service.verify_and_update_password_async', AsyncMock(return_value=(True, None))):
             with patch('ai_qa.application.user_service.create_access_token', return_value="fake_token"):
-                user, token = service.login("testuser", "password123")
+                user, token = await service.login("testuser", "password123")
         
         # Assert
         assert user == mock_user
         assert token == "fake_token"
 
-    def test_login_user_not_found_raises_unauthorized(self, mock_db):
+    async def test_login_user_not_found_raises_unauthorized(self, mock_db):
         """测试：用户不存在应抛出 UnauthorizedException"""
         # Arrange
         mock_db.query.return_value.filter.return_value.first.return_value = None
@@ -69,11 +71,11 @@ class TestUserServiceLogin:
         
         # Act & Assert
         with pytest.raises(UnauthorizedException) as exc_info:
-            service.login("nonexistent", "password")
+            await service.login("nonexistent", "password")
         
         assert "用户名或密码错误" in str(exc_info.value)
 
-    def test_login_wrong_password_raises_unauthorized(self, mock_db):
+    async def test_login_wrong_password_raises_unauthorized(self, mock_db):
         """测试：密码错误应抛出 UnauthorizedException"""
         # Arrange
         mock_user = MagicMock()
@@ -82,11 +84,11 @@ class TestUserServiceLogin:
         service = UserService(mock_db)
         
         # Act & Assert
-        with patch('ai_qa.application.user_service.verify_password', return_value=False):
+        with patch('ai_qa.application.user_service.verify_and_update_password_async', AsyncMock(return_value=(False, None))):
             with pytest.raises(UnauthorizedException):
-                service.login("testuser", "wrong_password")
+                await service.login("testuser", "wrong_password")
 
-    def test_login_disabled_user_raises_forbidden(self, mock_db):
+    async def test_login_disabled_user_raises_forbidden(self, mock_db):
         """测试：账号被禁用应抛出 ForbiddenException"""
         # Arrange
         mock_user = MagicMock()
@@ -96,7 +98,57 @@ class TestUserServiceLogin:
         service = UserService(mock_db)
         
         # Act & Assert
-        with patch('ai_qa.application.user_service.verify_password', return_value=True):
+        with patch('ai_qa.application.user_service.verify_and_update_password_async', AsyncMock(return_value=(True, None))):
             with pytest.raises(ForbiddenException):
-                service.login("testuser", "password")
-    
\ No newline at end of file
+                await service.login("testuser", "password")
+
+    async def test_login_rehashes_outdated_password(self, mock_db):
+        """测试：密码哈希的 cost 过期时登录成功后写入新哈希"""
+        # Arrange
+        mock_user = MagicMock()
+        mock_user.status = 1
+        mock_user.password_hash = "old_hash"
+        mock_db.query.return_value.filter.return_value.first.return_value = mock_user
+        service = UserService(mock_db)
+
+        # Act
+        with patch('ai_qa.application.user_service.verify_and_update_password_async', AsyncMock(return_value=(True, "new_hash"))):
+            with patch('ai_qa.application.user_service.create_access_token', return_value="fake_token"):
+                await service.login("testuser", "password")
+
+        # Assert
+        assert mock_user.password_hash == "new_hash"
+        mock_db.commit.assert_called_once()
+    
+
+
+class TestUserServiceRevoke:
+    """Token 撤销测试"""
+
+    def test_logout_bumps_token_version_and_invalidates_cache(self, mock_db):
+        """测试：登出时 token_version 加一并清除鉴权缓存"""
+        # Arrange
+        auth_cache = MagicMock()
+        service = UserService(mock_db, auth_cache=auth_cache)
+
+        # Act
+        service.logout("user_123")
+
+        # Assert
+        mock_db.query.return_value.filter.return_value.update.assert_called_once()
+        mock_db.commit.assert_called_once()
+        auth_cache.invalidate_user.assert_called_once_with("user_123")
+
+    def test_disable_user_revokes_tokens(self, mock_db):
+        """测试：禁用账号同时使 Token 失效"""
+        # Arrange
+        auth_cache = MagicMock()
+        service = UserService(mock_db, auth_cache=auth_cache)
+
+        # Act
+        service.set_status("user_123", 0)
+
+        # Assert
+        assert mock_db.query.return_value.filter.return_value.update.call_count == 2
+        auth_cache.invalidate_user.assert_called_once_with("user_123")
+